@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+決策邊界生成效能基準測試
+比較舊的逐欄掃描（50 欄 x 100 個 y 候選點，每欄呼叫一次模型）與
+批次網格評估 + marching squares 零等高線在不同解析度下的速度，
+並以模型在邊界點上的 |f| 檢查邊界精度
+
+Usage:
+    python benchmarks/benchmark_decision_boundary.py [--resolution 50 100 200 256] [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pu-learning'))
+
+from data_generator import generate_synthetic_data  # noqa: E402
+from pulearning_engine import (  # noqa: E402
+    BOUNDARY_X_RANGE, BOUNDARY_Y_RANGE, generate_decision_boundary, train_nnpu, train_upu
+)
+
+
+def predict(model, algorithm, outputs, points):
+    if algorithm == 'uPU':
+        return np.asarray(model(points)).ravel()
+    with torch.no_grad():
+        return model(torch.FloatTensor(points).to(outputs['device'])).cpu().numpy().ravel()
+
+
+def legacy_column_scan(model, algorithm, outputs):
+    """舊版做法：每個 x 位置呼叫一次模型，取 |f| 最小的 y"""
+    x_line = np.linspace(*BOUNDARY_X_RANGE, 50)
+    y_candidates = np.linspace(*BOUNDARY_Y_RANGE, 100)
+    boundary = []
+    for x in x_line:
+        test_points = np.column_stack([np.full_like(y_candidates, x), y_candidates])
+        predictions = predict(model, algorithm, outputs, test_points)
+        boundary.append([float(x), float(y_candidates[np.argmin(np.abs(predictions))])])
+    return boundary
+
+
+def timed(fn, repeat):
+    """重複執行取最短時間（隱藏日誌），回傳 (結果, 毫秒)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--resolution', type=int, nargs='+', default=[50, 100, 200, 256])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--n-p', type=int, default=50)
+    parser.add_argument('--n-u', type=int, default=300)
+    parser.add_argument('--prior', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    xp, xu, _, _ = generate_synthetic_data('two_moons', dims=2, n_p=args.n_p, n_u=args.n_u,
+                                           prior=args.prior, seed=args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        models = {
+            'uPU': train_upu(xp, xu, args.prior, {'model_type': 'gauss', 'use_bias': True, 'n_basis': 200},
+                             seed=args.seed),
+            'nnPU': train_nnpu(xp, xu, args.prior, {'n_epochs': 30, 'hidden_dim': 100, 'learning_rate': 0.001,
+                                                    'activation': 'relu'}, seed=args.seed),
+        }
+
+    print(f"{'algorithm':>9} {'method':>14} {'points':>7} {'time (ms)':>10} {'speedup':>8} {'max |f| on boundary':>20}")
+
+    for algorithm, (model, outputs) in models.items():
+        legacy, legacy_ms = timed(lambda: legacy_column_scan(model, algorithm, outputs), args.repeat)
+        legacy_error = np.max(np.abs(predict(model, algorithm, outputs, np.array(legacy))))
+        print(f"{algorithm:>9} {'column scan':>14} {len(legacy):>7} {legacy_ms:>10.2f} {'':>8} {legacy_error:>20.2e}")
+
+        for resolution in args.resolution:
+            boundary, grid_ms = timed(
+                lambda: generate_decision_boundary(model, algorithm, outputs, resolution), args.repeat
+            )
+            grid_error = np.max(np.abs(predict(model, algorithm, outputs, np.array(boundary))))
+            print(f"{algorithm:>9} {f'grid {resolution}':>14} {len(boundary):>7} {grid_ms:>10.2f} "
+                  f"{legacy_ms / grid_ms:>7.1f}x {grid_error:>20.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+FeatureEngineering.generate_feature_matrix 效能基準測試
+比較逐筆 generate_feature_vector 與批次（攤平序列 + segment reduce）特徵計算的速度，
+並確認兩者的特徵矩陣一致（邊界情況的等價測試見 tests/test_feature_engineering.py）
+
+Usage:
+    python benchmarks/benchmark_feature_matrix.py [--events 1000 10000] [--window 60]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.feature_engineering import FeatureEngineering  # noqa: E402
+
+
+def make_events(n_events: int, window: int, seed: int = 42, as_json: bool = False):
+    """建立與 data_window 服務相同格式的模擬異常事件"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2025-08-01T00:00:00+08:00')
+    rules = ['spike', 'threshold', 'pattern', 'peer', 'dynamic_u_sample', 'Spike']
+    events = []
+    for i in range(n_events):
+        length = int(rng.integers(max(1, window // 2), window + 1))
+        center = base + pd.Timedelta(minutes=int(rng.integers(0, 30 * 1440)))
+        powers = (400 + 150 * rng.standard_normal(length)).round(3).tolist()
+        time_series = [
+            {'timestamp': (center + pd.Timedelta(minutes=k - length // 2)).isoformat(), 'power': power}
+            for k, power in enumerate(powers)
+        ]
+        data_window = {
+            'eventTimestamp': center.isoformat(),
+            'eventPowerValue': powers[length // 2],
+            'timeSeries': time_series,
+            'totalDataPoints': length,
+        }
+        events.append({
+            'eventId': f"event_{i}",
+            'eventTimestamp': center.isoformat(),
+            'detectionRule': rules[i % len(rules)],
+            'score': float(rng.random()),
+            'dataWindow': json.dumps(data_window) if as_json else data_window,
+        })
+    return events
+
+
+def per_event_matrix(featurizer, events):
+    return np.vstack([featurizer.generate_feature_vector(event) for event in events])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--window', type=int, default=60)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    featurizer = FeatureEngineering()
+
+    print(f"{'events':>8} {'format':>7} {'per-event (s)':>14} {'batched (s)':>12} {'speedup':>8} {'max |diff|':>11}")
+    for n_events in args.events:
+        for as_json in (False, True):
+            events = make_events(n_events, args.window, as_json=as_json)
+
+            start = time.perf_counter()
+            expected = per_event_matrix(featurizer, events)
+            per_event_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual, _ = featurizer.generate_feature_matrix(events)
+            batched_seconds = time.perf_counter() - start
+
+            np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+            max_diff = float(np.nanmax(np.abs(actual - expected)))
+            print(f"{n_events:>8} {'json' if as_json else 'dict':>7} {per_event_seconds:>14.3f} "
+                  f"{batched_seconds:>12.3f} {per_event_seconds / batched_seconds:>7.1f}x {max_diff:>11.2e}")
+
+
+if __name__ == '__main__':
+    main()
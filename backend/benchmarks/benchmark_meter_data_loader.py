@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+電表數據載入效能基準測試
+比較 ORM 物件載入（舊路徑）、欄位投影載入與分批串流載入的延遲與記憶體峰值
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/benchmark_meter_data_loader.py \\
+        --start 2025-08-01T00:00:00 --end 2025-08-15T00:00:00
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+
+from core.database import AmmeterLog, db_manager  # noqa: E402
+from services.data_loader import data_loader  # noqa: E402
+
+
+async def load_with_orm(start_time: str, end_time: str) -> pd.DataFrame:
+    """舊路徑：載入完整 AmmeterLog ORM 物件後逐筆組成 DataFrame"""
+    start_datetime = datetime.fromisoformat(start_time)
+    end_datetime = datetime.fromisoformat(end_time)
+    async with db_manager.get_async_session() as session:
+        query = select(AmmeterLog).where(and_(
+            AmmeterLog.createdAt >= start_datetime,
+            AmmeterLog.createdAt <= end_datetime,
+            AmmeterLog.action == "ammeterDetail",
+            AmmeterLog.success == True,
+            AmmeterLog.power.is_not(None),
+            AmmeterLog.power > 0
+        )).order_by(AmmeterLog.deviceNumber, AmmeterLog.createdAt)
+        logs = (await session.execute(query)).scalars().all()
+
+        df = pd.DataFrame([{
+            'deviceNumber': log.deviceNumber,
+            'timestamp': log.createdAt,
+            'power': float(log.power),
+            'kWh': float(log.power),
+            'voltage': float(log.voltage) if log.voltage else 220.0,
+            'current': float(log.currents) if log.currents else 0.0,
+            'currents': float(log.currents) if log.currents else 0.0,
+            'battery': float(log.battery) if log.battery else 85.0,
+            'switchState': int(log.switchState) if log.switchState else 1,
+            'networkState': int(log.networkState) if log.networkState else 1
+        } for log in logs])
+        if df.empty:
+            return df
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values(['deviceNumber', 'timestamp'])
+        return df.drop_duplicates(subset=['deviceNumber', 'timestamp'], keep='last')
+
+
+async def load_streaming(start_time: str, end_time: str, chunk_size: int) -> int:
+    """分批串流：只保留每批的筆數，模擬逐批處理"""
+    total_rows = 0
+    async for chunk in data_loader.iter_meter_data_by_time_range(start_time, end_time, chunk_size=chunk_size):
+        total_rows += len(chunk)
+    return total_rows
+
+
+async def measure(label: str, coroutine_factory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await coroutine_factory()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = result if isinstance(result, int) else len(result)
+    print(f"{label:<24} {rows:>10,} rows {elapsed:>8.2f} s {peak / 1024 / 1024:>10.1f} MB peak")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--start', required=True)
+    parser.add_argument('--end', required=True)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    await measure("ORM objects", lambda: load_with_orm(args.start, args.end))
+    await measure("column projection", lambda: data_loader.load_meter_data_by_time_range(args.start, args.end))
+    await measure(f"streaming ({args.chunk_size})", lambda: load_streaming(args.start, args.end, args.chunk_size))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
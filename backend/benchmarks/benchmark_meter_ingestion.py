@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+電表擷取管線效能基準測試
+以本地 stub（httpx.MockTransport，可設定延遲與失敗率）取代電表 API，
+比較舊路徑（無上限 gather + 逐台 SELECT/UPDATE）與 MeterIngestionPipeline
+
+Usage:
+    DATABASE_URL=sqlite+aiosqlite:////tmp/meter_ingestion.db \\
+        python benchmarks/benchmark_meter_ingestion.py --meters 300 --latency-ms 200 --create-tables
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Base, db_manager, engine  # noqa: E402
+from services.meter_ingestion import MeterApiClient, MeterIngestionPipeline  # noqa: E402
+
+STUB_URL = "http://meter-api.stub/ammeterDetail?deviceNumber={deviceNumber}"
+
+
+def make_stub_transport(latency_ms: float, failure_rate: float, stats: dict) -> httpx.MockTransport:
+    """本地電表 API stub：固定延遲（±50% 抖動），依 failure_rate 回傳 503"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+            if random.random() < failure_rate:
+                return httpx.Response(503, text="upstream unavailable")
+            device_number = request.url.params['deviceNumber']
+            return httpx.Response(200, json={'data': {
+                'factory': 'stub', 'device': device_number,
+                'voltage': round(random.uniform(215, 225), 1),
+                'currents': round(random.uniform(0, 10), 2),
+                'power': round(random.uniform(0, 2000), 1),
+                'battery': 100, 'switchState': 1, 'networkState': 1,
+            }})
+        finally:
+            stats['in_flight'] -= 1
+
+    return httpx.MockTransport(handler)
+
+
+def make_meters(count: int):
+    return [{
+        'electricMeterNumber': f"M{i:05d}",
+        'electricMeterName': f"Stub Meter {i}",
+        'deviceNumber': f"STUB{i:08X}",
+    } for i in range(count)]
+
+
+async def run_legacy(meters, client: MeterApiClient):
+    """舊路徑：每台電表一個 task、無並行上限，逐台 save_ammeter_data"""
+    async def fetch_single_meter(meter):
+        status_code, body = await client.fetch_detail(meter['deviceNumber'])
+        if status_code != 200:
+            raise RuntimeError(f"HTTP {status_code}")
+        reading = json.loads(body)['data']
+        await db_manager.save_ammeter_data({
+            'electricMeterNumber': meter['electricMeterNumber'],
+            'electricMeterName': meter['electricMeterName'],
+            'deviceNumber': meter['deviceNumber'],
+            'lastUpdated': datetime.utcnow(),
+            **{k: reading[k] for k in ('voltage', 'currents', 'power', 'battery', 'switchState', 'networkState')},
+        })
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(fetch_single_meter(m) for m in meters), return_exceptions=True)
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    return time.perf_counter() - start, len(meters) - failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--meters', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--create-tables', action='store_true', help="在目標資料庫建立 ammeter / ammeter_log")
+    args = parser.parse_args()
+
+    if args.create_tables:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    meters = make_meters(args.meters)
+
+    if not args.skip_legacy:
+        stub_stats = {'in_flight': 0, 'max_in_flight': 0}
+        client = MeterApiClient(STUB_URL, transport=make_stub_transport(args.latency_ms, args.failure_rate, stub_stats))
+        elapsed, succeeded = await run_legacy(meters, client)
+        await client.close()
+        print(f"{'legacy gather':<24} {elapsed:>8.2f} s  {succeeded:>5}/{len(meters)} ok  "
+              f"max in-flight {stub_stats['max_in_flight']}")
+
+    stub_stats = {'in_flight': 0, 'max_in_flight': 0}
+    client = MeterApiClient(
+        STUB_URL,
+        max_connections=args.concurrency,
+        transport=make_stub_transport(args.latency_ms, args.failure_rate, stub_stats)
+    )
+    pipeline = MeterIngestionPipeline(api_client=client, concurrency=args.concurrency, batch_size=args.batch_size)
+    metrics = await pipeline.run_cycle(meters)
+    await pipeline.close()
+    print(f"{f'pipeline (c={args.concurrency})':<24} {metrics['duration_seconds']:>8.2f} s  "
+          f"{metrics['meters_succeeded']:>5}/{len(meters)} ok  max in-flight {stub_stats['max_in_flight']}")
+    print(json.dumps({k: v for k, v in metrics.items() if k != 'errors'}, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
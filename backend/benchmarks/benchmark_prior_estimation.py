@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+類別先驗估計效能基準測試
+1. 向量化 penl1cp 與逐 fold / λ / prior 迴圈的 PenL1CP.m 直譯版比較，確認 penL1_list 與估計值一致
+2. 比較 KDE 密度比（精確）與近似模式（kde_subsample / kde_tree）及 penl1cp 在不同 n_u 下的速度與估計值
+
+Usage:
+    python benchmarks/benchmark_prior_estimation.py [--n-u 1000 5000 10000] [--dims 2 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pu-learning'))
+
+from data_generator import generate_synthetic_data  # noqa: E402
+from prior_estimation import PRIOR_ESTIMATORS, estimate_class_prior, penl1cp  # noqa: E402
+
+
+def reference_penl1cp(xp, xu, seed, n_fold=5, n_basis=300):
+    """PenL1CP.m 的逐行直譯（相同的隨機數使用順序）"""
+    lambda_list = np.logspace(-3, 1, 10)
+    prior_list = np.arange(1, 20) * 0.05
+    rng = np.random.RandomState(seed)
+    np_samples, nu_samples = len(xp), len(xu)
+
+    b = min(n_basis, nu_samples)
+    xc = xu[rng.permutation(nu_samples)[:b]]
+    cv_index_p = (np.arange(np_samples) * n_fold // np_samples)[rng.permutation(np_samples)]
+    cv_index_u = (np.arange(nu_samples) * n_fold // nu_samples)[rng.permutation(nu_samples)]
+
+    dp = cdist(xp, xc, 'sqeuclidean')
+    du = cdist(xu, xc, 'sqeuclidean')
+    sigma_list = np.sqrt(np.median(du)) * np.logspace(-2, 1, 10)
+
+    def solve(Kp, Ku, prior, lam):
+        beta = prior * Kp.mean(axis=0) - Ku.mean(axis=0)
+        return np.maximum(0, beta) / lam, beta
+
+    score_table = np.zeros((len(sigma_list), len(lambda_list), len(prior_list)))
+    for ite_sigma, sigma in enumerate(sigma_list):
+        Kp, Ku = np.exp(-dp / (2 * sigma ** 2)), np.exp(-du / (2 * sigma ** 2))
+        for fold in range(n_fold):
+            Kp_tr, Kp_te = Kp[cv_index_p != fold], Kp[cv_index_p == fold]
+            Ku_tr, Ku_te = Ku[cv_index_u != fold], Ku[cv_index_u == fold]
+            for ite_lambda, lam in enumerate(lambda_list):
+                for ite_prior, prior in enumerate(prior_list):
+                    alpha_tr, _ = solve(Kp_tr, Ku_tr, prior, lam)
+                    _, beta_te = solve(Kp_te, Ku_te, prior, lam)
+                    score_table[ite_sigma, ite_lambda, ite_prior] -= alpha_tr @ beta_te / n_fold
+
+    penL1_list = np.zeros(len(prior_list))
+    for ite_prior, prior in enumerate(prior_list):
+        chosen_index = np.argmin(score_table[:, :, ite_prior].T.ravel())
+        lambda_index, sigma_index = divmod(chosen_index, len(sigma_list))
+        sigma = sigma_list[sigma_index]
+        alpha, beta = solve(np.exp(-dp / (2 * sigma ** 2)), np.exp(-du / (2 * sigma ** 2)), prior,
+                            lambda_list[lambda_index])
+        penL1_list[ite_prior] = alpha @ beta - prior + 1
+    return float(prior_list[np.argmin(penL1_list)]), penL1_list
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--n-u', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--dims', type=int, nargs='+', default=[2, 8])
+    parser.add_argument('--n-p', type=int, default=200)
+    parser.add_argument('--prior', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("== penl1cp vs PenL1CP.m 直譯版 ==")
+    print(f"{'dims':>5} {'n_u':>6} {'loop (s)':>9} {'vectorized (s)':>15} {'speedup':>8} {'same prior':>11} {'max |ΔpenL1|':>13}")
+    for dims in args.dims:
+        xp, xu, _, _ = generate_synthetic_data('gaussian', dims=dims, n_p=args.n_p, n_u=1000,
+                                               prior=args.prior, seed=args.seed)
+        (ref_prior, ref_list), ref_seconds = timed(lambda: reference_penl1cp(xp, xu, args.seed))
+        (prior, penL1_list), seconds = timed(lambda: penl1cp(xp, xu, seed=args.seed))
+        print(f"{dims:>5} {len(xu):>6} {ref_seconds:>9.3f} {seconds:>15.3f} {ref_seconds / seconds:>7.1f}x "
+              f"{str(ref_prior == prior):>11} {np.max(np.abs(ref_list - penL1_list)):>13.2e}")
+
+    print("\n== 估計器比較（真實 prior = {:.2f}）==".format(args.prior))
+    print(f"{'dims':>5} {'n_u':>6} " + ' '.join(f"{name:>22}" for name in PRIOR_ESTIMATORS))
+    for dims in args.dims:
+        for n_u in args.n_u:
+            xp, xu, _, _ = generate_synthetic_data('gaussian', dims=dims, n_p=args.n_p, n_u=n_u,
+                                                   prior=args.prior, seed=args.seed)
+            cells = []
+            for estimator in PRIOR_ESTIMATORS:
+                result = estimate_class_prior(xp, xu, estimator, 'median', seed=args.seed)
+                cells.append(f"{result['prior']:.3f} ({result['elapsed_seconds']:.3f}s)")
+            print(f"{dims:>5} {n_u:>6} " + ' '.join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+train_upu 交叉驗證效能基準測試
+比較逐 λ Cholesky 分解（單執行緒）與正則化路徑求解（特徵分解一次 + σ 平行）
+在不同 n_u / n_basis 下的速度，並確認最佳 (σ, λ) 與 theta 一致
+
+Usage:
+    python benchmarks/benchmark_upu_regularization_path.py [--n-u 300 1000 2000] [--n-basis 50 100 200]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pu-learning'))
+
+from data_generator import generate_synthetic_data  # noqa: E402
+from pulearning_engine import train_upu  # noqa: E402
+
+
+def run(xp, xu, prior, options, seed):
+    """執行 train_upu（隱藏訓練日誌），回傳 (outputs, 秒數)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, outputs = train_upu(xp, xu, prior, options, seed=seed)
+    return outputs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--n-u', type=int, nargs='+', default=[300, 1000, 2000])
+    parser.add_argument('--n-basis', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--n-p', type=int, default=100)
+    parser.add_argument('--dims', type=int, default=8)
+    parser.add_argument('--prior', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'n_u':>6} {'n_basis':>8} {'cholesky (s)':>13} {'path (s)':>9} {'speedup':>8} "
+          f"{'same best':>10} {'max |Δθ|':>10} {'max |Δscore|':>13}")
+
+    for n_u in args.n_u:
+        xp, xu, _, _ = generate_synthetic_data('gaussian', dims=args.dims, n_p=args.n_p, n_u=n_u,
+                                               prior=args.prior, seed=args.seed)
+        for n_basis in args.n_basis:
+            options = {'model_type': 'gauss', 'use_bias': True, 'n_basis': n_basis}
+            reference, reference_seconds = run(xp, xu, args.prior, {**options, 'solver': 'cholesky', 'n_jobs': 1}, args.seed)
+            path, path_seconds = run(xp, xu, args.prior, {**options, 'solver': 'path'}, args.seed)
+
+            same_best = reference['sigma'] == path['sigma'] and reference['lambda'] == path['lambda']
+            theta_diff = float(np.max(np.abs(reference['theta'] - path['theta'])))
+            score_diff = float(np.max(np.abs(reference['score_table'] - path['score_table'])))
+            print(f"{n_u:>6} {n_basis:>8} {reference_seconds:>13.3f} {path_seconds:>9.3f} "
+                  f"{reference_seconds / path_seconds:>7.1f}x {str(same_best):>10} "
+                  f"{theta_diff:>10.2e} {score_diff:>13.2e}")
+
+
+if __name__ == '__main__':
+    main()
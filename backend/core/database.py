@@ -1,6 +1,7 @@
 import os
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import Column, String, Float, Integer, DateTime, Boolean, Text, ForeignKey
@@ -68,6 +69,20 @@ class AmmeterLog(Base):
     organizationId = Column(String)
     createdAt = Column(DateTime, default=datetime.utcnow)
 
+# 批次 upsert 時由 API 回應更新的 ammeter 欄位
+AMMETER_UPSERT_COLUMNS = [
+    "electricMeterNumber", "electricMeterName", "factory", "device",
+    "voltage", "currents", "power", "battery",
+    "switchState", "networkState", "lastUpdated",
+]
+
+AMMETER_LOG_INSERT_COLUMNS = [
+    "id", "deviceNumber", "action", "factory", "device",
+    "voltage", "currents", "power", "battery", "switchState", "networkState",
+    "lastUpdated", "requestData", "responseData", "statusCode", "success",
+    "errorMessage", "responseTime", "createdAt",
+]
+
 # 建表
 async def init_database():
     async with engine.begin() as conn:
@@ -103,6 +118,66 @@ class DatabaseManager:
             await session.commit()
             return ammeter.id
 
+    async def save_ammeter_batch(
+        self,
+        ammeters: List[Dict[str, Any]],
+        logs: List[Dict[str, Any]]
+    ) -> Tuple[int, int]:
+        """
+        以單一交易批次寫入電表最新狀態與 API 呼叫紀錄
+
+        ammeter 使用 INSERT ... ON CONFLICT ("deviceNumber") DO UPDATE，
+        ammeter_log 使用單一多列 INSERT。
+
+        Returns:
+            (upsert 的 ammeter 筆數, 寫入的 ammeter_log 筆數)
+        """
+        if not ammeters and not logs:
+            return 0, 0
+
+        now = datetime.utcnow()
+        # 同一批次中同設備只保留最後一筆（ON CONFLICT 不允許同一列更新兩次）
+        latest = {row["deviceNumber"]: row for row in ammeters}
+        ammeter_rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "deviceNumber": device_number,
+                "createdAt": now,
+                "updatedAt": now,
+                **{column: row.get(column) for column in AMMETER_UPSERT_COLUMNS},
+            }
+            for device_number, row in latest.items()
+        ]
+        log_rows = [
+            {
+                **{column: row.get(column) for column in AMMETER_LOG_INSERT_COLUMNS},
+                "id": row.get("id") or str(uuid.uuid4()),
+                "createdAt": row.get("createdAt") or now,
+            }
+            for row in logs
+        ]
+
+        async with self.session_factory() as session:
+            dialect = sqlite if session.bind.dialect.name == "sqlite" else postgresql
+
+            if ammeter_rows:
+                stmt = dialect.insert(Ammeter.__table__).values(ammeter_rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Ammeter.__table__.c.deviceNumber],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in AMMETER_UPSERT_COLUMNS + ["updatedAt"]
+                    },
+                )
+                await session.execute(stmt)
+
+            if log_rows:
+                await session.execute(dialect.insert(AmmeterLog.__table__).values(log_rows))
+
+            await session.commit()
+
+        return len(ammeter_rows), len(log_rows)
+
     async def get_all_ammeters(self) -> List[Ammeter]:
         async with self.session_factory() as session:
             result = await session.execute(select(Ammeter))
@@ -2,8 +2,11 @@ import asyncio
 import csv
 import os
 from datetime import datetime
-from typing import List, Dict
-from database import db_manager
+from typing import Any, List, Dict
+from services.meter_ingestion import get_ingestion_pipeline
+
+# 抓取間隔（秒）
+CRON_INTERVAL_SECONDS = int(os.getenv("METER_CRON_INTERVAL_SECONDS", "60"))
 
 # ========== 電表資料載入 ==========
 def load_meter_data() -> List[Dict[str, str]]:
@@ -30,8 +33,8 @@ def load_meter_data() -> List[Dict[str, str]]:
         return []
 
 # ========== Cron 任務 ==========
-async def fetch_all_meters_data():
-    """抓取所有電表資料並儲存到資料庫"""
+async def fetch_all_meters_data() -> Dict[str, Any]:
+    """抓取所有電表資料並儲存到資料庫（限流抓取 + 批次寫入，見 MeterIngestionPipeline）"""
     start_time = datetime.now()
     print(f"\n=== 開始執行電表資料抓取任務 ({start_time.strftime('%Y-%m-%d %H:%M:%S')}) ===")
     
@@ -39,84 +42,61 @@ async def fetch_all_meters_data():
     meters = load_meter_data()
     if not meters:
         print("沒有電表資料可處理")
-        return
-    
-    # 並行抓取所有電表資料
-    async def fetch_single_meter(meter: Dict[str, str]):
-        try:
-            device_number = meter["deviceNumber"]
-            
-            # 使用 ammeters_api 的函數來抓取資料
-            # 注意：get_ammeter_detail 函數內部已經會儲存資料到 Ammeter 表
-            from ammeters_api import get_ammeter_detail
-            
-            ammeter_response = await get_ammeter_detail(device_number)
-            
-            # 不需要再次儲存，因為 get_ammeter_detail 內部已經儲存了
-            # 只需要更新電表名稱和編號（如果需要的話）
-            try:
-                # 更新電表的基本資訊（名稱和編號）
-                update_data = {
-                    "electricMeterNumber": meter["electricMeterNumber"],
-                    "electricMeterName": meter["electricMeterName"],
-                    "deviceNumber": device_number,
-                    "lastUpdated": datetime.utcnow()
-                }
-                await db_manager.save_ammeter_data(update_data)
-            except Exception as update_error:
-                print(f"更新電表基本資訊失敗 {device_number}: {update_error}")
-            
-            return {"success": True, "device": device_number, "name": meter['electricMeterName']}
-            
-        except Exception as e:
-            return {"success": False, "device": meter.get('deviceNumber', 'unknown'), "name": meter.get('electricMeterName', 'unknown'), "error": str(e)}
+        return {}
     
-    # 並行執行所有電表資料抓取
-    tasks = [fetch_single_meter(meter) for meter in meters]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # 統計結果
-    success_results = [r for r in results if isinstance(r, dict) and r.get("success")]
-    failed_results = [r for r in results if isinstance(r, dict) and not r.get("success")]
-    exception_results = [r for r in results if not isinstance(r, dict)]
-    
-    success_count = len(success_results)
-    failed_count = len(failed_results) + len(exception_results)
-    total_count = len(meters)
+    metrics = await get_ingestion_pipeline().run_cycle(meters)
+    if metrics.get("skipped"):
+        print("上一輪電表資料抓取尚未完成，略過本次執行\n")
+        return metrics
     
     end_time = datetime.now()
-    duration = (end_time - start_time).total_seconds()
     
     # 統整輸出結果
     print(f"=== 電表資料抓取完成 ({end_time.strftime('%Y-%m-%d %H:%M:%S')}) ===")
-    print(f"執行時間: {duration:.1f} 秒")
-    print(f"總計: {total_count} 個電表")
-    print(f"成功: {success_count} 個")
-    print(f"失敗: {failed_count} 個")
+    print(f"執行時間: {metrics['duration_seconds']:.1f} 秒（寫入 {metrics['write_seconds']:.1f} 秒，{metrics['write_batches']} 批）")
+    print(f"總計: {metrics['meters_total']} 個電表")
+    print(f"成功: {metrics['meters_succeeded']} 個")
+    print(f"失敗: {metrics['meters_failed']} 個")
+    if metrics['meters_timed_out']:
+        print(f"逾時取消: {metrics['meters_timed_out']} 個")
+    print(f"吞吐量: {metrics['throughput_meters_per_second']:.1f} 個電表/秒，"
+          f"延遲 p50 {metrics['fetch_latency_ms']['p50']:.0f} ms / p95 {metrics['fetch_latency_ms']['p95']:.0f} ms")
     
     # 顯示失敗的電表詳情
-    if failed_results:
+    if metrics['errors']:
         print(f"\n失敗的電表:")
-        for result in failed_results:
+        for result in metrics['errors']:
             print(f"  - {result['name']} ({result['device']}): {result['error']}")
     
-    if exception_results:
-        print(f"\n異常錯誤:")
-        for i, exception in enumerate(exception_results):
-            print(f"  - 異常 {i+1}: {str(exception)}")
+    if metrics['write_errors']:
+        print(f"\n資料庫寫入失敗: {metrics['write_errors']} 批")
     
     print()
+    return metrics
 
 async def cron_task():
-    """每分鐘執行的 cron 任務"""
+    """
+    每分鐘執行的 cron 任務
+
+    以固定頻率排程（週期開始時間對齊 CRON_INTERVAL_SECONDS），
+    單次執行超過間隔時略過錯過的排程，不會讓週期重疊
+    """
+    loop = asyncio.get_running_loop()
+    next_run = loop.time()
     while True:
         try:
             await fetch_all_meters_data()
         except Exception as e:
             print(f"Cron 任務執行失敗: {e}")
         
-        # 等待 600 秒（10分鐘）
-        await asyncio.sleep(60)
+        next_run += CRON_INTERVAL_SECONDS
+        delay = next_run - loop.time()
+        if delay < 0:
+            missed = int(-delay // CRON_INTERVAL_SECONDS) + 1
+            print(f"電表資料抓取超過排程間隔，略過 {missed} 次排程")
+            next_run += missed * CRON_INTERVAL_SECONDS
+            delay = next_run - loop.time()
+        await asyncio.sleep(delay)
 
 # ========== 啟動函數 ==========
 async def start_cron():
@@ -128,8 +108,10 @@ async def start_cron():
 async def manual_fetch():
     """手動執行一次電表資料抓取"""
     try:
-        await fetch_all_meters_data()
-        return {"success": True, "message": "電表資料抓取完成"}
+        metrics = await fetch_all_meters_data()
+        if metrics.get("skipped"):
+            return {"success": False, "message": "上一輪電表資料抓取尚未完成"}
+        return {"success": True, "message": "電表資料抓取完成", "metrics": metrics}
     except Exception as e:
         return {"success": False, "message": f"電表資料抓取失敗: {str(e)}"}
 
@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "analysis_ready_data_dataset_id_timestamp_idx" ON "analysis_ready_data"("dataset_id", "timestamp");
@@ -25,6 +25,7 @@ from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from cron_ammeter import start_cron, manual_fetch
+from services.meter_ingestion import get_ingestion_pipeline
 
 # 設置日誌記錄
 logger = logging.getLogger(__name__)
@@ -225,6 +226,11 @@ async def lifespan(app: FastAPI):
         await cleanup_case_study_v2()
     except Exception as e:
         logger.error(f"Case Study v2 cleanup failed: {e}")
+
+    # 關閉 PU 模擬 worker pool（routes.pu_learning 已將 pu-learning 加入 sys.path）
+    from simulation_cache import shutdown_simulation_cache
+    shutdown_simulation_cache()
+    await get_ingestion_pipeline().close()
     print("應用程序關閉")
 
 app = FastAPI(
@@ -312,6 +318,15 @@ async def trigger_meter_fetch():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"電表資料抓取失敗: {str(e)}")
 
+@app.get("/api/meter-fetch/metrics")
+async def meter_fetch_metrics(limit: int = 10):
+    """最近幾次電表資料抓取週期的延遲與吞吐量指標"""
+    pipeline = get_ingestion_pipeline()
+    return {
+        "running": pipeline.is_running,
+        "cycles": pipeline.get_recent_metrics(limit)
+    }
+
 if __name__ == "__main__":
     import uvicorn
 
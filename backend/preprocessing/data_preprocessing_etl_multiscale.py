@@ -24,6 +24,7 @@ import numpy as np
 import csv
 import logging
 from datetime import datetime, timedelta
+from itertools import repeat
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
@@ -49,6 +50,7 @@ except ImportError:
         "long_window_size": 60,
         "short_window_size": 15,
         "feature_step_size": 1,
+        "copy_chunk_size": 50000,
     }
     PREDEFINED_ROOMS = []
     TIME_RANGES = {}
@@ -60,6 +62,10 @@ except ImportError:
     def get_etl_config():
         return ETL_CONFIG.copy()
 
+from rolling_window_features import (
+    TIME_FEATURE_COLUMNS, compute_time_features, compute_window_features
+)
+
 # 配置日誌
 logging.basicConfig(
     level=logging.DEBUG,  # 改為 DEBUG 等級以顯示詳細資訊
@@ -301,6 +307,8 @@ class DataPreprocessingETL:
         步驟一：尋找最佳數據窗口 (Find Golden Window)
 
         在指定的時間範圍內，找出數據品質最佳的連續 N 天。
+        先以單一 GROUP BY 查詢取得兩個電表的每日記錄數，再以前綴和
+        在記憶體中評估所有候選窗口，不再逐窗口查詢資料庫。
 
         Args:
             room_info: 房間資訊
@@ -315,65 +323,225 @@ class DataPreprocessingETL:
         logger.info(f"   搜索範圍: {search_start} 至 {search_end}")
         logger.info(f"   電表 L1: {room_info.meter_id_l1}, L2: {room_info.meter_id_l2}")
 
-        best_window = None
-        best_quality_score = (0.0, -float('inf'))  # 多級優先制初始值
-        total_windows = 0
-        valid_windows = 0
+        daily_counts = await self._fetch_daily_record_counts(
+            [room_info.meter_id_l1, room_info.meter_id_l2], search_start, search_end
+        )
 
-        # 以天為單位滑動窗口
-        current_date = search_start
-        while current_date + timedelta(days=window_days) <= search_end:
-            window_start = current_date
-            window_end = current_date + timedelta(days=window_days)
-            total_windows += 1
+        best_window = self._select_golden_window(
+            room_info, daily_counts, search_start, search_end, window_days
+        )
+
+        if best_window is None:
+            logger.error(f"❌ 在指定範圍內找不到符合條件的 {window_days} 天窗口")
+            logger.error(f"   建議: 降低品質要求或擴大搜索時間範圍")
+            raise ValueError(f"在指定範圍內找不到符合條件的 {window_days} 天窗口")
+
+        return best_window
 
-            logger.info(f"   🕐 檢查窗口 {total_windows}: {window_start.strftime('%Y-%m-%d')} 至 {window_end.strftime('%Y-%m-%d')}")
+    async def find_golden_windows_for_rooms(
+        self,
+        room_infos: List[RoomInfo],
+        search_start: datetime,
+        search_end: datetime,
+        window_days: int = 7
+    ) -> List[Tuple[RoomInfo, Optional[Tuple[datetime, datetime]]]]:
+        """
+        以單一批次查詢為多個房間尋找最佳數據窗口
 
-            # 評估此窗口的數據品質
-            quality_metrics = await self._evaluate_data_quality(
-                room_info, window_start, window_end
+        Args:
+            room_infos: 房間資訊列表
+            search_start: 搜索開始日期
+            search_end: 搜索結束日期
+            window_days: 窗口天數 (預設 7 天)
+
+        Returns:
+            List: (房間資訊, 最佳窗口或 None) 的列表，順序與輸入相同
+        """
+        logger.info(f"🔍 批次尋找 {len(room_infos)} 個房間的最佳 {window_days} 天數據窗口")
+        logger.info(f"   搜索範圍: {search_start} 至 {search_end}")
+
+        device_ids = sorted({
+            meter_id
+            for room_info in room_infos
+            for meter_id in (room_info.meter_id_l1, room_info.meter_id_l2)
+        })
+        daily_counts = await self._fetch_daily_record_counts(device_ids, search_start, search_end)
+
+        results = []
+        for room_info in room_infos:
+            best_window = self._select_golden_window(
+                room_info, daily_counts, search_start, search_end, window_days
             )
+            if best_window is None:
+                logger.warning(f"⚠️  房間 {room_info.building}-{room_info.floor}-{room_info.room} 找不到符合條件的窗口")
+            results.append((room_info, best_window))
 
-            # 記錄詳細的品質指標
-            logger.info(f"      📊 數據品質: 完整性={quality_metrics.completeness_ratio:.3f}, 缺失時段={quality_metrics.missing_periods}")
+        found_count = sum(1 for _, window in results if window is not None)
+        logger.info(f"📋 批次搜索完成: {found_count}/{len(room_infos)} 個房間找到最佳窗口")
+        return results
 
-            # 檢查是否符合最低要求
-            min_completeness = self.config.get("min_completeness_ratio", 0.1)
-            max_missing = self.config.get("max_missing_periods", 15000)
+    async def find_golden_windows_from_csv(
+        self,
+        csv_path: str = "meter.csv",
+        search_start: datetime = None,
+        search_end: datetime = None,
+        window_days: int = 7
+    ) -> List[Tuple[RoomInfo, Optional[Tuple[datetime, datetime]]]]:
+        """
+        為 meter.csv 中所有房間批次尋找最佳數據窗口
 
-            if (quality_metrics.completeness_ratio >= min_completeness and
-                quality_metrics.missing_periods <= max_missing):
+        Args:
+            csv_path: 電表映射 CSV 文件路徑
+            search_start: 搜索開始日期
+            search_end: 搜索結束日期
+            window_days: 窗口天數 (預設 7 天)
+
+        Returns:
+            List: (房間資訊, 最佳窗口或 None) 的列表
+        """
+        meter_mapping = self.load_meter_mapping(csv_path)
+        room_infos = self.create_room_info_from_mapping(meter_mapping)
+        return await self.find_golden_windows_for_rooms(
+            room_infos, search_start, search_end, window_days
+        )
+
+    async def _fetch_daily_record_counts(
+        self,
+        device_ids: List[str],
+        search_start: datetime,
+        search_end: datetime
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        以單一查詢取得每個電表在搜索範圍內的每日記錄數直方圖
+
+        天數區間以 search_start 為起點對齊（search_start 為午夜時等同
+        date_trunc('day')）。另外統計恰好落在區間起點的記錄數，
+        以重現原本 BETWEEN 查詢包含窗口結束時間點的語意。
+
+        Args:
+            device_ids: 電表 ID 列表
+            search_start: 搜索開始日期
+            search_end: 搜索結束日期
+
+        Returns:
+            Dict: {device_id: (每日記錄數, 每日起點時間的記錄數)}
+        """
+        query = """
+        WITH binned AS (
+            SELECT "deviceNumber" AS device_number,
+                   "lastUpdated" AS last_updated,
+                   FLOOR(EXTRACT(EPOCH FROM ("lastUpdated" - $2)) / 86400)::int AS day_offset
+            FROM ammeter_log
+            WHERE "deviceNumber" = ANY($1::text[])
+            AND "lastUpdated" BETWEEN $2 AND $3
+        )
+        SELECT device_number,
+               day_offset,
+               COUNT(*) AS day_records,
+               COUNT(*) FILTER (
+                   WHERE last_updated = $2 + day_offset * INTERVAL '1 day'
+               ) AS boundary_records
+        FROM binned
+        GROUP BY device_number, day_offset
+        """
+
+        rows = await self.conn.fetch(query, device_ids, search_start, search_end)
+
+        n_days = (search_end - search_start).days + 1
+        daily_counts = {
+            device_id: (np.zeros(n_days, dtype=np.int64), np.zeros(n_days, dtype=np.int64))
+            for device_id in device_ids
+        }
+        for row in rows:
+            day_records, boundary_records = daily_counts[row['device_number']]
+            day_records[row['day_offset']] = row['day_records']
+            boundary_records[row['day_offset']] = row['boundary_records']
+
+        logger.info(f"   📊 取得 {len(device_ids)} 個電表的每日記錄數 ({n_days} 天, {len(rows)} 個區間)")
+        return daily_counts
+
+    def _select_golden_window(
+        self,
+        room_info: RoomInfo,
+        daily_counts: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        search_start: datetime,
+        search_end: datetime,
+        window_days: int
+    ) -> Optional[Tuple[datetime, datetime]]:
+        """
+        以每日直方圖的前綴和評估所有候選窗口，回傳最佳窗口
+
+        排序規則與逐窗口查詢相同：(完整性, -缺失時段) 元組越大越好，
+        同分時保留最早的窗口。
+
+        Args:
+            room_info: 房間資訊
+            daily_counts: _fetch_daily_record_counts 的結果
+            search_start: 搜索開始日期
+            search_end: 搜索結束日期
+            window_days: 窗口天數
+
+        Returns:
+            (start_date, end_date) 或 None（無符合條件的窗口）
+        """
+        # 以天為單位滑動窗口的數量
+        total_windows = 0
+        while search_start + timedelta(days=total_windows + window_days) <= search_end:
+            total_windows += 1
+
+        if total_windows == 0:
+            return None
+
+        def window_record_counts(device_id: str) -> np.ndarray:
+            day_records, boundary_records = daily_counts[device_id]
+            prefix = np.concatenate(([0], np.cumsum(day_records)))
+            offsets = np.arange(total_windows)
+            counts = prefix[offsets + window_days] - prefix[offsets]
+            # BETWEEN 包含結束時間點：加上恰好位於窗口結束時刻的記錄
+            end_offsets = offsets + window_days
+            in_range = end_offsets < len(boundary_records)
+            counts[in_range] += boundary_records[end_offsets[in_range]]
+            return counts
+
+        counts_l1 = window_record_counts(room_info.meter_id_l1)
+        counts_l2 = window_record_counts(room_info.meter_id_l2)
+        actual_records = np.minimum(counts_l1, counts_l2)
+
+        # 計算期望的數據筆數 (假設每分鐘一筆)
+        expected_records = int(timedelta(days=window_days).total_seconds() / 60)
+
+        min_completeness = self.config.get("min_completeness_ratio", 0.1)
+        max_missing = self.config.get("max_missing_periods", 15000)
+
+        best_window = None
+        best_quality_score = (0.0, -float('inf'))  # 多級優先制初始值
+        valid_windows = 0
+
+        for offset in range(total_windows):
+            actual = int(actual_records[offset])
+            completeness_ratio = actual / expected_records if expected_records > 0 else 0.0
+            missing_periods = max(0, expected_records - actual)
+
+            if completeness_ratio >= min_completeness and missing_periods <= max_missing:
                 valid_windows += 1
 
                 # 評分標準：採用元組 (tuple) 進行多級排序
-                # Python 會自動先比較元組的第一個元素，如果相同，再比較第二個，以此類推
                 quality_tuple = (
-                    quality_metrics.completeness_ratio,  # 第一優先：完整度越高越好
-                    -quality_metrics.missing_periods,    # 第二優先：缺失時段越少越好 (取負值使其變為越大越好)
-                    # 未來還可以加入第三優先級，例如 -max_continuous_gap (最長中斷時間越短越好)
+                    completeness_ratio,  # 第一優先：完整度越高越好
+                    -missing_periods,    # 第二優先：缺失時段越少越好
                 )
 
-                logger.info(f"      ✅ 符合品質要求，品質元組: {quality_tuple}")
-
                 if quality_tuple > best_quality_score:
                     best_quality_score = quality_tuple
-                    best_window = (window_start, window_end)
-                    logger.info(f"      🏆 新的最佳窗口！")
-            else:
-                logger.info(f"      ❌ 不符合品質要求 (完整性需>={min_completeness}, 缺失<={max_missing})")
+                    window_start = search_start + timedelta(days=offset)
+                    best_window = (window_start, window_start + timedelta(days=window_days))
 
-            current_date += timedelta(days=1)
+        logger.info(f"📋 房間 {room_info.room}: 檢查了 {total_windows} 個窗口，{valid_windows} 個符合要求")
 
-        logger.info(f"📋 搜索結果: 檢查了 {total_windows} 個窗口，{valid_windows} 個符合要求")
-        logger.info(f"   最低品質要求: 完整性 >= {self.config.get('min_completeness_ratio', 0.1)}, 缺失時段 <= {self.config.get('max_missing_periods', 15000)}")
+        if best_window is not None:
+            logger.info(f"🎯 找到最佳窗口: {best_window[0].strftime('%Y-%m-%d')} 到 {best_window[1].strftime('%Y-%m-%d')}")
+            logger.info(f"   最佳品質元組: 完整性={best_quality_score[0]:.3f}, 缺失時段={-best_quality_score[1]}")
 
-        if best_window is None:
-            logger.error(f"❌ 在指定範圍內找不到符合條件的 {window_days} 天窗口")
-            logger.error(f"   建議: 降低品質要求或擴大搜索時間範圍")
-            raise ValueError(f"在指定範圍內找不到符合條件的 {window_days} 天窗口")
-
-        logger.info(f"🎯 找到最佳窗口: {best_window[0].strftime('%Y-%m-%d')} 到 {best_window[1].strftime('%Y-%m-%d')}")
-        logger.info(f"   最佳品質元組: 完整性={best_quality_score[0]:.3f}, 缺失時段={-best_quality_score[1]}")
         return best_window
 
     async def _evaluate_data_quality(
@@ -596,80 +764,37 @@ class DataPreprocessingETL:
 
     def _extract_time_window_features(
         self,
-        df: pd.DataFrame,
-        timestamp: pd.Timestamp,
+        df_sorted: pd.DataFrame,
         window_size: int,
         suffix: str
-    ) -> Dict[str, float]:
+    ) -> pd.DataFrame:
         """
-        從指定時間窗口中提取統計特徵
+        對每個時間點提取其結尾時間窗口的統計特徵
+
+        使用時間索引的滾動統計一次計算整個序列，窗口為
+        [timestamp - (window_size-1) 分鐘, timestamp]
 
         Args:
-            df: 包含功率數據的 DataFrame
-            timestamp: 窗口結束時間點
+            df_sorted: 依時間排序的功率數據
             window_size: 窗口大小（分鐘）
             suffix: 特徵名稱後綴（如 "60m", "15m"）
 
         Returns:
-            Dict: 提取的特徵字典
+            pd.DataFrame: 與 df_sorted 同索引的特徵
         """
-        # 計算窗口開始時間
-        window_start = timestamp - pd.Timedelta(minutes=window_size-1)
-
-        # 從 DataFrame 中切片出指定窗口的數據
-        mask = (df['timestamp'] >= window_start) & (df['timestamp'] <= timestamp)
-        window_data = df[mask]
-
-        features = {}
-
-        if len(window_data) == 0:
-            # 如果窗口內沒有數據，返回空值
-            power_types = ['wattage110v', 'wattage220v', 'wattageTotal']
-            stats = ['mean', 'std', 'max', 'min']
-            for power_type in power_types:
-                for stat in stats:
-                    features[f"{power_type}_{stat}_{suffix}"] = np.nan
-            return features
-
-        # 對每種功率類型計算統計特徵
-        power_types = ['wattage110v', 'wattage220v', 'wattageTotal']
-
-        for power_type in power_types:
-            if power_type in window_data.columns:
-                values = window_data[power_type].dropna()
-                if len(values) > 0:
-                    features[f"{power_type}_mean_{suffix}"] = values.mean()
-                    features[f"{power_type}_std_{suffix}"] = values.std()
-                    features[f"{power_type}_max_{suffix}"] = values.max()
-                    features[f"{power_type}_min_{suffix}"] = values.min()
-                    features[f"{power_type}_range_{suffix}"] = values.max() - values.min()
-                    features[f"{power_type}_var_{suffix}"] = values.var()
-                else:
-                    features[f"{power_type}_mean_{suffix}"] = np.nan
-                    features[f"{power_type}_std_{suffix}"] = np.nan
-                    features[f"{power_type}_max_{suffix}"] = np.nan
-                    features[f"{power_type}_min_{suffix}"] = np.nan
-                    features[f"{power_type}_range_{suffix}"] = np.nan
-                    features[f"{power_type}_var_{suffix}"] = np.nan
+        return compute_window_features(df_sorted, window_size, suffix)
 
-        return features
-
-    def _extract_time_features(self, timestamp: pd.Timestamp) -> Dict[str, float]:
+    def _extract_time_features(self, timestamps: pd.Series) -> pd.DataFrame:
         """
         提取時間相關特徵
 
         Args:
-            timestamp: 時間戳
+            timestamps: 時間戳序列
 
         Returns:
-            Dict: 時間特徵字典
+            pd.DataFrame: 時間特徵
         """
-        return {
-            'hour_of_day': timestamp.hour,
-            'day_of_week': timestamp.dayofweek,
-            'is_weekend': 1.0 if timestamp.dayofweek >= 5 else 0.0,
-            'is_business_hours': 1.0 if 8 <= timestamp.hour <= 18 else 0.0,
-        }
+        return compute_time_features(timestamps)
 
     def generate_multiscale_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -702,48 +827,32 @@ class DataPreprocessingETL:
             logger.warning(f"數據量不足以生成多尺度特徵，需要至少 {min_start_idx + 1} 筆數據，實際只有 {len(df_sorted)} 筆")
             return pd.DataFrame()
 
-        # 存儲所有樣本的列表
-        samples = []
-
-        # 從能夠生成完整長期窗口特徵的位置開始滑動
-        for i in range(min_start_idx, len(df_sorted), step_size):
-            current_timestamp = df_sorted.iloc[i]['timestamp']
-
-            # 提取當前時間點的基礎資訊
-            current_row = df_sorted.iloc[i]
-
-            sample = {
-                'timestamp': current_timestamp,
-                'room': current_row['room'],
-                'rawWattageL1': current_row['rawWattageL1'],
-                'rawWattageL2': current_row['rawWattageL2'],
-                'wattage110v_current': current_row['wattage110v'],
-                'wattage220v_current': current_row['wattage220v'],
-                'wattageTotal_current': current_row['wattageTotal'],
-                'isPositiveLabel': current_row.get('isPositiveLabel', False),
-                'sourceAnomalyEventId': current_row.get('sourceAnomalyEventId', None),
-            }
-
-            # 提取長期窗口特徵 (60分鐘)
-            long_features = self._extract_time_window_features(
-                df_sorted.iloc[:i+1], current_timestamp, long_window, "60m"
-            )
-            sample.update(long_features)
-
-            # 提取短期窗口特徵 (15分鐘)
-            short_features = self._extract_time_window_features(
-                df_sorted.iloc[:i+1], current_timestamp, short_window, "15m"
-            )
-            sample.update(short_features)
-
-            # 提取時間特徵
-            time_features = self._extract_time_features(current_timestamp)
-            sample.update(time_features)
-
-            samples.append(sample)
+        # 一次計算整個序列的滾動窗口特徵，再依步長取出樣本位置
+        long_features = self._extract_time_window_features(df_sorted, long_window, "60m")
+        short_features = self._extract_time_window_features(df_sorted, short_window, "15m")
+
+        positions = np.arange(min_start_idx, len(df_sorted), step_size)
+        current_rows = df_sorted.iloc[positions]
+
+        base_features = pd.DataFrame({
+            'timestamp': current_rows['timestamp'],
+            'room': current_rows['room'],
+            'rawWattageL1': current_rows['rawWattageL1'],
+            'rawWattageL2': current_rows['rawWattageL2'],
+            'wattage110v_current': current_rows['wattage110v'],
+            'wattage220v_current': current_rows['wattage220v'],
+            'wattageTotal_current': current_rows['wattageTotal'],
+            'isPositiveLabel': current_rows['isPositiveLabel'] if 'isPositiveLabel' in current_rows else False,
+            'sourceAnomalyEventId': current_rows['sourceAnomalyEventId'] if 'sourceAnomalyEventId' in current_rows else None,
+        })
 
-        # 轉換為 DataFrame
-        result_df = pd.DataFrame(samples)
+        # 組合基礎資訊、長期 (60分鐘)、短期 (15分鐘) 與時間特徵
+        result_df = pd.concat([
+            base_features,
+            long_features.iloc[positions],
+            short_features.iloc[positions],
+            self._extract_time_features(current_rows['timestamp']),
+        ], axis=1).reset_index(drop=True)
 
         logger.info(f"成功生成 {len(result_df)} 個多尺度特徵樣本")
         logger.info(f"特徵總數: {len(result_df.columns)} 個")
@@ -751,7 +860,7 @@ class DataPreprocessingETL:
         # 顯示特徵分類統計
         long_features_count = len([col for col in result_df.columns if '60m' in col])
         short_features_count = len([col for col in result_df.columns if '15m' in col])
-        time_features_count = len([col for col in result_df.columns if col in ['hour_of_day', 'day_of_week', 'is_weekend', 'is_business_hours']])
+        time_features_count = len([col for col in result_df.columns if col in TIME_FEATURE_COLUMNS])
 
         logger.info(f"  長期特徵 (60分鐘): {long_features_count} 個")
         logger.info(f"  短期特徵 (15分鐘): {short_features_count} 個")
@@ -929,33 +1038,34 @@ class DataPreprocessingETL:
 
         return dataset_id
 
-    async def copy_analysis_data_to_table(self, df: pd.DataFrame, dataset_id: str):
+    # analysis_ready_data 欄位與 DataFrame 欄位的對應（COPY 欄位順序）
+    ANALYSIS_DATA_COLUMNS = [
+        ('timestamp', 'timestamp'),
+        ('room', 'room'),
+        ('raw_wattage_l1', 'rawWattageL1'),
+        ('raw_wattage_l2', 'rawWattageL2'),
+        ('wattage_110v', 'wattage110v_current'),  # 使用當前時間點的功率值
+        ('wattage_220v', 'wattage220v_current'),
+        ('wattage_total', 'wattageTotal_current'),
+        ('is_positive_label', 'isPositiveLabel'),
+        ('source_anomaly_event_id', 'sourceAnomalyEventId'),
+    ]
+
+    def _clean_analysis_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        使用高效批次插入分析數據
+        清理待載入的分析數據（NaN 轉換與 sourceAnomalyEventId 去重）
 
         Args:
             df: 要插入的數據 DataFrame
-            dataset_id: 數據集 ID
-        """
-        if df.empty:
-            logger.warning("沒有數據需要插入")
-            return
 
-        # 準備批次插入查詢
-        insert_query = """
-        INSERT INTO analysis_ready_data (
-            dataset_id, timestamp, room, raw_wattage_l1, raw_wattage_l2,
-            wattage_110v, wattage_220v, wattage_total,
-            is_positive_label, source_anomaly_event_id
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        Returns:
+            pd.DataFrame: 清理後的數據
         """
-
-        # 處理 NaN 值和數據清理
         df_clean = df.copy()
 
         # 對於有重複 source_anomaly_event_id 的行，除了第一個以外都設為 None
         # 這樣可以避免唯一性約束衝突
-        df_clean['sourceAnomalyEventId'] = df_clean['sourceAnomalyEventId'].where(
+        df_clean['sourceAnomalyEventId'] = df_clean['sourceAnomalyEventId'].astype(object).where(
             df_clean['sourceAnomalyEventId'].notna(), None
         )
 
@@ -966,9 +1076,86 @@ class DataPreprocessingETL:
             # 將重複的設為 None
             df_clean.loc[duplicated_mask & df_clean['sourceAnomalyEventId'].notna(), 'sourceAnomalyEventId'] = None
 
-        df_clean['isPositiveLabel'] = df_clean['isPositiveLabel'].fillna(False)
+        df_clean['isPositiveLabel'] = df_clean['isPositiveLabel'].fillna(False).astype(bool)
+
+        return df_clean
+
+    async def copy_analysis_data_to_table(self, df: pd.DataFrame, dataset_id: str, chunk_size: int = None):
+        """
+        使用二進位 COPY ... FROM STDIN 批次載入分析數據
+
+        直接由各欄位陣列組成記錄串流給 asyncpg copy_records_to_table，
+        不再逐列建立 Series。使用呼叫端的連接，因此在 load_data 的交易內執行。
+
+        Args:
+            df: 要插入的數據 DataFrame
+            dataset_id: 數據集 ID
+            chunk_size: 每批 COPY 的筆數（預設使用配置 copy_chunk_size）
+        """
+        if df.empty:
+            logger.warning("沒有數據需要插入")
+            return
+
+        chunk_size = chunk_size or self.config.get("copy_chunk_size", 50000)
+        df_clean = self._clean_analysis_data(df)
+
+        # 各欄位轉為原生 Python 值陣列，供 COPY 二進位編碼
+        column_values = {
+            'timestamp': list(pd.to_datetime(df_clean['timestamp']).dt.to_pydatetime()),
+            'room': df_clean['room'].astype(str).tolist(),
+            'is_positive_label': df_clean['isPositiveLabel'].tolist(),
+            'source_anomaly_event_id': df_clean['sourceAnomalyEventId'].tolist(),
+        }
+        for table_column, df_column in self.ANALYSIS_DATA_COLUMNS:
+            if table_column not in column_values:
+                column_values[table_column] = df_clean[df_column].astype(float).tolist()
+
+        table_columns = ['dataset_id'] + [table_column for table_column, _ in self.ANALYSIS_DATA_COLUMNS]
+        total_count = len(df_clean)
+
+        for chunk_start in range(0, total_count, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, total_count)
+            records = zip(
+                repeat(dataset_id, chunk_end - chunk_start),
+                *(column_values[table_column][chunk_start:chunk_end]
+                  for table_column, _ in self.ANALYSIS_DATA_COLUMNS)
+            )
+            await self.conn.copy_records_to_table(
+                'analysis_ready_data', records=records, columns=table_columns
+            )
+            logger.debug(f"COPY 第 {chunk_start // chunk_size + 1} 批: {chunk_end - chunk_start} 筆")
+
+        # 計算正樣本數量
+        positive_count = int(df_clean['isPositiveLabel'].sum())
+
+        logger.info(f"成功以 COPY 載入 {total_count} 筆分析數據（每批 {chunk_size} 筆）")
+        logger.info(f"其中包含 {positive_count} 筆正樣本標籤")
+
+        return dataset_id
+
+    async def insert_analysis_data_executemany(self, df: pd.DataFrame, dataset_id: str):
+        """
+        以 executemany 逐列插入分析數據（舊路徑，保留作為效能基準比較）
+
+        Args:
+            df: 要插入的數據 DataFrame
+            dataset_id: 數據集 ID
+        """
+        if df.empty:
+            logger.warning("沒有數據需要插入")
+            return
+
+        # 準備批次插入查詢
+        insert_query = """
+        INSERT INTO analysis_ready_data (
+            dataset_id, timestamp, room, raw_wattage_l1, raw_wattage_l2,
+            wattage_110v, wattage_220v, wattage_total,
+            is_positive_label, source_anomaly_event_id
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        """
+
+        df_clean = self._clean_analysis_data(df)
 
-        # 準備批次數據 - 使用列表推導式提高效率
         batch_data = []
         for _, row in df_clean.iterrows():
             batch_data.append((
@@ -977,22 +1164,16 @@ class DataPreprocessingETL:
                 row['room'],
                 row['rawWattageL1'],
                 row['rawWattageL2'],
-                row['wattage110v_current'],  # 使用當前時間點的功率值
+                row['wattage110v_current'],
                 row['wattage220v_current'],
                 row['wattageTotal_current'],
-                bool(row['isPositiveLabel']),  # 確保是布林值
-                row['sourceAnomalyEventId']    # 可能是 None
+                bool(row['isPositiveLabel']),
+                row['sourceAnomalyEventId']
             ))
 
-        # 計算正樣本數量
-        positive_count = sum(1 for item in batch_data if item[8])
-
-        # 執行批次插入
         await self.conn.executemany(insert_query, batch_data)
 
         logger.info(f"成功批次插入 {len(batch_data)} 筆分析數據")
-        logger.info(f"其中包含 {positive_count} 筆正樣本標籤")
-
         return dataset_id
 
     async def process_room_data(
@@ -1001,7 +1182,8 @@ class DataPreprocessingETL:
         search_start: datetime,
         search_end: datetime,
         window_days: int = 7,
-        enable_multiscale_features: bool = True
+        enable_multiscale_features: bool = True,
+        golden_window: Optional[Tuple[datetime, datetime]] = None
     ) -> str:
         """
         執行完整的 ETL 流程處理單個房間的數據
@@ -1012,6 +1194,7 @@ class DataPreprocessingETL:
             search_end: 搜索結束日期
             window_days: 數據窗口天數
             enable_multiscale_features: 是否啟用多尺度特徵工程
+            golden_window: 已預先計算的最佳窗口（可選，提供時跳過窗口搜索）
 
         Returns:
             str: 創建的數據集 ID
@@ -1021,9 +1204,12 @@ class DataPreprocessingETL:
 
         try:
             # 步驟一：尋找最佳數據窗口
-            start_date, end_date = await self.find_golden_window(
-                room_info, search_start, search_end, window_days
-            )
+            if golden_window is not None:
+                start_date, end_date = golden_window
+            else:
+                start_date, end_date = await self.find_golden_window(
+                    room_info, search_start, search_end, window_days
+                )
 
             # 步驟二：抽取原始數據
             df_l1, df_l2 = await self.extract_raw_data(room_info, start_date, end_date)
@@ -1111,9 +1297,21 @@ class DataPreprocessingETL:
         successful_datasets = []
         failed_rooms = []
 
+        # 以單一批次查詢預先找出所有房間的最佳窗口
+        golden_windows = {}
+        for room_info, golden_window in await self.find_golden_windows_for_rooms(
+            room_infos, search_start, search_end, window_days
+        ):
+            if golden_window is None:
+                failed_rooms.append(f"{room_info.building}-{room_info.floor}-{room_info.room}")
+            else:
+                golden_windows[id(room_info)] = golden_window
+
+        rooms_to_process = [room_info for room_info in room_infos if id(room_info) in golden_windows]
+
         # 分批處理以避免過載
-        for i in range(0, len(room_infos), max_concurrent):
-            batch = room_infos[i:i + max_concurrent]
+        for i in range(0, len(rooms_to_process), max_concurrent):
+            batch = rooms_to_process[i:i + max_concurrent]
             batch_size = len(batch)
 
             logger.info(f"處理第 {i//max_concurrent + 1} 批次 ({batch_size} 個房間)...")
@@ -1126,7 +1324,8 @@ class DataPreprocessingETL:
                     search_start=search_start,
                     search_end=search_end,
                     window_days=window_days,
-                    enable_multiscale_features=enable_multiscale_features
+                    enable_multiscale_features=enable_multiscale_features,
+                    golden_window=golden_windows[id(room_info)]
                 )
                 tasks.append((room_info, task))
 
@@ -60,6 +60,9 @@ ETL_CONFIG = {
     "long_window_size": 60,     # 長期窗口60分鐘
     "short_window_size": 15,    # 短期窗口15分鐘
     "feature_step_size": 1,     # 特徵提取步長1分鐘
+
+    # 載入設定
+    "copy_chunk_size": 50000,   # COPY 批次載入每批筆數
 }
 
 # ========== 預定義房間設定 ==========
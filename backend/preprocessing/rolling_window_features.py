@@ -0,0 +1,81 @@
+"""
+多尺度滾動窗口特徵 (Rolling Window Features)
+
+供 data_preprocessing_etl_multiscale.py 與 room_based_etl_processor.py 共用的
+時間索引滾動統計實作。每個時間點 t 的窗口為 [t - (window_size - 1) 分鐘, t]，
+與原本逐筆布林遮罩切片的定義相同，但整個房間只需一次 O(n) 掃描。
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+POWER_TYPES = ['wattage110v', 'wattage220v', 'wattageTotal']
+WINDOW_STATS = ['mean', 'std', 'max', 'min', 'range', 'var']
+TIME_FEATURE_COLUMNS = ['hour_of_day', 'day_of_week', 'is_weekend', 'is_business_hours']
+
+
+def compute_window_features(
+    df_sorted: pd.DataFrame,
+    window_size: int,
+    suffix: str,
+    power_types: List[str] = None
+) -> pd.DataFrame:
+    """
+    計算每一筆資料結尾的時間窗口統計特徵
+
+    Args:
+        df_sorted: 依 timestamp 排序的功率數據
+        window_size: 窗口大小（分鐘）
+        suffix: 特徵名稱後綴（如 "60m", "15m"）
+        power_types: 要計算的功率欄位（預設為 110V/220V/Total）
+
+    Returns:
+        pd.DataFrame: 與 df_sorted 同索引的特徵，欄位為
+                      {power_type}_{mean,std,max,min,range,var}_{suffix}
+    """
+    power_types = [p for p in (power_types or POWER_TYPES) if p in df_sorted.columns]
+
+    indexed = df_sorted.set_index('timestamp')[power_types].astype(float)
+    # closed='both' 讓窗口包含左端點，等同 [t - (window_size-1) 分鐘, t]
+    rolling = indexed.rolling(
+        pd.Timedelta(minutes=window_size - 1), closed='both', min_periods=1
+    )
+
+    window_mean = rolling.mean()
+    window_std = rolling.std()
+    window_max = rolling.max()
+    window_min = rolling.min()
+    window_var = rolling.var()
+
+    features = {}
+    for power_type in power_types:
+        features[f"{power_type}_mean_{suffix}"] = window_mean[power_type].to_numpy()
+        features[f"{power_type}_std_{suffix}"] = window_std[power_type].to_numpy()
+        features[f"{power_type}_max_{suffix}"] = window_max[power_type].to_numpy()
+        features[f"{power_type}_min_{suffix}"] = window_min[power_type].to_numpy()
+        features[f"{power_type}_range_{suffix}"] = (window_max[power_type] - window_min[power_type]).to_numpy()
+        features[f"{power_type}_var_{suffix}"] = window_var[power_type].to_numpy()
+
+    return pd.DataFrame(features, index=df_sorted.index)
+
+
+def compute_time_features(timestamps: pd.Series) -> pd.DataFrame:
+    """
+    批次提取時間相關特徵
+
+    Args:
+        timestamps: 時間戳序列
+
+    Returns:
+        pd.DataFrame: hour_of_day, day_of_week, is_weekend, is_business_hours
+    """
+    hour = timestamps.dt.hour
+    day_of_week = timestamps.dt.dayofweek
+    return pd.DataFrame({
+        'hour_of_day': hour,
+        'day_of_week': day_of_week,
+        'is_weekend': np.where(day_of_week >= 5, 1.0, 0.0),
+        'is_business_hours': np.where((hour >= 8) & (hour <= 18), 1.0, 0.0),
+    }, index=timestamps.index)
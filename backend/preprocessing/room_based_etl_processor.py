@@ -31,6 +31,8 @@ from pathlib import Path
 from enum import Enum
 from tqdm import tqdm
 
+from rolling_window_features import compute_time_features, compute_window_features
+
 # 配置日誌
 logging.basicConfig(
     level=logging.INFO,
@@ -367,57 +369,16 @@ class RoomBasedETLProcessor:
 
     def _extract_time_window_features(
         self,
-        df: pd.DataFrame,
-        timestamp: pd.Timestamp,
+        df_sorted: pd.DataFrame,
         window_size: int,
         suffix: str
-    ) -> Dict[str, float]:
-        """提取時間窗口統計特徵"""
-        window_start = timestamp - pd.Timedelta(minutes=window_size-1)
-        mask = (df['timestamp'] >= window_start) & (df['timestamp'] <= timestamp)
-        window_data = df[mask]
-
-        features = {}
-
-        if len(window_data) == 0:
-            power_types = ['wattage110v', 'wattage220v', 'wattageTotal']
-            stats = ['mean', 'std', 'max', 'min']
-            for power_type in power_types:
-                for stat in stats:
-                    features[f"{power_type}_{stat}_{suffix}"] = np.nan
-            return features
-
-        power_types = ['wattage110v', 'wattage220v', 'wattageTotal']
-
-        for power_type in power_types:
-            if power_type in window_data.columns:
-                values = window_data[power_type].dropna()
-                if len(values) > 0:
-                    try:
-                        features[f"{power_type}_mean_{suffix}"] = round(float(values.mean()), 3)
-                        features[f"{power_type}_std_{suffix}"] = round(float(values.std()), 3)
-                        features[f"{power_type}_max_{suffix}"] = round(float(values.max()), 3)
-                        features[f"{power_type}_min_{suffix}"] = round(float(values.min()), 3)
-                        features[f"{power_type}_range_{suffix}"] = round(float(values.max() - values.min()), 3)
-                        features[f"{power_type}_var_{suffix}"] = round(float(values.var()), 3)
-                    except Exception as e:
-                        # 如果計算失敗，設置為 NaN
-                        for stat in ['mean', 'std', 'max', 'min', 'range', 'var']:
-                            features[f"{power_type}_{stat}_{suffix}"] = np.nan
-                else:
-                    for stat in ['mean', 'std', 'max', 'min', 'range', 'var']:
-                        features[f"{power_type}_{stat}_{suffix}"] = np.nan
+    ) -> pd.DataFrame:
+        """提取時間窗口統計特徵（整個序列一次滾動計算，四捨五入到第三位）"""
+        return compute_window_features(df_sorted, window_size, suffix).round(3)
 
-        return features
-
-    def _extract_time_features(self, timestamp: pd.Timestamp) -> Dict[str, float]:
+    def _extract_time_features(self, timestamps: pd.Series) -> pd.DataFrame:
         """提取時間相關特徵"""
-        return {
-            'hour_of_day': timestamp.hour,
-            'day_of_week': timestamp.dayofweek,
-            'is_weekend': 1.0 if timestamp.dayofweek >= 5 else 0.0,
-            'is_business_hours': 1.0 if 8 <= timestamp.hour <= 18 else 0.0,
-        }
+        return compute_time_features(timestamps)
 
     def generate_multiscale_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -446,44 +407,32 @@ class RoomBasedETLProcessor:
             logger.warning(f"數據量不足以生成多尺度特徵，需要至少 {min_start_idx + 1} 筆數據，實際只有 {len(df_sorted)} 筆")
             return pd.DataFrame()
 
-        samples = []
-
-        for i in range(min_start_idx, len(df_sorted), step_size):
-            current_timestamp = df_sorted.iloc[i]['timestamp']
-            current_row = df_sorted.iloc[i]
-
-            sample = {
-                'timestamp': current_timestamp,
-                'room_id': current_row['room_id'],
-                'rawWattageL1': round(current_row['rawWattageL1'], 3),
-                'rawWattageL2': round(current_row['rawWattageL2'], 3),
-                'wattage110v_current': round(current_row['wattage110v'], 3),
-                'wattage220v_current': round(current_row['wattage220v'], 3),
-                'wattageTotal_current': round(current_row['wattageTotal'], 3),
-                # PU 學習標籤（預設為 False，之後可以根據需要設置）
-                'isPositiveLabel': False,
-                'sourceAnomalyEventId': None,
-            }
-
-            # 提取長期窗口特徵 (60分鐘)
-            long_features = self._extract_time_window_features(
-                df_sorted.iloc[:i+1], current_timestamp, long_window, "60m"
-            )
-            sample.update(long_features)
-
-            # 提取短期窗口特徵 (15分鐘)
-            short_features = self._extract_time_window_features(
-                df_sorted.iloc[:i+1], current_timestamp, short_window, "15m"
-            )
-            sample.update(short_features)
-
-            # 提取時間特徵
-            time_features = self._extract_time_features(current_timestamp)
-            sample.update(time_features)
-
-            samples.append(sample)
-
-        result_df = pd.DataFrame(samples)
+        # 提取長期 (60分鐘) 與短期 (15分鐘) 窗口特徵
+        long_features = self._extract_time_window_features(df_sorted, long_window, "60m")
+        short_features = self._extract_time_window_features(df_sorted, short_window, "15m")
+
+        positions = np.arange(min_start_idx, len(df_sorted), step_size)
+        current_rows = df_sorted.iloc[positions]
+
+        base_features = pd.DataFrame({
+            'timestamp': current_rows['timestamp'],
+            'room_id': current_rows['room_id'],
+            'rawWattageL1': current_rows['rawWattageL1'].round(3),
+            'rawWattageL2': current_rows['rawWattageL2'].round(3),
+            'wattage110v_current': current_rows['wattage110v'].round(3),
+            'wattage220v_current': current_rows['wattage220v'].round(3),
+            'wattageTotal_current': current_rows['wattageTotal'].round(3),
+            # PU 學習標籤（預設為 False，之後可以根據需要設置）
+            'isPositiveLabel': False,
+            'sourceAnomalyEventId': None,
+        })
+
+        result_df = pd.concat([
+            base_features,
+            long_features.iloc[positions],
+            short_features.iloc[positions],
+            self._extract_time_features(current_rows['timestamp']),
+        ], axis=1).reset_index(drop=True)
 
         logger.info(f"成功生成 {len(result_df)} 個多尺度特徵樣本")
         logger.info(f"特徵總數: {len(result_df.columns)} 個")
@@ -32,6 +32,7 @@ class SimulationRequest(BaseModel):
     model_config = {"protected_namespaces": ()}
 
     algorithm: Literal['uPU', 'nnPU'] = 'nnPU'
+    boundary_resolution: int = Field(100, ge=20, le=256, description="決策邊界網格 x 軸取樣點數")
     data_params: DataParams
     model_params: ModelParams
 
@@ -48,6 +49,8 @@ class Metrics(BaseModel):
     estimated_prior: float = Field(description="估計的類別先驗")
     error_rate: float = Field(description="錯誤率")
     training_error_rate: float = Field(description="訓練錯誤率")
+    prior_estimator: Optional[str] = Field(None, description="使用的先驗估計器")
+    prior_estimation_seconds: Optional[float] = Field(None, description="先驗估計耗時（秒）")
     risk_curve: List[Dict[str, float]] = Field(description="風險曲線數據")
 
 
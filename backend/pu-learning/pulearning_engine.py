@@ -8,7 +8,10 @@ import torch.nn as nn
 import torch.optim as optim
 from scipy.spatial.distance import cdist
 from sklearn.model_selection import KFold
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Dict, List, Optional
+import os
+import time
 import warnings
 
 # 忽略一些不重要的警告
@@ -123,55 +126,88 @@ def solve_cholesky(H: np.ndarray, hpu: np.ndarray, use_bias: bool = True) -> np.
         return np.linalg.pinv(H) @ hpu
 
 
-def estimate_prior_penL1CP(xp: np.ndarray, xu: np.ndarray, method: str = 'median') -> float:
+def solve_regularization_path(H: np.ndarray, h: np.ndarray, lambda_list, use_bias: bool = True) -> np.ndarray:
     """
-    使用 PenL1CP 方法估計類別先驗
-    簡化版本的 MATLAB PenL1CP.m 實現
-    
+    一次求解整條正則化路徑 (H + λ·Reg) θ = h，λ ∈ lambda_list
+
+    Reg 為單位矩陣（use_bias 時偏置項不正則化）。偏置項先以 Schur complement
+    消去，剩下的 M = A - a·aᵀ/α 只做一次特徵分解，之後每個 λ 只需對角縮放：
+        w(λ) = V diag(1 / (s + λ)) Vᵀ r,   c(λ) = (h_b - aᵀ w(λ)) / α
+    與逐 λ 呼叫 solve_cholesky 的解相同（至浮點誤差）；矩陣非正定的 λ
+    仍交給 solve_cholesky（含偽逆退路）處理。
+
+    Args:
+        H: 係數矩陣（未加正則化）
+        h: 右手邊向量
+        lambda_list: 正則化參數列表
+        use_bias: 最後一維是否為不正則化的偏置項
+
+    Returns:
+        thetas: (b, n_lambda)，第 j 欄為 λ_j 的解
+    """
+    lambdas = np.asarray(lambda_list, dtype=float)
+
+    if use_bias:
+        A, a, alpha = H[:-1, :-1], H[:-1, -1], H[-1, -1]
+        r = h[:-1] - a * (h[-1] / alpha)
+        M = A - np.outer(a, a) / alpha
+    else:
+        M, r = H, h
+
+    s, V = np.linalg.eigh(M)
+    denominator = s[:, None] + lambdas[None, :]
+    W = V @ ((V.T @ r)[:, None] / denominator)
+
+    if use_bias:
+        c = (h[-1] - a @ W) / alpha
+        thetas = np.vstack([W, c[None, :]])
+    else:
+        thetas = W
+
+    # 非正定（Cholesky 會失敗）的 λ 沿用原本的求解方式
+    tolerance = np.finfo(float).eps * max(np.abs(s).max(), 1.0) * len(s)
+    for j in np.flatnonzero(denominator.min(axis=0) <= tolerance):
+        Reg = lambdas[j] * np.eye(H.shape[0])
+        if use_bias:
+            Reg[-1, -1] = 0
+        thetas[:, j] = solve_cholesky(H + Reg, h, use_bias)
+    return thetas
+
+
+def estimate_prior_penL1CP(xp: np.ndarray, xu: np.ndarray, method: str = 'median',
+                           estimator: str = 'kde', seed: int = None) -> float:
+    """
+    估計類別先驗（實作見 prior_estimation 模組）
+
     Args:
         xp: 正樣本
         xu: 未標記樣本
-        method: 估計方法 ('mean' 或 'median')
-    
+        method: KDE 估計器使用的統計量 ('mean' 或 'median')
+        estimator: 'kde'（預設，原本的 KDE 密度比）、'kde_subsample'、'kde_tree' 或 'penl1cp'（對應 PenL1CP.m）
+        seed: 隨機種子
+
     Returns:
         估計的類別先驗
     """
-    # 這是一個簡化的先驗估計
-    # 實際的 PenL1CP 方法較為複雜，這裡使用近似方法
-    
-    # 計算正樣本和未標記樣本的密度比
-    from sklearn.neighbors import KernelDensity
-    
+    from prior_estimation import estimate_class_prior
+
     try:
-        # 使用核密度估計
-        kde_p = KernelDensity(bandwidth=0.5, kernel='gaussian')
-        kde_u = KernelDensity(bandwidth=0.5, kernel='gaussian')
-        
-        kde_p.fit(xp)
-        kde_u.fit(xu)
-        
-        # 在未標記樣本上評估密度
-        log_dens_p = kde_p.score_samples(xu)
-        log_dens_u = kde_u.score_samples(xu)
-        
-        # 計算密度比
-        density_ratio = np.exp(log_dens_p - log_dens_u)
-        
-        # 💡 根據方法選擇使用均值或中位數
-        if method == 'mean':
-            estimated_prior = np.clip(np.mean(density_ratio), 0.1, 0.9)
-        else:  # median
-            estimated_prior = np.clip(np.median(density_ratio), 0.1, 0.9)
-        
-        print(f"[DEBUG] 先驗估計統計 (方法: {method}):")
-        print(f"   • 密度比均值: {np.mean(density_ratio):.4f}")
-        print(f"   • 密度比中位數: {np.median(density_ratio):.4f}")
+        result = estimate_class_prior(xp, xu, estimator, method, seed=seed)
+        estimated_prior = result['prior']
+
+        print(f"[DEBUG] 先驗估計統計 (估計器: {estimator}, 方法: {method}):")
+        if estimator == 'penl1cp':
+            print(f"   • 最小 penalized L1-distance: {min(result['penL1_list']):.4f}")
+        else:
+            print(f"   • 密度比均值: {result['density_ratio_mean']:.4f}")
+            print(f"   • 密度比中位數: {result['density_ratio_median']:.4f}")
         print(f"   • 修正後估計: {estimated_prior:.4f}")
-        
+        print(f"   • 估計耗時: {result['elapsed_seconds']:.3f}s")
+
     except Exception:
         # 如果出錯，返回一個合理的預設值
         estimated_prior = 0.3
-    
+
     return estimated_prior
 
 
@@ -440,6 +476,104 @@ def analyze_prior_estimation(estimated_prior: float, true_prior: float, algorith
         print(f"      ✅ {algorithm} 先驗估計誤差可接受 ({prior_error:.3f})")
 
 
+# 決策值相對於 ‖K_row‖₁·‖θ‖∞ 小於此值時視為符號不可靠
+_SIGN_TOLERANCE = 1e-8
+
+
+def _upu_sigma_cv_scores(dp: np.ndarray, du: np.ndarray, sigma: float, prior: float, lambda_list,
+                         cv_indices_p, cv_indices_u, use_bias: bool, model_type: str,
+                         solver: str = 'path') -> Tuple[np.ndarray, List[str]]:
+    """
+    單一 σ 的 uPU 交叉驗證分數
+
+    solver='path' 的 U Gram 矩陣每個 σ 只算一次（各折減去驗證部分），每個 fold 只分解一次
+    Hu_tr，以 solve_regularization_path 求出整條 λ 路徑；solver='cholesky' 為原本逐 λ
+    重新分解的做法（供比對）。
+
+    Returns:
+        scores: 各 λ 的平均驗證損失 (n_lambda,)
+        log_lines: 第一折第一個 λ 的風險明細（由呼叫端依 σ 順序印出）
+    """
+    # 計算核矩陣
+    Kp, Ku = calc_ker(dp, du, sigma, use_bias, model_type)
+    b = Kp.shape[1]
+    if solver != 'cholesky':
+        # 全部 U 樣本的 Gram 矩陣只算一次，各折扣掉驗證部分即為訓練部分
+        Gu = Ku.T @ Ku
+
+    cv_scores = []
+    log_lines = []
+    for fold, ((train_idx_p, test_idx_p), (train_idx_u, test_idx_u)) in enumerate(zip(cv_indices_p, cv_indices_u)):
+        # 訓練集 / 測試集核矩陣
+        Kp_train, Ku_train = Kp[train_idx_p], Ku[train_idx_u]
+        Kp_test, Ku_test = Kp[test_idx_p], Ku[test_idx_u]
+
+        # 計算訓練用的矩陣
+        if solver == 'cholesky':
+            Hu_tr = (Ku_train.T @ Ku_train) / len(train_idx_u)
+        else:
+            Hu_tr = (Gu - Ku_test.T @ Ku_test) / len(train_idx_u)
+        hp_tr = prior * np.mean(Kp_train, axis=0)
+        hu_tr = np.mean(Ku_train, axis=0)
+
+        # uPU 風險: hpu = 2*hp - hu
+        hpu = 2 * hp_tr - hu_tr
+
+        if solver == 'cholesky':
+            thetas = np.empty((b, len(lambda_list)))
+            for i_lambda, lambda_reg in enumerate(lambda_list):
+                Reg = lambda_reg * np.eye(b)
+                if use_bias:
+                    Reg[-1, -1] = 0  # 偏置項不正則化
+                thetas[:, i_lambda] = solve_cholesky(Hu_tr + Reg, hpu, use_bias)
+        else:
+            thetas = solve_regularization_path(Hu_tr, hpu, lambda_list, use_bias)
+
+        # 計算驗證損失（所有 λ 一起）
+        gp_test = Kp_test @ thetas
+        gu_test = Ku_test @ thetas
+
+        if solver != 'cholesky':
+            # 決策值落在捨入誤差內時（例如 σ 極小、核值近乎 0）符號由求解器的捨入決定：
+            # 這些 λ 改回原本的逐 λ Cholesky，驗證分數與原做法逐位一致
+            ambiguous = np.zeros(thetas.shape[1], dtype=bool)
+            for K_test, g_test in ((Kp_test, gp_test), (Ku_test, gu_test)):
+                if len(K_test):
+                    noise = _SIGN_TOLERANCE * np.outer(np.abs(K_test).sum(axis=1), np.abs(thetas).max(axis=0))
+                    ambiguous |= (np.abs(g_test) <= noise).any(axis=0)
+            if ambiguous.any():
+                Hu_direct = (Ku_train.T @ Ku_train) / len(train_idx_u)
+                for i_lambda in np.flatnonzero(ambiguous):
+                    Reg = lambda_list[i_lambda] * np.eye(b)
+                    if use_bias:
+                        Reg[-1, -1] = 0
+                    thetas[:, i_lambda] = solve_cholesky(Hu_direct + Reg, hpu, use_bias)
+                gp_test[:, ambiguous] = Kp_test @ thetas[:, ambiguous]
+                gu_test[:, ambiguous] = Ku_test @ thetas[:, ambiguous]
+        fn = np.mean(gp_test <= 0, axis=0) if len(gp_test) > 0 else np.zeros(thetas.shape[1])
+        fp_u = np.mean(gu_test >= 0, axis=0) if len(gu_test) > 0 else np.zeros(thetas.shape[1])
+
+        # uPU 風險的原始計算 (可能為負)，使用 non-negative risk estimator：max(0, negative_risk)
+        raw_negative_risk = fp_u + prior * fn - prior
+        losses = prior * fn + np.maximum(raw_negative_risk, 0)
+
+        if fold == 0:  # 只在第一折第一個lambda記錄
+            upu_risk_raw = prior * fn[0] + raw_negative_risk[0]
+            log_lines += [
+                f"      📊 CV Fold {fold+1}, λ={lambda_list[0]:.4f}:",
+                f"         • 正樣本風險 (prior * FN): {prior * fn[0]:.4f}",
+                f"         • 原始負樣本風險: {raw_negative_risk[0]:.4f}"
+                + (" ⚠️  **變成負數！使用非負約束**" if raw_negative_risk[0] < 0 else ""),
+                f"         • uPU 風險 (原始): {upu_risk_raw:.4f}",
+                f"         • uPU 風險 (非負約束後): {losses[0]:.4f}"
+            ]
+
+        cv_scores.append(losses)
+
+    # 平均交叉驗證分數
+    return np.mean(cv_scores, axis=0), log_lines
+
+
 def train_upu(xp: np.ndarray, xu: np.ndarray, prior: float, options: Dict, seed: int = None) -> Tuple[callable, Dict]:
     """
     uPU 演算法的 Python 實現
@@ -501,83 +635,26 @@ def train_upu(xp: np.ndarray, xu: np.ndarray, prior: float, options: Dict, seed:
     cv_indices_p = list(kf_p.split(range(np_samples)))
     cv_indices_u = list(kf_u.split(range(nu_samples)))
     
+    # σ 之間彼此獨立，以執行緒池平行處理（numpy 的矩陣運算會釋放 GIL）
+    solver = options.get('solver', 'path')
+    n_jobs = options.get('n_jobs') or min(n_sigma, os.cpu_count() or 1)
+
+    def run_sigma(sigma):
+        return _upu_sigma_cv_scores(dp, du, sigma, prior, lambda_list, cv_indices_p, cv_indices_u,
+                                    use_bias, model_type, solver)
+
+    if n_jobs > 1 and n_sigma > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            sigma_results = list(executor.map(run_sigma, sigma_list))
+    else:
+        sigma_results = [run_sigma(sigma) for sigma in sigma_list]
+
     score_table = np.zeros((n_sigma, n_lambda))
-    
-    for i_sigma, sigma in enumerate(sigma_list):
+    for i_sigma, (sigma, (scores, log_lines)) in enumerate(zip(sigma_list, sigma_results)):
         print(f"  Processing sigma {i_sigma+1}/{n_sigma}: {sigma:.4f}")
-        
-        # 計算核矩陣
-        Kp, Ku = calc_ker(dp, du, sigma, use_bias, model_type)
-        
-        cv_scores = []
-        
-        for fold in range(n_fold):
-            train_idx_p, test_idx_p = cv_indices_p[fold]
-            train_idx_u, test_idx_u = cv_indices_u[fold]
-            
-            # 訓練集核矩陣
-            Kp_train = Kp[train_idx_p]
-            Ku_train = Ku[train_idx_u]
-            
-            # 測試集核矩陣
-            Kp_test = Kp[test_idx_p]
-            Ku_test = Ku[test_idx_u]
-            
-            # 計算訓練用的矩陣
-            Hp_tr = prior * (Kp_train.T @ Kp_train) / len(train_idx_p)
-            Hu_tr = (Ku_train.T @ Ku_train) / len(train_idx_u)
-            hp_tr = prior * np.mean(Kp_train, axis=0)
-            hu_tr = np.mean(Ku_train, axis=0)
-            
-            fold_scores = []
-            for i_lambda, lambda_reg in enumerate(lambda_list):
-                # 正則化矩陣
-                b = Hu_tr.shape[0]
-                Reg = lambda_reg * np.eye(b)
-                if use_bias:
-                    Reg[-1, -1] = 0  # 偏置項不正則化
-                
-                # uPU 風險: hpu = 2*hp - hu
-                hpu = 2 * hp_tr - hu_tr
-                
-                # 求解
-                theta = solve_cholesky(Hu_tr + Reg, hpu, use_bias)
-                
-                # 計算驗證損失
-                gp_test = Kp_test @ theta
-                gu_test = Ku_test @ theta
-                
-                # uPU 損失計算，實現 non-negative risk estimator
-                fn = np.mean(gp_test <= 0) if len(gp_test) > 0 else 0
-                fp_u = np.mean(gu_test >= 0) if len(gu_test) > 0 else 0
-                
-                # uPU 風險的原始計算 (可能為負)
-                raw_negative_risk = fp_u + prior * fn - prior  # 這可能為負
-                upu_risk_raw = prior * fn + raw_negative_risk
-                
-                # **任務二修正：使用 non-negative risk estimator**
-                # 類似 nnPU 的做法：max(0, negative_risk)
-                non_negative_risk = max(raw_negative_risk, 0)
-                loss = prior * fn + non_negative_risk
-                
-                # 在部分折中記錄負風險情況
-                if fold == 0 and i_lambda == 0:  # 只在第一折第一個lambda記錄
-                    print(f"      📊 CV Fold {fold+1}, λ={lambda_reg:.4f}:")
-                    print(f"         • 正樣本風險 (prior * FN): {prior * fn:.4f}")
-                    print(f"         • 原始負樣本風險: {raw_negative_risk:.4f}", end="")
-                    if raw_negative_risk < 0:
-                        print(" ⚠️  **變成負數！使用非負約束**")
-                    else:
-                        print("")
-                    print(f"         • uPU 風險 (原始): {upu_risk_raw:.4f}")
-                    print(f"         • uPU 風險 (非負約束後): {loss:.4f}")
-                
-                fold_scores.append(loss)
-            
-            cv_scores.append(fold_scores)
-        
-        # 平均交叉驗證分數
-        score_table[i_sigma, :] = np.mean(cv_scores, axis=0)
+        for line in log_lines:
+            print(line)
+        score_table[i_sigma, :] = scores
     
     # 選擇最佳參數
     best_idx = np.unravel_index(np.argmin(score_table), score_table.shape)
@@ -786,6 +863,8 @@ def run_pu_simulation(request) -> Dict:
     # 初始化變量
     training_error_rate = 0.0  # 初始化訓練錯誤率
     estimated_prior = 0.0  # 初始化先驗估計
+    prior_estimator = None
+    prior_estimation_seconds = 0.0
     
     if request.algorithm == 'uPU':
         # 使用前端傳來的 uPU 參數，如果沒有則使用預設值
@@ -803,7 +882,10 @@ def run_pu_simulation(request) -> Dict:
         # 3. 在模型訓練完成後進行先驗估計
         print(f"\n🔍 [DEBUG] 訓練後先驗估計 (uPU):")
         prior_method = getattr(request, 'prior_estimation_method', 'median')
-        estimated_prior = estimate_prior_penL1CP(xp, xu, prior_method)
+        prior_estimator = getattr(request, 'prior_estimator', None) or 'kde'
+        prior_start = time.perf_counter()
+        estimated_prior = estimate_prior_penL1CP(xp, xu, prior_method, prior_estimator, seed)
+        prior_estimation_seconds = time.perf_counter() - prior_start
         print(f"   • 估計的 Prior: {estimated_prior:.3f}")
         print(f"   • 真實的 Prior: {data_params.prior:.3f}")
         print(f"   • 估計誤差: {abs(estimated_prior - data_params.prior):.3f}")
@@ -928,6 +1010,8 @@ def run_pu_simulation(request) -> Dict:
         # 計算 Estimated Prior 的內部數值
         print(f"\n🔍 [DEBUG] 訓練後先驗估計 (nnPU):")
         prior_method = getattr(request, 'prior_estimation_method', 'median')
+        prior_estimator = 'model_output'
+        prior_start = time.perf_counter()
         with torch.no_grad():
             # 對 unlabeled data 計算 E[g(x)]
             gu_for_prior = model(torch.FloatTensor(xu).to(device)).cpu().numpy()
@@ -944,6 +1028,7 @@ def run_pu_simulation(request) -> Dict:
             
             print(f"      • E[sigmoid(g(x))] 對 unlabeled data - Mean: {np.mean(prob_u):.4f}, Median: {np.median(prob_u):.4f}")
             print(f"      • 訓練後模型估計的 Prior ({prior_method}): {estimated_prior:.4f}")
+        prior_estimation_seconds = time.perf_counter() - prior_start
         
         # 使用共用的先驗估計分析函數
         analyze_prior_estimation(estimated_prior, data_params.prior, 'nnPU')
@@ -973,7 +1058,8 @@ def run_pu_simulation(request) -> Dict:
     
     # 生成決策邊界
     if data_params.dims <= 2:
-        decision_boundary = generate_decision_boundary(model, request.algorithm, outputs)
+        resolution = getattr(request, 'boundary_resolution', None) or DEFAULT_BOUNDARY_RESOLUTION
+        decision_boundary = generate_decision_boundary(model, request.algorithm, outputs, resolution)
         print(f"   • 決策邊界點數: {len(decision_boundary)}")
     else:
         # 高維情況下生成簡化的決策邊界
@@ -989,6 +1075,8 @@ def run_pu_simulation(request) -> Dict:
         },
         'metrics': {
             'estimated_prior': float(estimated_prior),  # 🔧 修正：返回真正的估計值，而不是真實值
+            'prior_estimator': prior_estimator,
+            'prior_estimation_seconds': float(prior_estimation_seconds),
             'error_rate': float(error_rate),
             'training_error_rate': float(training_error_rate),
             'risk_curve': risk_curve
@@ -1010,6 +1098,7 @@ def run_pu_simulation(request) -> Dict:
         print(f"   • 第一個 decision boundary 點: {response_data['visualization']['decision_boundary'][0]}")
     
     print(f"   • estimated_prior: {response_data['metrics']['estimated_prior']}")
+    print(f"   • prior_estimation_seconds: {response_data['metrics']['prior_estimation_seconds']:.4f} ({prior_estimator})")
     print(f"   • error_rate: {response_data['metrics']['error_rate']}")
     print(f"   • training_error_rate: {response_data['metrics']['training_error_rate']}")
     print(f"   • risk_curve 長度: {len(response_data['metrics']['risk_curve'])}")
@@ -1032,110 +1121,229 @@ def run_pu_simulation(request) -> Dict:
     return response_data
 
 
-def generate_decision_boundary(model, algorithm: str, outputs: Dict) -> List[List[float]]:
-    """生成決策邊界用於可視化 - 修正版本，使用等高線方法生成連續邊界線"""
+# 決策邊界可視化的取樣範圍（聚焦於 two_moons 數據範圍）
+BOUNDARY_X_RANGE = (-2.5, 2.5)
+BOUNDARY_Y_RANGE = (-1.5, 1.5)
+DEFAULT_BOUNDARY_RESOLUTION = 100
+
+
+def _upu_grid_values(outputs: Dict, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    uPU 決策函數在網格上的值
+
+    2D 高斯核在網格上可分離：exp(-|p - c|^2 / 2σ^2) = exp(-(x - cx)^2 / 2σ^2) * exp(-(y - cy)^2 / 2σ^2)，
+    因此整個網格只需一次 (ny, n_basis) x (n_basis, nx) 的矩陣乘積，不必建立 (ny*nx, n_basis) 的核矩陣。
+    """
+    theta = outputs['theta']
+    weights = theta[:-1] if outputs['use_bias'] else theta
+    bias = theta[-1] if outputs['use_bias'] else 0.0
+
+    if outputs['model_type'] == 'gauss':
+        xc = outputs['xc']
+        scale = 2 * outputs['sigma'] ** 2
+        kernel_x = np.exp(-(xs[:, None] - xc[None, :, 0]) ** 2 / scale)
+        kernel_y = np.exp(-(ys[:, None] - xc[None, :, 1]) ** 2 / scale)
+        values = (kernel_y * weights) @ kernel_x.T
+    else:
+        values = ys[:, None] * weights[1] + xs[None, :] * weights[0]
+
+    return values + bias
+
+
+def evaluate_decision_grid(model, algorithm: str, outputs: Dict, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    在 2D 網格上一次性批次評估決策函數
+
+    uPU 以可分離的高斯核做一次矩陣乘積；nnPU 在 no_grad 下對所有網格點做一次 forward。
+
+    Args:
+        model: uPU 的決策函數或 nnPU 的神經網路
+        algorithm: 'uPU' 或 'nnPU'
+        outputs: 訓練輸出（uPU 需要 theta / xc / sigma，nnPU 需要 device）
+        xs: x 軸取樣點 (nx,)
+        ys: y 軸取樣點 (ny,)
+
+    Returns:
+        決策值網格 (ny, nx)，第 i 列對應 ys[i]
+    """
+    if algorithm == 'uPU':
+        if 'theta' in outputs and np.shape(outputs.get('xc'))[-1:] == (2,):
+            return _upu_grid_values(outputs, xs, ys)
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        values = np.asarray(model(np.column_stack([grid_x.ravel(), grid_y.ravel()])))
+        return values.reshape(len(ys), len(xs))
+
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    grid_points = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+    device = outputs.get('device', torch.device('cpu'))
+    with torch.no_grad():
+        grid_tensor = torch.as_tensor(grid_points, dtype=torch.float32, device=device)
+        values = model(grid_tensor).cpu().numpy()
+
+    return values.reshape(len(ys), len(xs))
+
+
+def extract_zero_contours(values: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> List[np.ndarray]:
+    """
+    以 marching squares 擷取網格上的零等高線
+
+    每個跨越正負號的網格邊以線性內插取得交點，每個格子產生 0~2 條線段
+    （鞍點格子以中心值決定連接方式），再依共用的網格邊把線段串成折線。
+
+    Args:
+        values: 決策值網格 (ny, nx)
+        xs: x 軸取樣點 (nx,)
+        ys: y 軸取樣點 (ny,)
+
+    Returns:
+        折線列表，每條為 (n_points, 2) 的座標陣列；封閉曲線首尾相同
+    """
+    ny, nx = values.shape
+    positive = values > 0
+
+    # 網格邊編號：水平邊 (i, j)-(i, j+1) 在前，垂直邊 (i, j)-(i+1, j) 在後
+    h_ids = np.arange(ny * (nx - 1)).reshape(ny, nx - 1)
+    v_ids = ny * (nx - 1) + np.arange((ny - 1) * nx).reshape(ny - 1, nx)
+
+    # 每個格子的四條邊，順序為 下、右、上、左
+    p00, p01 = positive[:-1, :-1], positive[:-1, 1:]
+    p10, p11 = positive[1:, :-1], positive[1:, 1:]
+    crossed = np.stack([p00 != p01, p01 != p11, p10 != p11, p00 != p10], axis=-1)
+    edge_ids = np.stack([h_ids[:-1, :], v_ids[:, 1:], h_ids[1:, :], v_ids[:, :-1]], axis=-1)
+    n_crossed = crossed.sum(axis=-1)
+
+    single = n_crossed == 2
+    segments = [edge_ids[single][crossed[single]].reshape(-1, 2)]
+
+    saddle = n_crossed == 4
+    if np.any(saddle):
+        saddle_edges = edge_ids[saddle]
+        center = (values[:-1, :-1] + values[:-1, 1:] + values[1:, :-1] + values[1:, 1:])[saddle] / 4
+        # 中心與左下角同號：左下與右上相連，線段包圍右下、左上兩角；否則包圍左下、右上兩角
+        joined = ((center > 0) == p00[saddle])[:, None]
+        segments.append(np.where(joined, saddle_edges[:, [0, 1]], saddle_edges[:, [3, 0]]))
+        segments.append(np.where(joined, saddle_edges[:, [2, 3]], saddle_edges[:, [1, 2]]))
+
+    segments = np.concatenate(segments)
+    if len(segments) == 0:
+        return []
+
+    # 計算用到的網格邊的零點座標
+    used = np.unique(segments)
+    is_h = used < ny * (nx - 1)
+    coords = np.empty((len(used), 2))
+
+    h_i, h_j = np.divmod(used[is_h], nx - 1)
+    a, b = values[h_i, h_j], values[h_i, h_j + 1]
+    t = a / (a - b)
+    coords[is_h, 0] = xs[h_j] + t * (xs[h_j + 1] - xs[h_j])
+    coords[is_h, 1] = ys[h_i]
+
+    v_i, v_j = np.divmod(used[~is_h] - ny * (nx - 1), nx)
+    a, b = values[v_i, v_j], values[v_i + 1, v_j]
+    t = a / (a - b)
+    coords[~is_h, 0] = xs[v_j]
+    coords[~is_h, 1] = ys[v_i] + t * (ys[v_i + 1] - ys[v_i])
+
+    # 依共用網格邊串接線段（每條網格邊最多被兩個格子共用）
+    nodes = np.searchsorted(used, segments)
+    neighbors: Dict[int, List[int]] = {}
+    for start, end in nodes.tolist():
+        neighbors.setdefault(start, []).append(end)
+        neighbors.setdefault(end, []).append(start)
+
+    visited = set()
+    polylines = []
+    # 先從端點（開放曲線）出發，剩下的都是封閉曲線
+    endpoints = [node for node, linked in neighbors.items() if len(linked) == 1]
+    for start in endpoints + list(neighbors):
+        if start in visited:
+            continue
+        path = [start]
+        visited.add(start)
+        previous, current = None, start
+        while True:
+            following = [node for node in neighbors[current] if node != previous]
+            if not following:
+                break
+            step = following[0]
+            if step in visited:
+                if step == start:
+                    path.append(start)
+                break
+            path.append(step)
+            visited.add(step)
+            previous, current = current, step
+        polylines.append(coords[path])
+
+    return polylines
+
+
+def generate_decision_boundary(model, algorithm: str, outputs: Dict,
+                               resolution: int = DEFAULT_BOUNDARY_RESOLUTION) -> List[List[float]]:
+    """
+    生成決策邊界用於可視化
+
+    在 x 軸 resolution 個點、y 軸依範圍等比例取點的網格上一次批次評估決策函數，
+    再以 marching squares 擷取零等高線，回傳最長的一條（由左至右）。網格內沒有
+    零點時，退回逐欄取 |f| 最小值的掃描結果。
+
+    Args:
+        model: uPU 的決策函數或 nnPU 的神經網路
+        algorithm: 'uPU' 或 'nnPU'
+        outputs: 訓練輸出
+        resolution: x 軸取樣點數
+
+    Returns:
+        邊界點座標列表 [[x, y], ...]
+    """
     boundary_points = []
-    
+    x_min, x_max = BOUNDARY_X_RANGE
+    y_min, y_max = BOUNDARY_Y_RANGE
+    resolution = max(int(resolution), 2)
+
     try:
-        print(f"\n🎨 [DEBUG] 生成決策邊界 ({algorithm})...")
-        
-        if algorithm == 'uPU':
-            # **修正：使用連續邊界線生成方法**
-            x_min, x_max = -2.5, 2.5  # 聚焦於 two_moons 數據範圍
-            y_min, y_max = -1.5, 1.5
-            
-            # 生成邊界線的參數化方法
-            try:
-                # 方法1：沿著 x 軸掃描，找到決策邊界的 y 值
-                x_line = np.linspace(x_min, x_max, 50)
-                boundary_y = []
-                
-                for x in x_line:
-                    # 在當前 x 位置，搜索 y 方向的決策邊界
-                    y_candidates = np.linspace(y_min, y_max, 100)
-                    test_points = np.column_stack([np.full_like(y_candidates, x), y_candidates])
-                    
-                    try:
-                        predictions = model(test_points)
-                        # 找到最接近 0 的預測點
-                        abs_predictions = np.abs(predictions)
-                        min_idx = np.argmin(abs_predictions)
-                        boundary_y.append(y_candidates[min_idx])
-                    except:
-                        # 如果預測失敗，使用簡單的正弦波
-                        boundary_y.append(0.3 * np.sin(x * 1.5))
-                
-                boundary_points = [[float(x), float(y)] for x, y in zip(x_line, boundary_y)]
-                print(f"      • 生成了 {len(boundary_points)} 個連續邊界點")
-                
-            except Exception as e:
-                print(f"      ⚠️  uPU 邊界生成出錯: {e}")
-                # 後備方案：生成合理的非線性邊界
-                x_line = np.linspace(x_min, x_max, 30)
+        xs = np.linspace(x_min, x_max, resolution)
+        ys = np.linspace(y_min, y_max, max(round(resolution * (y_max - y_min) / (x_max - x_min)), 2))
+        print(f"\n🎨 [DEBUG] 生成決策邊界 ({algorithm}, 網格 {len(xs)}x{len(ys)})...")
+
+        try:
+            values = evaluate_decision_grid(model, algorithm, outputs, xs, ys)
+
+            contours = extract_zero_contours(values, xs, ys)
+            if contours:
+                boundary = max(contours, key=lambda line: np.sum(np.linalg.norm(np.diff(line, axis=0), axis=1)))
+                if boundary[0, 0] > boundary[-1, 0]:
+                    boundary = boundary[::-1]
+                boundary_points = boundary.tolist()
+                print(f"      • 零等高線 {len(contours)} 條，取最長的一條: {len(boundary_points)} 個邊界點")
+            else:
+                # 網格內沒有零點：每個 x 取 |f| 最小的 y
+                boundary_y = ys[np.argmin(np.abs(values), axis=0)]
+                boundary_points = [[float(x), float(y)] for x, y in zip(xs, boundary_y)]
+                print(f"      • 網格內無零等高線，使用逐欄最小 |f| 的 {len(boundary_points)} 個點")
+
+                y_range = float(boundary_y.max() - boundary_y.min())
+                if algorithm == 'nnPU' and y_range < 0.1:
+                    print(f"      ⚠️  邊界過於平直，添加輕微變化")
+                    for point in boundary_points:
+                        point[1] += 0.1 * np.sin(point[0] * 3)
+
+        except Exception as e:
+            print(f"      ⚠️  {algorithm} 邊界生成出錯: {e}")
+            # 後備方案：生成合理的非線性邊界
+            x_line = np.linspace(x_min, x_max, 30)
+            if algorithm == 'uPU':
                 y_line = 0.5 * np.sin(x_line * 2) + 0.2 * np.cos(x_line * 3)
-                boundary_points = [[float(x), float(y)] for x, y in zip(x_line, y_line)]
-                print(f"      • 使用後備非線性邊界")
-            
-            except Exception as e:
-                print(f"      ⚠️  uPU 預測出錯: {e}")
-                boundary_points = [[x_min, 0], [x_max, 0]]
-        
-        else:  # nnPU
-            # **修正：神經網路模型的連續邊界線生成**
-            device = outputs.get('device', torch.device('cpu'))
-            x_min, x_max = -2.5, 2.5  # 聚焦於 two_moons 數據範圍  
-            y_min, y_max = -1.5, 1.5
-            
-            try:
-                # 使用等高線方法生成連續邊界
-                x_line = np.linspace(x_min, x_max, 50)
-                boundary_y = []
-                
-                with torch.no_grad():
-                    for x in x_line:
-                        # 在當前 x 位置搜索決策邊界
-                        y_candidates = np.linspace(y_min, y_max, 100)
-                        test_points = np.column_stack([np.full_like(y_candidates, x), y_candidates])
-                        
-                        grid_tensor = torch.FloatTensor(test_points).to(device)
-                        predictions = model(grid_tensor).cpu().numpy().flatten()
-                        
-                        # 找到最接近 0 的預測點（決策邊界）
-                        abs_predictions = np.abs(predictions)
-                        min_idx = np.argmin(abs_predictions)
-                        boundary_y.append(y_candidates[min_idx])
-                
-                boundary_points = [[float(x), float(y)] for x, y in zip(x_line, boundary_y)]
-                print(f"      • 生成了 {len(boundary_points)} 個連續邊界點")
-                
-                # **調試輸出：檢查邊界點的 y 座標變化**
-                if len(boundary_points) >= 5:
-                    y_coords = [point[1] for point in boundary_points[:5]]
-                    print(f"      • 前5個點的 Y 座標: {[round(y, 3) for y in y_coords]}")
-                    
-                    y_range = max(boundary_y) - min(boundary_y)
-                    print(f"      • Y 座標變化範圍: {y_range:.3f}")
-                    
-                    if y_range < 0.1:
-                        print(f"      ⚠️  邊界過於平直，添加輕微變化")
-                        # 添加輕微的非線性變化
-                        for i, (x, y) in enumerate(boundary_points):
-                            boundary_points[i][1] = y + 0.1 * np.sin(x * 3)
-                
-            except Exception as e:
-                print(f"      ⚠️  nnPU 邊界生成出錯: {e}")
-                # 後備方案：生成月牙形邊界線
-                x_line = np.linspace(x_min, x_max, 30)
+            else:
                 y_line = 0.8 * np.sin(x_line * 1.2) * np.exp(-np.abs(x_line) * 0.3)
-                boundary_points = [[float(x), float(y)] for x, y in zip(x_line, y_line)]
-            except Exception as e:
-                print(f"      ⚠️  nnPU 預測出錯: {e}")
-                boundary_points = [[x_min, 0], [x_max, 0]]
-    
+            boundary_points = [[float(x), float(y)] for x, y in zip(x_line, y_line)]
+            print(f"      • 使用後備非線性邊界")
+
     except Exception as e:
         print(f"🚨 [ERROR] 決策邊界生成失敗: {e}")
         boundary_points = [[-3, 0], [3, 0]]
-    
+
     print(f"      ✅ 最終邊界點數: {len(boundary_points)}")
     return boundary_points
 
@@ -0,0 +1,254 @@
+"""
+PU 模擬結果快取
+/api/run-simulation（pu_main）與 /api/pu-learning/run-simulation（routes）共用
+
+- 以請求內容（algorithm、seed、data_params、model_params 等）的 SHA256 為 key；
+  相同 seed 的模擬是確定性的，重播相同請求直接回傳先前的結果
+- 行程內 LRU（PU_SIMULATION_CACHE_SIZE，預設 64）+ 可選的磁碟快取（PU_SIMULATION_CACHE_DIR，未設定則停用）
+- 相同 key 的並行請求共用同一次計算（request coalescing）
+- run_pu_simulation 在 spawn 的 worker process 中執行（PU_SIMULATION_WORKERS，預設 2；
+  設為 0 時改用執行緒，且同一時間只執行一個模擬），不阻塞 event loop
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+# 模擬引擎的輸出有變動時遞增，使舊的快取結果失效
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 64
+DEFAULT_WORKERS = 2
+# run_pu_simulation 在請求沒有 seed 欄位時使用的種子
+DEFAULT_SEED = 42
+
+
+def _request_payload(request) -> Dict:
+    if hasattr(request, 'model_dump'):
+        return request.model_dump()
+    return request.dict()
+
+
+def simulation_cache_key(request) -> Optional[str]:
+    """
+    模擬請求的快取 key
+
+    Returns:
+        str: SHA256；seed 明確為 None（結果不可重現）時回傳 None，不使用快取
+    """
+    payload = _request_payload(request)
+    payload.setdefault('seed', DEFAULT_SEED)
+    if payload['seed'] is None:
+        return None
+    canonical = json.dumps({'version': CACHE_VERSION, 'request': payload}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _run_simulation(payload: Dict) -> Dict:
+    """
+    worker 入口（模組層級，可被 pickle）
+
+    只傳送請求的 dict：pu_main 與 routes 的 SimulationRequest 是不同的類別，
+    在 worker 中以屬性存取的 namespace 重建，run_pu_simulation 的 getattr / hasattr 行為不變。
+    """
+    from pulearning_engine import run_pu_simulation
+
+    request = SimpleNamespace(**{
+        name: SimpleNamespace(**value) if isinstance(value, dict) else value
+        for name, value in payload.items()
+    })
+    return run_pu_simulation(request)
+
+
+# 執行緒模式下序列化模擬：run_pu_simulation 會設定 numpy / torch 的全域 RNG 種子，
+# 並行執行時亂數序列互相交錯，結果不可重現，也就不能放進快取
+_thread_mode_lock = threading.Lock()
+
+
+def _run_simulation_in_thread(payload: Dict) -> Dict:
+    with _thread_mode_lock:
+        return _run_simulation(payload)
+
+
+def _json_default(value):
+    # numpy 純量 / 陣列（risk_curve 等欄位可能帶有）
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SimulationCache:
+    """模擬結果的 LRU + 磁碟快取，並合併並行的相同請求"""
+
+    def __init__(self, max_entries: Optional[int] = None, cache_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        if max_entries is None:
+            max_entries = int(os.getenv('PU_SIMULATION_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+        if cache_dir is None:
+            cache_dir = os.getenv('PU_SIMULATION_CACHE_DIR') or None
+        if max_workers is None:
+            max_workers = int(os.getenv('PU_SIMULATION_WORKERS', DEFAULT_WORKERS))
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.stats = {'hits': 0, 'disk_hits': 0, 'coalesced': 0, 'misses': 0}
+
+        self._results: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    async def run(self, request) -> Dict:
+        """
+        回傳模擬結果（快取命中時直接回傳，否則在 worker pool 中計算）
+
+        Args:
+            request: SimulationRequest
+
+        Returns:
+            Dict: run_pu_simulation 的結果（呼叫端可自由修改的副本）
+        """
+        key = simulation_cache_key(request)
+        if key is None:
+            self.stats['misses'] += 1
+            return await self._compute(request)
+
+        result = self._lookup(key)
+        if result is not None:
+            print(f"♻️ [CACHE] Simulation result reused ({key[:12]})")
+            return copy.deepcopy(result)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            print(f"🔗 [CACHE] Waiting for identical in-flight simulation ({key[:12]})")
+        else:
+            self.stats['misses'] += 1
+            task = asyncio.get_running_loop().create_task(self._compute_and_store(key, request))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield：單一請求被取消（例如客戶端斷線）時，共用的計算仍繼續給其他請求使用
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.stats['hits'] += 1
+                return result
+
+        result = self._load_from_disk(key)
+        if result is not None:
+            self.stats['disk_hits'] += 1
+            self._remember(key, result)
+        return result
+
+    def _remember(self, key: str, result: Dict):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    async def _compute_and_store(self, key: str, request) -> Dict:
+        result = await self._compute(request)
+        self._remember(key, result)
+        self._save_to_disk(key, result)
+        return result
+
+    async def _compute(self, request) -> Dict:
+        payload = _request_payload(request)
+        if self.max_workers <= 0:
+            return await asyncio.to_thread(_run_simulation_in_thread, payload)
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, _run_simulation, payload)
+        except BrokenProcessPool:
+            # 先前的 worker 異常結束：關閉損壞的 pool（其他請求可能已重建新的 pool），重建後重試一次
+            print("⚠️ [CACHE] Simulation worker pool was broken, restarting worker processes")
+            if self._pool is pool:
+                self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            return await loop.run_in_executor(self._get_pool(), _run_simulation, payload)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn：避免 fork 後繼承 asyncio / torch 執行緒狀態
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[Dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [CACHE] Ignoring unreadable cached simulation {key[:12]}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, result: Dict):
+        if not self.cache_dir:
+            return
+        # 先寫暫存檔再 rename，讀取端不會看到寫到一半的結果
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, default=_json_default)
+            os.replace(tmp_path, self._disk_path(key))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ [CACHE] Failed to persist simulation result {key[:12]}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        """清除行程內的快取（磁碟快取保留）"""
+        with self._lock:
+            self._results.clear()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_simulation_cache: Optional[SimulationCache] = None
+
+
+def get_simulation_cache() -> SimulationCache:
+    """取得此 process 共用的模擬快取（第一次呼叫時建立）"""
+    global _simulation_cache
+    if _simulation_cache is None:
+        _simulation_cache = SimulationCache()
+    return _simulation_cache
+
+
+def shutdown_simulation_cache():
+    """關閉模擬 worker pool（應用程式關閉時呼叫）"""
+    global _simulation_cache
+    if _simulation_cache is not None:
+        _simulation_cache.shutdown()
+        _simulation_cache = None
@@ -2,6 +2,7 @@
 FastAPI 主應用 - PU Learning 模擬引擎
 專門的 REST API 服務用於 PU 學習演算法模擬
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -60,11 +61,20 @@ except ImportError as e:
         success: bool = True
         message: Optional[str] = None
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 關閉時停止 PU 模擬 worker pool
+    from simulation_cache import shutdown_simulation_cache
+    shutdown_simulation_cache()
+
+
 # 創建 FastAPI 應用
 app = FastAPI(
     title="PU Learning Simulation Engine",
     description="A backend service for simulating uPU and nnPU algorithms",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加 CORS 中間件
@@ -116,11 +126,9 @@ async def handle_simulation(request: SimulationRequest):
         print(f"  n_p: {request.data_params.n_p}, n_u: {request.data_params.n_u}")
         print(f"  Prior: {request.data_params.prior}")
 
-        # 檢查是否能夠導入模擬引擎
-        # 導入並使用真實的 PU Learning 引擎
-        from pulearning_engine import run_pu_simulation
-        print("✅ 成功導入 pulearning_engine")
-        results = run_pu_simulation(request)
+        # 執行模擬（相同請求重用快取結果，計算在 worker process 中進行）
+        from simulation_cache import get_simulation_cache
+        results = await get_simulation_cache().run(request)
         print("✅ 成功執行 run_pu_simulation")
 
         # 構建回應
@@ -92,12 +92,37 @@ def update_analysis_dataset_positive_labels(cursor, dataset_id):
         """, (new_positive_labels, dataset_id))
 
         logger.info(f"Updated AnalysisDataset {dataset_id} positiveLabels: {analysis_positive_count} (analysis) + {confirmed_positive_count} (confirmed) = {new_positive_labels}")
+
+        # 標籤已變更，清除依賴此數據集的快取特徵
+        try:
+            from services.case_study_v2.feature_cache import get_feature_cache
+            get_feature_cache().invalidate_dataset(dataset_id)
+        except Exception as cache_error:
+            logger.warning(f"Failed to invalidate feature cache for dataset {dataset_id}: {cache_error}")
+
         return new_positive_labels
 
     except Exception as e:
         logger.error(f"Failed to update AnalysisDataset positiveLabels for dataset {dataset_id}: {e}")
         return None
 
+def _log_bulk_review_result(result: Dict[str, Any]):
+    """記錄批次審核後的資料集 / 實驗統計，並清除受影響資料集的快取特徵"""
+    for dataset_id, positive_labels in result["dataset_positive_labels"].items():
+        logger.info(f"Bulk update: AnalysisDataset {dataset_id} positiveLabels updated to {positive_labels}")
+        try:
+            from services.case_study_v2.feature_cache import get_feature_cache
+            get_feature_cache().invalidate_dataset(dataset_id)
+        except Exception as cache_error:
+            logger.warning(f"Failed to invalidate feature cache for dataset {dataset_id}: {cache_error}")
+
+    for experiment_run_id, stats in result["experiment_stats"].items():
+        logger.info(
+            f"Bulk update: Updated experiment {experiment_run_id} with pool stats: "
+            f"total_pool={stats['total_data_pool_size']}, positive={stats['positive_label_count']}, "
+            f"negative={stats['negative_label_count']}, candidates={stats['candidate_count']}"
+        )
+
 def _import_case_study_v2_modules():
     """Dynamically import case-study-v2 modules"""
     try:
@@ -142,6 +167,10 @@ async def init_case_study_v2():
         model_evaluator = modules['ModelEvaluator'](db_manager)
         websocket_manager = modules['WebSocketManager']()
 
+        # CPU 密集的訓練 / 評估在 worker process 中執行，進度經由 websocket_manager 廣播
+        from services.case_study_v2.job_executor import get_job_executor
+        get_job_executor().set_websocket_manager(websocket_manager)
+
         logger.info("Case Study v2 services initialized successfully")
         return True
 
@@ -157,6 +186,10 @@ async def cleanup_case_study_v2():
     if db_manager:
         try:
             await db_manager.disconnect()
+            from services.case_study_v2.sqlite_repository import close_sqlite_repository
+            from services.case_study_v2.job_executor import shutdown_job_executor
+            await shutdown_job_executor()
+            await close_sqlite_repository()
             logger.info("Case Study v2 services cleanup complete")
         except Exception as e:
             logger.error(f"Error during Case Study v2 cleanup: {e}")
@@ -217,6 +250,13 @@ async def create_experiment_run(request: dict):
 @case_study_v2_router.post("/generate-candidates")
 async def generate_candidates(request: dict):
     """Generates anomaly candidates based on filter parameters"""
+    from services.case_study_v2.sqlite_repository import get_sqlite_repository
+
+    async with get_sqlite_repository().connection() as conn:
+        return await _generate_candidates(conn, request)
+
+async def _generate_candidates(conn, request: dict):
+    """generate_candidates 的實作，所有查詢共用同一條池化連線"""
     try:
         # 解析請求參數
         filter_params = request.get("filter_params", {})
@@ -247,15 +287,9 @@ async def generate_candidates(request: dict):
         end_date = filter_params.get("endDate", "")
         end_time = filter_params.get("endTime", "")
 
-        import sqlite3
         import json
         import numpy as np
 
-        # 連接到主資料庫
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
         # 建立基礎查詢條件
         where_conditions = []
         params = []
@@ -295,8 +329,8 @@ async def generate_candidates(request: dict):
         if where_conditions:
             base_query += " WHERE " + " AND ".join(where_conditions)
 
-        cursor.execute(base_query, params)
-        filtered_datasets = cursor.fetchall()
+        datasets_result = await conn.execute(base_query, params)
+        filtered_datasets = datasets_result.fetchall()
 
         # 使用真實數據進行異常檢測來計算候選數量
         total_candidates = 0
@@ -311,7 +345,7 @@ async def generate_candidates(request: dict):
             import numpy as np
 
             # 獲取數據集列名
-            columns = [desc[0] for desc in cursor.description]
+            columns = datasets_result.columns
 
             # 首先計算總數據池統計
             for dataset_row in filtered_datasets:
@@ -319,14 +353,13 @@ async def generate_candidates(request: dict):
                 dataset_id = dataset['id']
 
                 # 查詢該數據集的記錄數和已知正樣本數
-                cursor.execute('''
+                stats_result = await conn.fetchone('''
                     SELECT COUNT(*) as total_records,
                            SUM(CASE WHEN is_positive_label = 1 THEN 1 ELSE 0 END) as positive_count
                     FROM analysis_ready_data
                     WHERE dataset_id = ?
                 ''', (dataset_id,))
 
-                stats_result = cursor.fetchone()
                 if stats_result:
                     dataset_total_records = stats_result[0] or 0
                     dataset_positive_count = stats_result[1] or 0
@@ -347,15 +380,13 @@ async def generate_candidates(request: dict):
                 logger.info(f"[GENERATE_CANDIDATES] 分析數據集: {dataset['name']}")
 
                 # 查詢該數據集的實際電力數據
-                cursor.execute('''
+                power_data = await conn.fetchall('''
                     SELECT timestamp, wattage_total, wattage_110v, wattage_220v
                     FROM analysis_ready_data
                     WHERE dataset_id = ?
                     ORDER BY timestamp
                 ''', (dataset_id,))
 
-                power_data = cursor.fetchall()
-
                 if not power_data:
                     logger.warning(f"[GENERATE_CANDIDATES] 數據集 {dataset_id} 沒有實際數據")
                     continue
@@ -525,9 +556,6 @@ async def generate_candidates(request: dict):
 
         # 如果只是預覽模式，不創建實驗運行記錄，直接返回結果
         if not save_labels:
-            conn.commit()
-            conn.close()
-
             logger.info(f"[GENERATE_CANDIDATES] 預覽模式完成，總候選數: {total_candidates}")
             return {
                 "success": True,
@@ -574,15 +602,14 @@ async def generate_candidates(request: dict):
 
         if existing_experiment_run_id:
             # 先檢查實驗記錄是否存在
-            cursor.execute('SELECT id FROM experiment_run WHERE id = ?', (experiment_run_id,))
-            existing_record = cursor.fetchone()
+            existing_record = await conn.fetchone('SELECT id FROM experiment_run WHERE id = ?', (experiment_run_id,))
 
             if existing_record:
                 # 更新現有實驗記錄
                 logger.info(f"[GENERATE_CANDIDATES] 準備更新現有實驗記錄 ID: {experiment_run_id}")
                 logger.info(f"[GENERATE_CANDIDATES] 更新資料: status={status}, candidate_count={total_candidates}")
 
-                cursor.execute('''
+                update_result = await conn.execute('''
                     UPDATE experiment_run
                     SET description = ?, filtering_parameters = ?, status = ?,
                         candidate_count = ?, total_data_pool_size = ?,
@@ -601,7 +628,7 @@ async def generate_candidates(request: dict):
                 ))
 
                 # 檢查更新是否成功
-                rows_affected = cursor.rowcount
+                rows_affected = update_result.rowcount
                 logger.info(f"[GENERATE_CANDIDATES] 更新完成，影響的行數: {rows_affected}")
 
                 if rows_affected > 0:
@@ -623,7 +650,7 @@ async def generate_candidates(request: dict):
             logger.info(f"[GENERATE_CANDIDATES] 準備創建新實驗記錄 ID: {experiment_run_id}")
             logger.info(f"[GENERATE_CANDIDATES] 新記錄資料: status={status}, candidate_count={total_candidates}")
 
-            cursor.execute('''
+            await conn.execute('''
                 INSERT INTO experiment_run
                 (id, name, description, filtering_parameters, status, candidate_count,
                  total_data_pool_size, positive_label_count, negative_label_count, created_at, updated_at)
@@ -652,23 +679,21 @@ async def generate_candidates(request: dict):
             # 清理舊的異常事件記錄
             if existing_experiment_run_id and existing_record:
                 # 如果是更新現有實驗，只清理該實驗的異常事件
-                cursor.execute('''
+                delete_result = await conn.execute('''
                     DELETE FROM anomaly_event
                     WHERE experiment_run_id = ?
                 ''', (experiment_run_id,))
-                deleted_events_count = cursor.rowcount
+                deleted_events_count = delete_result.rowcount
                 logger.info(f"[GENERATE_CANDIDATES] 清理現有實驗的舊異常事件: 刪除了 {deleted_events_count} 個記錄")
             else:
                 # 如果是創建新實驗，清理具有相同參數的舊LABELING實驗
                 filter_params_json = json.dumps(filter_params, sort_keys=True)
-                cursor.execute('''
+                existing_labeling_runs = await conn.fetchall('''
                     SELECT id, name FROM experiment_run
                     WHERE filtering_parameters = ? AND status = 'LABELING' AND id != ?
                     ORDER BY created_at DESC
                 ''', (filter_params_json, experiment_run_id))
 
-                existing_labeling_runs = cursor.fetchall()
-
                 if existing_labeling_runs:
                     logger.info(f"[GENERATE_CANDIDATES] 找到 {len(existing_labeling_runs)} 個具有相同參數的舊LABELING實驗")
                     for run in existing_labeling_runs:
@@ -682,30 +707,25 @@ async def generate_candidates(request: dict):
                         DELETE FROM anomaly_event
                         WHERE experiment_run_id IN ({placeholders})
                     '''
-                    cursor.execute(delete_events_query, run_ids_to_clean)
-                    deleted_events_count = cursor.rowcount
+                    deleted_events_count = (await conn.execute(delete_events_query, run_ids_to_clean)).rowcount
 
                     # 再刪除舊的實驗運行記錄
                     delete_runs_query = f'''
                         DELETE FROM experiment_run
                         WHERE id IN ({placeholders})
                     '''
-                    cursor.execute(delete_runs_query, run_ids_to_clean)
-                    deleted_runs_count = cursor.rowcount
+                    deleted_runs_count = (await conn.execute(delete_runs_query, run_ids_to_clean)).rowcount
 
                     logger.info(f"[GENERATE_CANDIDATES] 清理舊資料: 刪除了 {deleted_events_count} 個異常事件和 {deleted_runs_count} 個實驗運行記錄")
                 else:
                     logger.info(f"[GENERATE_CANDIDATES] 沒有找到需要清理的舊實驗記錄")
 
+            # 一次 executemany 寫入所有事件，避免逐筆往返執行緒池
+            event_rows = []
             for event_data in anomaly_events_to_create:
                 anomaly_event_id = str(uuid.uuid4())
                 event_id = f"AUTO_{anomaly_event_id[:8]}"
-                cursor.execute('''
-                    INSERT INTO anomaly_event
-                    (id, event_id, name, dataset_id, line, event_timestamp, detection_rule, score,
-                     data_window, status, experiment_run_id, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                event_rows.append((
                     anomaly_event_id,
                     event_id,
                     event_data['name'],
@@ -720,19 +740,24 @@ async def generate_candidates(request: dict):
                     current_timestamp,
                     current_timestamp
                 ))
-                anomaly_events_created += 1
+            await conn.executemany('''
+                INSERT INTO anomaly_event
+                (id, event_id, name, dataset_id, line, event_timestamp, detection_rule, score,
+                 data_window, status, experiment_run_id, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', event_rows)
+            anomaly_events_created = len(event_rows)
 
             logger.info(f"[GENERATE_CANDIDATES] 創建了 {anomaly_events_created} 個異常事件記錄")
         elif not experiment_created_or_updated:
             logger.error(f"[GENERATE_CANDIDATES] 實驗記錄創建/更新失敗，跳過異常事件創建")
 
-        conn.commit()
+        await conn.commit()
 
         # 只有在實驗記錄成功創建/更新時才進行驗證
         if experiment_created_or_updated:
             # 驗證實驗記錄是否正確更新
-            cursor.execute('SELECT id, name, status, candidate_count, updated_at FROM experiment_run WHERE id = ?', (experiment_run_id,))
-            verification_result = cursor.fetchone()
+            verification_result = await conn.fetchone('SELECT id, name, status, candidate_count, updated_at FROM experiment_run WHERE id = ?', (experiment_run_id,))
 
             if verification_result:
                 logger.info(f"[GENERATE_CANDIDATES] 資料庫驗證 - 實驗記錄 {experiment_run_id}:")
@@ -746,8 +771,6 @@ async def generate_candidates(request: dict):
         else:
             logger.error(f"[GENERATE_CANDIDATES] 實驗記錄處理失敗，跳過驗證")
 
-        conn.close()
-
         if experiment_created_or_updated:
             logger.info(f"Generated {total_candidates} candidates and created {anomaly_events_created} anomaly events for experiment {experiment_run_id}")
 
@@ -1322,7 +1345,7 @@ async def bulk_review_anomaly_events(request: dict):
     支持將多個事件一次性標記為正異常或正常
     """
     try:
-        import sqlite3
+        from services.case_study_v2.sqlite_repository import get_sqlite_repository
 
         # 解析請求參數
         event_ids = request.get("event_ids", [])
@@ -1342,196 +1365,29 @@ async def bulk_review_anomaly_events(request: dict):
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
 
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-
-        try:
-            # 開始事務
-            conn.execute("BEGIN TRANSACTION")
-            cursor = conn.cursor()
-
-            current_timestamp = get_current_datetime()
-            updated_events = []
-            experiment_run_ids = set()
-
-            # 處理每個事件
-            for event_id in event_ids:
-                # 1. 查詢並驗證異常事件
-                cursor.execute("""
-                    SELECT id, dataset_id, event_timestamp, status, experiment_run_id
-                    FROM anomaly_event
-                    WHERE id = ?
-                """, (event_id,))
-
-                event_row = cursor.fetchone()
-                if not event_row:
-                    logger.warning(f"Anomaly event {event_id} not found, skipping")
-                    continue
-
-                current_status = event_row[3]
-                if current_status != "UNREVIEWED":
-                    logger.warning(f"Event {event_id} has already been reviewed, skipping")
-                    continue
-
-                event_dataset_id = event_row[1]
-                event_timestamp = event_row[2]
-                experiment_run_id = event_row[4]
-                experiment_run_ids.add(experiment_run_id)
-
-                # 2. 更新異常事件狀態
-                cursor.execute("""
-                    UPDATE anomaly_event
-                    SET status = ?, reviewer_id = ?, justification_notes = ?,
-                        review_timestamp = ?, updated_at = ?
-                    WHERE id = ?
-                """, (status, reviewer_id, justification_notes, current_timestamp, current_timestamp, event_id))
-
-                # 3. 如果確認為異常，更新相關的 AnalysisReadyData
-                if status == "CONFIRMED_POSITIVE":
-                    cursor.execute("""
-                        UPDATE analysis_ready_data
-                        SET is_positive_label = 1, source_anomaly_event_id = ?
-                        WHERE dataset_id = ? AND timestamp = ?
-                    """, (event_id, event_dataset_id, event_timestamp))
-
-                    # 如果沒有找到完全匹配的記錄，嘗試時間範圍匹配
-                    if cursor.rowcount == 0:
-                        from datetime import datetime, timedelta
-
-                        try:
-                            event_dt = datetime.fromisoformat(event_timestamp.replace('Z', '+00:00'))
-                            start_window = (event_dt - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
-                            end_window = (event_dt + timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
-
-                            cursor.execute("""
-                                SELECT id
-                                FROM analysis_ready_data
-                                WHERE dataset_id = ?
-                                AND timestamp BETWEEN ? AND ?
-                                ORDER BY ABS(julianday(timestamp) - julianday(?)) ASC
-                                LIMIT 1
-                            """, (event_dataset_id, start_window, end_window, event_timestamp))
-
-                            matching_record = cursor.fetchone()
-                            if matching_record:
-                                cursor.execute("""
-                                    UPDATE analysis_ready_data
-                                    SET is_positive_label = 1, source_anomaly_event_id = ?
-                                    WHERE id = ?
-                                """, (event_id, matching_record[0]))
-
-                        except Exception as dt_error:
-                            logger.error(f"Error processing timestamp for event {event_id}: {dt_error}")
-
-                # 3.5. 更新 AnalysisDataset 的 positiveLabels
-                new_positive_count = update_analysis_dataset_positive_labels(cursor, event_dataset_id)
-                if new_positive_count is not None:
-                    logger.info(f"Updated AnalysisDataset {event_dataset_id} positiveLabels to {new_positive_count}")
-
-                updated_events.append(event_id)
-
-            # 4. 更新所有相關實驗運行的統計數據
-            for experiment_run_id in experiment_run_ids:
-                cursor.execute("""
-                    SELECT
-                        COUNT(*) as total_candidates,
-                        SUM(CASE WHEN status = 'CONFIRMED_POSITIVE' THEN 1 ELSE 0 END) as positive_count,
-                        SUM(CASE WHEN status = 'REJECTED_NORMAL' THEN 1 ELSE 0 END) as negative_count
-                    FROM anomaly_event
-                    WHERE experiment_run_id = ?
-                """, (experiment_run_id,))
-
-                stats_row = cursor.fetchone()
-                if stats_row:
-                    total_candidates, positive_count, negative_count = stats_row
-
-                    # 計算總數據池大小（基於實驗中使用的數據集）
-                    cursor.execute("""
-                        SELECT SUM(ard_counts.total_records) as total_data_pool_size
-                        FROM (
-                            SELECT DISTINCT dataset_id, COUNT(*) as total_records
-                            FROM analysis_ready_data ard
-                            WHERE ard.dataset_id IN (
-                                SELECT DISTINCT ae.dataset_id
-                                FROM anomaly_event ae
-                                WHERE ae.experiment_run_id = ?
-                            )
-                            GROUP BY dataset_id
-                        ) ard_counts
-                    """, (experiment_run_id,))
-
-                    total_data_pool_result = cursor.fetchone()
-                    total_data_pool_size = total_data_pool_result[0] if total_data_pool_result and total_data_pool_result[0] else 0
-
-                    # 計算總數據池中的正標籤數（基於 AnalysisReadyData 中的 is_positive_label）
-                    cursor.execute("""
-                        SELECT SUM(positive_counts.positive_labels) as total_positive_labels
-                        FROM (
-                            SELECT dataset_id, COUNT(*) as positive_labels
-                            FROM analysis_ready_data ard
-                            WHERE ard.dataset_id IN (
-                                SELECT DISTINCT ae.dataset_id
-                                FROM anomaly_event ae
-                                WHERE ae.experiment_run_id = ?
-                            ) AND ard.is_positive_label = 1
-                            GROUP BY dataset_id
-                        ) positive_counts
-                    """, (experiment_run_id,))
-
-                    total_positive_result = cursor.fetchone()
-                    total_positive_in_pool = total_positive_result[0] if total_positive_result and total_positive_result[0] else 0
-
-                    # 計算總數據池中的負標籤數
-                    total_negative_in_pool = total_data_pool_size - total_positive_in_pool
-
-                    cursor.execute("""
-                        UPDATE experiment_run
-                        SET candidate_count = ?,
-                            positive_label_count = ?,
-                            negative_label_count = ?,
-                            total_data_pool_size = ?,
-                            updated_at = ?
-                        WHERE id = ?
-                    """, (total_candidates, total_positive_in_pool, total_negative_in_pool, total_data_pool_size, current_timestamp, experiment_run_id))
-
-                    logger.info(f"Bulk update: Updated experiment {experiment_run_id} with pool stats: total_pool={total_data_pool_size}, positive={total_positive_in_pool}, negative={total_negative_in_pool}, candidates={total_candidates}")
-
-            # 4.5. 更新所有相關 AnalysisDataset 的 positiveLabels
-            affected_datasets = set()
-            for event_id in updated_events:
-                cursor.execute("SELECT dataset_id FROM anomaly_event WHERE id = ?", (event_id,))
-                dataset_result = cursor.fetchone()
-                if dataset_result:
-                    affected_datasets.add(dataset_result[0])
-
-            for dataset_id in affected_datasets:
-                new_positive_count = update_analysis_dataset_positive_labels(cursor, dataset_id)
-                if new_positive_count is not None:
-                    logger.info(f"Bulk update: AnalysisDataset {dataset_id} positiveLabels updated to {new_positive_count}")
-
-            # 提交事務
-            conn.commit()
-
-            logger.info(f"Successfully bulk reviewed {len(updated_events)} events with status {status} by reviewer {reviewer_id}")
-
-            return {
-                "success": True,
-                "message": f"Successfully reviewed {len(updated_events)} events",
-                "updated_events": updated_events,
-                "total_requested": len(event_ids),
-                "total_updated": len(updated_events),
-                "status": status,
-                "reviewer_id": reviewer_id,
-                "review_timestamp": current_timestamp
-            }
+        current_timestamp = get_current_datetime()
+        result = await get_sqlite_repository().bulk_review_events(
+            status=status,
+            reviewer_id=reviewer_id,
+            justification_notes=justification_notes,
+            review_timestamp=current_timestamp,
+            event_ids=event_ids
+        )
+        updated_events = result["updated_events"]
+        _log_bulk_review_result(result)
 
-        except Exception as e:
-            # 回滾事務
-            conn.rollback()
-            raise e
+        logger.info(f"Successfully bulk reviewed {len(updated_events)} events with status {status} by reviewer {reviewer_id}")
 
-        finally:
-            conn.close()
+        return {
+            "success": True,
+            "message": f"Successfully reviewed {len(updated_events)} events",
+            "updated_events": updated_events,
+            "total_requested": len(event_ids),
+            "total_updated": len(updated_events),
+            "status": status,
+            "reviewer_id": reviewer_id,
+            "review_timestamp": current_timestamp
+        }
 
     except HTTPException:
         raise
@@ -1546,7 +1402,7 @@ async def bulk_review_by_experiment(request: dict):
     支持將特定實驗的所有 UNREVIEWED 事件一次性標記為正異常或正常
     """
     try:
-        import sqlite3
+        from services.case_study_v2.sqlite_repository import get_sqlite_repository
 
         # 解析請求參數
         experiment_run_id = request.get("experiment_run_id")
@@ -1563,173 +1419,41 @@ async def bulk_review_by_experiment(request: dict):
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
 
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-
-        try:
-            # 開始事務
-            conn.execute("BEGIN TRANSACTION")
-            cursor = conn.cursor()
-
-            current_timestamp = get_current_datetime()
-
-            # 1. 獲取所有未審核的事件
-            cursor.execute("""
-                SELECT id, event_id, dataset_id, event_timestamp
-                FROM anomaly_event
-                WHERE experiment_run_id = ? AND status = 'UNREVIEWED'
-            """, (experiment_run_id,))
-
-            unreviewed_events = cursor.fetchall()
-            event_count = len(unreviewed_events)
-
-            if event_count == 0:
-                conn.close()
-                return {
-                    "success": True,
-                    "message": "No unreviewed events found",
-                    "updated_events": [],
-                    "total_updated": 0,
-                    "status": status,
-                    "reviewer_id": reviewer_id,
-                    "review_timestamp": current_timestamp
-                }
-
-            # 2. 更新所有未審核事件的狀態
-            placeholders = ','.join(['?' for _ in range(event_count)])
-            event_ids = [event[0] for event in unreviewed_events]
-
-            cursor.execute(f"""
-                UPDATE anomaly_event
-                SET status = ?, reviewer_id = ?, review_timestamp = ?, justification_notes = ?
-                WHERE id IN ({placeholders})
-            """, [status, reviewer_id, current_timestamp, justification_notes] + event_ids)
-
-            # 3. 更新 analysis_ready_data 中的標籤
-            if status == "CONFIRMED_POSITIVE":
-                for event_id, event_event_id, event_dataset_id, event_timestamp in unreviewed_events:
-                    cursor.execute("""
-                        UPDATE analysis_ready_data
-                        SET is_positive_label = 1, source_anomaly_event_id = ?
-                        WHERE dataset_id = ? AND timestamp = ?
-                    """, (event_id, event_dataset_id, event_timestamp))
-
-                    # 如果沒有找到完全匹配的記錄，嘗試時間範圍匹配
-                    if cursor.rowcount == 0:
-                        from datetime import datetime, timedelta
-
-                        try:
-                            event_dt = datetime.fromisoformat(event_timestamp.replace('Z', '+00:00'))
-                            start_window = (event_dt - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
-                            end_window = (event_dt + timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
-
-                            cursor.execute("""
-                                SELECT id
-                                FROM analysis_ready_data
-                                WHERE dataset_id = ?
-                                AND timestamp BETWEEN ? AND ?
-                                ORDER BY ABS(julianday(timestamp) - julianday(?)) ASC
-                                LIMIT 1
-                            """, (event_dataset_id, start_window, end_window, event_timestamp))
-
-                            matching_record = cursor.fetchone()
-                            if matching_record:
-                                cursor.execute("""
-                                    UPDATE analysis_ready_data
-                                    SET is_positive_label = 1, source_anomaly_event_id = ?
-                                    WHERE id = ?
-                                """, (event_id, matching_record[0]))
-
-                        except Exception as dt_error:
-                            logger.error(f"Error processing timestamp for event {event_id}: {dt_error}")
-
-            # 4. 更新實驗運行的統計數據
-            cursor.execute("""
-                SELECT
-                    COUNT(*) as total_candidates,
-                    SUM(CASE WHEN status = 'CONFIRMED_POSITIVE' THEN 1 ELSE 0 END) as positive_count,
-                    SUM(CASE WHEN status = 'REJECTED_NORMAL' THEN 1 ELSE 0 END) as negative_count
-                FROM anomaly_event
-                WHERE experiment_run_id = ?
-            """, (experiment_run_id,))
-
-            stats = cursor.fetchone()
-            if stats:
-                total_candidates, positive_count, negative_count = stats
-
-                # 計算總數據池大小（基於實驗中使用的數據集）
-                cursor.execute("""
-                    SELECT SUM(ard_counts.total_records) as total_data_pool_size
-                    FROM (
-                        SELECT DISTINCT dataset_id, COUNT(*) as total_records
-                        FROM analysis_ready_data ard
-                        WHERE ard.dataset_id IN (
-                            SELECT DISTINCT ae.dataset_id
-                            FROM anomaly_event ae
-                            WHERE ae.experiment_run_id = ?
-                        )
-                        GROUP BY dataset_id
-                    ) ard_counts
-                """, (experiment_run_id,))
-
-                total_data_pool_result = cursor.fetchone()
-                total_data_pool_size = total_data_pool_result[0] if total_data_pool_result and total_data_pool_result[0] else 0
-
-                # 計算總數據池中的正標籤數（基於 AnalysisReadyData 中的 is_positive_label）
-                cursor.execute("""
-                    SELECT SUM(positive_counts.positive_labels) as total_positive_labels
-                    FROM (
-                        SELECT dataset_id, COUNT(*) as positive_labels
-                        FROM analysis_ready_data ard
-                        WHERE ard.dataset_id IN (
-                            SELECT DISTINCT ae.dataset_id
-                            FROM anomaly_event ae
-                            WHERE ae.experiment_run_id = ?
-                        ) AND ard.is_positive_label = 1
-                        GROUP BY dataset_id
-                    ) positive_counts
-                """, (experiment_run_id,))
-
-                total_positive_result = cursor.fetchone()
-                total_positive_in_pool = total_positive_result[0] if total_positive_result and total_positive_result[0] else 0
-
-                # 計算總數據池中的負標籤數
-                total_negative_in_pool = total_data_pool_size - total_positive_in_pool
-
-                cursor.execute("""
-                    UPDATE experiment_run
-                    SET candidate_count = ?,
-                        positive_label_count = ?,
-                        negative_label_count = ?,
-                        total_data_pool_size = ?
-                    WHERE id = ?
-                """, (total_candidates, total_positive_in_pool, total_negative_in_pool, total_data_pool_size, experiment_run_id))
-
-                logger.info(f"Bulk experiment update: Updated experiment {experiment_run_id} with pool stats: total_pool={total_data_pool_size}, positive={total_positive_in_pool}, negative={total_negative_in_pool}, candidates={total_candidates}")
-
-            # 提交事務
-            conn.commit()
-
-            logger.info(f"Successfully bulk reviewed {event_count} events for experiment {experiment_run_id} as {status}")
+        current_timestamp = get_current_datetime()
+        result = await get_sqlite_repository().bulk_review_events(
+            status=status,
+            reviewer_id=reviewer_id,
+            justification_notes=justification_notes,
+            review_timestamp=current_timestamp,
+            experiment_run_id=experiment_run_id
+        )
+        event_ids = result["updated_events"]
+        event_count = len(event_ids)
 
+        if event_count == 0:
             return {
                 "success": True,
-                "message": f"Successfully reviewed {event_count} events",
-                "updated_events": event_ids,
-                "total_updated": event_count,
+                "message": "No unreviewed events found",
+                "updated_events": [],
+                "total_updated": 0,
                 "status": status,
                 "reviewer_id": reviewer_id,
-                "review_timestamp": current_timestamp,
-                "experiment_run_id": experiment_run_id
+                "review_timestamp": current_timestamp
             }
 
-        except Exception as e:
-            # 回滾事務
-            conn.rollback()
-            raise e
+        _log_bulk_review_result(result)
+        logger.info(f"Successfully bulk reviewed {event_count} events for experiment {experiment_run_id} as {status}")
 
-        finally:
-            conn.close()
+        return {
+            "success": True,
+            "message": f"Successfully reviewed {event_count} events",
+            "updated_events": event_ids,
+            "total_updated": event_count,
+            "status": status,
+            "reviewer_id": reviewer_id,
+            "review_timestamp": current_timestamp,
+            "experiment_run_id": experiment_run_id
+        }
 
     except HTTPException:
         raise
@@ -3942,5 +3666,29 @@ async def get_training_jobs():
         logger.error(f"Error retrieving training jobs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve training jobs: {str(e)}")
 
+@case_study_v2_router.post("/training-jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str):
+    """取消排隊中或執行中的訓練工作（執行中的工作會在下一個 epoch 停止）"""
+    from services.case_study_v2.job_executor import get_job_executor
+
+    if not get_job_executor().cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} is not queued or running")
+
+    if websocket_manager:
+        await websocket_manager.send_training_log(job_id, {
+            "type": "status",
+            "message": "🛑 Cancellation requested, stopping after the current epoch..."
+        })
+    return {"success": True, "job_id": job_id, "status": "CANCELLING"}
+
+@case_study_v2_router.post("/evaluation-jobs/{job_id}/cancel")
+async def cancel_evaluation_job(job_id: str):
+    """取消排隊中或執行中的評估工作"""
+    from services.case_study_v2.job_executor import get_job_executor
+
+    if not get_job_executor().cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"Evaluation job {job_id} is not queued or running")
+    return {"success": True, "job_id": job_id, "status": "CANCELLING"}
+
 
 # ========== End of Stage 3 API Routes ==========
@@ -17,6 +17,7 @@ from services.data_loader import data_loader
 from services.anomaly_rules import anomaly_rules
 from services.anomaly_service import anomaly_service
 from services.candidate_calculation import candidate_calculation_service
+from services.data_window import DataWindowExtractor
 from database import async_session
 from sqlalchemy import text
 
@@ -949,6 +950,10 @@ async def _save_events_to_database_with_data_window(
                 await session.execute(delete_query, {"run_id": run_id})
                 logger.info(f"[SAVE_EVENTS_WITH_DATA] 已刪除實驗 {run_id} 的現有事件")
 
+            # 一次批次擷取所有事件的 dataWindow
+            logger.info(f"[SAVE_EVENTS_WITH_DATA] 開始生成 dataWindow...")
+            data_windows = _generate_data_windows_for_events(events, df)
+
             # 批量插入新事件
             events_saved = 0
             for i, event in enumerate(events):
@@ -959,9 +964,7 @@ async def _save_events_to_database_with_data_window(
                     event_id = f"EXP-{run_id[:8]}-{datetime.utcnow().strftime('%Y%m%d')}-{i+1:03d}"
                     logger.info(f"[SAVE_EVENTS_WITH_DATA] 生成的 eventId: {event_id}")
 
-                    # 為每個事件生成 dataWindow
-                    logger.info(f"[SAVE_EVENTS_WITH_DATA] 開始生成 dataWindow...")
-                    data_window = await _generate_data_window_for_event(event, df)
+                    data_window = data_windows[i]
                     logger.info(f"[SAVE_EVENTS_WITH_DATA] 生成的 dataWindow 大小: {len(str(data_window))} 字符")
 
                     # 驗證必需字段
@@ -1021,131 +1024,70 @@ async def _save_events_to_database_with_data_window(
         raise
 
 
-async def _generate_data_window_for_event(event: Dict[str, Any], df: pd.DataFrame) -> Dict[str, Any]:
+def _generate_data_windows_for_events(events: List[Dict[str, Any]], df: pd.DataFrame) -> List[Dict[str, Any]]:
     """
-    為候選事件生成包含時序數據的 dataWindow
-    這個函數從原始數據中提取事件周圍的時間窗口數據
+    為候選事件批次生成包含時序數據的 dataWindow
+    原始數據只排序一次，所有事件的時間窗口以 DataWindowExtractor 一次擷取
     """
-    try:
-        logger.info(f"[DATA_WINDOW] 為事件生成 dataWindow: {event}")
-
-        meter_id = event.get("meterId")
-        if not meter_id:
-            logger.error(f"[DATA_WINDOW] 事件缺少 meterId 字段: {event}")
-            return {
-                "eventTimestamp": event.get("eventTimestamp", ""),
-                "eventPowerValue": 0,
-                "windowStart": event.get("eventTimestamp", ""),
-                "windowEnd": event.get("eventTimestamp", ""),
-                "timeSeries": [],
-                "error": "Missing meterId"
-            }
-
-        event_timestamp_str = event.get("eventTimestamp")
-        if not event_timestamp_str:
-            logger.error(f"[DATA_WINDOW] 事件缺少 eventTimestamp 字段: {event}")
-            return {
-                "eventTimestamp": "",
-                "eventPowerValue": 0,
-                "windowStart": "",
-                "windowEnd": "",
-                "timeSeries": [],
-                "error": "Missing eventTimestamp"
-            }
-
-        event_timestamp = pd.to_datetime(event_timestamp_str)
-
-        # 檢查 DataFrame 中的列名
-        logger.info(f"[DATA_WINDOW] DataFrame 列名: {list(df.columns)}")
-
-        # 根據實際列名確定設備ID列
-        device_column = None
-        for col in ['meterId', 'deviceNumber', 'device_id']:
-            if col in df.columns:
-                device_column = col
-                break
-
-        if device_column is None:
-            logger.error(f"[DATA_WINDOW] DataFrame 中找不到設備ID列")
-            return {
-                "eventTimestamp": event_timestamp_str,
-                "eventPowerValue": 0,
-                "windowStart": event_timestamp_str,
-                "windowEnd": event_timestamp_str,
-                "timeSeries": [],
-                "error": "No device ID column found in DataFrame"
-            }
-
-        logger.info(f"[DATA_WINDOW] 使用設備ID列: {device_column}")
-
-        # 篩選出該電表的數據
-        meter_df = df[df[device_column] == meter_id].copy()
+    def minimal_window(event: Dict[str, Any], error: Optional[str] = None) -> Dict[str, Any]:
+        timestamp = event.get("eventTimestamp") or ""
+        window = {
+            "eventTimestamp": timestamp,
+            "eventPowerValue": 0,
+            "windowStart": timestamp,
+            "windowEnd": timestamp,
+            "timeSeries": []
+        }
+        if error:
+            window["error"] = error
+        return window
 
-        if meter_df.empty:
-            logger.warning(f"[DATA_WINDOW] 沒有找到電表 {meter_id} 的數據")
-            return {
-                "eventTimestamp": event_timestamp_str,
-                "eventPowerValue": 0,
-                "windowStart": event_timestamp_str,
-                "windowEnd": event_timestamp_str,
-                "timeSeries": []
-            }
+    try:
+        try:
+            extractor = DataWindowExtractor(df)
+        except ValueError as e:
+            logger.error(f"[DATA_WINDOW] {e}: {list(df.columns)}")
+            return [minimal_window(event, str(e)) for event in events]
+
+        data_windows: List[Optional[Dict[str, Any]]] = [None] * len(events)
+        located = []
+        for i, event in enumerate(events):
+            if not event.get("meterId"):
+                logger.error(f"[DATA_WINDOW] 事件缺少 meterId 字段: {event}")
+                data_windows[i] = minimal_window(event, "Missing meterId")
+            elif not event.get("eventTimestamp"):
+                logger.error(f"[DATA_WINDOW] 事件缺少 eventTimestamp 字段: {event}")
+                data_windows[i] = minimal_window(event, "Missing eventTimestamp")
+            else:
+                located.append(i)
 
-        # 確保時間戳是 datetime 類型
-        meter_df['timestamp'] = pd.to_datetime(meter_df['timestamp'])
-        meter_df = meter_df.sort_values('timestamp')
-
-        # 定義時間窗口：事件前後各 15 分鐘
-        window_start = event_timestamp - timedelta(minutes=15)
-        window_end = event_timestamp + timedelta(minutes=15)
-
-        # 篩選時間窗口內的數據
-        window_df = meter_df[
-            (meter_df['timestamp'] >= window_start) &
-            (meter_df['timestamp'] <= window_end)
-        ]
-
-        # 找到最接近事件時間的數據點
-        time_diffs = abs(meter_df['timestamp'] - event_timestamp)
-        closest_idx = time_diffs.idxmin()
-        event_power_value = meter_df.loc[closest_idx, 'power'] if not meter_df.empty else 0
-
-        # 構建時序數據列表
-        time_series = []
-        for _, row in window_df.iterrows():
-            time_series.append({
-                "timestamp": row['timestamp'].isoformat(),
-                "power": float(row['power']) if pd.notna(row['power']) else 0.0
-            })
+        located_events = [events[i] for i in located]
+        slices = extractor.locate(
+            [event["meterId"] for event in located_events],
+            [event["eventTimestamp"] for event in located_events]
+        )
+        windows = extractor.build_data_windows(
+            slices,
+            detection_rule=[event.get("detectionRule", "") for event in located_events],
+            anomaly_score=[event.get("score", 0) for event in located_events],
+            event_timestamps=[event["eventTimestamp"] for event in located_events]
+        )
 
-        # 構建 dataWindow 對象
-        data_window = {
-            "eventTimestamp": event_timestamp_str,
-            "eventPowerValue": float(event_power_value) if pd.notna(event_power_value) else 0.0,
-            "windowStart": window_start.isoformat(),
-            "windowEnd": window_end.isoformat(),
-            "timeSeries": time_series,
-            "totalDataPoints": len(time_series),
-            "detectionRule": event.get("detectionRule", ""),
-            "anomalyScore": event.get("score", 0)
-        }
+        for i, event, window, has_data in zip(located, located_events, windows, slices.has_meter_data):
+            if not has_data:
+                logger.warning(f"[DATA_WINDOW] 沒有找到電表 {event['meterId']} 的數據")
+                window = minimal_window(event)
+            data_windows[i] = window
 
-        logger.info(f"[DATA_WINDOW] 為事件 {meter_id}@{event_timestamp} 生成了包含 {len(time_series)} 個數據點的時間窗口")
-        return data_window
+        logger.info(f"[DATA_WINDOW] 為 {len(events)} 個事件生成 dataWindow，共 {int(slices.counts.sum())} 個數據點")
+        return data_windows
 
     except Exception as e:
         logger.error(f"[DATA_WINDOW] 生成 dataWindow 失敗: {e}")
         import traceback
         logger.error(f"[DATA_WINDOW] 詳細錯誤堆棧: {traceback.format_exc()}")
         # 返回最小化的 dataWindow
-        return {
-            "eventTimestamp": event.get("eventTimestamp", ""),
-            "eventPowerValue": 0,
-            "windowStart": event.get("eventTimestamp", ""),
-            "windowEnd": event.get("eventTimestamp", ""),
-            "timeSeries": [],
-            "error": str(e)
-        }
+        return [minimal_window(event, str(e)) for event in events]
 
 
 async def _update_experiment_run_to_labeling_status(
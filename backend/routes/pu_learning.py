@@ -53,6 +53,8 @@ class SimulationRequest(BaseModel):
     algorithm: Literal['uPU', 'nnPU'] = 'nnPU'
     seed: Optional[int] = Field(42, ge=0, le=99999, description="隨機種子，用於確保實驗可重現性")
     prior_estimation_method: Optional[Literal['mean', 'median']] = Field('median', description="先驗估計方法")
+    prior_estimator: Optional[Literal['kde', 'kde_subsample', 'kde_tree', 'penl1cp']] = Field('kde', description="uPU 先驗估計器（penl1cp 對應 PenL1CP.m，kde_subsample / kde_tree 為大型資料的近似模式）")
+    boundary_resolution: Optional[int] = Field(100, ge=20, le=256, description="決策邊界網格 x 軸取樣點數")
     data_params: DataParams
     model_params: ModelParams
 
@@ -67,6 +69,8 @@ class Metrics(BaseModel):
     estimated_prior: float = Field(description="估計的類別先驗")
     error_rate: float = Field(description="錯誤率")
     training_error_rate: float = Field(description="訓練錯誤率")
+    prior_estimator: Optional[str] = Field(None, description="使用的先驗估計器")
+    prior_estimation_seconds: Optional[float] = Field(None, description="先驗估計耗時（秒）")
     risk_curve: List[Dict[str, float]] = Field(description="風險曲線數據")
 
 class SimulationResponse(BaseModel):
@@ -92,11 +96,9 @@ async def handle_simulation(request: SimulationRequest):
 	try:
 		print(f"Processing simulation request for algorithm: {request.algorithm}")
 
-		# 導入並使用真實的 PU Learning 引擎
-		from pulearning_engine import run_pu_simulation
-
-		# 執行 PU 學習模擬
-		result = run_pu_simulation(request)
+		# 執行 PU 學習模擬（相同請求重用快取結果，計算在 worker process 中進行）
+		from simulation_cache import get_simulation_cache
+		result = await get_simulation_cache().run(request)
 
 		return SimulationResponse(**result)
 
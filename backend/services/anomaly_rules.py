@@ -11,6 +11,8 @@ import logging
 from scipy import stats
 from sklearn.preprocessing import StandardScaler
 
+from services.peer_baseline import DEFAULT_AGG_WINDOW_MINUTES, PeerBaseline, peer_baseline_service
+
 logger = logging.getLogger(__name__)
 
 class AnomalyRulesService:
@@ -28,6 +30,17 @@ class AnomalyRulesService:
             'moving_average_window': 12,  # 小時
         }
     
+    def _build_peer_baseline(self, df: pd.DataFrame, params: Dict[str, Any]) -> Optional[PeerBaseline]:
+        """Build (or reuse the cached) floor/building peer baseline for df"""
+        try:
+            return peer_baseline_service.get_baseline(
+                df, 'power',
+                agg_window_minutes=params.get('peer_agg_window_minutes', DEFAULT_AGG_WINDOW_MINUTES)
+            )
+        except Exception as e:
+            logger.warning(f"Peer baseline unavailable, falling back to per-device median: {e}")
+            return None
+    
     async def calculate_candidate_count_enhanced(self, df: pd.DataFrame, params: Dict[str, Any]) -> int:
         """
         Enhanced candidate count calculation with new multi-dimensional rules
@@ -48,6 +61,7 @@ class AnomalyRulesService:
         logger.info(f"[ANOMALY_RULES] Enhanced candidate count calculation with params: {detection_params}")
         
         total_candidates = 0
+        peer_baseline = self._build_peer_baseline(df, detection_params)
         device_list = df['deviceNumber'].unique()
         logger.info(f"[ANOMALY_RULES] 處理 {len(device_list)} 個裝置: {device_list[:5]}{'...' if len(device_list) > 5 else ''}")
         
@@ -78,8 +92,8 @@ class AnomalyRulesService:
             device_candidates += gap_count
             logger.info(f"[ANOMALY_RULES] 裝置 {device} - Gap anomalies: {gap_count}")
             
-            # D. Peer comparison rules (simplified estimation)
-            peer_count = self._estimate_peer_anomalies(device_df, detection_params)
+            # D. Peer comparison rules (floor/building baseline)
+            peer_count = self._estimate_peer_anomalies(device_df, detection_params, peer_baseline)
             device_candidates += peer_count
             logger.info(f"[ANOMALY_RULES] 裝置 {device} - Peer comparison: {peer_count}")
             
@@ -150,6 +164,8 @@ class AnomalyRulesService:
         except Exception:
             records_by_date = []
 
+        peer_baseline = self._build_peer_baseline(df, detection_params)
+
         for device in df['deviceNumber'].unique():
             device_df = df[df['deviceNumber'] == device].sort_values('timestamp')
             if len(device_df) < detection_params.get('min_data_points', 48):
@@ -160,7 +176,7 @@ class AnomalyRulesService:
             sp_est = self._estimate_spike_anomalies(device_df, detection_params)
             tm_est = self._estimate_time_anomalies(device_df, detection_params)
             gp_est = self._estimate_gap_anomalies(device_df, detection_params)
-            pr_est = self._estimate_peer_anomalies(device_df, detection_params)
+            pr_est = self._estimate_peer_anomalies(device_df, detection_params, peer_baseline)
 
             per_rule_totals['zscore_estimate'] += z_est
             per_rule_totals['spike_estimate'] += sp_est
@@ -361,17 +377,30 @@ class AnomalyRulesService:
             logger.warning(f"Gap anomaly estimation failed: {e}")
             return 0
     
-    def _estimate_peer_anomalies(self, device_df: pd.DataFrame, params: Dict) -> int:
-        """Estimate peer comparison anomalies count (simplified)"""
+    def _estimate_peer_anomalies(
+        self,
+        device_df: pd.DataFrame,
+        params: Dict,
+        peer_baseline: Optional[PeerBaseline] = None
+    ) -> int:
+        """
+        Estimate peer comparison anomalies count
+
+        Compares each reading to the time-aligned floor (or building) median from
+        peer_baseline; falls back to the device's own median where no peer
+        baseline is available.
+        """
         try:
             exceed_percentage = params.get('peer_exceed_percentage', 150.0) / 100.0
             
-            # For estimation, use device's own median as "peer average"
-            # In real implementation, this would use actual peer data
-            peer_baseline = device_df['power'].median()
+            baseline = device_df['power'].median()
+            if peer_baseline is not None:
+                peer_median = peer_baseline.lookup(device_df['deviceNumber'], device_df['timestamp'])
+                baseline = np.where(np.isnan(peer_median), baseline, peer_median)
             
-            peer_anomalies = device_df[device_df['power'] > peer_baseline * exceed_percentage]
-            return len(peer_anomalies)
+            with np.errstate(invalid='ignore'):
+                peer_anomalies = device_df['power'].to_numpy(dtype=float) > baseline * exceed_percentage
+            return int(peer_anomalies.sum())
             
         except Exception as e:
             logger.warning(f"Peer anomaly estimation failed: {e}")
@@ -818,17 +847,30 @@ class AnomalyRulesService:
             logger.warning(f"Gap anomaly estimation failed: {e}")
             return 0
     
-    def _estimate_peer_anomalies(self, device_df: pd.DataFrame, params: Dict) -> int:
-        """Estimate peer comparison anomalies count (simplified)"""
+    def _estimate_peer_anomalies(
+        self,
+        device_df: pd.DataFrame,
+        params: Dict,
+        peer_baseline: Optional[PeerBaseline] = None
+    ) -> int:
+        """
+        Estimate peer comparison anomalies count
+
+        Compares each reading to the time-aligned floor (or building) median from
+        peer_baseline; falls back to the device's own median where no peer
+        baseline is available.
+        """
         try:
             exceed_percentage = params.get('peer_exceed_percentage', 150.0) / 100.0
             
-            # For estimation, use device's own median as "peer average"
-            # In real implementation, this would use actual peer data
-            peer_baseline = device_df['power'].median()
+            baseline = device_df['power'].median()
+            if peer_baseline is not None:
+                peer_median = peer_baseline.lookup(device_df['deviceNumber'], device_df['timestamp'])
+                baseline = np.where(np.isnan(peer_median), baseline, peer_median)
             
-            peer_anomalies = device_df[device_df['power'] > peer_baseline * exceed_percentage]
-            return len(peer_anomalies)
+            with np.errstate(invalid='ignore'):
+                peer_anomalies = device_df['power'].to_numpy(dtype=float) > baseline * exceed_percentage
+            return int(peer_anomalies.sum())
             
         except Exception as e:
             logger.warning(f"Peer anomaly estimation failed: {e}")
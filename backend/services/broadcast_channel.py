@@ -0,0 +1,215 @@
+"""
+WebSocket 廣播頻道 - 訓練 / 評估日誌與進度的非阻塞推送
+
+發佈端（訓練、評估的熱迴圈）只做 enqueue，不 await 任何 send_text：
+- 每個頻道以 ring buffer 保留最近的日誌，晚加入的連線先收到重播
+- 進度更新依 key 合併（latest-wins），並限制推送頻率
+- 每個連線有自己的 sender task 與有上限的佇列；慢速連線滿了只丟棄自己最舊的訊息，
+  不會拖慢發佈端或其他連線
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Collection, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_SIZE = 200        # 每個頻道保留的日誌行數
+DEFAULT_QUEUE_SIZE = 256          # 每個連線待送訊息上限
+DEFAULT_PROGRESS_INTERVAL = 0.25  # 進度更新最短推送間隔（秒）
+MAX_PROGRESS_KEYS = 64            # 保留最新進度供重播的 key 數
+MAX_RETAINED_CHANNELS = 64        # hub 保留（無連線）頻道數
+
+
+class _Subscriber:
+    """單一連線的待送佇列（滿了丟棄最舊）"""
+
+    def __init__(self, websocket: Any, queue_size: int):
+        self.websocket = websocket
+        self.queue: Deque[str] = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, message: str):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(message)
+        self.ready.set()
+
+
+class BroadcastChannel:
+    """
+    單一工作（或全域）的廣播頻道
+
+    publish / publish_progress 必須在事件迴圈執行緒中呼叫，兩者皆不會阻塞。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL
+    ):
+        self.name = name
+        self.history: Deque[str] = deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self.progress_interval = progress_interval
+        self._subscribers: Dict[Any, _Subscriber] = {}
+        self._pending_progress: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._latest_progress: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._last_flush = float('-inf')
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def websockets(self) -> List[Any]:
+        return list(self._subscribers)
+
+    def publish(self, message: str, record: bool = True, exclude: Collection[Any] = ()):
+        """
+        發送一則訊息給所有連線
+
+        Args:
+            message: 已序列化的訊息
+            record: 是否寫入 ring buffer 供晚加入的連線重播
+            exclude: 不發送的 websocket（例如跨頻道廣播時已送過的連線）
+        """
+        if record:
+            self.history.append(message)
+        for websocket, subscriber in self._subscribers.items():
+            if websocket not in exclude:
+                subscriber.push(message)
+
+    def publish_progress(self, message: str, key: Hashable = None):
+        """
+        發送進度更新：同一 key 在推送間隔內只送出最新的一則
+
+        Args:
+            message: 已序列化的進度訊息
+            key: 合併鍵（例如 job_id / 訊息類型）
+        """
+        self._pending_progress[key] = message
+        self._pending_progress.move_to_end(key)
+        if self._flush_handle is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._last_flush + self.progress_interval - loop.time())
+        self._flush_handle = loop.call_later(delay, self._flush_progress)
+
+    def flush(self):
+        """立即送出尚未推送的進度（例如工作結束時）"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_progress()
+
+    def _flush_progress(self):
+        self._flush_handle = None
+        if not self._pending_progress:
+            return
+        self._last_flush = asyncio.get_running_loop().time()
+
+        pending, self._pending_progress = self._pending_progress, OrderedDict()
+        for key, message in pending.items():
+            self._latest_progress[key] = message
+            self._latest_progress.move_to_end(key)
+            for subscriber in self._subscribers.values():
+                subscriber.push(message)
+
+        while len(self._latest_progress) > MAX_PROGRESS_KEYS:
+            self._latest_progress.popitem(last=False)
+
+    def subscribe(self, websocket: Any, replay: Optional[int] = None):
+        """
+        加入連線並啟動其 sender task
+
+        Args:
+            websocket: 已 accept 的 WebSocket
+            replay: 重播最近幾行日誌（None 表示 ring buffer 全部）；另外會重播每個 key 的最新進度
+        """
+        self.unsubscribe(websocket)
+        subscriber = _Subscriber(websocket, self.queue_size)
+
+        history = list(self.history)
+        if replay is not None:
+            history = history[-replay:] if replay > 0 else []
+        for message in history + list(self._latest_progress.values()):
+            subscriber.push(message)
+
+        subscriber.task = asyncio.create_task(self._sender(subscriber))
+        self._subscribers[websocket] = subscriber
+
+    def unsubscribe(self, websocket: Any):
+        subscriber = self._subscribers.pop(websocket, None)
+        if subscriber and subscriber.task and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    async def _sender(self, subscriber: _Subscriber):
+        try:
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                while subscriber.queue:
+                    await subscriber.websocket.send_text(subscriber.queue.popleft())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error sending to websocket on channel {self.name}, dropping connection: {e}")
+            if self._subscribers.get(subscriber.websocket) is subscriber:
+                del self._subscribers[subscriber.websocket]
+        finally:
+            if subscriber.dropped:
+                logger.warning(f"Slow websocket on channel {self.name}: dropped {subscriber.dropped} oldest messages")
+
+    async def close(self):
+        """送出剩餘進度並停止所有 sender task"""
+        self.flush()
+        subscribers, self._subscribers = list(self._subscribers.values()), {}
+        for subscriber in subscribers:
+            if subscriber.task:
+                subscriber.task.cancel()
+        await asyncio.gather(*(s.task for s in subscribers if s.task), return_exceptions=True)
+
+
+class BroadcastHub:
+    """依 key（job_id）管理 BroadcastChannel，保留最近的頻道供之後連線重播"""
+
+    def __init__(self, max_channels: int = MAX_RETAINED_CHANNELS, **channel_options):
+        self.max_channels = max_channels
+        self.channel_options = channel_options
+        self._channels: "OrderedDict[Hashable, BroadcastChannel]" = OrderedDict()
+
+    def channel(self, key: Hashable) -> BroadcastChannel:
+        """取得（必要時建立）頻道"""
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = BroadcastChannel(str(key), **self.channel_options)
+            self._channels[key] = channel
+            self._evict()
+        self._channels.move_to_end(key)
+        return channel
+
+    def get(self, key: Hashable) -> Optional[BroadcastChannel]:
+        return self._channels.get(key)
+
+    def channels(self) -> List[BroadcastChannel]:
+        return list(self._channels.values())
+
+    def _evict(self):
+        # 只淘汰沒有連線的舊頻道
+        for key in list(self._channels):
+            if len(self._channels) <= self.max_channels:
+                break
+            if self._channels[key].subscriber_count == 0:
+                del self._channels[key]
+
+    async def close(self):
+        for channel in self.channels():
+            await channel.close()
+        self._channels.clear()
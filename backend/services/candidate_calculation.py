@@ -4,15 +4,43 @@
 
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import logging
-from scipy import stats
 import json
 import uuid
 
+from services.peer_baseline import DEFAULT_AGG_WINDOW_MINUTES, PeerBaseline, peer_baseline_service
+
 logger = logging.getLogger(__name__)
 
+# 規則位元：每筆資料的 rule_mask 為所有命中規則位元的 OR
+RULE_ZSCORE = 1 << 0
+RULE_SPIKE = 1 << 1
+RULE_TIME = 1 << 2
+RULE_GAP = 1 << 3
+RULE_PEER = 1 << 4
+
+RULE_BITS = {
+    "zscore": RULE_ZSCORE,
+    "spike": RULE_SPIKE,
+    "time": RULE_TIME,
+    "gap": RULE_GAP,
+    "peer": RULE_PEER,
+}
+
+RULE_ESTIMATE_KEYS = {
+    "zscore": "zscoreEstimate",
+    "spike": "spikeEstimate",
+    "time": "timeEstimate",
+    "gap": "gapEstimate",
+    "peer": "peerEstimate",
+}
+
+MIN_DEVICE_RECORDS = 5  # 數據少於此筆數的設備不套用規則
+EVENT_MERGE_MAX_INDEX_GAP = 3  # 同設備異常點序號相差不超過此值即併入同一事件
+
 class CandidateCalculationService:
     """候選事件計算服務 - 實現完整的 Calculate Candidates 功能"""
 
@@ -146,88 +174,51 @@ class CandidateCalculationService:
         df: pd.DataFrame,
         params: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """步驟 2: 應用多維度篩選規則"""
+        """
+        步驟 2: 應用多維度篩選規則
+
+        所有設備一次以 groupby 計算，每條規則產生一個布林遮罩並寫入
+        rule_frame['rule_mask'] 的對應位元（見 RULE_BITS），不再逐設備
+        產生 "device_idx" 字串。
+        """
         logger.info(f"[CANDIDATE_CALC] 應用多維度篩選規則")
 
         # 合併參數
         detection_params = {**self.default_params, **params}
 
-        # 為每個規則建立獨立的異常標記
-        rule_results = {
-            "zscoreEstimate": 0,
-            "spikeEstimate": 0,
-            "timeEstimate": 0,
-            "gapEstimate": 0,
-            "peerEstimate": 0
-        }
-
-        # 儲存每個規則檢測到的異常點
-        rule_anomalies = {
-            "zscore": set(),
-            "spike": set(),
-            "time": set(),
-            "gap": set(),
-            "peer": set()
-        }
-
-        # 處理每台設備
-        devices = df['deviceNumber'].unique()
-        logger.info(f"[CANDIDATE_CALC] 處理 {len(devices)} 台設備")
-
-        for device in devices:
-            device_df = df[df['deviceNumber'] == device].copy()
-            device_df = device_df.sort_values('timestamp').reset_index(drop=True)
-
-            if len(device_df) < 5:  # 數據太少，跳過
-                continue
-
-            # 確保有 kWh 欄位
-            value_column = self._get_value_column(device_df)
-            if value_column is None:
-                logger.warning(f"設備 {device} 缺少數值欄位，跳過")
-                continue
+        rule_frame = self._prepare_rule_frame(df)
+        rule_results = {key: 0 for key in RULE_ESTIMATE_KEYS.values()}
 
-            # Z-Score 規則
-            zscore_points = self._apply_zscore_rule(
-                device_df, device, value_column, detection_params
-            )
-            rule_anomalies["zscore"].update(zscore_points)
-            rule_results["zscoreEstimate"] += len(zscore_points)
-
-            # Spike 規則
-            spike_points = self._apply_spike_rule(
-                device_df, device, value_column, detection_params
-            )
-            rule_anomalies["spike"].update(spike_points)
-            rule_results["spikeEstimate"] += len(spike_points)
+        if rule_frame.empty:
+            return {
+                "per_rule": rule_results,
+                "total_before_overlap": 0,
+                "rule_frame": rule_frame
+            }
 
-            # Time 規則 (假日/非正常時段)
-            time_points = self._apply_time_rule(
-                device_df, device, detection_params
-            )
-            rule_anomalies["time"].update(time_points)
-            rule_results["timeEstimate"] += len(time_points)
+        logger.info(f"[CANDIDATE_CALC] 處理 {rule_frame['device_code'].nunique()} 台設備，{len(rule_frame)} 筆資料")
 
-            # Gap 規則
-            gap_points = self._apply_gap_rule(
-                device_df, device, detection_params
-            )
-            rule_anomalies["gap"].update(gap_points)
-            rule_results["gapEstimate"] += len(gap_points)
+        rule_functions = {
+            "zscore": self._apply_zscore_rule,
+            "spike": self._apply_spike_rule,
+            "time": self._apply_time_rule,
+            "gap": self._apply_gap_rule,
+            "peer": self._apply_peer_rule,
+        }
 
-            # Peer 規則 (簡化版本)
-            peer_points = self._apply_peer_rule(
-                device_df, device, value_column, detection_params
-            )
-            rule_anomalies["peer"].update(peer_points)
-            rule_results["peerEstimate"] += len(peer_points)
+        rule_mask = np.zeros(len(rule_frame), dtype=np.uint8)
+        for rule_name, rule_function in rule_functions.items():
+            hits = rule_function(rule_frame, detection_params)
+            rule_mask[hits] |= RULE_BITS[rule_name]
+            rule_results[RULE_ESTIMATE_KEYS[rule_name]] = int(np.count_nonzero(hits))
 
+        rule_frame['rule_mask'] = rule_mask
         total_before_overlap = sum(rule_results.values())
 
         return {
             "per_rule": rule_results,
             "total_before_overlap": total_before_overlap,
-            "rule_anomalies": rule_anomalies
+            "rule_frame": rule_frame
         }
 
     def _get_value_column(self, df: pd.DataFrame) -> Optional[str]:
@@ -238,72 +229,104 @@ class CandidateCalculationService:
                 return col
         return None
 
-    def _apply_zscore_rule(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        value_column: str,
-        params: Dict[str, Any]
-    ) -> List[str]:
-        """應用 Z-Score 規則"""
-        try:
-            values = device_df[value_column].astype(float)
-            if len(values) < 3:
-                return []
+    def _prepare_rule_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        建立規則計算用的資料框
 
-            z_scores = np.abs(stats.zscore(values, nan_policy='omit'))
-            threshold = params.get('z_score_threshold', 3.0)
+        Returns:
+            依 (deviceNumber, timestamp) 排序的 DataFrame，欄位為
+            deviceNumber, device_code（整數設備代碼）, timestamp, value,
+            pos（設備內序號）, device_records；
+            已排除數據少於 MIN_DEVICE_RECORDS 筆的設備
+        """
+        columns = ['deviceNumber', 'device_code', 'timestamp', 'value', 'pos', 'device_records']
+
+        # 確保有 kWh 欄位
+        value_column = self._get_value_column(df)
+        if value_column is None:
+            logger.warning(f"[CANDIDATE_CALC] 資料缺少數值欄位，略過規則計算")
+            return pd.DataFrame(columns=columns)
+
+        # 設備編號先轉為整數代碼，後續 groupby 不必重複對字串做 factorize
+        device_codes, device_names = pd.factorize(df['deviceNumber'], sort=True)
+        frame = pd.DataFrame({
+            'device_code': device_codes,
+            'timestamp': pd.to_datetime(df['timestamp']).array,
+            'value': pd.to_numeric(df[value_column], errors='coerce').astype(float).to_numpy(),
+        })
+        frame = frame.sort_values(['device_code', 'timestamp'], kind='mergesort').reset_index(drop=True)
+
+        frame['pos'] = frame.groupby('device_code', sort=False).cumcount()
+        frame['device_records'] = np.bincount(frame['device_code'].to_numpy())[frame['device_code'].to_numpy()]
+
+        # 數據太少，跳過
+        frame = frame[frame['device_records'] >= MIN_DEVICE_RECORDS].reset_index(drop=True)
+        frame['deviceNumber'] = np.asarray(device_names, dtype=object)[frame['device_code'].to_numpy()]
+        return frame[columns]
+
+    def _apply_zscore_rule(self, frame: pd.DataFrame, params: Dict[str, Any]) -> np.ndarray:
+        """應用 Z-Score 規則（母體標準差，忽略 NaN，與 scipy.stats.zscore 相同）"""
+        try:
+            values = frame['value']
+            devices = frame['device_code']
+            deviation = values - values.groupby(devices, sort=False).transform('mean')
+            std = np.sqrt((deviation ** 2).groupby(devices, sort=False).transform('mean'))
 
-            anomaly_indices = device_df.index[z_scores > threshold].tolist()
-            anomaly_points = [f"{device}_{idx}" for idx in anomaly_indices]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = (deviation / std).abs()
 
-            return anomaly_points
+            threshold = params.get('z_score_threshold', 3.0)
+            return (z_scores > threshold).to_numpy()
         except Exception as e:
-            logger.warning(f"Z-Score 規則失敗 (設備 {device}): {e}")
-            return []
+            logger.warning(f"Z-Score 規則失敗: {e}")
+            return np.zeros(len(frame), dtype=bool)
 
-    def _apply_spike_rule(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        value_column: str,
-        params: Dict[str, Any]
-    ) -> List[str]:
+    def _apply_spike_rule(self, frame: pd.DataFrame, params: Dict[str, Any]) -> np.ndarray:
         """應用 Spike 規則"""
         try:
-            values = device_df[value_column].astype(float)
-            if len(values) < 5:
-                return []
-
-            # 計算滾動中位數作為基線
-            window_size = min(5, len(values) // 2)
-            baseline = values.rolling(window=window_size, center=True).median()
+            # 計算滾動中位數作為基線（置中窗口，窗口內有 NaN 時為 NaN，與 Series.rolling 相同）
+            # 窗口為 min(5, 設備筆數 // 2)；資料已依設備連續排列，
+            # 對整段陣列做一次 sliding window，再排除跨越設備邊界的窗口
+            values = frame['value'].to_numpy()
+            positions = frame['pos'].to_numpy()
+            device_records = frame['device_records'].to_numpy()
+            window_sizes = np.minimum(5, device_records // 2)
+            baseline = np.full(len(frame), np.nan)
+
+            for window_size in np.unique(window_sizes):
+                window_size = int(window_size)
+                rows = np.flatnonzero(window_sizes == window_size)
+                offset = window_size // 2
+                first = positions[rows] - offset
+                valid = (first >= 0) & (first + window_size <= device_records[rows])
+                rows = rows[valid]
+                # 排序後取中位；np.sort 會把 NaN 排到最後，末欄為 NaN 即代表窗口含 NaN
+                windows = np.sort(sliding_window_view(values, window_size), axis=1)
+                middle = window_size // 2
+                if window_size % 2:
+                    window_medians = windows[:, middle]
+                else:
+                    window_medians = (windows[:, middle - 1] + windows[:, middle]) / 2
+                window_medians[np.isnan(windows[:, -1])] = np.nan
+                baseline[rows] = window_medians[rows - offset]
 
             spike_threshold = params.get('spike_percentage', 200.0) / 100.0
             threshold_values = baseline * (1 + spike_threshold)
 
-            anomaly_mask = values > threshold_values
-            anomaly_indices = device_df.index[anomaly_mask].tolist()
-            anomaly_points = [f"{device}_{idx}" for idx in anomaly_indices]
-
-            return anomaly_points
+            with np.errstate(invalid='ignore'):
+                return values > threshold_values
         except Exception as e:
-            logger.warning(f"Spike 規則失敗 (設備 {device}): {e}")
-            return []
+            logger.warning(f"Spike 規則失敗: {e}")
+            return np.zeros(len(frame), dtype=bool)
 
-    def _apply_time_rule(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        params: Dict[str, Any]
-    ) -> List[str]:
+    def _apply_time_rule(self, frame: pd.DataFrame, params: Dict[str, Any]) -> np.ndarray:
         """應用時間規則 (假日/非正常時段)"""
         try:
             if not params.get('detect_holiday_pattern', True):
-                return []
+                return np.zeros(len(frame), dtype=bool)
 
             # 簡化版本：檢測深夜時段 (23:00-06:00) 和週末
-            timestamps = pd.to_datetime(device_df['timestamp'])
+            timestamps = frame['timestamp']
 
             # 深夜時段
             night_mask = (timestamps.dt.hour >= 23) | (timestamps.dt.hour <= 6)
@@ -312,67 +335,58 @@ class CandidateCalculationService:
             weekend_mask = timestamps.dt.weekday >= 5
 
             # 假日模式：深夜或週末
-            holiday_mask = night_mask | weekend_mask
-
-            anomaly_indices = device_df.index[holiday_mask].tolist()
-            anomaly_points = [f"{device}_{idx}" for idx in anomaly_indices]
-
-            return anomaly_points
+            return (night_mask | weekend_mask).to_numpy()
         except Exception as e:
-            logger.warning(f"時間規則失敗 (設備 {device}): {e}")
-            return []
+            logger.warning(f"時間規則失敗: {e}")
+            return np.zeros(len(frame), dtype=bool)
 
-    def _apply_gap_rule(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        params: Dict[str, Any]
-    ) -> List[str]:
+    def _apply_gap_rule(self, frame: pd.DataFrame, params: Dict[str, Any]) -> np.ndarray:
         """應用 Gap 規則"""
         try:
-            if len(device_df) < 2:
-                return []
-
-            timestamps = pd.to_datetime(device_df['timestamp'])
-            time_diffs = timestamps.diff().dt.total_seconds() / 60  # 轉換為分鐘
+            time_diffs = frame.groupby('device_code', sort=False)['timestamp'].diff().dt.total_seconds() / 60  # 轉換為分鐘
 
             max_gap = params.get('max_time_gap_minutes', 60)
-            gap_mask = time_diffs > max_gap
-
-            anomaly_indices = device_df.index[gap_mask].tolist()
-            anomaly_points = [f"{device}_{idx}" for idx in anomaly_indices]
-
-            return anomaly_points
+            return (time_diffs > max_gap).to_numpy()
         except Exception as e:
-            logger.warning(f"Gap 規則失敗 (設備 {device}): {e}")
-            return []
+            logger.warning(f"Gap 規則失敗: {e}")
+            return np.zeros(len(frame), dtype=bool)
 
-    def _apply_peer_rule(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        value_column: str,
-        params: Dict[str, Any]
-    ) -> List[str]:
-        """應用 Peer 規則 (簡化版本)"""
+    def _apply_peer_rule(self, frame: pd.DataFrame, params: Dict[str, Any]) -> np.ndarray:
+        """
+        應用 Peer 規則
+
+        以同樓層（不足時同建築物）設備在同一聚合時間桶的中位數為基準；
+        無同儕基準的資料點退回使用設備自己的平均值。
+        """
         try:
-            values = device_df[value_column].astype(float)
-            if len(values) < 3:
-                return []
+            values = frame['value']
+            own_mean = values.groupby(frame['device_code'], sort=False).transform('mean').to_numpy()
+
+            peer_baseline = self._get_peer_baseline(frame, params)
+            if peer_baseline is not None:
+                peer_median = peer_baseline.lookup(frame['deviceNumber'], frame['timestamp'])
+                baseline = np.where(np.isnan(peer_median), own_mean, peer_median)
+            else:
+                baseline = own_mean
 
-            # 簡化版本：使用設備自己的平均值作為同群組基準
-            peer_mean = values.mean()
             peer_threshold = params.get('peer_exceed_percentage', 150.0) / 100.0
-            threshold_value = peer_mean * peer_threshold
 
-            anomaly_mask = values > threshold_value
-            anomaly_indices = device_df.index[anomaly_mask].tolist()
-            anomaly_points = [f"{device}_{idx}" for idx in anomaly_indices]
+            with np.errstate(invalid='ignore'):
+                return values.to_numpy() > baseline * peer_threshold
+        except Exception as e:
+            logger.warning(f"Peer 規則失敗: {e}")
+            return np.zeros(len(frame), dtype=bool)
 
-            return anomaly_points
+    def _get_peer_baseline(self, frame: pd.DataFrame, params: Dict[str, Any]) -> Optional[PeerBaseline]:
+        """取得（快取的）樓層 / 建築物同儕基準；無法建立時回傳 None"""
+        try:
+            return peer_baseline_service.get_baseline(
+                frame, 'value',
+                agg_window_minutes=params.get('peer_agg_window_minutes', DEFAULT_AGG_WINDOW_MINUTES)
+            )
         except Exception as e:
-            logger.warning(f"Peer 規則失敗 (設備 {device}): {e}")
-            return []
+            logger.warning(f"[CANDIDATE_CALC] 無法建立同儕基準，改用設備自身平均: {e}")
+            return None
 
     async def _process_overlap_and_finalize(
         self,
@@ -383,14 +397,10 @@ class CandidateCalculationService:
         """步驟 3: 處理重疊並計算最終結果"""
         logger.info(f"[CANDIDATE_CALC] 處理重疊並計算最終結果")
 
-        # 合併所有規則檢測到的異常點
-        all_anomalies = set()
-        for rule_name, anomalies in rule_results['rule_anomalies'].items():
-            all_anomalies.update(anomalies)
-
+        # rule_mask != 0 即為任一規則命中的異常點（重疊自然合併）
         # 轉換為事件格式並應用持續時間規則
-        events = self._convert_points_to_events(
-            df, all_anomalies, params
+        events = self._convert_masks_to_events(
+            rule_results['rule_frame'], {**self.default_params, **params}
         )
 
         total_candidates = len(events)
@@ -408,152 +418,88 @@ class CandidateCalculationService:
             "final_events": events
         }
 
-    def _convert_points_to_events(
+    def _convert_masks_to_events(
         self,
-        df: pd.DataFrame,
-        anomaly_points: set,
+        rule_frame: pd.DataFrame,
         params: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """將異常點轉換為事件，並應用持續時間規則"""
-        logger.info(f"[CANDIDATE_CALC] 轉換 {len(anomaly_points)} 個異常點為事件")
-        logger.info(f"[CANDIDATE_CALC] 異常點樣本 (前10個): {list(anomaly_points)[:10]}")
+        """
+        將異常點合併為事件，並應用持續時間規則
 
-        if not anomaly_points:
+        rule_frame 已依 (deviceNumber, timestamp) 排序；同設備相鄰異常點的
+        設備內序號相差不超過 EVENT_MERGE_MAX_INDEX_GAP 時屬於同一事件。
+        """
+        if rule_frame.empty or 'rule_mask' not in rule_frame.columns:
             return []
 
-        # 解析異常點 (格式: "device_index")
-        parsed_points = []
-        for point in anomaly_points:
-            try:
-                device, idx = point.rsplit('_', 1)
-                parsed_points.append((device, int(idx)))
-            except Exception as e:
-                logger.warning(f"無法解析異常點 {point}: {e}")
-                continue
-
-        logger.info(f"[CANDIDATE_CALC] 成功解析 {len(parsed_points)} 個異常點")
-
-        # 按設備分組
-        device_groups = {}
-        for device, idx in parsed_points:
-            if device not in device_groups:
-                device_groups[device] = []
-            device_groups[device].append(idx)
-
-        logger.info(f"[CANDIDATE_CALC] 設備分組: {[(device, len(indices)) for device, indices in device_groups.items()]}")
-
-        events = []
-        min_duration = params.get('min_event_duration_minutes', 30)
-
-        logger.info(f"[CANDIDATE_CALC] 使用最小持續時間: {min_duration} 分鐘")
-
-        for device, indices in device_groups.items():
-            logger.info(f"[CANDIDATE_CALC] 處理設備 {device}，異常點數量: {len(indices)}")
+        anomalies = rule_frame[rule_frame['rule_mask'] != 0]
+        logger.info(f"[CANDIDATE_CALC] 轉換 {len(anomalies)} 個異常點為事件")
 
-            device_df = df[df['deviceNumber'] == device].copy()
-            device_df = device_df.sort_values('timestamp').reset_index(drop=True)
-
-            logger.info(f"[CANDIDATE_CALC] 設備 {device} 總數據點: {len(device_df)}")
-
-            # 將相鄰的異常點合併為事件
-            indices.sort()
-            current_event_start = None
-            current_event_indices = []
-
-            for idx in indices:
-                if idx >= len(device_df):
-                    logger.warning(f"[CANDIDATE_CALC] 設備 {device} 索引 {idx} 超出範圍 (總長度: {len(device_df)})")
-                    continue
-
-                if current_event_start is None:
-                    current_event_start = idx
-                    current_event_indices = [idx]
-                elif idx - current_event_indices[-1] <= 3:  # 相鄰或近似相鄰
-                    current_event_indices.append(idx)
-                else:
-                    # 結束當前事件，開始新事件
-                    logger.info(f"[CANDIDATE_CALC] 設備 {device} 完成一個事件組，索引: {current_event_indices}")
-                    event = self._create_event_from_indices(
-                        device_df, device, current_event_indices, min_duration
-                    )
-                    if event:
-                        events.append(event)
-                        logger.info(f"[CANDIDATE_CALC] 設備 {device} 事件已添加")
-                    else:
-                        logger.info(f"[CANDIDATE_CALC] 設備 {device} 事件被過濾")
-
-                    current_event_start = idx
-                    current_event_indices = [idx]
-
-            # 處理最後一個事件
-            if current_event_indices:
-                logger.info(f"[CANDIDATE_CALC] 設備 {device} 處理最後一個事件組，索引: {current_event_indices}")
-                event = self._create_event_from_indices(
-                    device_df, device, current_event_indices, min_duration
-                )
-                if event:
-                    events.append(event)
-                    logger.info(f"[CANDIDATE_CALC] 設備 {device} 最後事件已添加")
-                else:
-                    logger.info(f"[CANDIDATE_CALC] 設備 {device} 最後事件被過濾")
-
-        logger.info(f"[CANDIDATE_CALC] 生成 {len(events)} 個事件")
-        return events
-
-    def _create_event_from_indices(
-        self,
-        device_df: pd.DataFrame,
-        device: str,
-        indices: List[int],
-        min_duration: int
-    ) -> Optional[Dict[str, Any]]:
-        """從異常點索引創建事件"""
-        try:
-            logger.info(f"[CANDIDATE_CALC] 為設備 {device} 創建事件，索引: {indices}")
-
-            if not indices:
-                logger.warning(f"[CANDIDATE_CALC] 設備 {device} 索引為空")
-                return None
+        if anomalies.empty:
+            return []
 
-            start_idx = min(indices)
-            end_idx = max(indices)
+        device_codes = anomalies['device_code'].to_numpy()
+        positions = anomalies['pos'].to_numpy()
+        masks = anomalies['rule_mask'].to_numpy()
 
-            logger.info(f"[CANDIDATE_CALC] 設備 {device} 事件範圍: {start_idx} 到 {end_idx}")
+        # 事件邊界：換設備，或與前一個異常點的序號差距過大
+        new_event = np.ones(len(anomalies), dtype=bool)
+        new_event[1:] = (device_codes[1:] != device_codes[:-1]) | (np.diff(positions) > EVENT_MERGE_MAX_INDEX_GAP)
+        starts = np.flatnonzero(new_event)
+        ends = np.append(starts[1:], len(anomalies)) - 1
 
-            start_time = pd.to_datetime(device_df.iloc[start_idx]['timestamp'])
-            end_time = pd.to_datetime(device_df.iloc[end_idx]['timestamp'])
+        timestamps = anomalies['timestamp']
+        start_times = timestamps.iloc[starts].reset_index(drop=True)
+        end_times = timestamps.iloc[ends].reset_index(drop=True)
+        durations = ((end_times - start_times).dt.total_seconds() / 60).to_numpy()
 
-            duration_minutes = (end_time - start_time).total_seconds() / 60
+        min_duration = params.get('min_event_duration_minutes', 30)
+        keep = np.flatnonzero(durations >= min_duration)
+        logger.info(
+            f"[CANDIDATE_CALC] {len(starts)} 個事件組，持續時間 >= {min_duration} 分鐘者 {len(keep)} 個"
+        )
 
-            logger.info(f"[CANDIDATE_CALC] 設備 {device} 事件持續時間: {duration_minutes:.1f} 分鐘，最小要求: {min_duration} 分鐘")
+        if len(keep) == 0:
+            return []
 
-            # 檢查持續時間
-            if duration_minutes < min_duration:
-                logger.warning(f"[CANDIDATE_CALC] 設備 {device} 事件被過濾掉：持續時間 {duration_minutes:.1f} 分鐘 < 最小要求 {min_duration} 分鐘")
-                return None
+        # 只為保留下來的事件批次取值，避免逐筆 iloc
+        kept_starts = starts[keep]
+        kept_ends = ends[keep]
+        kept_devices = anomalies['deviceNumber'].to_numpy()[kept_starts].tolist()
+        kept_start_idx = positions[kept_starts].tolist()
+        kept_end_idx = positions[kept_ends].tolist()
+        kept_start_times = list(start_times.iloc[keep].dt.to_pydatetime())
+        kept_end_times = list(end_times.iloc[keep].dt.to_pydatetime())
+        kept_durations = durations[keep].tolist()
+        kept_counts = (kept_ends - kept_starts + 1).tolist()
+        kept_masks = np.bitwise_or.reduceat(masks, starts)[keep].tolist()
 
-            # 創建事件
-            event = {
+        events = []
+        for device, start_idx, end_idx, start_time, end_time, duration_minutes, anomaly_count, event_mask in zip(
+            kept_devices, kept_start_idx, kept_end_idx, kept_start_times, kept_end_times,
+            kept_durations, kept_counts, kept_masks
+        ):
+            events.append({
                 "id": str(uuid.uuid4()),
                 "eventId": f"evt_{device}_{start_idx}_{end_idx}",
                 "meterId": device,
                 "eventTimestamp": start_time.isoformat(),
                 "detectionRule": "MULTI_DIMENSIONAL",
-                "score": len(indices),  # 使用異常點數量作為分數
+                "score": anomaly_count,  # 使用異常點數量作為分數
                 "dataWindow": {
                     "startTime": start_time.isoformat(),
                     "endTime": end_time.isoformat(),
                     "duration_minutes": duration_minutes,
-                    "anomaly_count": len(indices)
+                    "anomaly_count": anomaly_count,
+                    "triggered_rules": [
+                        rule_name for rule_name, bit in RULE_BITS.items() if event_mask & bit
+                    ]
                 },
                 "status": "UNREVIEWED"
-            }
+            })
 
-            logger.info(f"[CANDIDATE_CALC] 成功創建設備 {device} 的事件：{event['eventId']}")
-            return event
-        except Exception as e:
-            logger.error(f"[CANDIDATE_CALC] 創建事件失敗 (設備 {device}): {e}")
-            return None
+        logger.info(f"[CANDIDATE_CALC] 生成 {len(events)} 個事件")
+        return events
 
     async def _calculate_top_devices(
         self,
@@ -8,11 +8,26 @@ from .candidate_generator import CandidateGenerator
 from .model_trainer import ModelTrainer
 from .model_evaluator import ModelEvaluator
 from .websocket_manager import WebSocketManager
+from .sqlite_repository import SQLiteRepository, get_sqlite_repository, close_sqlite_repository
+from .job_executor import JobExecutor, JobCancelledError, get_job_executor, shutdown_job_executor
+from .feature_cache import FeatureCache, get_feature_cache
+from .sweep_runner import SweepRunner, expand_search_space
 
 __all__ = [
     'DatabaseManager',
     'CandidateGenerator',
     'ModelTrainer',
     'ModelEvaluator',
-    'WebSocketManager'
+    'WebSocketManager',
+    'SQLiteRepository',
+    'get_sqlite_repository',
+    'close_sqlite_repository',
+    'JobExecutor',
+    'JobCancelledError',
+    'get_job_executor',
+    'shutdown_job_executor',
+    'FeatureCache',
+    'get_feature_cache',
+    'SweepRunner',
+    'expand_search_space'
 ]
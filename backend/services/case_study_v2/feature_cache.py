@@ -0,0 +1,240 @@
+"""
+Feature Cache for Case Study v2
+Content-addressed on-disk cache of temporal feature arrays, so training runs
+and evaluations over the same datasets / window size skip ETL and feature work
+
+每個快取項目是一個目錄：
+    <cache_dir>/<key>/meta.json   —— 建立時間、來源 dataset、大小與額外資訊
+    <cache_dir>/<key>/<name>.npy  —— 特徵陣列（以 mmap_mode='r' 讀取）
+
+key 由 dataset 指紋（筆數、正標籤數、時間範圍、正標籤 checksum）、
+window size 與 FEATURE_VERSION 雜湊而成；標籤改變時指紋自然改變，
+update_analysis_dataset_positive_labels 也會主動清除相關項目。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .shared_models import FEATURE_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'cache', 'features'
+))
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+META_FILENAME = 'meta.json'
+
+
+class FeatureCache:
+    """
+    以 LRU（依最後讀取時間）控制總大小的特徵快取
+
+    同一台機器上的多個 worker process 可共用同一個 cache_dir：
+    寫入先落在暫存目錄再以 rename 原子性發佈，讀取端只會看到完整項目。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv('CASE_STUDY_FEATURE_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_mb = os.getenv('CASE_STUDY_FEATURE_CACHE_MB')
+            max_bytes = int(max_mb) * 1024 ** 2 if max_mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """
+        由任意可 JSON 序列化的組成部分產生快取 key
+
+        FEATURE_VERSION 永遠包含在內，特徵實作改版後舊項目自動失效。
+        """
+        payload = json.dumps({'feature_version': FEATURE_VERSION, **parts}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, entry_dir: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(entry_dir, META_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_dir(key), META_FILENAME))
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+        """
+        讀取快取項目
+
+        Returns:
+            (arrays, meta)：arrays 為唯讀 memory-mapped 陣列；未命中時回傳 None
+        """
+        entry_dir = self._entry_dir(key)
+        meta = self._read_meta(entry_dir)
+        if meta is None:
+            return None
+
+        try:
+            arrays = {
+                name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+                for name in meta.get('arrays', [])
+            }
+        except (OSError, ValueError) as e:
+            logger.warning(f"Feature cache entry {key} is unreadable, discarding: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        # 更新最後讀取時間（LRU 依據）
+        try:
+            os.utime(os.path.join(entry_dir, META_FILENAME))
+        except OSError:
+            pass
+
+        logger.info(f"Feature cache hit: {key} ({meta.get('nbytes', 0) / 1024 / 1024:.1f} MB)")
+        return arrays, meta.get('extra', {})
+
+    def store(self, key: str, arrays: Dict[str, np.ndarray], dataset_ids: Iterable[str] = (),
+              extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        寫入快取項目
+
+        Args:
+            key: make_key() 產生的 key
+            arrays: 名稱 -> numpy 陣列（不可為 object dtype）
+            dataset_ids: 項目所依賴的 dataset，供 invalidate_dataset 使用
+            extra: 其他 JSON 可序列化的資訊（原樣隨 load 回傳）
+
+        Returns:
+            bool: 是否寫入成功
+        """
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return True
+
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=self.cache_dir)
+        try:
+            nbytes = 0
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), array, allow_pickle=False)
+                nbytes += array.nbytes
+
+            meta = {
+                'key': key,
+                'feature_version': FEATURE_VERSION,
+                'dataset_ids': sorted(set(dataset_ids)),
+                'arrays': list(arrays.keys()),
+                'nbytes': nbytes,
+                'created_at': time.time(),
+                'extra': extra or {},
+            }
+            with open(os.path.join(tmp_dir, META_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, default=str)
+
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # 其他 process 同時寫入同一個 key，或磁碟錯誤：快取失敗不影響主流程
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(entry_dir):
+                logger.warning(f"Failed to store feature cache entry {key}: {e}")
+                return False
+            return True
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Feature cache stored: {key} ({nbytes / 1024 / 1024:.1f} MB)")
+        self.evict()
+        return True
+
+    def _entries(self):
+        """列出 (entry_dir, meta, last_access) — 略過尚未完成的暫存目錄"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if name.startswith('.'):
+                continue
+            entry_dir = os.path.join(self.cache_dir, name)
+            meta_path = os.path.join(entry_dir, META_FILENAME)
+            meta = self._read_meta(entry_dir)
+            if meta is None:
+                continue
+            try:
+                last_access = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((entry_dir, meta, last_access))
+        return entries
+
+    def evict(self) -> int:
+        """
+        依最後讀取時間淘汰項目，直到總大小不超過 max_bytes
+
+        Returns:
+            int: 移除的項目數
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(meta.get('nbytes', 0) for _, meta, _ in entries)
+            removed = 0
+            for entry_dir, meta, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= meta.get('nbytes', 0)
+                removed += 1
+
+        if removed:
+            logger.info(f"Feature cache evicted {removed} entries (now {total / 1024 / 1024:.1f} MB)")
+        return removed
+
+    def invalidate_dataset(self, dataset_id: str) -> int:
+        """
+        移除所有依賴指定 dataset 的項目（標籤變更時呼叫）
+
+        Returns:
+            int: 移除的項目數
+        """
+        removed = 0
+        for entry_dir, meta, _ in self._entries():
+            if dataset_id in meta.get('dataset_ids', []):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                removed += 1
+
+        if removed:
+            logger.info(f"Feature cache invalidated {removed} entries for dataset {dataset_id}")
+        return removed
+
+    def clear(self):
+        """清空整個快取"""
+        for entry_dir, _, _ in self._entries():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+_feature_cache: Optional[FeatureCache] = None
+
+
+def get_feature_cache() -> FeatureCache:
+    """取得此 process 共用的 FeatureCache"""
+    global _feature_cache
+    if _feature_cache is None:
+        _feature_cache = FeatureCache()
+    return _feature_cache
@@ -0,0 +1,242 @@
+"""
+Job Executor for Case Study v2
+Runs CPU-bound training / evaluation work in worker processes so the
+FastAPI event loop stays responsive, and streams progress back to the
+WebSocket manager through a shared queue
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND_TRAINING = 'training'
+JOB_KIND_EVALUATION = 'evaluation'
+
+_QUEUE_SENTINEL = None
+
+
+class JobCancelledError(Exception):
+    """工作被使用者取消"""
+
+
+class JobContext:
+    """
+    傳入 worker process 的工作上下文
+
+    只包含 job id 與 Manager proxy，可被 pickle；worker 透過它回報進度、
+    檢查是否已被取消。
+    """
+
+    def __init__(self, job_id: str, kind: str, queue=None, cancel_flags=None):
+        self.job_id = job_id
+        self.kind = kind
+        self._queue = queue
+        self._cancel_flags = cancel_flags
+
+    def _emit(self, event: Dict[str, Any]):
+        if self._queue is None:
+            return
+        try:
+            self._queue.put((self.job_id, self.kind, event))
+        except Exception as e:
+            # 進度回報失敗不應中斷訓練
+            logger.debug(f"Failed to emit progress for job {self.job_id}: {e}")
+
+    def log(self, message: str):
+        """送出一行日誌到前端"""
+        self._emit({'type': 'log', 'message': message})
+
+    def progress(self, **data):
+        """送出結構化進度（例如 epoch / total_epochs / val_f1）"""
+        self._emit({'type': 'progress', **data})
+
+    @property
+    def is_cancelled(self) -> bool:
+        if self._cancel_flags is None:
+            return False
+        try:
+            return bool(self._cancel_flags.get(self.job_id, False))
+        except Exception:
+            return False
+
+    def check_cancelled(self):
+        """若工作已被取消則拋出 JobCancelledError（在 epoch 之間呼叫）"""
+        if self.is_cancelled:
+            raise JobCancelledError(f"Job {self.job_id} was cancelled")
+
+
+def _run_in_worker(fn: Callable[..., Any], context: JobContext, args: tuple, kwargs: dict) -> Any:
+    """worker process 入口：先檢查取消狀態再執行 fn(context, *args, **kwargs)"""
+    context.check_cancelled()
+    return fn(context, *args, **kwargs)
+
+
+class JobExecutor:
+    """
+    CPU 密集工作的 process pool
+
+    - max_workers 限制同時執行的訓練 / 評估工作數（CASE_STUDY_JOB_WORKERS，預設 2）
+    - 使用 spawn 啟動 worker，避免 fork 後繼承 asyncio / torch 執行緒狀態
+    - worker 的 log / progress 經由 Manager queue 轉送給 websocket_manager
+    - cancel() 會取消尚未開始的工作，或通知執行中的工作在下一個 epoch 停止
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, websocket_manager=None):
+        self.max_workers = max_workers or int(os.getenv('CASE_STUDY_JOB_WORKERS', '2'))
+        self.websocket_manager = websocket_manager
+
+        self._mp_context = multiprocessing.get_context('spawn')
+        self._manager = None
+        self._queue = None
+        self._cancel_flags = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self._futures: Dict[str, Future] = {}
+
+    def set_websocket_manager(self, websocket_manager):
+        """Set the WebSocket manager used for progress broadcasts"""
+        self.websocket_manager = websocket_manager
+
+    def _ensure_started(self):
+        if self._manager is None:
+            self._manager = self._mp_context.Manager()
+            self._queue = self._manager.Queue()
+            self._cancel_flags = self._manager.dict()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._mp_context)
+            logger.info(f"Job executor started with {self.max_workers} worker process(es)")
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump_progress())
+
+    async def run(self, job_id: str, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在 worker process 中執行 fn(context, *args, **kwargs) 並等待結果
+
+        Args:
+            job_id: 工作 ID（用於進度廣播與取消）
+            kind: JOB_KIND_TRAINING 或 JOB_KIND_EVALUATION
+            fn: 模組層級函式（必須可被 pickle）
+
+        Returns:
+            fn 的回傳值；工作被取消時拋出 JobCancelledError
+        """
+        self._ensure_started()
+        self._cancel_flags.pop(job_id, None)
+        context = JobContext(job_id, kind, self._queue, self._cancel_flags)
+
+        try:
+            future = self._pool.submit(_run_in_worker, fn, context, args, kwargs)
+        except BrokenProcessPool:
+            # 先前的 worker 異常結束，重建 pool 後重試一次
+            logger.warning("Job executor pool was broken, restarting worker processes")
+            self._pool = None
+            self._ensure_started()
+            future = self._pool.submit(_run_in_worker, fn, context, args, kwargs)
+
+        self._futures[job_id] = future
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if self._cancel_flags.get(job_id):
+                raise JobCancelledError(f"Job {job_id} was cancelled before it started")
+            raise
+        finally:
+            self._futures.pop(job_id, None)
+            self._cancel_flags.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消工作
+
+        Returns:
+            bool: job_id 為目前排隊或執行中的工作時為 True
+        """
+        future = self._futures.get(job_id)
+        if future is None:
+            return False
+        self._cancel_flags[job_id] = True
+        future.cancel()
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def active_jobs(self) -> List[str]:
+        return list(self._futures.keys())
+
+    async def _pump_progress(self):
+        """把 worker queue 中的事件轉送到 WebSocket"""
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            try:
+                item = await loop.run_in_executor(None, queue.get)
+            except (EOFError, OSError):
+                break
+            if item is _QUEUE_SENTINEL:
+                break
+            job_id, kind, event = item
+            try:
+                await self._broadcast(job_id, kind, event)
+            except Exception as e:
+                logger.error(f"Error broadcasting progress for job {job_id}: {e}")
+
+    async def _broadcast(self, job_id: str, kind: str, event: Dict[str, Any]):
+        if event.get('type') == 'log':
+            logger.info(f"{kind.capitalize()} Job {job_id}: {event['message']}")
+        if not self.websocket_manager:
+            return
+
+        if kind == JOB_KIND_TRAINING:
+            await self.websocket_manager.send_training_log(job_id, event)
+        elif event.get('type') == 'log':
+            # 與 ModelEvaluator._log 的格式一致
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            await self.websocket_manager.broadcast_evaluation_log(job_id, f"[{timestamp}] {event['message']}")
+        else:
+            await self.websocket_manager.send_evaluation_log(job_id, event)
+
+    async def shutdown(self):
+        """取消所有工作並關閉 worker processes"""
+        for job_id in list(self._futures):
+            self.cancel(job_id)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._queue is not None:
+            self._queue.put(_QUEUE_SENTINEL)
+        if self._pump_task is not None:
+            try:
+                await asyncio.wait_for(self._pump_task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                self._pump_task.cancel()
+            self._pump_task = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._queue = None
+            self._cancel_flags = None
+
+
+_job_executor: Optional[JobExecutor] = None
+
+
+def get_job_executor() -> JobExecutor:
+    """取得共用的 JobExecutor（第一次呼叫時建立）"""
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = JobExecutor()
+    return _job_executor
+
+
+async def shutdown_job_executor():
+    """關閉共用的 JobExecutor（應用程式關閉時呼叫）"""
+    global _job_executor
+    if _job_executor is not None:
+        await _job_executor.shutdown()
+        _job_executor = None
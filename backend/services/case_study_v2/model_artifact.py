@@ -0,0 +1,227 @@
+"""
+Model Artifact Format for Case Study v2
+結構化的模型 artifact，取代整包 pickle
+
+每個 artifact 是一個目錄（<name>.model）：
+    <dir>/meta.json    —— model_config、feature_names、訓練統計等 metadata 與 content_hash
+    <dir>/weights.pt   —— 模型權重（torch.save，以 weights_only=True、mmap=True 讀取）
+    <dir>/scaler.npz   —— StandardScaler 參數（純陣列，allow_pickle=False）
+
+讀取時只解析 meta.json；權重與 scaler 在第一次被存取時才載入。
+content_hash 為權重、scaler 與 metadata 的 SHA256，評估端以它作為
+已重建模型 LRU 的 key，重複評估同一模型時不必再反序列化與重建。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.model'
+
+META_FILENAME = 'meta.json'
+WEIGHTS_FILENAME = 'weights.pt'
+SCALER_FILENAME = 'scaler.npz'
+
+# 延遲載入的欄位（其餘欄位都在 meta.json）
+LAZY_KEYS = ('model_state_dict', 'scaler')
+SCALER_ARRAYS = ('mean_', 'scale_', 'var_', 'n_samples_seen_')
+
+DEFAULT_MODEL_CACHE_SIZE = 8
+
+
+def json_default(value: Any) -> Any:
+    """json.dump 的 default：numpy 純量 / 陣列轉為 Python 原生型別"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _file_digest(digest, path: str):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+
+def save_artifact(path: str, artifact: Dict[str, Any]) -> str:
+    """
+    將 artifact dict（model_state_dict、scaler 與 JSON 可序列化的 metadata）寫成目錄
+
+    先寫入暫存目錄再 rename，讀取端只會看到完整的 artifact。
+
+    Args:
+        path: 目標目錄（應以 ARTIFACT_SUFFIX 結尾）
+        artifact: 與舊 pickle 相同鍵值的 dict
+
+    Returns:
+        str: content_hash
+    """
+    import torch
+
+    metadata = {key: value for key, value in artifact.items() if key not in LAZY_KEYS}
+    scaler = artifact['scaler']
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=parent)
+    try:
+        state_dict = {key: value.detach().cpu().contiguous() for key, value in artifact['model_state_dict'].items()}
+        torch.save(state_dict, os.path.join(tmp_dir, WEIGHTS_FILENAME))
+        np.savez(
+            os.path.join(tmp_dir, SCALER_FILENAME),
+            **{name: np.asarray(getattr(scaler, name)) for name in SCALER_ARRAYS if getattr(scaler, name, None) is not None}
+        )
+        metadata['scaler_params'] = {
+            'with_mean': scaler.with_mean,
+            'with_std': scaler.with_std,
+            'n_features_in_': int(scaler.n_features_in_)
+        }
+
+        meta_payload = json.dumps(metadata, sort_keys=True, default=json_default)
+        digest = hashlib.sha256()
+        _file_digest(digest, os.path.join(tmp_dir, WEIGHTS_FILENAME))
+        _file_digest(digest, os.path.join(tmp_dir, SCALER_FILENAME))
+        digest.update(meta_payload.encode('utf-8'))
+        content_hash = digest.hexdigest()
+
+        with open(os.path.join(tmp_dir, META_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format_version': ARTIFACT_FORMAT_VERSION,
+                'content_hash': content_hash,
+                'metadata': json.loads(meta_payload)
+            }, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_dir, path)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return content_hash
+
+
+def is_artifact_dir(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILENAME))
+
+
+class ModelArtifact(MutableMapping):
+    """
+    延遲載入的模型 artifact，介面與舊的 artifact dict 相同
+
+    model_state_dict / scaler 在第一次存取時才從磁碟載入（權重為 mmap）；
+    pickle 時只帶路徑與 metadata，送到 worker process 後在該程序內延遲載入。
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILENAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format: {meta.get('format_version')}")
+
+        self.path = path
+        self.content_hash = meta['content_hash']
+        self._data: Dict[str, Any] = meta['metadata']
+        self._loaded: Dict[str, Any] = {}
+
+    def _load(self, key: str) -> Any:
+        if key == 'model_state_dict':
+            import torch
+            return torch.load(os.path.join(self.path, WEIGHTS_FILENAME), map_location='cpu',
+                              weights_only=True, mmap=True)
+
+        from sklearn.preprocessing import StandardScaler
+        params = self._data['scaler_params']
+        scaler = StandardScaler(with_mean=params['with_mean'], with_std=params['with_std'])
+        with np.load(os.path.join(self.path, SCALER_FILENAME), allow_pickle=False) as arrays:
+            for name in arrays.files:
+                setattr(scaler, name, arrays[name])
+        scaler.n_features_in_ = params['n_features_in_']
+        return scaler
+
+    def __getitem__(self, key: str) -> Any:
+        if key in LAZY_KEYS and key not in self._data:
+            if key not in self._loaded:
+                self._loaded[key] = self._load(key)
+            return self._loaded[key]
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._data[key] = value
+
+    def __delitem__(self, key: str):
+        del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        # 不觸發延遲載入
+        return key in self._data or key in LAZY_KEYS
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._data
+        yield from (key for key in LAZY_KEYS if key not in self._data)
+
+    def __len__(self) -> int:
+        return len(self._data) + sum(1 for key in LAZY_KEYS if key not in self._data)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'path': self.path, 'content_hash': self.content_hash, '_data': self._data, '_loaded': {}}
+
+
+def load_artifact(path: str) -> ModelArtifact:
+    """讀取 artifact 目錄（只解析 meta.json）"""
+    return ModelArtifact(path)
+
+
+class ModelCache:
+    """以 content_hash 為 key 的已重建模型 LRU（每個 process 各一份）"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        if max_entries is None:
+            max_entries = int(os.getenv('CASE_STUDY_MODEL_CACHE_SIZE', DEFAULT_MODEL_CACHE_SIZE))
+        self.max_entries = max_entries
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, content_hash: str, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            model = self._models.get(content_hash)
+            if model is not None:
+                self._models.move_to_end(content_hash)
+                logger.info(f"♻️ Reusing reconstructed model {content_hash[:12]} from in-process cache")
+                return model
+
+        model = build()
+        with self._lock:
+            self._models[content_hash] = model
+            self._models.move_to_end(content_hash)
+            while len(self._models) > self.max_entries:
+                self._models.popitem(last=False)
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """取得此 process 共用的模型 LRU（大小可由 CASE_STUDY_MODEL_CACHE_SIZE 設定）"""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache()
+    return _model_cache
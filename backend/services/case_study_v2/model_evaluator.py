@@ -7,14 +7,13 @@ Uses shared model definitions and follows exact training SOP
 import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import pickle
 import os
 import json
 import numpy as np
 import pandas as pd
 import glob
-import sqlite3
 import torch
 from sklearn.metrics import (
     f1_score, precision_score, recall_score, accuracy_score,
@@ -26,11 +25,18 @@ from .models import StartEvaluationJobRequest
 from .database import DatabaseManager
 from .shared_models import (
     LSTMPULearningModel,
-    extract_temporal_features,
+    extract_model_inputs,
     get_feature_names,
+    get_input_mode,
     load_model_artifacts,
-    reconstruct_model
+    reconstruct_model,
+    to_model_input
 )
+from .nnpu_engine import predict_in_chunks
+from .sqlite_repository import get_sqlite_repository
+from .job_executor import JobContext, JOB_KIND_EVALUATION, get_job_executor
+from .feature_cache import FeatureCache, get_feature_cache
+from .model_artifact import ARTIFACT_SUFFIX
 
 logger = logging.getLogger(__name__)
 
@@ -109,8 +115,10 @@ class ModelEvaluator:
             potential_model_files = []
 
             # Pattern 1: Real model from _real_training_process (PREFERRED)
+            # 結構化 artifact 目錄（.model）與舊版 pickle（.pkl）
             import glob
-            pattern1_files = glob.glob(os.path.join(models_base_dir, f"real_model_{trained_model_id}*.pkl"))
+            pattern1_files = glob.glob(os.path.join(models_base_dir, f"real_model_{trained_model_id}*{ARTIFACT_SUFFIX}"))
+            pattern1_files += glob.glob(os.path.join(models_base_dir, f"real_model_{trained_model_id}*.pkl"))
             potential_model_files.extend(pattern1_files)
 
             # Pattern 2: Complete model package from _save_model_artifact (FALLBACK)
@@ -137,16 +145,20 @@ class ModelEvaluator:
 
             await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Found model file: {os.path.basename(model_path)}")
 
-            # 🆕 模型檔案證明 - 計算檔案 SHA256 Hash 值
-            import hashlib
-            with open(model_path, "rb") as f:
-                file_hash = hashlib.sha256(f.read()).hexdigest()
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model file SHA256: {file_hash}")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model file size: {os.path.getsize(model_path)} bytes")
-
             # Use shared function to load artifacts with validation
             artifacts = load_model_artifacts(model_path)
 
+            # 🆕 模型檔案證明 - 結構化 artifact 使用保存時計算的 content hash，舊版 pickle 計算檔案 SHA256
+            content_hash = getattr(artifacts, 'content_hash', None)
+            if content_hash:
+                await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model artifact content SHA256: {content_hash}")
+            else:
+                import hashlib
+                with open(model_path, "rb") as f:
+                    file_hash = hashlib.sha256(f.read()).hexdigest()
+                await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model file SHA256: {file_hash}")
+                await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model file size: {os.path.getsize(model_path)} bytes")
+
             await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model artifacts loaded successfully")
             await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Feature count: {len(artifacts.get('feature_names', []))}")
 
@@ -246,9 +258,7 @@ class ModelEvaluator:
                                                 window_size: int, scaler, feature_names: List[str]) -> Dict[str, Any]:
         """Prepare test data from training holdout split"""
         # Step 2: Load RAW data from database (same as trainer)
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        repository = get_sqlite_repository()
 
         try:
             # Get training data info to understand data sources
@@ -277,13 +287,7 @@ class ModelEvaluator:
             positive_data = []
             if positive_dataset_ids:
                 for dataset_id in positive_dataset_ids:
-                    cursor.execute('''
-                        SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2
-                        FROM analysis_ready_data
-                        WHERE dataset_id = ? AND is_positive_label = 1
-                        ORDER BY timestamp
-                    ''', (dataset_id,))
-                    rows = cursor.fetchall()
+                    rows = await repository.load_positive_samples(dataset_id)
                     for row in rows:
                         # Keep timestamp: [timestamp, features..., label]
                         positive_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 1])
@@ -293,14 +297,7 @@ class ModelEvaluator:
             if unlabeled_dataset_ids:
                     for dataset_id in unlabeled_dataset_ids:
                         sample_limit = int(10000 * u_sample_ratio)
-                        cursor.execute('''
-                            SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2
-                            FROM analysis_ready_data
-                            WHERE dataset_id = ? AND (is_positive_label = 0 OR is_positive_label IS NULL)
-                            ORDER BY timestamp
-                            LIMIT ?
-                        ''', (dataset_id, sample_limit))
-                        rows = cursor.fetchall()
+                        rows = await repository.load_unlabeled_samples(dataset_id, sample_limit)
                         for row in rows:
                             # Treat as unlabeled (label = 0): [timestamp, features..., label]
                             unlabeled_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 0])
@@ -334,7 +331,9 @@ class ModelEvaluator:
             await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test time range: {test_df['timestamp'].min()} to {test_df['timestamp'].max()}")
 
             # Step 7: Apply SAME feature engineering as trainer
-            X_test, y_test, test_timestamps = extract_temporal_features(test_df, window_size, "test")
+            X_test, y_test, test_timestamps = await self._extract_test_features(
+                job_id, test_df, window_size, get_input_mode(model_artifacts['model_config'])
+            )
 
             if len(X_test) == 0:
                 raise ValueError(f"No features extracted from test set with window_size={window_size}")
@@ -353,7 +352,7 @@ class ModelEvaluator:
                 'feature_names': feature_names,
                 'test_df_info': {
                     'total_samples': len(test_df),
-                    'windowed_samples': len(X_test_scaled),
+                    'windowed_samples': len(y_test),
                     'positive_ratio': np.sum(y_test == 1) / len(y_test) if len(y_test) > 0 else 0
                 }
             }
@@ -363,8 +362,6 @@ class ModelEvaluator:
             await self._log(job_id, error_msg)
             logger.error(error_msg)
             raise
-        finally:
-            conn.close()
 
     async def _load_holdout_test_data(self, job_id: str, trained_model) -> Dict[str, Any]:
         """Load held-out test data from the same experiment as the training"""
@@ -623,65 +620,6 @@ class ModelEvaluator:
             # NO FALLBACKS - fail fast and report the real issue
             raise
 
-    async def _predict_pytorch_lstm(self, job_id: str, model: LSTMPULearningModel, X_test: np.ndarray) -> tuple:
-        """
-        Make predictions using PyTorch LSTM model - STRICT mode, no automatic fixes
-        """
-        import torch
-
-        try:
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Making predictions with LSTM model...")
-            await self._log(job_id, f"       Input shape: {X_test.shape}")
-            await self._log(job_id, f"       Model expects input size: {model.input_size}")
-
-            # Verify input dimensions MATCH model expectations
-            if X_test.shape[1] != model.input_size:
-                error_msg = f"CRITICAL ERROR: Feature dimension mismatch. Model expects {model.input_size}, got {X_test.shape[1]}"
-                await self._log(job_id, f"ERROR: {error_msg}")
-                raise ValueError(error_msg)
-
-            # Convert to tensor
-            X_tensor = torch.FloatTensor(X_test)
-            await self._log(job_id, f"       Tensor shape: {X_tensor.shape}")
-
-            # Set model to evaluation mode
-            model.eval()
-
-            with torch.no_grad():
-                # Get model outputs
-                outputs = model(X_tensor)
-
-                # Extract probabilities
-                if outputs.dim() > 1:
-                    y_prob_positive = outputs.squeeze().numpy()
-                else:
-                    y_prob_positive = outputs.numpy()
-
-                # Convert to binary predictions (threshold = 0.5)
-                y_pred = (y_prob_positive > 0.5).astype(int)
-
-            await self._log(job_id, f"       Prediction completed: {len(y_pred)} samples")
-            await self._log(job_id, f"       Probability range: [{y_prob_positive.min():.4f}, {y_prob_positive.max():.4f}]")
-
-            # 🆕 預測結果抽樣檢查 - 記錄頭尾幾個樣本的預測機率
-            if len(y_prob_positive) > 5:
-                await self._log(job_id, f"       Prediction probability samples (first 5): {np.round(y_prob_positive[:5], 4)}")
-                await self._log(job_id, f"       Prediction probability samples (last 5): {np.round(y_prob_positive[-5:], 4)}")
-            # 增加預測分佈統計
-            positive_predictions = np.sum(y_pred == 1)
-            await self._log(job_id, f"       Binary predictions: Positive={positive_predictions}/{len(y_pred)} ({positive_predictions/len(y_pred)*100:.1f}%)")
-            # 增加機率分佈統計
-            prob_quartiles = np.percentile(y_prob_positive, [25, 50, 75])
-            await self._log(job_id, f"       Probability quartiles: Q1={prob_quartiles[0]:.4f}, Median={prob_quartiles[1]:.4f}, Q3={prob_quartiles[2]:.4f}")
-
-            return y_pred, y_prob_positive
-
-        except Exception as e:
-            error_msg = f"PyTorch LSTM prediction failed: {str(e)}"
-            await self._log(job_id, f"ERROR: [Evaluation Job: {job_id}] {error_msg}")
-            logger.error(error_msg)
-            raise
-
     async def _predict_sklearn_model(self, job_id: str, model, X_test_processed: np.ndarray) -> tuple:
         """Make predictions using scikit-learn model"""
         try:
@@ -724,37 +662,20 @@ class ModelEvaluator:
             y_test = test_data['y']
             feature_names = test_data.get('feature_names', get_feature_names())
 
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test set: {len(X_test)} samples, {X_test.shape[1]} features")
-
-            # Reconstruct model using shared implementation (NO FALLBACKS)
-            model = reconstruct_model(model_artifacts)
+            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test set: {len(y_test)} samples, {X_test.shape[1]} features")
 
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model reconstructed successfully")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Model architecture: {model.input_size} -> {model.hidden_size} -> 1")
-
-            # Make predictions with PyTorch LSTM model (STRICT dimension checking)
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Generating predictions...")
-            y_pred, y_prob_positive = await self._predict_pytorch_lstm(job_id, model, X_test)
-
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Prediction completed")
-            await self._log(job_id, f"       Predicted positive: {np.sum(y_pred == 1)}/{len(y_pred)}")
-            await self._log(job_id, f"       Actual positive: {np.sum(y_test == 1)}/{len(y_test)}")
-
-            # Calculate comprehensive metrics
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Calculating performance metrics...")
-            metrics = self._calculate_comprehensive_metrics(
-                y_test, y_pred, y_prob_positive, getattr(config, 'scenario_type', 'ERM_BASELINE')
+            # Reconstruct, predict and score in a worker process (NO FALLBACKS)
+            scored = await get_job_executor().run(
+                job_id, JOB_KIND_EVALUATION, score_lstm_model,
+                model_artifacts, X_test, y_test, getattr(config, 'scenario_type', 'ERM_BASELINE')
             )
+            y_pred = scored['y_pred']
+            metrics = scored['metrics']
 
             # Add model-specific metadata
             metrics['model_info'] = {
                 'model_type': 'LSTM_PU_Learning',
-                'model_architecture': {
-                    'input_size': model.input_size,
-                    'hidden_size': model.hidden_size,
-                    'num_layers': model.num_layers,
-                    'dropout': model.dropout if hasattr(model, 'dropout') else 0.2
-                },
+                'model_architecture': scored['model_architecture'],
                 'feature_names': feature_names,
                 'evaluation_method': 'shared_model_strict_consistency'
             }
@@ -792,8 +713,9 @@ class ModelEvaluator:
             # NO FALLBACKS - fail fast and report the real issue
             raise
 
-    def _calculate_comprehensive_metrics(self, y_true: np.ndarray, y_pred: np.ndarray,
-                                       y_prob: np.ndarray = None, scenario_type: str = "ERM_BASELINE") -> Dict[str, Any]:
+    @staticmethod
+    def _calculate_comprehensive_metrics(y_true: np.ndarray, y_pred: np.ndarray,
+                                         y_prob: np.ndarray = None, scenario_type: str = "ERM_BASELINE") -> Dict[str, Any]:
         """Calculate comprehensive evaluation metrics"""
 
         try:
@@ -901,6 +823,13 @@ class ModelEvaluator:
                 'evaluation_date': datetime.now().isoformat()
             }
 
+    async def _extract_test_features(self, job_id: str, test_df: pd.DataFrame, window_size: int,
+                                     input_mode: Optional[str] = None) -> tuple:
+        """Run the model's input extraction (temporal features or sequence channels) for a test split in a worker process"""
+        return await get_job_executor().run(
+            job_id, JOB_KIND_EVALUATION, extract_test_features, test_df, window_size, input_mode
+        )
+
     async def _log(self, job_id: str, message: str):
         """Send log message via WebSocket if available"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -1002,85 +931,80 @@ class ModelEvaluator:
         """Fallback method to prepare test data when no dataset IDs are available"""
         await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Using fallback test data preparation")
 
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        try:
-            # Load recent data from analysis_ready_data table
-            cursor.execute('''
-                SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2,
-                       COALESCE(is_positive_label, 0) as label
-                FROM analysis_ready_data
-                WHERE timestamp IS NOT NULL
-                ORDER BY timestamp DESC
-                LIMIT 10000
-            ''')
-            rows = cursor.fetchall()
-
-            if not rows:
-                raise ValueError("No data found in analysis_ready_data table")
-
-            # Convert to DataFrame
-            df = pd.DataFrame(rows, columns=['timestamp', 'wattage_total', 'wattage_110v', 'wattage_220v', 'raw_l1', 'raw_l2', 'label'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp').reset_index(drop=True)
+        repository = get_sqlite_repository()
 
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Loaded {len(df)} samples from fallback data")
+        # Load recent data from analysis_ready_data table
+        rows = await repository.load_labeled_samples(limit=10000, newest_first=True)
 
-            # Use the last 20% as test data
-            test_start = int(len(df) * 0.8)
-            test_df = df.iloc[test_start:].copy().reset_index(drop=True)
+        if not rows:
+            raise ValueError("No data found in analysis_ready_data table")
 
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Using last 20% as test set: {len(test_df)} samples")
+        # Convert to DataFrame
+        df = pd.DataFrame(rows, columns=['timestamp', 'wattage_total', 'wattage_110v', 'wattage_220v', 'raw_l1', 'raw_l2', 'label'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values('timestamp').reset_index(drop=True)
 
-            # Apply feature engineering
-            X_test, y_test, test_timestamps = extract_temporal_features(test_df, window_size, "test")
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Loaded {len(df)} samples from fallback data")
 
-            if len(X_test) == 0:
-                raise ValueError(f"No features extracted from test set with window_size={window_size}")
+        # Use the last 20% as test data
+        test_start = int(len(df) * 0.8)
+        test_df = df.iloc[test_start:].copy().reset_index(drop=True)
 
-            # Apply saved scaler
-            X_test_scaled = scaler.transform(X_test)
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Using last 20% as test set: {len(test_df)} samples")
 
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Applied saved scaler to test features")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Final test shape: {X_test_scaled.shape}")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test labels: Positive={np.sum(y_test==1)}, Negative={np.sum(y_test==0)}")
+        # Apply feature engineering
+        X_test, y_test, test_timestamps = await self._extract_test_features(
+            job_id, test_df, window_size, get_input_mode(model_artifacts['model_config'])
+        )
 
-            return {
-                'X': X_test_scaled,
-                'y': y_test,
-                'timestamps': test_timestamps,
-                'feature_names': feature_names,
-                'test_df_info': {
-                    'total_samples': len(test_df),
-                    'windowed_samples': len(X_test_scaled),
-                    'positive_ratio': np.sum(y_test == 1) / len(y_test) if len(y_test) > 0 else 0
-                }
+        if len(X_test) == 0:
+            raise ValueError(f"No features extracted from test set with window_size={window_size}")
+
+        # Apply saved scaler
+        X_test_scaled = scaler.transform(X_test)
+
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Applied saved scaler to test features")
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Final test shape: {X_test_scaled.shape}")
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test labels: Positive={np.sum(y_test==1)}, Negative={np.sum(y_test==0)}")
+
+        return {
+            'X': X_test_scaled,
+            'y': y_test,
+            'timestamps': test_timestamps,
+            'feature_names': feature_names,
+            'test_df_info': {
+                'total_samples': len(test_df),
+                'windowed_samples': len(y_test),
+                'positive_ratio': np.sum(y_test == 1) / len(y_test) if len(y_test) > 0 else 0
             }
+        }
 
-        finally:
-            conn.close()
 
     async def _prepare_target_dataset_test_data(self, job_id: str, dataset_id: str, model_artifacts: Dict,
                                               window_size: int, scaler, feature_names: List[str]) -> Dict[str, Any]:
         """Prepare test data from a specific target dataset for cross-domain evaluation"""
         await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Loading target dataset: {dataset_id}")
 
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        try:
+        repository = get_sqlite_repository()
+        feature_cache = get_feature_cache()
+        feature_cache_key = FeatureCache.make_key(
+            purpose='dataset_full',
+            dataset_id=dataset_id,
+            fingerprint=await repository.dataset_fingerprint(dataset_id),
+            window_size=window_size,
+            input_mode=get_input_mode(model_artifacts['model_config'])
+        )
+        cached = feature_cache.load(feature_cache_key)
+
+        if cached is not None:
+            arrays, cache_info = cached
+            X_test, y_test = arrays['X'], np.array(arrays['y'])
+            test_timestamps = pd.to_datetime(arrays['timestamps']).tolist()
+            total_samples = cache_info['total_samples']
+            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Reusing cached features for dataset {dataset_id} (window_size={window_size})")
+        else:
             # Load all data from the specified dataset
-            cursor.execute('''
-                SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2,
-                       COALESCE(is_positive_label, 0) as label
-                FROM analysis_ready_data
-                WHERE dataset_id = ?
-                ORDER BY timestamp
-            ''', (dataset_id,))
-            rows = cursor.fetchall()
+            rows = await repository.load_labeled_samples(dataset_id)
 
             if not rows:
                 raise ValueError(f"No data found for dataset {dataset_id}")
@@ -1103,31 +1027,153 @@ class ModelEvaluator:
             test_df = df.copy()
 
             # Apply feature engineering
-            X_test, y_test, test_timestamps = extract_temporal_features(test_df, window_size, "test")
+            X_test, y_test, test_timestamps = await self._extract_test_features(
+                job_id, test_df, window_size, get_input_mode(model_artifacts['model_config'])
+            )
 
             if len(X_test) == 0:
                 raise ValueError(f"No features extracted from dataset with window_size={window_size}")
 
-            # Apply saved scaler
-            X_test_scaled = scaler.transform(X_test)
-
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Applied saved scaler to target dataset")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Final test shape: {X_test_scaled.shape}")
-            await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test labels: Positive={np.sum(y_test==1)}, Negative={np.sum(y_test==0)}")
+            total_samples = len(test_df)
+            feature_cache.store(
+                feature_cache_key,
+                {
+                    'X': X_test,
+                    'y': y_test,
+                    'timestamps': pd.to_datetime(test_timestamps).to_numpy(dtype='datetime64[ns]')
+                },
+                dataset_ids=[dataset_id],
+                extra={'total_samples': total_samples}
+            )
 
-            return {
-                'X': X_test_scaled,
-                'y': y_test,
-                'timestamps': test_timestamps,
-                'feature_names': feature_names,
-                'test_df_info': {
-                    'total_samples': len(test_df),
-                    'windowed_samples': len(X_test_scaled),
-                    'positive_ratio': np.sum(y_test == 1) / len(y_test) if len(y_test) > 0 else 0
-                }
+        # Apply saved scaler
+        X_test_scaled = scaler.transform(X_test)
+
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Applied saved scaler to target dataset")
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Final test shape: {X_test_scaled.shape}")
+        await self._log(job_id, f"INFO: [Evaluation Job: {job_id}] Test labels: Positive={np.sum(y_test==1)}, Negative={np.sum(y_test==0)}")
+
+        return {
+            'X': X_test_scaled,
+            'y': y_test,
+            'timestamps': test_timestamps,
+            'feature_names': feature_names,
+            'test_df_info': {
+                'total_samples': total_samples,
+                'windowed_samples': len(y_test),
+                'positive_ratio': np.sum(y_test == 1) / len(y_test) if len(y_test) > 0 else 0
             }
+        }
+
+
+# ========== Worker-process functions (run via JobExecutor) ==========
+
+def extract_test_features(job: JobContext, test_df: pd.DataFrame, window_size: int,
+                          input_mode: Optional[str] = None) -> tuple:
+    """Apply the trainer's input extraction (temporal features or sequence channels) to a test split"""
+    return extract_model_inputs(test_df, window_size, input_mode, "test")
+
 
-        finally:
-            conn.close()
+def predict_lstm(job: JobContext, model: LSTMPULearningModel, X_test: np.ndarray,
+                 window_size: Optional[int] = None, input_mode: Optional[str] = None) -> tuple:
+    """
+    Make predictions using PyTorch LSTM model - STRICT mode, no automatic fixes
 
+    In sequence mode X_test holds the scaled channel rows; windows are zero-copy
+    views and inference runs in chunks.
+    """
+    job_id = job.job_id
 
+    try:
+        job.log(f"INFO: [Evaluation Job: {job_id}] Making predictions with LSTM model...")
+        job.log(f"       Input shape: {X_test.shape}")
+        job.log(f"       Model expects input size: {model.input_size}")
+
+        # Verify input dimensions MATCH model expectations
+        if X_test.shape[1] != model.input_size:
+            error_msg = f"CRITICAL ERROR: Feature dimension mismatch. Model expects {model.input_size}, got {X_test.shape[1]}"
+            job.log(f"ERROR: {error_msg}")
+            raise ValueError(error_msg)
+
+        # Convert to tensor
+        X_tensor = to_model_input(X_test, window_size, input_mode)
+        job.log(f"       Tensor shape: {tuple(X_tensor.shape)}")
+
+        with torch.no_grad():
+            # Get model outputs (eval mode, chunked)
+            outputs = predict_in_chunks(model, X_tensor)
+
+            # Extract probabilities
+            if outputs.dim() > 1:
+                y_prob_positive = outputs.squeeze().numpy()
+            else:
+                y_prob_positive = outputs.numpy()
+
+            # Convert to binary predictions (threshold = 0.5)
+            y_pred = (y_prob_positive > 0.5).astype(int)
+
+        job.log(f"       Prediction completed: {len(y_pred)} samples")
+        job.log(f"       Probability range: [{y_prob_positive.min():.4f}, {y_prob_positive.max():.4f}]")
+
+        # 🆕 預測結果抽樣檢查 - 記錄頭尾幾個樣本的預測機率
+        if len(y_prob_positive) > 5:
+            job.log(f"       Prediction probability samples (first 5): {np.round(y_prob_positive[:5], 4)}")
+            job.log(f"       Prediction probability samples (last 5): {np.round(y_prob_positive[-5:], 4)}")
+        # 增加預測分佈統計
+        positive_predictions = np.sum(y_pred == 1)
+        job.log(f"       Binary predictions: Positive={positive_predictions}/{len(y_pred)} ({positive_predictions/len(y_pred)*100:.1f}%)")
+        # 增加機率分佈統計
+        prob_quartiles = np.percentile(y_prob_positive, [25, 50, 75])
+        job.log(f"       Probability quartiles: Q1={prob_quartiles[0]:.4f}, Median={prob_quartiles[1]:.4f}, Q3={prob_quartiles[2]:.4f}")
+
+        return y_pred, y_prob_positive
+
+    except Exception as e:
+        error_msg = f"PyTorch LSTM prediction failed: {str(e)}"
+        job.log(f"ERROR: [Evaluation Job: {job_id}] {error_msg}")
+        logger.error(error_msg)
+        raise
+
+
+def score_lstm_model(job: JobContext, model_artifacts: Dict[str, Any], X_test: np.ndarray,
+                     y_test: np.ndarray, scenario_type: str = "ERM_BASELINE") -> Dict[str, Any]:
+    """
+    Reconstruct the trained LSTM, predict on the test set and compute metrics
+
+    Returns:
+        Dict: y_pred, y_prob_positive, metrics, model_architecture
+    """
+    job_id = job.job_id
+
+    # Reconstruct model using shared implementation (NO FALLBACKS)
+    model = reconstruct_model(model_artifacts)
+
+    job.log(f"INFO: [Evaluation Job: {job_id}] Model reconstructed successfully")
+    job.log(f"INFO: [Evaluation Job: {job_id}] Model architecture: {model.input_size} -> {model.hidden_size} -> 1")
+
+    # Make predictions with PyTorch LSTM model (STRICT dimension checking)
+    job.log(f"INFO: [Evaluation Job: {job_id}] Generating predictions...")
+    model_config = model_artifacts.get('model_config', {})
+    y_pred, y_prob_positive = predict_lstm(
+        job, model, X_test, model_config.get('windowSize'), get_input_mode(model_config)
+    )
+
+    job.log(f"INFO: [Evaluation Job: {job_id}] Prediction completed")
+    job.log(f"       Predicted positive: {np.sum(y_pred == 1)}/{len(y_pred)}")
+    job.log(f"       Actual positive: {np.sum(y_test == 1)}/{len(y_test)}")
+
+    # Calculate comprehensive metrics
+    job.log(f"INFO: [Evaluation Job: {job_id}] Calculating performance metrics...")
+    metrics = ModelEvaluator._calculate_comprehensive_metrics(y_test, y_pred, y_prob_positive, scenario_type)
+
+    return {
+        'y_pred': y_pred,
+        'y_prob_positive': y_prob_positive,
+        'metrics': metrics,
+        'model_architecture': {
+            'input_size': model.input_size,
+            'hidden_size': model.hidden_size,
+            'num_layers': model.num_layers,
+            'dropout': model.dropout if hasattr(model, 'dropout') else 0.2
+        }
+    }
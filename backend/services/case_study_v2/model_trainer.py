@@ -7,16 +7,27 @@ Uses shared model definitions for consistency with evaluator
 import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import random
-import pickle
+import json
 import os
 import numpy as np
 
 from .models import StartTrainingJobRequest
 from .database import DatabaseManager
 from .data_preprocessing_pipeline import DataPreprocessingPipeline
-from .shared_models import LSTMPULearningModel, extract_temporal_features, get_feature_names
+from .shared_models import (
+    LSTMPULearningModel,
+    SEQUENCE_INPUT_MODE,
+    extract_model_inputs,
+    get_feature_names,
+    get_input_mode,
+    to_model_input
+)
+from .sqlite_repository import SQLiteRepository, get_sqlite_repository
+from .job_executor import JobContext, JobCancelledError, JOB_KIND_TRAINING, get_job_executor
+from .feature_cache import FeatureCache, get_feature_cache
+from .model_artifact import ARTIFACT_SUFFIX, json_default, save_artifact
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +41,6 @@ def get_taiwan_time() -> datetime:
 class ModelTrainer:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
-        self._last_best_f1_score = 0.0  # Track the best F1 score from training
-        self._training_metrics = {}  # Store actual training metrics
-        self._preprocessing_pipeline = None  # Store the preprocessing pipeline
 
     async def train_model(self, job_id: str, trained_model_id: str, config: StartTrainingJobRequest, training_data_info: dict = None):
         """
@@ -50,13 +58,13 @@ class ModelTrainer:
             await self.db_manager.update_trained_model(trained_model_id, 'RUNNING')
             logger.info(f"✅ Model status updated to RUNNING")
 
-            # Real training process
-            await self._real_training_process(job_id, trained_model_id, config, training_data_info)
+            # Real training process（結果只屬於此 job：並行的訓練工作共用同一個 ModelTrainer）
+            result = await self._real_training_process(job_id, trained_model_id, config, training_data_info)
 
             # Generate comprehensive metrics
-            training_metrics = await self._generate_training_metrics(config)
-            validation_metrics = await self._generate_validation_metrics(config)
-            model_path = await self._save_model_artifact(trained_model_id, config)
+            training_metrics = await self._generate_training_metrics(config, result)
+            validation_metrics = await self._generate_validation_metrics(config, result)
+            model_path = await self._save_model_artifact(trained_model_id, config, result)
 
             await self.db_manager.update_trained_model(
                 trained_model_id,
@@ -70,10 +78,15 @@ class ModelTrainer:
 
             logger.info("="*80)
             logger.info(f"✅ TRAINING JOB COMPLETED SUCCESSFULLY: {job_id}")
-            logger.info(f"   🎯 Final F1 Score: {self._last_best_f1_score:.4f}")
+            logger.info(f"   🎯 Final F1 Score: {result['best_val_f1']:.4f}")
             logger.info(f"   📁 Model saved to: {model_path}")
             logger.info("="*80)
 
+        except JobCancelledError:
+            logger.warning(f"🛑 TRAINING JOB CANCELLED: {job_id}")
+            await self.db_manager.update_trained_model(trained_model_id, 'FAILED')
+            raise
+
         except Exception as e:
             logger.error("="*80)
             logger.error(f"❌ TRAINING JOB FAILED: {job_id}")
@@ -81,35 +94,25 @@ class ModelTrainer:
             logger.error("="*80)
             await self.db_manager.update_trained_model(trained_model_id, 'FAILED')
 
-    async def _real_training_process(self, job_id: str, model_id: str, config: StartTrainingJobRequest, training_data_info: dict = None):
-        """Real PU Learning training process with proper time-series handling and LSTM architecture"""
+    async def _real_training_process(self, job_id: str, model_id: str, config: StartTrainingJobRequest, training_data_info: dict = None) -> Dict[str, Any]:
+        """
+        Real PU Learning training process with proper time-series handling and LSTM architecture
+
+        Returns:
+            Dict: fit_nnpu_model 的結果（best_val_f1, training_metrics, preprocessing_pipeline, model_path）
+        """
         logger.info("🔬 STARTING REAL TRAINING PROCESS (TIME-SERIES CORRECTED)")
         logger.info(f"   🆔 Job ID: {job_id}")
         logger.info(f"   🧠 Model ID: {model_id}")
         logger.info("   🚨 FIXES: Time-based split + LSTM architecture")
         logger.info("-"*60)
 
-        import sqlite3
-        import json
-        import numpy as np
-        import torch
-        import torch.nn as nn
-        import torch.optim as optim
-        from sklearn.preprocessing import StandardScaler
-        from sklearn.metrics import f1_score, precision_score, recall_score
-        import pandas as pd
-        from datetime import datetime, timedelta
-
         # 1. 資料載入 - 從資料庫獲取實際訓練資料
         logger.info("📂 Loading training data from database...")
-        db_path = '/home/infowin/Git-projects/pu-in-practice/backend/database/prisma/pu_practice.db'
-        conn = sqlite3.connect(db_path)
-        logger.info(f"   🔗 Connected to database: {db_path}")
+        repository = get_sqlite_repository()
+        logger.info(f"   🔗 Using database: {repository.db_path}")
 
         try:
-            # 取得實驗資料
-            cursor = conn.cursor()
-
             # 從 training_data_info 獲取資料來源配置
             if training_data_info:
                 positive_dataset_ids = training_data_info.get('p_data_sources', {}).get('dataset_ids', [])
@@ -122,615 +125,54 @@ class ModelTrainer:
                 split_ratios = {'train': 0.7, 'validation': 0.2, 'test': 0.1}
                 u_sample_ratio = 0.1
 
-            # 載入正樣本資料 - 保留時間戳
-            positive_data = []
-            if positive_dataset_ids:
-                logger.info(f"📊 Loading positive samples from datasets: {positive_dataset_ids}")
-                for dataset_id in positive_dataset_ids:
-                    cursor.execute('''
-                        SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2
-                        FROM analysis_ready_data
-                        WHERE dataset_id = ? AND is_positive_label = 1
-                        ORDER BY timestamp
-                    ''', (dataset_id,))
-                    rows = cursor.fetchall()
-                    dataset_positive_count = len(rows)
-                    logger.info(f"  📈 Dataset {dataset_id}: {dataset_positive_count} positive samples")
-                    for row in rows:
-                        # 保留時間戳：[timestamp, features..., label]
-                        positive_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 1])  # 包含 timestamp
-
-            # 載入未標記資料 (作為負樣本) - 保留時間戳
-            unlabeled_data = []
-            if unlabeled_dataset_ids:
-                logger.info(f"📊 Loading unlabeled samples from datasets: {unlabeled_dataset_ids}")
-                logger.info(f"  🎯 U-sample ratio: {u_sample_ratio}")
-                for dataset_id in unlabeled_dataset_ids:
-                    sample_limit = int(10000 * u_sample_ratio)
-                    logger.info(f"  📉 Dataset {dataset_id}: sampling up to {sample_limit} unlabeled samples")
-                    cursor.execute('''
-                        SELECT timestamp, wattage_total, wattage_110v, wattage_220v, raw_wattage_l1, raw_wattage_l2
-                        FROM analysis_ready_data
-                        WHERE dataset_id = ? AND (is_positive_label = 0 OR is_positive_label IS NULL)
-                        ORDER BY timestamp
-                        LIMIT ?
-                    ''', (dataset_id, sample_limit))
-                    rows = cursor.fetchall()
-                    dataset_unlabeled_count = len(rows)
-                    logger.info(f"  📉 Dataset {dataset_id}: {dataset_unlabeled_count} unlabeled samples loaded")
-                    for row in rows:
-                        # 保留時間戳：[timestamp, features..., label]
-                        unlabeled_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 0])  # 包含 timestamp
-
-
-            if len(positive_data) == 0 or len(unlabeled_data) == 0:
-                raise Exception("Insufficient training data: need both positive and unlabeled samples")
-
-            logger.info(f"📊 Data Summary:")
-            logger.info(f"  ✅ Positive samples: {len(positive_data)}")
-            logger.info(f"  ❓ Unlabeled samples: {len(unlabeled_data)}")
-            logger.info(f"  📏 Total samples: {len(positive_data) + len(unlabeled_data)}")
-            logger.info(f"  🎯 Class balance: P={len(positive_data)/(len(positive_data)+len(unlabeled_data)):.3f}, U={len(unlabeled_data)/(len(positive_data)+len(unlabeled_data)):.3f}")
-
-            # 2. 資料預處理 - 使用統一的資料處理管道並保持時間順序
-            logger.info("🔧 Starting data preprocessing with unified pipeline (time-aware)...")
-
-            # 🚨 關鍵修正：合併資料時保留時間戳，然後按時間排序
-            logger.info("  📅 Combining data and preserving temporal order...")
-            all_data = positive_data + unlabeled_data
-
-            # 創建包含時間戳的 DataFrame
-            df = pd.DataFrame(all_data, columns=[
-                'timestamp', 'wattage_total', 'wattage_110v', 'wattage_220v', 'raw_l1', 'raw_l2', 'label'
-            ])
-            logger.info(f"  📋 Combined dataframe shape: {df.shape}")
-
-            # 將時間戳轉換為 datetime 格式
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-            # 🚨 最關鍵步驟：嚴格按時間戳排序，恢復正確的時間序列順序
-            logger.info("  ⏰ CRITICAL: Sorting data by timestamp to preserve sequence for LSTM...")
-            df_before_sort = df.copy()
-            df = df.sort_values(by='timestamp').reset_index(drop=True)
-
-            # 驗證排序效果
-            time_span = df['timestamp'].max() - df['timestamp'].min()
-            logger.info(f"  ✅ Data sorted successfully:")
-            logger.info(f"    📅 Time range: {df['timestamp'].min()} to {df['timestamp'].max()}")
-            logger.info(f"    ⏱️ Total time span: {time_span}")
-            logger.info(f"    🔢 Sample count: {len(df)}")
-
-            # 檢查排序前後的差異
-            position_changes = (df_before_sort.index != df.index).sum()
-            logger.info(f"    🔄 Rows reordered: {position_changes} out of {len(df)}")
-
-            if position_changes > 0:
-                logger.info(f"    ⚠️ Data was NOT in chronological order - fixed by sorting")
-            else:
-                logger.info(f"    ✅ Data was already in chronological order")
-
-            # 處理缺失值
-            missing_before = df.isnull().sum().sum()
-            df = df.fillna(0)
-            missing_after = df.isnull().sum().sum()
-            logger.info(f"  🧹 Missing values handled: {missing_before} → {missing_after}")
-
-            # 🚨 修正：改進的時間分割策略 - 確保 P 和 U 樣本在所有分割中都有合理分佈
-            logger.info("🔥 CRITICAL FIX: Improved time-based split with balanced P/U distribution")
-            logger.info("  📅 Performing separate time-based split for P and U samples...")
-
-            # 獲取分割比例
-            train_ratio = split_ratios['train']
-            val_ratio = split_ratios['validation']
-            test_ratio = split_ratios['test']
-
-            # 1. 分別處理 P 和 U 樣本
-            p_df = df[df['label'] == 1].copy()  # 正樣本
-            u_df = df[df['label'] == 0].copy()  # 未標記樣本
-
-            logger.info(f"  📊 Sample distribution before split:")
-            logger.info(f"    ✅ Positive samples: {len(p_df)}")
-            logger.info(f"    ❓ Unlabeled samples: {len(u_df)}")
-
-            # 2. 對 P 樣本進行時間分割
-            p_total = len(p_df)
-            p_train_end = int(p_total * train_ratio)
-            p_val_end = int(p_total * (train_ratio + val_ratio))
-
-            p_train_df = p_df.iloc[:p_train_end].copy()
-            p_val_df = p_df.iloc[p_train_end:p_val_end].copy()
-            p_test_df = p_df.iloc[p_val_end:].copy()
-
-            # 3. 對 U 樣本進行時間分割
-            u_total = len(u_df)
-            u_train_end = int(u_total * train_ratio)
-            u_val_end = int(u_total * (train_ratio + val_ratio))
-
-            u_train_df = u_df.iloc[:u_train_end].copy()
-            u_val_df = u_df.iloc[u_train_end:u_val_end].copy()
-            u_test_df = u_df.iloc[u_val_end:].copy()
-
-            # 4. 合併成最終的數據集，保持時間順序
-            train_df = pd.concat([p_train_df, u_train_df]).sort_values(by='timestamp').reset_index(drop=True)
-            val_df = pd.concat([p_val_df, u_val_df]).sort_values(by='timestamp').reset_index(drop=True)
-            test_df = pd.concat([p_test_df, u_test_df]).sort_values(by='timestamp').reset_index(drop=True)
-
-            logger.info(f"  📊 Improved time-based split completed:")
-            logger.info(f"    🏋️ Training data: {len(train_df)} samples ({len(p_train_df)} pos, {len(u_train_df)} unlab)")
-            logger.info(f"      📅 Time range: {train_df['timestamp'].min()} to {train_df['timestamp'].max()}")
-            logger.info(f"    🎯 Validation data: {len(val_df)} samples ({len(p_val_df)} pos, {len(u_val_df)} unlab)")
-            logger.info(f"      📅 Time range: {val_df['timestamp'].min()} to {val_df['timestamp'].max()}")
-            logger.info(f"    🧪 Test data: {len(test_df)} samples ({len(p_test_df)} pos, {len(u_test_df)} unlab)")
-            logger.info(f"      📅 Time range: {test_df['timestamp'].min()} to {test_df['timestamp'].max()}")
-
-            # 5. 驗證分割品質
-            logger.info(f"  🔍 Split quality verification:")
-            logger.info(f"    📊 Training set: P={len(p_train_df)/(len(p_train_df)+len(u_train_df)):.3f}, U={len(u_train_df)/(len(p_train_df)+len(u_train_df)):.3f}")
-            logger.info(f"    📊 Validation set: P={len(p_val_df)/(len(p_val_df)+len(u_val_df)):.3f}, U={len(u_val_df)/(len(p_val_df)+len(u_val_df)):.3f}")
-            logger.info(f"    📊 Test set: P={len(p_test_df)/(len(p_test_df)+len(u_test_df)):.3f}, U={len(u_test_df)/(len(p_test_df)+len(u_test_df)):.3f}")
-            logger.info(f"    ✅ All splits now contain both P and U samples for meaningful nnPU evaluation!")
-
-            # 2. 對每個分割分別進行特徵工程（避免洩漏）- 使用共享函數確保一致性
+            # 特徵快取 key：資料集指紋 + 取樣設定 + 窗口大小（與學習率等超參數無關）
             window_size = config.training_config.windowSize
-            logger.info(f"  🔧 Applying temporal feature engineering separately to each split...")
-
-            X_train, y_train, train_timestamps = extract_temporal_features(train_df, window_size, "training")
-            X_val, y_val, val_timestamps = extract_temporal_features(val_df, window_size, "validation")
-            X_test, y_test, test_timestamps = extract_temporal_features(test_df, window_size, "test")
-
-            # 檢查是否有足夠的特徵數據
-            if len(X_train) == 0 or len(X_val) == 0 or len(X_test) == 0:
-                raise Exception("Insufficient data after feature engineering. Consider reducing window_size or increasing dataset size.")
-
-            # 3. 標準化：在訓練集上 fit，在所有集合上 transform
-            logger.info("  🔧 Applying StandardScaler (fit on train, transform on all)...")
-
-            # 創建並配置預處理管道
-            preprocessing_pipeline = DataPreprocessingPipeline(
-                window_config={
-                    "main_window_minutes": config.training_config.windowSize * 5,
-                    "short_window_minutes": config.training_config.windowSize * 2,
-                    "medium_window_minutes": config.training_config.windowSize * 5,
-                    "long_window_minutes": config.training_config.windowSize * 10
-                }
-            )
-            self._preprocessing_pipeline = preprocessing_pipeline
-
-            # 初始化並擬合 StandardScaler（只在訓練集上）
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_val_scaled = scaler.transform(X_val)
-            X_test_scaled = scaler.transform(X_test)
-
-            # 保存 scaler 到預處理管道
-            preprocessing_pipeline.scaler = scaler
-            preprocessing_pipeline.is_fitted = True
-
-            logger.info(f"  📊 Feature scaling completed:")
-            logger.info(f"    🏋️ Training: {X_train_scaled.shape} (scaled means: {np.mean(X_train_scaled, axis=0)[:4]}...)")
-            logger.info(f"    🎯 Validation: {X_val_scaled.shape}")
-            logger.info(f"    🧪 Test: {X_test_scaled.shape}")
-            logger.info(f"    ⚠️ NO DATA LEAKAGE: Scaler fitted only on training data")
-
-            logger.info(f"  📊 Data split summary:")
-            logger.info(f"    🏋️ Training set: {X_train_scaled.shape[0]} samples ({np.sum(y_train==1)} pos, {np.sum(y_train==0)} unlab)")
-            logger.info(f"    🎯 Validation set: {X_val_scaled.shape[0]} samples ({np.sum(y_val==1)} pos, {np.sum(y_val==0)} unlab)")
-            logger.info(f"    🧪 Test set: {X_test_scaled.shape[0]} samples ({np.sum(y_test==1)} pos, {np.sum(y_test==0)} unlab)")
-
-            # 4. 建立 LSTM 模型（修正：從 MLP 改為真正的 LSTM）
-            logger.info("🧠 Building LSTM model for time-series PU Learning...")
-            logger.info(f"  � ARCHITECTURE FIX: Using LSTM instead of MLP")
-            logger.info(f"  �🔧 Model configuration:")
-            logger.info(f"    📏 Input size: {X_train_scaled.shape[1]}")
-            logger.info(f"    🧩 Hidden size: {config.training_config.hiddenSize}")
-            logger.info(f"    🏗️ LSTM layers: {config.training_config.numLayers}")
-            logger.info(f"    💧 Dropout rate: {config.training_config.dropout}")
-            logger.info(f"    🎯 Optimizer: {config.training_config.optimizer}")
-            logger.info(f"    📈 Learning rate: {config.training_config.learningRate}")
-            logger.info(f"    🔒 L2 regularization: {config.training_config.l2Regularization}")
-            logger.info(f"    🎲 Batch size: {config.training_config.batchSize}")
-            logger.info(f"    🔄 Max epochs: {config.training_config.epochs}")
-            logger.info(f"    ⏰ Early stopping: {config.training_config.earlyStopping} (patience: {config.training_config.patience})")
-
-            # 創建 LSTM 模型 (使用共享定義確保與評估器一致)
-            model = LSTMPULearningModel(
-                input_size=X_train_scaled.shape[1],
-                hidden_size=config.training_config.hiddenSize,
-                num_layers=config.training_config.numLayers,
-                dropout=config.training_config.dropout
+            sample_limit = int(10000 * u_sample_ratio)
+            fingerprints = {}
+            for dataset_id in dict.fromkeys(list(positive_dataset_ids) + list(unlabeled_dataset_ids)):
+                fingerprints[dataset_id] = await repository.dataset_fingerprint(dataset_id)
+            feature_cache_key = FeatureCache.make_key(
+                purpose='training_splits',
+                positive=[[dataset_id, fingerprints[dataset_id]] for dataset_id in positive_dataset_ids],
+                unlabeled=[[dataset_id, fingerprints[dataset_id]] for dataset_id in unlabeled_dataset_ids],
+                u_sample_limit=sample_limit,
+                split_ratios=split_ratios,
+                window_size=window_size,
+                input_mode=get_input_mode(config.training_config.dict())
             )
 
-            logger.info(f"  ✅ Enhanced LSTM Model created successfully")
-            logger.info(f"    🧠 Architecture: {X_train_scaled.shape[1]} features → Batch Norm → LSTM({config.training_config.hiddenSize}×{config.training_config.numLayers}) → FC({config.training_config.hiddenSize//2}) → FC(1)")
-            logger.info(f"    📊 Total parameters: {sum(p.numel() for p in model.parameters()):,}")
-            logger.info(f"    🔧 Enhancements: Batch normalization, two-layer classifier, Xavier initialization")
-
-            # 移動模型到適當的設備
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            model = model.to(device)
-            logger.info(f"    🖥️ Model running on: {device}")
-
-            # 設定優化器
-            if config.training_config.optimizer == 'adam':
-                optimizer = optim.Adam(model.parameters(), lr=config.training_config.learningRate,
-                                     weight_decay=config.training_config.l2Regularization)
-            elif config.training_config.optimizer == 'sgd':
-                optimizer = optim.SGD(model.parameters(), lr=config.training_config.learningRate,
-                                    weight_decay=config.training_config.l2Regularization, momentum=0.9)
+            positive_data = []
+            unlabeled_data = []
+            if get_feature_cache().contains(feature_cache_key):
+                logger.info(f"♻️ Feature cache hit ({feature_cache_key}), skipping data loading")
             else:
-                optimizer = optim.Adam(model.parameters(), lr=config.training_config.learningRate)
-
-            # nnPU Learning 損失函數實現
-            logger.info("🧬 Setting up nnPU (non-negative PU Learning) loss function...")
-            class_prior = config.training_config.classPrior  # π (class prior)
-            logger.info(f"  🎯 Class prior (π): {class_prior}")
-            logger.info(f"  📊 This means we estimate {class_prior*100:.1f}% of unlabeled data are positive")
-
-            def nnpu_loss(outputs, labels, positive_mask, unlabeled_mask, beta=0.0):
-                """
-                nnPU Loss Implementation
-                Based on: "Positive-Unlabeled Learning with Non-Negative Risk Estimator" (Kiryo et al., 2017)
-
-                Args:
-                    outputs: Model predictions (sigmoid output)
-                    labels: True labels (1 for positive, 0 for unlabeled)
-                    positive_mask: Boolean mask for positive samples
-                    unlabeled_mask: Boolean mask for unlabeled samples
-                    beta: Non-negative coefficient (0 for nnPU, >0 for regularization)
-                """
-                sigmoid_loss = nn.BCELoss(reduction='none')
-
-                # Positive risk: E_p[l(f(x), +1)]
-                if positive_mask.sum() > 0:
-                    positive_loss = sigmoid_loss(outputs[positive_mask], torch.ones_like(outputs[positive_mask]))
-                    positive_risk = positive_loss.mean()
-                else:
-                    # ✅ 修正：使用 zeros_like 確保計算圖連接和設備一致性
-                    positive_risk = torch.zeros_like(outputs.mean())
-
-                # Unlabeled risk components
-                if unlabeled_mask.sum() > 0:
-                    unlabeled_outputs = outputs[unlabeled_mask]
-
-                    # E_u[l(f(x), -1)]
-                    negative_loss_on_unlabeled = sigmoid_loss(unlabeled_outputs, torch.zeros_like(unlabeled_outputs))
-                    negative_risk_unlabeled = negative_loss_on_unlabeled.mean()
-
-                    # E_u[l(f(x), +1)]
-                    positive_loss_on_unlabeled = sigmoid_loss(unlabeled_outputs, torch.ones_like(unlabeled_outputs))
-                    positive_risk_unlabeled = positive_loss_on_unlabeled.mean()
-                else:
-                    # ✅ 修正：使用 zeros_like 確保計算圖連接和設備一致性
-                    negative_risk_unlabeled = torch.zeros_like(outputs.mean())
-                    positive_risk_unlabeled = torch.zeros_like(outputs.mean())
-
-                # nnPU risk estimate
-                pu_risk = class_prior * positive_risk + negative_risk_unlabeled - class_prior * positive_risk_unlabeled
-
-                # Non-negative constraint
-                # ✅ 最終修正：確保 beta 檢查也是張量操作
-                beta_tensor = torch.zeros_like(outputs.mean()) + beta
-                negative_risk_condition = pu_risk < -beta_tensor
-
-                # 使用 torch.where 進行條件選擇，保持計算圖完整性
-                final_risk = torch.where(
-                    negative_risk_condition,
-                    class_prior * positive_risk + beta_tensor,  # 當風險過負時
-                    pu_risk  # 正常情況
+                logger.info(f"  🎯 U-sample ratio: {u_sample_ratio}")
+                positive_data, unlabeled_data = await load_pu_training_rows(
+                    repository, positive_dataset_ids, unlabeled_dataset_ids, sample_limit
                 )
 
-                return final_risk
-
-
-            # 5. 實際訓練過程（使用時間分割的數據）
-
-            # 轉換為 PyTorch tensors 並移動到設備（使用正確分割的數據）
-            X_train_tensor = torch.FloatTensor(X_train_scaled).to(device)
-            y_train_tensor = torch.FloatTensor(y_train).unsqueeze(1).to(device)
-            X_val_tensor = torch.FloatTensor(X_val_scaled).to(device)
-            y_val_tensor = torch.FloatTensor(y_val).unsqueeze(1).to(device)
-
-            best_val_f1 = 0.0
-            patience_counter = 0
-            training_start_time = get_taiwan_time()
-
-            logger.info("🚀 Starting nnPU Learning training with Enhanced LSTM...")
-            logger.info(f"  ⏰ Training started at: {training_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            logger.info(f"  🖥️ Training device: {device}")
-            logger.info("  🧬 Using nnPU (non-negative PU Learning) loss function")
-            logger.info("  🏗️ Architecture: LSTM-based time-series model")
-            logger.info("  🚨 DATA INTEGRITY: Time-based split prevents data leakage")
-            logger.info("  🎯 Monitoring metric: Validation F1 Score (for early stopping and model checkpointing)")
-            logger.info("  📊 Format: Epoch X/Y - nnPU Loss: X.XXX, Val Loss: X.X, Val F1: X.XX")
-            logger.info("-" * 80)
-
-            # 記錄訓練指標
-            training_history = {
-                'train_losses': [],
-                'val_losses': [],
-                'val_f1_scores': [],
-                'val_precisions': [],
-                'val_recalls': [],
-                'epochs_trained': 0,
-                'early_stopped': False,
-                'best_epoch': 0,
-                'nnpu_risks': [],  # 記錄 nnPU risk
-                'negative_risks': []  # 記錄負風險事件
-            }
-
-            for epoch in range(1, config.training_config.epochs + 1):
-                # 訓練模式
-                model.train()
-                epoch_train_loss = 0.0
-                epoch_negative_risks = 0  # 計算負風險發生次數
-                batch_size = config.training_config.batchSize
-
-                # Mini-batch 訓練
-                for i in range(0, len(X_train_tensor), batch_size):
-                    batch_X = X_train_tensor[i:i+batch_size]
-                    batch_y = y_train_tensor[i:i+batch_size]
-
-                    optimizer.zero_grad()
-                    outputs = model(batch_X)
-
-                    # nnPU Learning 損失計算
-                    positive_mask = (batch_y == 1).squeeze()
-                    unlabeled_mask = (batch_y == 0).squeeze()
-
-                    # 計算 nnPU loss
-                    nnpu_risk = nnpu_loss(outputs, batch_y, positive_mask, unlabeled_mask, beta=0.0)
-
-                    # 檢查是否發生負風險
-                    if nnpu_risk < 0:
-                        epoch_negative_risks += 1
-
-                    nnpu_risk.backward()
-                    optimizer.step()
-                    epoch_train_loss += nnpu_risk.item()
-
-                avg_train_loss = epoch_train_loss / (len(X_train_tensor) // batch_size + 1)
-
-                # 驗證
-                model.eval()
-                with torch.no_grad():
-                    val_outputs = model(X_val_tensor)
-
-                    # 計算驗證損失 - 使用 nnPU loss
-                    positive_mask_val = (y_val_tensor == 1).squeeze()
-                    unlabeled_mask_val = (y_val_tensor == 0).squeeze()
-                    val_nnpu_risk = nnpu_loss(val_outputs, y_val_tensor, positive_mask_val, unlabeled_mask_val, beta=0.0)
-
-                    # 計算 F1 分數和其他指標
-                    # 注意：在 PU Learning 中，我們只能在「標記為正」的樣本上計算真實的性能指標
-                    # 對於未標記樣本，我們不知道真實標籤，所以 F1 分數是一個近似值
-                    val_pred = (val_outputs > 0.5).float()
-                    val_pred_np = val_pred.cpu().numpy().flatten()
-                    y_val_np = y_val_tensor.cpu().numpy().flatten()
-
-                    # 只在已知標籤的樣本上計算指標（正樣本）
-                    known_positive_mask = y_val_np == 1
-                    if known_positive_mask.sum() > 0:
-                        # 正樣本的召回率（多少正樣本被正確識別）
-                        true_positive_recall = np.mean(val_pred_np[known_positive_mask])
-
-                        # 整體 F1（包含未標記樣本的近似計算）
-                        val_f1 = f1_score(y_val_np, val_pred_np, zero_division=0)
-                        val_precision = precision_score(y_val_np, val_pred_np, zero_division=0)
-                        val_recall = recall_score(y_val_np, val_pred_np, zero_division=0)
-                    else:
-                        true_positive_recall = 0.0
-                        val_f1 = 0.0
-                        val_precision = 0.0
-                        val_recall = 0.0
-
-                # 檢查是否為最佳模型（基於 F1 分數）
-                is_best = val_f1 > best_val_f1
-                if is_best:
-                    best_val_f1 = val_f1
-                    patience_counter = 0
-                    training_history['best_epoch'] = epoch
-                    # 保存最佳模型
-                    best_model_state = model.state_dict().copy()
-                else:
-                    patience_counter += 1
-
-                # 記錄訓練歷史
-                training_history['train_losses'].append(avg_train_loss)
-                training_history['val_losses'].append(val_nnpu_risk.item())
-                training_history['val_f1_scores'].append(val_f1)
-                training_history['val_precisions'].append(val_precision)
-                training_history['val_recalls'].append(val_recall)
-                training_history['epochs_trained'] = epoch
-                training_history['nnpu_risks'].append(avg_train_loss)
-                training_history['negative_risks'].append(epoch_negative_risks)
-
-                # 記錄訓練進度 - nnPU Learning 專用格式
-                best_indicator = " 🌟 (New best!)" if is_best else ""
-                negative_risk_indicator = f" ⚠️ ({epoch_negative_risks} neg.risks)" if epoch_negative_risks > 0 else ""
-
-                # 統一的日誌格式：Epoch X/Y - nnPU Loss: X.XXX, Val Loss: X.X, Val F1: X.XX
-                logger.info(f"Epoch {epoch:3d}/{config.training_config.epochs} - "
-                           f"nnPU Loss: {avg_train_loss:.3f}, "
-                           f"Val Loss: {val_nnpu_risk.item():.3f}, "
-                           f"Val F1: {val_f1:.3f}{best_indicator}{negative_risk_indicator}")
-
-                # 每 10 個 epoch 或最佳結果時顯示額外詳細信息
-                if epoch % 10 == 0 or is_best or epoch <= 5:
-                    logger.info(f"  📊 Additional metrics - Precision: {val_precision:.4f}, "
-                               f"Recall: {val_recall:.4f}, True Pos Recall: {true_positive_recall:.4f}")
-                    logger.info(f"  🧬 nnPU status - Patience: {patience_counter}/{config.training_config.patience}, "
-                               f"Class prior: {class_prior}")
-
-                # 早停檢查
-                if config.training_config.earlyStopping and patience_counter >= config.training_config.patience:
-                    training_history['early_stopped'] = True
-                    logger.info(f"⏰ Early stopping triggered at epoch {epoch}")
-                    logger.info(f"  🎯 Best validation F1: {best_val_f1:.4f} at epoch {training_history['best_epoch']}")
-                    break
-
-            # 載入最佳模型
-            if 'best_model_state' in locals():
-                model.load_state_dict(best_model_state)
-                logger.info(f"✅ Loaded best nnPU model from epoch {training_history['best_epoch']}")
-
-            # 計算訓練完成時間
-            training_end_time = get_taiwan_time()
-            training_duration = (training_end_time - training_start_time).total_seconds()
-
-            # 分析 nnPU 訓練特性
-            total_negative_risks = sum(training_history['negative_risks'])
-            avg_negative_risks_per_epoch = total_negative_risks / training_history['epochs_trained'] if training_history['epochs_trained'] > 0 else 0
-
-            logger.info("-" * 80)
-            logger.info("🏁 nnPU Learning training completed!")
-            logger.info(f"  ⏰ Training duration: {training_duration:.2f} seconds ({training_duration/60:.2f} minutes)")
-            logger.info(f"  🔄 Total epochs trained: {training_history['epochs_trained']}")
-            logger.info(f"  ⏰ Early stopped: {'Yes' if training_history.get('early_stopped', False) else 'No'}")
-            logger.info(f"  🎯 Best validation F1 achieved: {best_val_f1:.4f} at epoch {training_history['best_epoch']}")
-            logger.info(f"  🧬 nnPU training analysis:")
-            logger.info(f"    ⚠️ Total negative risk events: {total_negative_risks}")
-            logger.info(f"    📊 Avg negative risks per epoch: {avg_negative_risks_per_epoch:.1f}")
-            logger.info(f"    🎯 Class prior used: {class_prior}")
-
-            # 最終評估 - 在測試集上進行 PU Learning 評估
-            logger.info("🧪 Evaluating LSTM nnPU model on test set...")
-            model.eval()
-            with torch.no_grad():
-                X_test_tensor = torch.FloatTensor(X_test_scaled).to(device)
-                y_test_tensor = torch.FloatTensor(y_test).unsqueeze(1).to(device)
-
-                test_outputs = model(X_test_tensor)
-                test_pred = (test_outputs > 0.5).float()
-                test_pred_np = test_pred.cpu().numpy().flatten()
-                y_test_np = y_test_tensor.cpu().numpy().flatten()
-
-                # 測試集上的 nnPU loss
-                positive_mask_test = (y_test_tensor == 1).squeeze()
-                unlabeled_mask_test = (y_test_tensor == 0).squeeze()
-                test_nnpu_risk = nnpu_loss(test_outputs, y_test_tensor, positive_mask_test, unlabeled_mask_test, beta=0.0)
-
-                # 標準分類指標（注意：這些指標在 PU Learning 中的解釋需要謹慎）
-                final_test_f1 = f1_score(y_test_np, test_pred_np, zero_division=0)
-                final_test_precision = precision_score(y_test_np, test_pred_np, zero_division=0)
-                final_test_recall = recall_score(y_test_np, test_pred_np, zero_division=0)
-
-                # PU Learning 特定指標
-                known_positive_mask_test = y_test_np == 1
-                if known_positive_mask_test.sum() > 0:
-                    true_positive_recall_test = np.mean(test_pred_np[known_positive_mask_test])
-                    # 估計的陽性率（在未標記樣本中）
-                    unlabeled_mask_np = y_test_np == 0
-                    if unlabeled_mask_np.sum() > 0:
-                        estimated_positive_rate_in_unlabeled = np.mean(test_pred_np[unlabeled_mask_np])
-                    else:
-                        estimated_positive_rate_in_unlabeled = 0.0
-                else:
-                    true_positive_recall_test = 0.0
-                    estimated_positive_rate_in_unlabeled = 0.0
-
-            logger.info("📊 Final nnPU Model Performance:")
-            logger.info(f"  🎯 Best Validation F1: {best_val_f1:.4f} (epoch {training_history['best_epoch']})")
-            logger.info(f"  🧪 Test nnPU Risk: {test_nnpu_risk.item():.4f}")
-            logger.info(f"  📈 Standard metrics (interpret with caution in PU setting):")
-            logger.info(f"    🎯 Test F1 Score: {final_test_f1:.4f}")
-            logger.info(f"    🎯 Test Precision: {final_test_precision:.4f}")
-            logger.info(f"    📊 Test Recall: {final_test_recall:.4f}")
-            logger.info(f"  🧬 PU Learning specific metrics:")
-            logger.info(f"    ✅ True Positive Recall: {true_positive_recall_test:.4f}")
-            logger.info(f"    🔍 Estimated positive rate in unlabeled: {estimated_positive_rate_in_unlabeled:.4f}")
-            logger.info(f"    📊 Expected vs Actual: {class_prior:.3f} vs {estimated_positive_rate_in_unlabeled:.3f}")
-
-            # 計算模型大小
-            total_params = sum(p.numel() for p in model.parameters())
-            trainable_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
-            logger.info(f"  🧠 Model parameters: {total_params:,} total, {trainable_params:,} trainable")
-
-
-            # 保存最佳 F1 分數和完整訓練指標供後續使用
-            self._last_best_f1_score = best_val_f1
-            self._training_metrics = {
-                'training_history': training_history,
-                'training_duration': training_duration,
-                'final_test_metrics': {
-                    'test_f1': final_test_f1,
-                    'test_precision': final_test_precision,
-                    'test_recall': final_test_recall,
-                    'test_nnpu_risk': test_nnpu_risk.item(),
-                    'true_positive_recall_test': true_positive_recall_test,
-                    'estimated_positive_rate_in_unlabeled': estimated_positive_rate_in_unlabeled,
-                    # 🔥 CRITICAL FIX: 保存時間戳信息用於結果分析
-                    'test_timestamps': [ts.isoformat() if hasattr(ts, 'isoformat') else str(ts) for ts in test_timestamps],
-                    'test_predictions': test_pred_np.tolist(),  # 保存預測結果
-                    'test_true_labels': y_test_np.tolist()  # 保存真實標籤
-                },
-                'data_stats': {
-                    'positive_samples': len(positive_data),
-                    'unlabeled_samples': len(unlabeled_data),
-                    'total_features': X_train_scaled.shape[1],
-                    'train_samples': len(X_train_scaled),
-                    'val_samples': len(X_val_scaled),
-                    'test_samples': len(X_test_scaled),
-                    'time_based_split': True,  # 標記使用時間分割
-                    'data_leakage_prevented': True,  # 確認無數據洩漏
-                    # 添加時間範圍信息
-                    'time_ranges': {
-                        'train_start': train_df['timestamp'].min().isoformat(),
-                        'train_end': train_df['timestamp'].max().isoformat(),
-                        'val_start': val_df['timestamp'].min().isoformat(),
-                        'val_end': val_df['timestamp'].max().isoformat(),
-                        'test_start': test_df['timestamp'].min().isoformat(),
-                        'test_end': test_df['timestamp'].max().isoformat(),
-                        'total_time_span': (df['timestamp'].max() - df['timestamp'].min()).total_seconds() / 3600  # 小時
-                    }
-                },
-                'model_params': {
-                    'total_parameters': sum(p.numel() for p in model.parameters()),
-                    'trainable_parameters': sum(p.numel() for p in model.parameters() if p.requires_grad)
-                },
-                'nnpu_stats': {
-                    'class_prior_used': class_prior,
-                    'total_negative_risks': total_negative_risks,
-                    'avg_negative_risks_per_epoch': avg_negative_risks_per_epoch,
-                    'nnpu_method': 'non-negative PU Learning (Kiryo et al., 2017)'
+                logger.info(f"📊 Data Summary:")
+                logger.info(f"  ✅ Positive samples: {len(positive_data)}")
+                logger.info(f"  ❓ Unlabeled samples: {len(unlabeled_data)}")
+                logger.info(f"  📏 Total samples: {len(positive_data) + len(unlabeled_data)}")
+                logger.info(f"  🎯 Class balance: P={len(positive_data)/(len(positive_data)+len(unlabeled_data)):.3f}, U={len(unlabeled_data)/(len(positive_data)+len(unlabeled_data)):.3f}")
+
+            # 2. 預處理、訓練與保存在 worker process 中執行，避免阻塞事件迴圈
+            logger.info(f"🏭 Dispatching training job {job_id} to worker process...")
+            result = await get_job_executor().run(
+                job_id, JOB_KIND_TRAINING, fit_nnpu_model,
+                model_id, config, positive_data, unlabeled_data, split_ratios,
+                feature_cache_key, list(fingerprints.keys()),
+                {
+                    'db_path': repository.db_path,
+                    'positive_dataset_ids': list(positive_dataset_ids),
+                    'unlabeled_dataset_ids': list(unlabeled_dataset_ids),
+                    'sample_limit': sample_limit
                 }
-            }
-
-            # 保存模型和預處理器
-            logger.info("💾 Saving nnPU model artifacts...")
-            model_artifact = {
-                'model_state_dict': model.state_dict(),
-                'scaler': scaler,
-                'model_config': config.training_config.dict(),
-                'best_f1_score': best_val_f1,
-                'nnpu_class_prior': class_prior,
-                'nnpu_method': 'non-negative PU Learning',
-                'feature_names': get_feature_names(),  # 使用共享的特徵名稱函數
-                'training_stats': {
-                    'negative_risk_events': total_negative_risks,
-                    'epochs_trained': training_history['epochs_trained'],
-                    'early_stopped': training_history['early_stopped']
-                }
-            }
-
-            # 保存到檔案
-            import pickle
-
-            # 使用台灣時間生成檔案名稱
-            taiwan_time = get_taiwan_time()
-            taiwan_time_str = taiwan_time.strftime("%Y%m%d_%H%M%S")
-
-            model_path = f"/home/infowin/Git-projects/pu-in-practice/backend/trained_models/real_model_{model_id}_{taiwan_time_str}.pkl"
-            os.makedirs(os.path.dirname(model_path), exist_ok=True)
-            logger.info(f"  📁 Saving to: {model_path}")
-            logger.info(f"  🕐 Taiwan time: {taiwan_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-
-            with open(model_path, 'wb') as f:
-                pickle.dump(model_artifact, f)
+            )
 
-            # 檢查檔案大小
-            file_size = os.path.getsize(model_path)
-            logger.info(f"  📦 Model file size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
-            logger.info("✅ Model artifacts saved successfully!")
+            logger.info(f"✅ Worker finished training, model saved to: {result['model_path']}")
+            return result
 
         except Exception as e:
             logger.error(f"❌ Error during training: {str(e)}")
@@ -739,26 +181,23 @@ class ModelTrainer:
             logger.error(f"   Traceback: {traceback.format_exc()}")
             raise e
 
-        finally:
-            conn.close()
-            logger.info("🔌 Database connection closed")
-
-    async def _generate_training_metrics(self, config: StartTrainingJobRequest) -> Dict[str, Any]:
-        """Generate training metrics from actual nnPU training results"""
+    async def _generate_training_metrics(self, config: StartTrainingJobRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate training metrics from actual nnPU training results (result of fit_nnpu_model)"""
         model_config = config.training_config
+        run_metrics = result.get('training_metrics') or {}
 
         # 使用實際 nnPU 訓練結果
-        if hasattr(self, '_training_metrics') and self._training_metrics:
-            training_history = self._training_metrics['training_history']
-            training_duration = self._training_metrics['training_duration']
-            final_test_metrics = self._training_metrics['final_test_metrics']
-            data_stats = self._training_metrics['data_stats']
-            model_params = self._training_metrics['model_params']
-            nnpu_stats = self._training_metrics['nnpu_stats']
+        if run_metrics:
+            training_history = run_metrics['training_history']
+            training_duration = run_metrics['training_duration']
+            final_test_metrics = run_metrics['final_test_metrics']
+            data_stats = run_metrics['data_stats']
+            model_params = run_metrics['model_params']
+            nnpu_stats = run_metrics['nnpu_stats']
         else:
             # 備用方案：如果沒有訓練記錄，使用基本的 F1 分數
             return {
-                'best_val_f1_score': self._last_best_f1_score,
+                'best_val_f1_score': result.get('best_val_f1', 0.0),
                 'error': 'nnPU training metrics not available - training may have failed'
             }
 
@@ -794,7 +233,7 @@ class ModelTrainer:
             best_val_recall = training_history['val_recalls'][best_epoch - 1]
             best_val_loss = training_history['val_losses'][best_epoch - 1]
         else:
-            best_val_f1 = max(f1_scores) if f1_scores else self._last_best_f1_score
+            best_val_f1 = max(f1_scores) if f1_scores else result.get('best_val_f1', 0.0)
             best_val_precision = max(training_history['val_precisions']) if training_history['val_precisions'] else 0.5
             best_val_recall = max(training_history['val_recalls']) if training_history['val_recalls'] else 0.5
             best_val_loss = min(training_history['val_losses']) if training_history['val_losses'] else 0.5
@@ -817,7 +256,7 @@ class ModelTrainer:
             # 最終訓練結果 - 來自實際 nnPU 訓練（確保 JSON 可序列化）
             'final_train_loss': ensure_json_serializable(nnpu_risks[-1] if nnpu_risks else 0.5),
             'final_val_loss': ensure_json_serializable(training_history['val_losses'][-1] if training_history['val_losses'] else 0.5),
-            'final_val_f1_score': ensure_json_serializable(f1_scores[-1] if f1_scores else self._last_best_f1_score),
+            'final_val_f1_score': ensure_json_serializable(f1_scores[-1] if f1_scores else result.get('best_val_f1', 0.0)),
             'final_precision': ensure_json_serializable(training_history['val_precisions'][-1] if training_history['val_precisions'] else 0.5),
             'final_recall': ensure_json_serializable(training_history['val_recalls'][-1] if training_history['val_recalls'] else 0.5),
 
@@ -838,6 +277,7 @@ class ModelTrainer:
 
             # 訓練過程信息 - nnPU 特定
             'training_time_seconds': int(training_duration),
+            'epochs_per_second': ensure_json_serializable(run_metrics.get('epochs_per_second', 0.0)),
             'total_epochs_trained': int(training_history['epochs_trained']),
             'convergence_epoch': int(best_epoch),
             'early_stopped': bool(training_history['early_stopped']),
@@ -913,6 +353,7 @@ class ModelTrainer:
                     'estimated': ensure_json_serializable(final_test_metrics['estimated_positive_rate_in_unlabeled']),
                     'difference': ensure_json_serializable(abs(nnpu_stats['class_prior_used'] - final_test_metrics['estimated_positive_rate_in_unlabeled']))
                 },
+                'training_split_prior_estimation': ensure_json_serializable(nnpu_stats.get('prior_estimation')),
                 'pu_vs_supervised_difference': 'Metrics should be interpreted differently than standard supervised learning',
                 'reliability_note': 'F1/Precision/Recall are approximations in PU Learning setting'
             },
@@ -923,8 +364,9 @@ class ModelTrainer:
             'training_method': 'nnPU_Learning'
         }
 
-    async def _save_model_artifact(self, model_id: str, config: StartTrainingJobRequest) -> str:
-        """Save model artifact with complete preprocessing pipeline to disk"""
+    async def _save_model_artifact(self, model_id: str, config: StartTrainingJobRequest, result: Dict[str, Any]) -> str:
+        """Save model artifact with complete preprocessing pipeline to disk (result of fit_nnpu_model)"""
+        preprocessing_pipeline = result.get('preprocessing_pipeline')
         # Create models directory if it doesn't exist
         models_dir = "/home/infowin/Git-projects/pu-in-practice/backend/trained_models"
         os.makedirs(models_dir, exist_ok=True)
@@ -933,8 +375,8 @@ class ModelTrainer:
         taiwan_time = get_taiwan_time()
         taiwan_time_str = taiwan_time.strftime("%Y%m%d_%H%M%S")
 
-        # Generate model file path with Taiwan timestamp
-        model_filename = f"{config.training_config.modelType}_{model_id}_{taiwan_time_str}.pkl"
+        # Generate model file path with Taiwan timestamp（純資料，以 JSON 保存）
+        model_filename = f"{config.training_config.modelType}_{model_id}_{taiwan_time_str}.json"
         model_path = os.path.join(models_dir, model_filename)
 
         # 準備完整的模型包裝，包含預處理管道
@@ -958,7 +400,7 @@ class ModelTrainer:
             },
 
             # 訓練結果指標
-            'training_metrics': self._training_metrics if hasattr(self, '_training_metrics') else {},
+            'training_metrics': result.get('training_metrics') or {},
 
             # 版本資訊
             'pipeline_version': '2.0',
@@ -966,10 +408,10 @@ class ModelTrainer:
         }
 
         # 如果有預處理管道，將其序列化並包含
-        if self._preprocessing_pipeline is not None:
+        if preprocessing_pipeline is not None:
             logger.info("💾 Saving preprocessing pipeline with model...")
             try:
-                model_package['preprocessing_pipeline'] = self._preprocessing_pipeline.save_to_dict()
+                model_package['preprocessing_pipeline'] = preprocessing_pipeline.save_to_dict()
                 model_package['pipeline_fitted'] = True
                 logger.info("✅ Preprocessing pipeline saved successfully")
             except Exception as e:
@@ -979,23 +421,24 @@ class ModelTrainer:
             logger.warning("⚠️ No preprocessing pipeline found to save")
 
         # 保存完整的模型包裝
-        with open(model_path, 'wb') as f:
-            pickle.dump(model_package, f)
+        with open(model_path, 'w', encoding='utf-8') as f:
+            json.dump(model_package, f, default=json_default)
 
         logger.info(f"💾 Complete model package saved to: {model_path}")
         logger.info(f"📦 Package includes: model config, preprocessing pipeline, training metrics")
 
         return model_path
 
-    async def _generate_validation_metrics(self, config: StartTrainingJobRequest) -> Dict[str, Any]:
-        """Generate validation and test metrics from actual nnPU training results"""
+    async def _generate_validation_metrics(self, config: StartTrainingJobRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate validation and test metrics from actual nnPU training results (result of fit_nnpu_model)"""
+        run_metrics = result.get('training_metrics') or {}
 
         # 使用實際 nnPU 訓練結果
-        if hasattr(self, '_training_metrics') and self._training_metrics:
-            training_history = self._training_metrics['training_history']
-            final_test_metrics = self._training_metrics['final_test_metrics']
-            data_stats = self._training_metrics['data_stats']
-            nnpu_stats = self._training_metrics['nnpu_stats']
+        if run_metrics:
+            training_history = run_metrics['training_history']
+            final_test_metrics = run_metrics['final_test_metrics']
+            data_stats = run_metrics['data_stats']
+            nnpu_stats = run_metrics['nnpu_stats']
         else:
             # 備用方案：如果沒有訓練記錄，返回空指標
             return {
@@ -1026,7 +469,7 @@ class ModelTrainer:
             best_val_recall = training_history['val_recalls'][best_epoch - 1]
             best_val_loss = training_history['val_losses'][best_epoch - 1]
         else:
-            best_val_f1 = max(f1_scores) if f1_scores else self._last_best_f1_score
+            best_val_f1 = max(f1_scores) if f1_scores else result.get('best_val_f1', 0.0)
             best_val_precision = max(training_history['val_precisions']) if training_history['val_precisions'] else 0.5
             best_val_recall = max(training_history['val_recalls']) if training_history['val_recalls'] else 0.5
             best_val_loss = min(training_history['val_losses']) if training_history['val_losses'] else 0.5
@@ -1093,3 +536,646 @@ class ModelTrainer:
             'evaluation_timestamp': get_taiwan_time().strftime('%Y-%m-%d %H:%M:%S %Z'),
             'evaluation_method': 'nnPU_Learning_Validation'
         }
+
+
+def fit_nnpu_model(job: JobContext, model_id: str, config: StartTrainingJobRequest,
+                   positive_data: List[list], unlabeled_data: List[list],
+                   split_ratios: Dict[str, float], feature_cache_key: Optional[str] = None,
+                   cache_dataset_ids: List[str] = (), data_source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    nnPU 訓練主體（預處理、時間分割、LSTM 訓練、保存模型）
+
+    在 JobExecutor 的 worker process 中執行，不可存取 DatabaseManager 等
+    主程序資源；訓練進度透過 job 回報，結果以 dict 回傳。
+
+    Args:
+        job: 工作上下文（進度回報與取消檢查）
+        model_id: 訓練模型 ID
+        config: 訓練設定
+        positive_data: [timestamp, features..., 1] 正樣本列
+        unlabeled_data: [timestamp, features..., 0] 未標記樣本列
+        split_ratios: train / validation / test 比例
+        feature_cache_key: 特徵快取 key；命中時 positive_data / unlabeled_data 可為空
+        cache_dataset_ids: 快取項目依賴的 dataset（標籤變更時失效）
+        data_source: db_path、positive_dataset_ids、unlabeled_dataset_ids、sample_limit；
+                     快取項目在 worker 讀取前被淘汰或失效時，用來重新從資料庫載入樣本列
+
+    Returns:
+        Dict: best_val_f1, training_metrics, preprocessing_pipeline, model_path
+    """
+    import torch
+    from sklearn.preprocessing import StandardScaler
+    from .nnpu_engine import NNPUTrainingEngine, nnpu_risk
+    from sklearn.metrics import f1_score, precision_score, recall_score
+    import pandas as pd
+
+    # 2. 資料預處理與特徵工程 - 相同資料來源與窗口設定時直接重用快取特徵
+    window_size = config.training_config.windowSize
+    input_mode = get_input_mode(config.training_config.dict())
+    feature_cache = get_feature_cache() if feature_cache_key else None
+    cached = feature_cache.load(feature_cache_key) if feature_cache else None
+
+    if cached is not None:
+        arrays, feature_summary = cached
+        logger.info(f"♻️ Reusing cached training features ({feature_cache_key}), skipping ETL and feature extraction")
+        job.log(f"♻️ Reusing cached features for window size {window_size}")
+    else:
+        if (not positive_data or not unlabeled_data) and data_source:
+            # 主程序判定命中後、worker 讀取前項目被 LRU 淘汰或因標籤變更失效：在 worker 中重新載入
+            logger.info(f"Feature cache entry {feature_cache_key} is gone, reloading training rows in worker")
+            job.log("♻️ Cached features were evicted, reloading training data")
+            positive_data, unlabeled_data = asyncio.run(_load_training_rows_in_worker(data_source))
+        if not positive_data or not unlabeled_data:
+            raise Exception("Cached training features were evicted and no data source was given to reload them")
+        arrays, feature_summary = build_training_features(positive_data, unlabeled_data, split_ratios, window_size, input_mode)
+        if feature_cache:
+            feature_cache.store(feature_cache_key, arrays, dataset_ids=cache_dataset_ids, extra=feature_summary)
+
+    X_train, X_val, X_test = arrays['X_train'], arrays['X_val'], arrays['X_test']
+    y_train, y_val, y_test = np.array(arrays['y_train']), np.array(arrays['y_val']), np.array(arrays['y_test'])
+    test_timestamps = pd.to_datetime(arrays['test_timestamps']).tolist()
+
+    # 3. 標準化：在訓練集上 fit，在所有集合上 transform
+    # （序列模式下 X_* 為排序後的原始通道列，scaler 以通道為單位，窗口在之後以 view 取出）
+    logger.info(f"  🔧 Applying StandardScaler (fit on train, transform on all, input mode: {input_mode})...")
+
+    # 創建並配置預處理管道
+    preprocessing_pipeline = DataPreprocessingPipeline(
+        window_config={
+            "main_window_minutes": config.training_config.windowSize * 5,
+            "short_window_minutes": config.training_config.windowSize * 2,
+            "medium_window_minutes": config.training_config.windowSize * 5,
+            "long_window_minutes": config.training_config.windowSize * 10
+        }
+    )
+
+    # 初始化並擬合 StandardScaler（只在訓練集上）
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_val_scaled = scaler.transform(X_val)
+    X_test_scaled = scaler.transform(X_test)
+
+    # 保存 scaler 到預處理管道
+    preprocessing_pipeline.scaler = scaler
+    preprocessing_pipeline.is_fitted = True
+
+    logger.info(f"  📊 Feature scaling completed:")
+    logger.info(f"    🏋️ Training: {X_train_scaled.shape} (scaled means: {np.mean(X_train_scaled, axis=0)[:4]}...)")
+    logger.info(f"    🎯 Validation: {X_val_scaled.shape}")
+    logger.info(f"    🧪 Test: {X_test_scaled.shape}")
+    logger.info(f"    ⚠️ NO DATA LEAKAGE: Scaler fitted only on training data")
+
+    logger.info(f"  📊 Data split summary:")
+    logger.info(f"    🏋️ Training set: {len(y_train)} samples ({np.sum(y_train==1)} pos, {np.sum(y_train==0)} unlab)")
+    logger.info(f"    🎯 Validation set: {len(y_val)} samples ({np.sum(y_val==1)} pos, {np.sum(y_val==0)} unlab)")
+    logger.info(f"    🧪 Test set: {len(y_test)} samples ({np.sum(y_test==1)} pos, {np.sum(y_test==0)} unlab)")
+
+    # 先驗估計（可選）：在訓練集上估計類別先驗，與設定的 classPrior 比較
+    prior_estimation = None
+    prior_estimator = getattr(config.training_config, 'priorEstimator', 'none') or 'none'
+    if prior_estimator != 'none':
+        if input_mode == SEQUENCE_INPUT_MODE:
+            logger.info(f"  ⏭️ Prior estimation ({prior_estimator}) skipped: requires window features, input mode is {input_mode}")
+        else:
+            prior_estimation = estimate_training_prior(X_train_scaled, y_train, prior_estimator)
+            logger.info(f"  🔍 Estimated class prior ({prior_estimator}): {prior_estimation['prior']:.4f} "
+                        f"vs configured {config.training_config.classPrior} ({prior_estimation['elapsed_seconds']:.2f}s)")
+            job.log(f"🔍 Estimated class prior ({prior_estimator}): {prior_estimation['prior']:.4f}")
+
+    # 4. 建立 LSTM 模型（修正：從 MLP 改為真正的 LSTM）
+    logger.info("🧠 Building LSTM model for time-series PU Learning...")
+    logger.info(f"  � ARCHITECTURE FIX: Using LSTM instead of MLP")
+    logger.info(f"  �🔧 Model configuration:")
+    logger.info(f"    📏 Input size: {X_train_scaled.shape[1]}")
+    logger.info(f"    🧩 Hidden size: {config.training_config.hiddenSize}")
+    logger.info(f"    🏗️ LSTM layers: {config.training_config.numLayers}")
+    logger.info(f"    💧 Dropout rate: {config.training_config.dropout}")
+    logger.info(f"    🎯 Optimizer: {config.training_config.optimizer}")
+    logger.info(f"    📈 Learning rate: {config.training_config.learningRate}")
+    logger.info(f"    🔒 L2 regularization: {config.training_config.l2Regularization}")
+    logger.info(f"    🎲 Batch size: {config.training_config.batchSize}")
+    logger.info(f"    🔄 Max epochs: {config.training_config.epochs}")
+    logger.info(f"    ⏰ Early stopping: {config.training_config.earlyStopping} (patience: {config.training_config.patience})")
+
+    # 創建 LSTM 模型與優化器 (使用共享定義確保與評估器一致)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model, optimizer = build_nnpu_model(config.training_config, X_train_scaled.shape[1], device)
+
+    logger.info(f"  ✅ Enhanced LSTM Model created successfully")
+    logger.info(f"    🧠 Architecture: {X_train_scaled.shape[1]} features → Batch Norm → LSTM({config.training_config.hiddenSize}×{config.training_config.numLayers}) → FC({config.training_config.hiddenSize//2}) → FC(1)")
+    logger.info(f"    📊 Total parameters: {sum(p.numel() for p in model.parameters()):,}")
+    logger.info(f"    🔧 Enhancements: Batch normalization, two-layer classifier, Xavier initialization")
+    logger.info(f"    🖥️ Model running on: {device}")
+
+    # nnPU Learning 損失函數（nnpu_engine.nnpu_risk：遮罩加權、無 host sync）
+    logger.info("🧬 Setting up nnPU (non-negative PU Learning) loss function...")
+    class_prior = config.training_config.classPrior  # π (class prior)
+    logger.info(f"  🎯 Class prior (π): {class_prior}")
+    logger.info(f"  📊 This means we estimate {class_prior*100:.1f}% of unlabeled data are positive")
+
+    # 5. 實際訓練過程（使用時間分割的數據）
+    eval_every = max(1, config.training_config.evalEvery)
+    engine = NNPUTrainingEngine(
+        model, optimizer, class_prior, device,
+        batch_size=config.training_config.batchSize,
+        shuffle=config.training_config.shuffle,
+        num_workers=config.training_config.numWorkers
+    )
+    # 序列模式：(samples, window, channels) 為原始通道列上的 unfold view，不逐樣本複製
+    train_loader = engine.make_loader(to_model_input(X_train_scaled, window_size, input_mode), y_train)
+    X_val_tensor = to_model_input(X_val_scaled, window_size, input_mode, device=device)
+    y_val_tensor = torch.FloatTensor(y_val).unsqueeze(1).to(device)
+    if input_mode == SEQUENCE_INPUT_MODE:
+        logger.info(f"  🪟 Sequence input: {tuple(X_val_tensor.shape[1:])} windows per sample (zero-copy views)")
+
+    training_start_time = get_taiwan_time()
+
+    logger.info("🚀 Starting nnPU Learning training with Enhanced LSTM...")
+    logger.info(f"  ⏰ Training started at: {training_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"  🖥️ Training device: {device}")
+    logger.info("  🧬 Using nnPU (non-negative PU Learning) loss function")
+    logger.info("  🏗️ Architecture: LSTM-based time-series model")
+    logger.info("  🚨 DATA INTEGRITY: Time-based split prevents data leakage")
+    logger.info(f"  🔀 Batches: shuffle={config.training_config.shuffle}, workers={config.training_config.numWorkers}, "
+                f"validation every {eval_every} epoch(s)")
+    logger.info("  🎯 Monitoring metric: Validation F1 Score (for early stopping and model checkpointing)")
+    logger.info("  📊 Format: Epoch X/Y - nnPU Loss: X.XXX, Val Loss: X.X, Val F1: X.XX")
+    logger.info("-" * 80)
+
+    total_epochs = config.training_config.epochs
+    patience = config.training_config.patience
+
+    def report_epoch(epoch: int, info: Dict[str, Any]):
+        # 記錄訓練進度 - nnPU Learning 專用格式
+        val_metrics = engine.val_metrics
+        avg_train_loss, epoch_negative_risks = info['train_loss'], info['negative_risks']
+        val_f1, val_loss = val_metrics['f1'], val_metrics['loss']
+        best_indicator = " 🌟 (New best!)" if info['is_best'] else ""
+        negative_risk_indicator = f" ⚠️ ({epoch_negative_risks} neg.risks)" if epoch_negative_risks > 0 else ""
+
+        # 統一的日誌格式：Epoch X/Y - nnPU Loss: X.XXX, Val Loss: X.X, Val F1: X.XX
+        if info['evaluated']:
+            epoch_message = (f"Epoch {epoch:3d}/{total_epochs} - "
+                             f"nnPU Loss: {avg_train_loss:.3f}, "
+                             f"Val Loss: {val_loss:.3f}, "
+                             f"Val F1: {val_f1:.3f}{best_indicator}{negative_risk_indicator}")
+        else:
+            epoch_message = (f"Epoch {epoch:3d}/{total_epochs} - "
+                             f"nnPU Loss: {avg_train_loss:.3f}{negative_risk_indicator}")
+        logger.info(epoch_message)
+        job.log(epoch_message)
+        job.progress(epoch=epoch, total_epochs=total_epochs,
+                     train_loss=float(avg_train_loss), val_loss=float(val_loss),
+                     val_f1=float(val_f1), best_val_f1=float(engine.best_val_f1),
+                     epochs_per_second=float(engine.epochs_per_second))
+
+        # 每 10 個 epoch 或最佳結果時顯示額外詳細信息
+        if info['evaluated'] and (epoch % 10 == 0 or info['is_best'] or epoch <= 5):
+            logger.info(f"  📊 Additional metrics - Precision: {val_metrics['precision']:.4f}, "
+                       f"Recall: {val_metrics['recall']:.4f}, True Pos Recall: {val_metrics['true_positive_recall']:.4f}")
+            logger.info(f"  🧬 nnPU status - Patience: {engine.patience_counter}/{patience}, "
+                       f"Class prior: {class_prior}")
+
+    # 每個 epoch 開始前檢查是否已被取消
+    training_history = engine.fit(
+        train_loader, X_val_tensor, y_val_tensor, total_epochs,
+        eval_every=eval_every,
+        early_stopping=config.training_config.earlyStopping,
+        patience=patience,
+        on_epoch=report_epoch,
+        check_cancelled=job.check_cancelled
+    )
+    best_val_f1 = engine.best_val_f1
+
+    if training_history['early_stopped']:
+        logger.info(f"⏰ Early stopping triggered at epoch {training_history['epochs_trained']}")
+        logger.info(f"  🎯 Best validation F1: {best_val_f1:.4f} at epoch {training_history['best_epoch']}")
+
+    # 載入最佳模型
+    if engine.load_best():
+        logger.info(f"✅ Loaded best nnPU model from epoch {training_history['best_epoch']}")
+
+    # 計算訓練完成時間
+    training_end_time = get_taiwan_time()
+    training_duration = (training_end_time - training_start_time).total_seconds()
+
+    # 分析 nnPU 訓練特性
+    total_negative_risks = sum(training_history['negative_risks'])
+    avg_negative_risks_per_epoch = total_negative_risks / training_history['epochs_trained'] if training_history['epochs_trained'] > 0 else 0
+
+    logger.info("-" * 80)
+    logger.info("🏁 nnPU Learning training completed!")
+    logger.info(f"  ⏰ Training duration: {training_duration:.2f} seconds ({training_duration/60:.2f} minutes)")
+    logger.info(f"  🔄 Total epochs trained: {training_history['epochs_trained']} ({engine.epochs_per_second:.2f} epochs/sec)")
+    logger.info(f"  ⏰ Early stopped: {'Yes' if training_history.get('early_stopped', False) else 'No'}")
+    logger.info(f"  🎯 Best validation F1 achieved: {best_val_f1:.4f} at epoch {training_history['best_epoch']}")
+    logger.info(f"  🧬 nnPU training analysis:")
+    logger.info(f"    ⚠️ Total negative risk events: {total_negative_risks}")
+    logger.info(f"    📊 Avg negative risks per epoch: {avg_negative_risks_per_epoch:.1f}")
+    logger.info(f"    🎯 Class prior used: {class_prior}")
+
+    # 最終評估 - 在測試集上進行 PU Learning 評估
+    logger.info("🧪 Evaluating LSTM nnPU model on test set...")
+    model.eval()
+    with torch.no_grad():
+        X_test_tensor = to_model_input(X_test_scaled, window_size, input_mode, device=device)
+        y_test_tensor = torch.FloatTensor(y_test).unsqueeze(1).to(device)
+
+        test_outputs = engine.predict(X_test_tensor)
+        test_pred = (test_outputs > 0.5).float()
+        test_pred_np = test_pred.cpu().numpy().flatten()
+        y_test_np = y_test_tensor.cpu().numpy().flatten()
+
+        # 測試集上的 nnPU loss
+        test_nnpu_risk, _ = nnpu_risk(test_outputs, y_test_tensor, class_prior)
+
+        # 標準分類指標（注意：這些指標在 PU Learning 中的解釋需要謹慎）
+        final_test_f1 = f1_score(y_test_np, test_pred_np, zero_division=0)
+        final_test_precision = precision_score(y_test_np, test_pred_np, zero_division=0)
+        final_test_recall = recall_score(y_test_np, test_pred_np, zero_division=0)
+
+        # PU Learning 特定指標
+        known_positive_mask_test = y_test_np == 1
+        if known_positive_mask_test.sum() > 0:
+            true_positive_recall_test = np.mean(test_pred_np[known_positive_mask_test])
+            # 估計的陽性率（在未標記樣本中）
+            unlabeled_mask_np = y_test_np == 0
+            if unlabeled_mask_np.sum() > 0:
+                estimated_positive_rate_in_unlabeled = np.mean(test_pred_np[unlabeled_mask_np])
+            else:
+                estimated_positive_rate_in_unlabeled = 0.0
+        else:
+            true_positive_recall_test = 0.0
+            estimated_positive_rate_in_unlabeled = 0.0
+
+    logger.info("📊 Final nnPU Model Performance:")
+    logger.info(f"  🎯 Best Validation F1: {best_val_f1:.4f} (epoch {training_history['best_epoch']})")
+    logger.info(f"  🧪 Test nnPU Risk: {test_nnpu_risk.item():.4f}")
+    logger.info(f"  📈 Standard metrics (interpret with caution in PU setting):")
+    logger.info(f"    🎯 Test F1 Score: {final_test_f1:.4f}")
+    logger.info(f"    🎯 Test Precision: {final_test_precision:.4f}")
+    logger.info(f"    📊 Test Recall: {final_test_recall:.4f}")
+    logger.info(f"  🧬 PU Learning specific metrics:")
+    logger.info(f"    ✅ True Positive Recall: {true_positive_recall_test:.4f}")
+    logger.info(f"    🔍 Estimated positive rate in unlabeled: {estimated_positive_rate_in_unlabeled:.4f}")
+    logger.info(f"    📊 Expected vs Actual: {class_prior:.3f} vs {estimated_positive_rate_in_unlabeled:.3f}")
+
+    # 計算模型大小
+    total_params = sum(p.numel() for p in model.parameters())
+    trainable_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
+    logger.info(f"  🧠 Model parameters: {total_params:,} total, {trainable_params:,} trainable")
+
+
+    # 完整訓練指標（回傳給主程序供後續使用）
+    training_metrics = {
+        'training_history': training_history,
+        'training_duration': training_duration,
+        'epochs_per_second': engine.epochs_per_second,
+        'final_test_metrics': {
+            'test_f1': final_test_f1,
+            'test_precision': final_test_precision,
+            'test_recall': final_test_recall,
+            'test_nnpu_risk': test_nnpu_risk.item(),
+            'true_positive_recall_test': true_positive_recall_test,
+            'estimated_positive_rate_in_unlabeled': estimated_positive_rate_in_unlabeled,
+            # 🔥 CRITICAL FIX: 保存時間戳信息用於結果分析
+            'test_timestamps': [ts.isoformat() if hasattr(ts, 'isoformat') else str(ts) for ts in test_timestamps],
+            'test_predictions': test_pred_np.tolist(),  # 保存預測結果
+            'test_true_labels': y_test_np.tolist()  # 保存真實標籤
+        },
+        'data_stats': {
+            'positive_samples': feature_summary['positive_samples'],
+            'unlabeled_samples': feature_summary['unlabeled_samples'],
+            'total_features': X_train_scaled.shape[1],
+            'train_samples': len(y_train),
+            'val_samples': len(y_val),
+            'test_samples': len(y_test),
+            'input_mode': input_mode,
+            'time_based_split': True,  # 標記使用時間分割
+            'data_leakage_prevented': True,  # 確認無數據洩漏
+            # 添加時間範圍信息
+            'time_ranges': feature_summary['time_ranges']
+        },
+        'model_params': {
+            'total_parameters': sum(p.numel() for p in model.parameters()),
+            'trainable_parameters': sum(p.numel() for p in model.parameters() if p.requires_grad)
+        },
+        'nnpu_stats': {
+            'class_prior_used': class_prior,
+            'total_negative_risks': total_negative_risks,
+            'avg_negative_risks_per_epoch': avg_negative_risks_per_epoch,
+            'nnpu_method': 'non-negative PU Learning (Kiryo et al., 2017)',
+            'prior_estimation': prior_estimation
+        }
+    }
+
+    # 保存模型和預處理器
+    logger.info("💾 Saving nnPU model artifacts...")
+    model_artifact = {
+        'model_state_dict': model.state_dict(),
+        'scaler': scaler,
+        'model_config': config.training_config.dict(),
+        'best_f1_score': best_val_f1,
+        'nnpu_class_prior': class_prior,
+        'nnpu_method': 'non-negative PU Learning',
+        'feature_names': get_feature_names(),  # 使用共享的特徵名稱函數
+        'training_stats': {
+            'negative_risk_events': total_negative_risks,
+            'epochs_trained': training_history['epochs_trained'],
+            'early_stopped': training_history['early_stopped']
+        }
+    }
+
+    model_path = save_model_artifact(model_id, model_artifact)
+
+    return {
+        'best_val_f1': best_val_f1,
+        'training_metrics': training_metrics,
+        'preprocessing_pipeline': preprocessing_pipeline,
+        'model_path': model_path
+    }
+
+
+def build_nnpu_model(training_config, input_size: int, device) -> tuple:
+    """
+    依訓練設定建立共享 LSTM 模型與優化器
+
+    Args:
+        training_config: ModelConfig
+        input_size: 每個時間步的特徵數
+        device: torch.device
+
+    Returns:
+        tuple: (model, optimizer)，model 已移到 device
+    """
+    import torch.optim as optim
+
+    model = LSTMPULearningModel(
+        input_size=input_size,
+        hidden_size=training_config.hiddenSize,
+        num_layers=training_config.numLayers,
+        dropout=training_config.dropout
+    ).to(device)
+
+    if training_config.optimizer == 'adam':
+        optimizer = optim.Adam(model.parameters(), lr=training_config.learningRate,
+                               weight_decay=training_config.l2Regularization)
+    elif training_config.optimizer == 'sgd':
+        optimizer = optim.SGD(model.parameters(), lr=training_config.learningRate,
+                              weight_decay=training_config.l2Regularization, momentum=0.9)
+    else:
+        optimizer = optim.Adam(model.parameters(), lr=training_config.learningRate)
+    return model, optimizer
+
+
+def estimate_training_prior(X_train: np.ndarray, y_train: np.ndarray, estimator: str,
+                            seed: int = 42) -> Dict[str, Any]:
+    """
+    在（已標準化的）訓練特徵上估計類別先驗
+
+    使用 pu-learning/prior_estimation 的估計器：penl1cp 對應 PenL1CP.m，
+    kde_subsample / kde_tree 為大型資料集的近似模式。
+
+    Args:
+        X_train: 訓練特徵 (n, d)
+        y_train: 1 = 正樣本，0 = 未標記
+        estimator: 'penl1cp'、'kde_subsample' 或 'kde_tree'（ModelConfig.priorEstimator 已於請求時驗證）
+        seed: 隨機種子
+
+    Returns:
+        Dict: prior、estimator、elapsed_seconds 與估計器診斷資訊
+    """
+    import sys
+    pu_learning_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pu-learning')
+    if pu_learning_dir not in sys.path:
+        sys.path.insert(0, pu_learning_dir)
+    from prior_estimation import estimate_class_prior
+
+    y_train = np.asarray(y_train)
+    return estimate_class_prior(X_train[y_train == 1], X_train[y_train == 0], estimator, seed=seed)
+
+
+def save_model_artifact(model_id: str, model_artifact: Dict[str, Any]) -> str:
+    """
+    將模型 artifact 以台灣時間命名寫入 trained_models
+
+    以結構化格式保存（權重 / scaler 陣列 / JSON metadata，見 model_artifact），
+    不再 pickle 整個 dict。
+
+    Returns:
+        str: 模型 artifact 目錄路徑
+    """
+    # 使用台灣時間生成檔案名稱
+    taiwan_time = get_taiwan_time()
+    taiwan_time_str = taiwan_time.strftime("%Y%m%d_%H%M%S")
+
+    model_path = f"/home/infowin/Git-projects/pu-in-practice/backend/trained_models/real_model_{model_id}_{taiwan_time_str}{ARTIFACT_SUFFIX}"
+    logger.info(f"  📁 Saving to: {model_path}")
+    logger.info(f"  🕐 Taiwan time: {taiwan_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+
+    content_hash = save_artifact(model_path, model_artifact)
+
+    # 檢查檔案大小
+    file_size = sum(entry.stat().st_size for entry in os.scandir(model_path))
+    logger.info(f"  📦 Model artifact size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB), content hash: {content_hash[:16]}")
+    logger.info("✅ Model artifacts saved successfully!")
+    return model_path
+
+
+async def load_pu_training_rows(repository, positive_dataset_ids: List[str], unlabeled_dataset_ids: List[str],
+                                sample_limit: int) -> tuple:
+    """
+    從資料庫載入 P / U 訓練樣本列（保留時間戳）
+
+    Returns:
+        tuple: (positive_data, unlabeled_data)，每列為 [timestamp, features..., label]
+    """
+    positive_data = []
+    unlabeled_data = []
+
+    # 載入正樣本資料 - 保留時間戳
+    if positive_dataset_ids:
+        logger.info(f"📊 Loading positive samples from datasets: {positive_dataset_ids}")
+        for dataset_id in positive_dataset_ids:
+            rows = await repository.load_positive_samples(dataset_id)
+            logger.info(f"  📈 Dataset {dataset_id}: {len(rows)} positive samples")
+            for row in rows:
+                positive_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 1])  # 包含 timestamp
+
+    # 載入未標記資料 (作為負樣本) - 保留時間戳
+    if unlabeled_dataset_ids:
+        logger.info(f"📊 Loading unlabeled samples from datasets: {unlabeled_dataset_ids}")
+        for dataset_id in unlabeled_dataset_ids:
+            logger.info(f"  📉 Dataset {dataset_id}: sampling up to {sample_limit} unlabeled samples")
+            rows = await repository.load_unlabeled_samples(dataset_id, sample_limit)
+            logger.info(f"  📉 Dataset {dataset_id}: {len(rows)} unlabeled samples loaded")
+            for row in rows:
+                unlabeled_data.append([row[0], row[1], row[2], row[3], row[4], row[5], 0])  # 包含 timestamp
+
+    if len(positive_data) == 0 or len(unlabeled_data) == 0:
+        raise Exception("Insufficient training data: need both positive and unlabeled samples")
+    return positive_data, unlabeled_data
+
+
+async def _load_training_rows_in_worker(data_source: Dict[str, Any]) -> tuple:
+    """在 worker process 中以獨立的 SQLiteRepository 載入 P / U 樣本列（用完即關閉）"""
+    repository = SQLiteRepository(db_url=data_source.get('db_path'), pool_size=1)
+    try:
+        return await load_pu_training_rows(
+            repository, data_source.get('positive_dataset_ids', []),
+            data_source.get('unlabeled_dataset_ids', []), data_source['sample_limit']
+        )
+    finally:
+        await repository.close()
+
+
+def build_training_features(positive_data: List[list], unlabeled_data: List[list],
+                            split_ratios: Dict[str, float], window_size: int,
+                            input_mode: Optional[str] = None) -> tuple:
+    """
+    合併 P/U 資料、依時間分割並提取各分割的時間特徵
+
+    Args:
+        positive_data: [timestamp, features..., 1] 正樣本列
+        unlabeled_data: [timestamp, features..., 0] 未標記樣本列
+        split_ratios: train / validation / test 比例
+        window_size: 特徵窗口大小
+        input_mode: 'features'（窗口統計特徵）或 'sequence'（原始通道列，X_* 比 y_* 多 window_size 列）
+
+    Returns:
+        tuple: (arrays, summary)
+            arrays: X_train, y_train, X_val, y_val, X_test, y_test, test_timestamps
+                    （皆為 numpy 陣列，可直接寫入 FeatureCache）
+            summary: 樣本數與各分割時間範圍（JSON 可序列化）
+    """
+    import pandas as pd
+
+    # 2. 資料預處理 - 使用統一的資料處理管道並保持時間順序
+    logger.info("🔧 Starting data preprocessing with unified pipeline (time-aware)...")
+
+    # 🚨 關鍵修正：合併資料時保留時間戳，然後按時間排序
+    logger.info("  📅 Combining data and preserving temporal order...")
+    all_data = positive_data + unlabeled_data
+
+    # 創建包含時間戳的 DataFrame
+    df = pd.DataFrame(all_data, columns=[
+        'timestamp', 'wattage_total', 'wattage_110v', 'wattage_220v', 'raw_l1', 'raw_l2', 'label'
+    ])
+    logger.info(f"  📋 Combined dataframe shape: {df.shape}")
+
+    # 將時間戳轉換為 datetime 格式
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    # 🚨 最關鍵步驟：嚴格按時間戳排序，恢復正確的時間序列順序
+    logger.info("  ⏰ CRITICAL: Sorting data by timestamp to preserve sequence for LSTM...")
+    df_before_sort = df.copy()
+    df = df.sort_values(by='timestamp').reset_index(drop=True)
+
+    # 驗證排序效果
+    time_span = df['timestamp'].max() - df['timestamp'].min()
+    logger.info(f"  ✅ Data sorted successfully:")
+    logger.info(f"    📅 Time range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+    logger.info(f"    ⏱️ Total time span: {time_span}")
+    logger.info(f"    🔢 Sample count: {len(df)}")
+
+    # 檢查排序前後的差異
+    position_changes = (df_before_sort.index != df.index).sum()
+    logger.info(f"    🔄 Rows reordered: {position_changes} out of {len(df)}")
+
+    if position_changes > 0:
+        logger.info(f"    ⚠️ Data was NOT in chronological order - fixed by sorting")
+    else:
+        logger.info(f"    ✅ Data was already in chronological order")
+
+    # 處理缺失值
+    missing_before = df.isnull().sum().sum()
+    df = df.fillna(0)
+    missing_after = df.isnull().sum().sum()
+    logger.info(f"  🧹 Missing values handled: {missing_before} → {missing_after}")
+
+    # 🚨 修正：改進的時間分割策略 - 確保 P 和 U 樣本在所有分割中都有合理分佈
+    logger.info("🔥 CRITICAL FIX: Improved time-based split with balanced P/U distribution")
+    logger.info("  📅 Performing separate time-based split for P and U samples...")
+
+    # 獲取分割比例
+    train_ratio = split_ratios['train']
+    val_ratio = split_ratios['validation']
+    test_ratio = split_ratios['test']
+
+    # 1. 分別處理 P 和 U 樣本
+    p_df = df[df['label'] == 1].copy()  # 正樣本
+    u_df = df[df['label'] == 0].copy()  # 未標記樣本
+
+    logger.info(f"  📊 Sample distribution before split:")
+    logger.info(f"    ✅ Positive samples: {len(p_df)}")
+    logger.info(f"    ❓ Unlabeled samples: {len(u_df)}")
+
+    # 2. 對 P 樣本進行時間分割
+    p_total = len(p_df)
+    p_train_end = int(p_total * train_ratio)
+    p_val_end = int(p_total * (train_ratio + val_ratio))
+
+    p_train_df = p_df.iloc[:p_train_end].copy()
+    p_val_df = p_df.iloc[p_train_end:p_val_end].copy()
+    p_test_df = p_df.iloc[p_val_end:].copy()
+
+    # 3. 對 U 樣本進行時間分割
+    u_total = len(u_df)
+    u_train_end = int(u_total * train_ratio)
+    u_val_end = int(u_total * (train_ratio + val_ratio))
+
+    u_train_df = u_df.iloc[:u_train_end].copy()
+    u_val_df = u_df.iloc[u_train_end:u_val_end].copy()
+    u_test_df = u_df.iloc[u_val_end:].copy()
+
+    # 4. 合併成最終的數據集，保持時間順序
+    train_df = pd.concat([p_train_df, u_train_df]).sort_values(by='timestamp').reset_index(drop=True)
+    val_df = pd.concat([p_val_df, u_val_df]).sort_values(by='timestamp').reset_index(drop=True)
+    test_df = pd.concat([p_test_df, u_test_df]).sort_values(by='timestamp').reset_index(drop=True)
+
+    logger.info(f"  📊 Improved time-based split completed:")
+    logger.info(f"    🏋️ Training data: {len(train_df)} samples ({len(p_train_df)} pos, {len(u_train_df)} unlab)")
+    logger.info(f"      📅 Time range: {train_df['timestamp'].min()} to {train_df['timestamp'].max()}")
+    logger.info(f"    🎯 Validation data: {len(val_df)} samples ({len(p_val_df)} pos, {len(u_val_df)} unlab)")
+    logger.info(f"      📅 Time range: {val_df['timestamp'].min()} to {val_df['timestamp'].max()}")
+    logger.info(f"    🧪 Test data: {len(test_df)} samples ({len(p_test_df)} pos, {len(u_test_df)} unlab)")
+    logger.info(f"      📅 Time range: {test_df['timestamp'].min()} to {test_df['timestamp'].max()}")
+
+    # 5. 驗證分割品質
+    logger.info(f"  🔍 Split quality verification:")
+    logger.info(f"    📊 Training set: P={len(p_train_df)/(len(p_train_df)+len(u_train_df)):.3f}, U={len(u_train_df)/(len(p_train_df)+len(u_train_df)):.3f}")
+    logger.info(f"    📊 Validation set: P={len(p_val_df)/(len(p_val_df)+len(u_val_df)):.3f}, U={len(u_val_df)/(len(p_val_df)+len(u_val_df)):.3f}")
+    logger.info(f"    📊 Test set: P={len(p_test_df)/(len(p_test_df)+len(u_test_df)):.3f}, U={len(u_test_df)/(len(p_test_df)+len(u_test_df)):.3f}")
+    logger.info(f"    ✅ All splits now contain both P and U samples for meaningful nnPU evaluation!")
+
+    # 2. 對每個分割分別進行特徵工程（避免洩漏）- 使用共享函數確保一致性
+    logger.info(f"  🔧 Applying temporal feature engineering separately to each split...")
+
+    X_train, y_train, train_timestamps = extract_model_inputs(train_df, window_size, input_mode, "training")
+    X_val, y_val, val_timestamps = extract_model_inputs(val_df, window_size, input_mode, "validation")
+    X_test, y_test, test_timestamps = extract_model_inputs(test_df, window_size, input_mode, "test")
+
+    # 檢查是否有足夠的特徵數據
+    if len(X_train) == 0 or len(X_val) == 0 or len(X_test) == 0:
+        raise Exception("Insufficient data after feature engineering. Consider reducing window_size or increasing dataset size.")
+
+    summary = {
+        'positive_samples': len(positive_data),
+        'unlabeled_samples': len(unlabeled_data),
+        'time_ranges': {
+            'train_start': train_df['timestamp'].min().isoformat(),
+            'train_end': train_df['timestamp'].max().isoformat(),
+            'val_start': val_df['timestamp'].min().isoformat(),
+            'val_end': val_df['timestamp'].max().isoformat(),
+            'test_start': test_df['timestamp'].min().isoformat(),
+            'test_end': test_df['timestamp'].max().isoformat(),
+            'total_time_span': (df['timestamp'].max() - df['timestamp'].min()).total_seconds() / 3600  # 小時
+        }
+    }
+    arrays = {
+        'X_train': X_train, 'y_train': y_train,
+        'X_val': X_val, 'y_val': y_val,
+        'X_test': X_test, 'y_test': y_test,
+        'test_timestamps': pd.to_datetime(test_timestamps).to_numpy(dtype='datetime64[ns]')
+    }
+    return arrays, summary
@@ -3,7 +3,7 @@ Pydantic models for Case Study v2 API
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -73,9 +73,12 @@ class ModelConfig(BaseModel):
 
     # PU Learning 策略
     classPrior: float = Field(default=0.05, description="Class prior (π_p) - true positive sample ratio")
+    # 不開放精確 'kde'：O(n_u × (n_p + n_u))，訓練資料集規模下過慢
+    priorEstimator: Literal['none', 'penl1cp', 'kde_subsample', 'kde_tree'] = Field(default="none", description="Estimate the class prior on the training split for comparison: 'none', 'penl1cp', 'kde_subsample' or 'kde_tree'")
 
     # 資料準備
     windowSize: int = Field(default=60, description="Time window size in minutes")
+    inputMode: Literal['features', 'sequence'] = Field(default="features", description="Model input: 'features' (window statistics) or 'sequence' (raw per-minute window)")
 
     # 模型架構
     modelType: str = Field(default="LSTM", description="Neural network architecture type")
@@ -96,6 +99,11 @@ class ModelConfig(BaseModel):
     patience: int = Field(default=10, description="Early stopping patience")
     learningRateScheduler: str = Field(default="none", description="Learning rate scheduler type")
 
+    # 訓練引擎
+    shuffle: bool = Field(default=True, description="Shuffle training batches every epoch")
+    numWorkers: int = Field(default=0, description="DataLoader worker processes (0 = load in training process)")
+    evalEvery: int = Field(default=1, description="Run validation every K epochs")
+
     model_config = {"protected_namespaces": ()}
 
 class DataSourceConfig(BaseModel):
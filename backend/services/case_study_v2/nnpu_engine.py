@@ -0,0 +1,335 @@
+"""
+nnPU Training Engine
+DataLoader-based mini-batch training for the shared LSTM PU model
+
+- 批次以 BatchSampler 一次索引整批（不逐樣本 collate），可設定 shuffle / workers，
+  CUDA 時使用 pinned memory 與 non_blocking 傳輸
+- nnPU 風險以遮罩加權一次算完，不做 Python 端的 `.sum() > 0` 判斷（無 host sync）
+- 驗證指標（F1 / precision / recall）在裝置上以 torch 計算，每次評估只同步一次
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler, SequentialSampler, TensorDataset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVAL_BATCH_SIZE = 4096
+
+EMPTY_VAL_METRICS = {'loss': 0.0, 'f1': 0.0, 'precision': 0.0, 'recall': 0.0, 'true_positive_recall': 0.0}
+
+
+def new_training_history() -> Dict[str, Any]:
+    """訓練歷史（驗證指標每個 epoch 一筆；未驗證的 epoch 沿用上一次驗證結果）"""
+    return {
+        'train_losses': [],
+        'val_losses': [],
+        'val_f1_scores': [],
+        'val_precisions': [],
+        'val_recalls': [],
+        'eval_epochs': [],
+        'epochs_trained': 0,
+        'early_stopped': False,
+        'best_epoch': 0,
+        'nnpu_risks': [],  # 記錄 nnPU risk
+        'negative_risks': []  # 記錄負風險（非負修正）事件
+    }
+
+
+def nnpu_risk(outputs: torch.Tensor, labels: torch.Tensor, class_prior: float,
+              beta: float = 0.0) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    nnPU risk (Kiryo et al., 2017)，全程張量運算
+
+    與逐遮罩 BCELoss 版本的風險與梯度皆相同：某一類樣本數為 0 時該項風險為 0。
+    逐樣本損失直接使用 F.binary_cross_entropy，sigmoid 飽和為 0 / 1 時梯度仍為有限值
+    （對 log 結果 clamp 會讓 0 梯度乘上 d log(x)/dx = inf 而得到 NaN）。
+
+    Args:
+        outputs: 模型 sigmoid 輸出 (N, 1)
+        labels: 1 為正樣本、0 為未標記 (N, 1)
+        class_prior: π
+        beta: 非負修正門檻
+
+    Returns:
+        Tuple[Tensor, Tensor]: (risk, 是否觸發非負修正的 bool 張量)
+    """
+    outputs = outputs.reshape(-1)
+    positive = (labels.reshape(-1) == 1).to(outputs.dtype)
+    unlabeled = (labels.reshape(-1) == 0).to(outputs.dtype)
+
+    loss_as_positive = F.binary_cross_entropy(outputs, torch.ones_like(outputs), reduction='none')
+    loss_as_negative = F.binary_cross_entropy(outputs, torch.zeros_like(outputs), reduction='none')
+
+    n_positive = positive.sum().clamp(min=1)
+    n_unlabeled = unlabeled.sum().clamp(min=1)
+
+    # E_p[l(f(x), +1)]、E_u[l(f(x), -1)]、E_u[l(f(x), +1)]
+    positive_risk = (loss_as_positive * positive).sum() / n_positive
+    negative_risk_unlabeled = (loss_as_negative * unlabeled).sum() / n_unlabeled
+    positive_risk_unlabeled = (loss_as_positive * unlabeled).sum() / n_unlabeled
+
+    pu_risk = class_prior * positive_risk + negative_risk_unlabeled - class_prior * positive_risk_unlabeled
+    is_negative = pu_risk < -beta
+    risk = torch.where(is_negative, class_prior * positive_risk + beta, pu_risk)
+    return risk, is_negative
+
+
+def binary_metrics(outputs: torch.Tensor, labels: torch.Tensor, threshold: float = 0.5) -> Dict[str, torch.Tensor]:
+    """
+    在裝置上計算二元分類指標（與 sklearn zero_division=0 一致）
+
+    Returns:
+        Dict[str, Tensor]: f1 / precision / recall / true_positive_recall（0 維張量）
+    """
+    pred = (outputs.reshape(-1) > threshold).to(outputs.dtype)
+    truth = (labels.reshape(-1) == 1).to(outputs.dtype)
+
+    tp = (pred * truth).sum()
+    predicted_positive = pred.sum()
+    actual_positive = truth.sum()
+
+    precision = torch.where(predicted_positive > 0, tp / predicted_positive.clamp(min=1), torch.zeros_like(tp))
+    recall = torch.where(actual_positive > 0, tp / actual_positive.clamp(min=1), torch.zeros_like(tp))
+    denominator = predicted_positive + actual_positive
+    f1 = torch.where(denominator > 0, 2 * tp / denominator.clamp(min=1), torch.zeros_like(tp))
+    return {'f1': f1, 'precision': precision, 'recall': recall, 'true_positive_recall': recall}
+
+
+@torch.no_grad()
+def predict_in_chunks(model: nn.Module, X: torch.Tensor, chunk_size: int = DEFAULT_EVAL_BATCH_SIZE) -> torch.Tensor:
+    """
+    以 eval 模式分塊推論（BatchNorm 使用 running stats，結果與整批相同）
+
+    序列輸入為 unfold view，分塊讓每次只實體化 chunk_size 個窗口；
+    平均分塊以免出現只有 1 筆的尾塊（模型對單筆輸入會略過 BatchNorm）。
+    """
+    model.eval()
+    if len(X) <= chunk_size:
+        return model(X)
+    chunks = -(-len(X) // chunk_size)
+    return torch.cat([model(part) for part in torch.tensor_split(X, chunks)])
+
+
+class NNPUTrainingEngine:
+    """
+    nnPU 訓練引擎
+
+    Args:
+        model: PyTorch 模型（已移到 device）
+        optimizer: 優化器
+        class_prior: π
+        device: 訓練裝置
+        batch_size: mini-batch 大小
+        shuffle: 每個 epoch 是否打亂順序
+        num_workers: DataLoader worker 數（0 表示在主程序取批次）
+        seed: shuffle 的隨機種子
+        eval_batch_size: 評估時每次推論的樣本數
+    """
+
+    def __init__(self, model: nn.Module, optimizer: torch.optim.Optimizer, class_prior: float,
+                 device: torch.device, batch_size: int, shuffle: bool = True,
+                 num_workers: int = 0, seed: Optional[int] = None,
+                 eval_batch_size: int = DEFAULT_EVAL_BATCH_SIZE):
+        self.model = model
+        self.optimizer = optimizer
+        self.class_prior = class_prior
+        self.device = device
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.num_workers = num_workers
+        self.eval_batch_size = eval_batch_size
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        self.epoch_times = []
+
+        # fit() 的狀態（可經 checkpoint() / restore() 接續訓練）
+        self.history = new_training_history()
+        self.best_val_f1 = 0.0
+        self.best_state: Optional[Dict[str, torch.Tensor]] = None
+        self.patience_counter = 0
+        self.val_metrics = dict(EMPTY_VAL_METRICS)
+
+    def make_loader(self, X, y: np.ndarray) -> DataLoader:
+        """
+        建立訓練用 DataLoader
+
+        TensorDataset 以整批索引取出（batch_size=None + BatchSampler），
+        避免逐樣本 __getitem__ 再 collate；X 可為 float32 張量 view
+        （例如序列窗口），此時只有被取出的批次會被複製。
+        """
+        dataset = TensorDataset(torch.as_tensor(X, dtype=torch.float32),
+                                torch.as_tensor(y, dtype=torch.float32).reshape(-1, 1))
+        sampler = (RandomSampler(dataset, generator=self.generator) if self.shuffle
+                   else SequentialSampler(dataset))
+        return DataLoader(
+            dataset,
+            sampler=BatchSampler(sampler, batch_size=self.batch_size, drop_last=False),
+            batch_size=None,
+            num_workers=self.num_workers,
+            pin_memory=self.device.type == 'cuda',
+            persistent_workers=self.num_workers > 0
+        )
+
+    def train_epoch(self, loader: DataLoader) -> Tuple[float, int]:
+        """
+        訓練一個 epoch
+
+        Returns:
+            Tuple[float, int]: (平均 nnPU risk, 觸發非負修正的批次數)
+        """
+        start = time.perf_counter()
+        self.model.train()
+        non_blocking = self.device.type == 'cuda'
+        total_risk = torch.zeros((), device=self.device)
+        negative_risks = torch.zeros((), dtype=torch.long, device=self.device)
+        batches = 0
+
+        for batch_X, batch_y in loader:
+            batch_X = batch_X.to(self.device, non_blocking=non_blocking)
+            batch_y = batch_y.to(self.device, non_blocking=non_blocking)
+
+            self.optimizer.zero_grad(set_to_none=True)
+            risk, is_negative = nnpu_risk(self.model(batch_X), batch_y, self.class_prior)
+            risk.backward()
+            self.optimizer.step()
+
+            total_risk += risk.detach()
+            negative_risks += is_negative
+            batches += 1
+
+        # 每個 epoch 只同步一次
+        avg_risk = total_risk.item() / max(batches, 1)
+        negative_count = int(negative_risks.item())
+        self.epoch_times.append(time.perf_counter() - start)
+        return avg_risk, negative_count
+
+    def predict(self, X: torch.Tensor) -> torch.Tensor:
+        """分塊推論，見 predict_in_chunks"""
+        return predict_in_chunks(self.model, X, self.eval_batch_size)
+
+    @torch.no_grad()
+    def evaluate(self, X: torch.Tensor, y: torch.Tensor) -> Dict[str, float]:
+        """
+        在裝置上計算 nnPU risk 與分類指標
+
+        Returns:
+            Dict[str, float]: loss / f1 / precision / recall / true_positive_recall
+        """
+        outputs = self.predict(X)
+        risk, _ = nnpu_risk(outputs, y, self.class_prior)
+        metrics = binary_metrics(outputs, y)
+        names = ['loss'] + list(metrics)
+        values = torch.stack([risk] + list(metrics.values())).tolist()
+        return dict(zip(names, values))
+
+    @property
+    def epochs_per_second(self) -> float:
+        total = sum(self.epoch_times)
+        return len(self.epoch_times) / total if total > 0 else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """複製目前權重（state_dict().copy() 只複製 dict，張量仍會被後續訓練覆寫）"""
+        return {key: value.detach().clone() for key, value in self.model.state_dict().items()}
+
+    def fit(self, train_loader: DataLoader, X_val: torch.Tensor, y_val: torch.Tensor, epochs: int,
+            eval_every: int = 1, early_stopping: bool = True, patience: int = 10,
+            on_epoch: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+            check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """
+        訓練到第 epochs 個 epoch（從 history['epochs_trained'] 接續）
+
+        每 eval_every 個 epoch 與最後一個 epoch 驗證一次，以驗證 F1 保存最佳權重；
+        patience 以 epoch 計。
+
+        Args:
+            on_epoch: 每個 epoch 結束時呼叫 on_epoch(epoch, info)，info 含
+                      train_loss / negative_risks / evaluated / is_best
+            check_cancelled: 每個 epoch 開始前呼叫（可拋出例外中止）
+
+        Returns:
+            Dict: training history（與 ModelTrainer 記錄的格式相同）
+        """
+        history = self.history
+        eval_every = max(1, eval_every)
+
+        for epoch in range(history['epochs_trained'] + 1, epochs + 1):
+            if check_cancelled:
+                check_cancelled()
+
+            train_loss, negative_risks = self.train_epoch(train_loader)
+
+            evaluated = epoch % eval_every == 0 or epoch == epochs
+            is_best = False
+            if evaluated:
+                self.val_metrics = self.evaluate(X_val, y_val)
+                history['eval_epochs'].append(epoch)
+
+                # 檢查是否為最佳模型（基於 F1 分數）
+                is_best = self.val_metrics['f1'] > self.best_val_f1
+                if is_best:
+                    self.best_val_f1 = self.val_metrics['f1']
+                    self.patience_counter = 0
+                    history['best_epoch'] = epoch
+                    self.best_state = self.snapshot()
+                else:
+                    self.patience_counter += eval_every
+
+            history['train_losses'].append(train_loss)
+            history['val_losses'].append(self.val_metrics['loss'])
+            history['val_f1_scores'].append(self.val_metrics['f1'])
+            history['val_precisions'].append(self.val_metrics['precision'])
+            history['val_recalls'].append(self.val_metrics['recall'])
+            history['epochs_trained'] = epoch
+            history['nnpu_risks'].append(train_loss)
+            history['negative_risks'].append(negative_risks)
+
+            if on_epoch:
+                on_epoch(epoch, {'train_loss': train_loss, 'negative_risks': negative_risks,
+                                 'evaluated': evaluated, 'is_best': is_best})
+
+            if early_stopping and self.patience_counter >= patience:
+                history['early_stopped'] = True
+                break
+
+        return history
+
+    def load_best(self) -> bool:
+        """載入最佳權重（若有）"""
+        if self.best_state is None:
+            return False
+        self.model.load_state_dict(self.best_state)
+        return True
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """可 torch.save 的完整訓練狀態（權重、優化器、shuffle 亂數、fit 狀態）"""
+        return {
+            'model': self.snapshot(),
+            'optimizer': self.optimizer.state_dict(),
+            'generator': self.generator.get_state(),
+            'history': self.history,
+            'best_val_f1': self.best_val_f1,
+            'best_state': self.best_state,
+            'patience_counter': self.patience_counter,
+            'val_metrics': self.val_metrics,
+            'epoch_times': self.epoch_times
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """由 checkpoint() 的結果接續訓練"""
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.generator.set_state(state['generator'])
+        self.history = state['history']
+        self.best_val_f1 = state['best_val_f1']
+        self.best_state = state['best_state']
+        self.patience_counter = state['patience_counter']
+        self.val_metrics = state['val_metrics']
+        self.epoch_times = list(state['epoch_times'])
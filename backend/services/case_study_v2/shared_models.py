@@ -8,6 +8,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 import logging
+from typing import Any, Dict
 
 logger = logging.getLogger(__name__)
 
@@ -113,34 +114,97 @@ class LSTMPULearningModel(nn.Module):
         return output.squeeze(-1)
 
 
-def extract_temporal_features(dataframe, window_size, set_name="data"):
+# Columns consumed by the temporal feature extractor, in DataFrame naming
+TEMPORAL_FEATURE_COLUMNS = ['wattage_total', 'wattage_110v', 'wattage_220v', 'raw_l1', 'raw_l2']
+
+# Bump whenever extract_temporal_features output changes; invalidates cached features
+FEATURE_VERSION = 'temporal-v1'
+
+# Model input modes: 12 window statistics per sample (sequence length 1),
+# or the raw TEMPORAL_FEATURE_COLUMNS channels over the whole window
+FEATURE_INPUT_MODE = 'features'
+SEQUENCE_INPUT_MODE = 'sequence'
+
+
+def _compute_window_features(values: Dict[str, np.ndarray], window_size: int) -> np.ndarray:
     """
-    Extract temporal features from time-sorted DataFrame
-    Shared implementation to ensure consistency between training and evaluation
+    Compute all 12 temporal features for every sliding window in one batched pass
+
+    Window ``k`` covers rows ``[k, k + window_size)`` and describes the sample at
+    row ``k + window_size``, matching the original ``iloc[i-window_size:i]`` loop.
+    Means come from prefix sums (O(n)); order statistics and the standard deviation
+    use zero-copy ``sliding_window_view`` strides over the column arrays.
 
     Args:
-        dataframe: DataFrame with columns ['timestamp', 'wattage_total', 'wattage_110v',
-                   'wattage_220v', 'raw_l1', 'raw_l2', 'label']
+        values: Mapping of column name to float64 array (no NaN values)
         window_size: Size of sliding window
-        set_name: Name for logging purposes
 
     Returns:
-        X: Feature array of shape (n_samples, n_features)
-        y: Label array of shape (n_samples,)
-        timestamps: List of timestamps for each sample
+        np.ndarray: Feature matrix of shape (n_windows, 12) in float64,
+                    ordered as in get_feature_names()
     """
-    logger.info("SHARED_MODELS: CORRECT (V2) extract_temporal_features function called.")
-    logger.info(f"Extracting temporal features for {set_name} (window_size={window_size})...")
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    n_windows = len(values['wattage_total']) - window_size
+
+    def window_mean(column: np.ndarray) -> np.ndarray:
+        prefix = np.concatenate(([0.0], np.cumsum(column)))
+        return (prefix[window_size:window_size + n_windows] - prefix[:n_windows]) / window_size
+
+    total_windows = sliding_window_view(values['wattage_total'], window_size)[:n_windows]
+
+    total_mean = window_mean(values['wattage_total'])
+    w110_mean = window_mean(values['wattage_110v'])
+    w220_mean = window_mean(values['wattage_220v'])
+    l1_mean = window_mean(values['raw_l1'])
+    l2_mean = window_mean(values['raw_l2'])
+
+    # pandas Series.std() semantics: sample std (ddof=1), NaN for single-row windows
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total_std = total_windows.std(axis=1, ddof=1)
+        q25, q75 = np.percentile(total_windows, [25, 75], axis=1)
+
+        features = np.column_stack([
+            # Main power statistics
+            total_mean,
+            total_std + 1e-8,
+            total_windows.max(axis=1),
+            total_windows.min(axis=1),
+
+            # Branch power statistics
+            w110_mean,
+            w220_mean,
+            l1_mean,
+            l2_mean,
+
+            # Temporal dynamic features
+            (total_windows[:, -1] - total_windows[:, 0]) / (window_size + 1e-8),
+            q75 - q25,
 
+            # Power balance features
+            np.abs(w110_mean - w220_mean) / (total_mean + 1e-8),
+            (l1_mean + l2_mean) / (total_mean + 1e-8)
+        ])
+
+    # Numerical validation: ensure no inf or nan
+    features[~np.isfinite(features)] = 0.0
+    return features
+
+
+def _extract_temporal_features_loop(dataframe, window_size):
+    """
+    Reference per-window implementation of the temporal features
+
+    Kept for windows containing missing values (pandas skips NaN per window)
+    and as the baseline for benchmarks/benchmark_temporal_features.py.
+
+    Returns:
+        tuple: (features list, labels list, timestamps list)
+    """
     X_features = []
     y_labels = []
     timestamps = []
 
-    if len(dataframe) <= window_size:
-        logger.warning(f"{set_name}: Insufficient data for windowing ({len(dataframe)} <= {window_size})")
-        return np.array([]), np.array([]), []
-
-    # Batch computation for efficiency
     for i in range(window_size, len(dataframe)):
         window_data = dataframe.iloc[i-window_size:i]
         current_timestamp = dataframe.iloc[i]['timestamp']
@@ -183,8 +247,47 @@ def extract_temporal_features(dataframe, window_size, set_name="data"):
         y_labels.append(dataframe.iloc[i]['label'])
         timestamps.append(current_timestamp)
 
-    X = np.array(X_features, dtype=np.float32)
-    y = np.array(y_labels, dtype=np.int64)
+    return X_features, y_labels, timestamps
+
+
+def extract_temporal_features(dataframe, window_size, set_name="data"):
+    """
+    Extract temporal features from time-sorted DataFrame
+    Shared implementation to ensure consistency between training and evaluation
+
+    Args:
+        dataframe: DataFrame with columns ['timestamp', 'wattage_total', 'wattage_110v',
+                   'wattage_220v', 'raw_l1', 'raw_l2', 'label']
+        window_size: Size of sliding window
+        set_name: Name for logging purposes
+
+    Returns:
+        X: Feature array of shape (n_samples, n_features)
+        y: Label array of shape (n_samples,)
+        timestamps: List of timestamps for each sample
+    """
+    logger.info("SHARED_MODELS: CORRECT (V2) extract_temporal_features function called.")
+    logger.info(f"Extracting temporal features for {set_name} (window_size={window_size})...")
+
+    if len(dataframe) <= window_size:
+        logger.warning(f"{set_name}: Insufficient data for windowing ({len(dataframe)} <= {window_size})")
+        return np.array([]), np.array([]), []
+
+    values = {
+        column: dataframe[column].to_numpy(dtype=np.float64)
+        for column in TEMPORAL_FEATURE_COLUMNS
+    }
+
+    if any(np.isnan(column).any() for column in values.values()):
+        # pandas skips NaN inside each window; keep those exact semantics
+        logger.info(f"{set_name}: Missing values present, using per-window feature extraction")
+        X_features, y_labels, timestamps = _extract_temporal_features_loop(dataframe, window_size)
+        X = np.array(X_features, dtype=np.float32)
+        y = np.array(y_labels, dtype=np.int64)
+    else:
+        X = _compute_window_features(values, window_size).astype(np.float32)
+        y = dataframe['label'].iloc[window_size:].to_numpy().astype(np.int64)
+        timestamps = dataframe['timestamp'].iloc[window_size:].tolist()
 
     # Data quality check
     nan_count = np.sum(np.isnan(X))
@@ -200,6 +303,85 @@ def extract_temporal_features(dataframe, window_size, set_name="data"):
     return X, y, timestamps
 
 
+def get_input_mode(model_config: Dict[str, Any]) -> str:
+    """Input mode stored in a training config ('features' for models trained before sequence mode)"""
+    return (model_config or {}).get('inputMode') or FEATURE_INPUT_MODE
+
+
+def extract_sequence_source(dataframe, window_size, set_name="data"):
+    """
+    Extract the raw per-minute channels for sequence-mode models
+
+    Same sample definition as extract_temporal_features (sample ``i`` is row
+    ``window_size + i`` and sees rows ``[i, i + window_size)``), but instead of
+    summarising each window the sorted channel columns are returned once;
+    sequence_windows() turns them into (samples, window, channels) views, so
+    memory stays linear in the number of rows.
+
+    Args:
+        dataframe: Time-sorted DataFrame with TEMPORAL_FEATURE_COLUMNS, 'timestamp' and 'label'
+        window_size: Size of sliding window
+        set_name: Name for logging purposes
+
+    Returns:
+        values: Channel array of shape (n_rows, n_channels); n_rows = n_samples + window_size
+        y: Label array of shape (n_samples,)
+        timestamps: List of timestamps for each sample
+    """
+    logger.info(f"Extracting sequence channels for {set_name} (window_size={window_size})...")
+
+    if len(dataframe) <= window_size:
+        logger.warning(f"{set_name}: Insufficient data for windowing ({len(dataframe)} <= {window_size})")
+        return np.array([]), np.array([]), []
+
+    # Gaps are carried forward (then backward) so windows never contain NaN
+    channels = dataframe[TEMPORAL_FEATURE_COLUMNS].astype(np.float64).ffill().bfill().fillna(0.0)
+    values = np.ascontiguousarray(channels.to_numpy(dtype=np.float32))
+    y = dataframe['label'].iloc[window_size:].to_numpy().astype(np.int64)
+    timestamps = dataframe['timestamp'].iloc[window_size:].tolist()
+
+    logger.info(f"{set_name} sequences: {len(y)} windows of {window_size}x{values.shape[1]} over {len(values)} rows")
+    logger.info(f"Positive: {np.sum(y == 1)}, Unlabeled: {np.sum(y == 0)}")
+
+    return values, y, timestamps
+
+
+def extract_model_inputs(dataframe, window_size, input_mode=None, set_name="data"):
+    """Dispatch to the extractor matching the model's input mode"""
+    if input_mode == SEQUENCE_INPUT_MODE:
+        return extract_sequence_source(dataframe, window_size, set_name)
+    return extract_temporal_features(dataframe, window_size, set_name)
+
+
+def sequence_windows(values, window_size: int) -> torch.Tensor:
+    """
+    Zero-copy (n_samples, window_size, n_channels) view over channel rows
+
+    Window ``k`` covers rows ``[k, k + window_size)``; the last full window is
+    dropped because it has no following row to label. Only indexing a batch out
+    of the view (or calling .contiguous()) materializes data.
+
+    Args:
+        values: (n_rows, n_channels) float32 array or tensor
+        window_size: Size of sliding window
+    """
+    values = torch.as_tensor(values, dtype=torch.float32)
+    return values.unfold(0, window_size, 1)[:len(values) - window_size].transpose(1, 2)
+
+
+def to_model_input(X, window_size: int, input_mode=None, device=None) -> torch.Tensor:
+    """
+    Convert scaled model inputs to the tensor the LSTM consumes
+
+    Features mode returns (n_samples, n_features); sequence mode moves the
+    channel rows to ``device`` first and returns the windowed view there.
+    """
+    tensor = torch.as_tensor(np.asarray(X, dtype=np.float32), device=device)
+    if input_mode == SEQUENCE_INPUT_MODE:
+        return sequence_windows(tensor, window_size)
+    return tensor
+
+
 def get_feature_names():
     """
     Get standardized feature names for model input
@@ -220,11 +402,15 @@ def load_model_artifacts(model_path: str):
     """
     Load model artifacts from file with validation
 
+    Structured artifact directories (``.model``) only parse their JSON metadata
+    here; weights and scaler load lazily on first access. Legacy ``.pkl`` files
+    are still unpickled for models trained before the structured format.
+
     Args:
-        model_path: Path to the model file (.pkl)
+        model_path: Path to the model artifact directory (.model) or legacy file (.pkl)
 
     Returns:
-        dict: Model artifacts containing model_state_dict, scaler, config, etc.
+        Mapping: Model artifacts containing model_state_dict, scaler, config, etc.
 
     Raises:
         FileNotFoundError: If model file doesn't exist
@@ -232,6 +418,7 @@ def load_model_artifacts(model_path: str):
     """
     import pickle
     import os
+    from .model_artifact import is_artifact_dir, load_artifact
 
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model file not found: {model_path}")
@@ -239,8 +426,12 @@ def load_model_artifacts(model_path: str):
     logger.info(f"Loading model artifacts from: {model_path}")
 
     try:
-        with open(model_path, 'rb') as f:
-            artifacts = pickle.load(f)
+        if is_artifact_dir(model_path):
+            artifacts = load_artifact(model_path)
+            logger.info(f"Structured model artifact, content hash: {artifacts.content_hash}")
+        else:
+            with open(model_path, 'rb') as f:
+                artifacts = pickle.load(f)
 
         # Validate required components
         required_keys = ['model_state_dict', 'scaler', 'model_config', 'feature_names']
@@ -264,6 +455,11 @@ def reconstruct_model(artifacts: dict) -> LSTMPULearningModel:
     """
     Reconstruct PyTorch model from artifacts
 
+    Structured artifacts carry a content hash; their reconstructed models are
+    kept in an in-process LRU so repeated evaluations of the same model skip
+    weight deserialization and reconstruction. The returned model is shared
+    and must only be used for inference.
+
     Args:
         artifacts: Model artifacts from load_model_artifacts()
 
@@ -273,6 +469,15 @@ def reconstruct_model(artifacts: dict) -> LSTMPULearningModel:
     Raises:
         ValueError: If model reconstruction fails
     """
+    content_hash = getattr(artifacts, 'content_hash', None)
+    if content_hash is None:
+        return _reconstruct_model(artifacts)
+
+    from .model_artifact import get_model_cache
+    return get_model_cache().get_or_build(content_hash, lambda: _reconstruct_model(artifacts))
+
+
+def _reconstruct_model(artifacts: dict) -> LSTMPULearningModel:
     logger.info("SHARED_MODELS: CORRECT (V2) reconstruct_model function called.")
     try:
         model_config = artifacts['model_config']
@@ -308,8 +513,9 @@ def reconstruct_model(artifacts: dict) -> LSTMPULearningModel:
             return model
 
         # New LSTM architecture - normal loading
+        # (input size comes from the saved weights: 12 features, or channel count in sequence mode)
         model = LSTMPULearningModel(
-            input_size=model_config.get('input_size', 12),
+            input_size=model_config.get('input_size', state_dict['lstm.weight_ih_l0'].shape[1]),
             hidden_size=model_config.get('hiddenSize', 64),
             num_layers=model_config.get('numLayers', 2),
             dropout=model_config.get('dropout', 0.2)
@@ -0,0 +1,610 @@
+"""
+SQLite Repository for Case Study v2
+Async, pooled access to analysis_datasets / analysis_ready_data /
+anomaly_event / trained_models without blocking the FastAPI event loop
+
+sqlite3 本身是同步的；這裡把每個查詢丟到專用的執行緒池中執行，
+並維護一個固定大小的連線池，讓長時間的 analysis_ready_data 掃描
+不會卡住其他 API 請求。
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 預設資料庫位置：backend/database/prisma/pu_practice.db
+DEFAULT_DB_PATH = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'prisma', 'pu_practice.db'
+))
+
+SAMPLE_COLUMNS = ['timestamp', 'wattage_total', 'wattage_110v', 'wattage_220v', 'raw_wattage_l1', 'raw_wattage_l2']
+
+# 每個 asyncio task（即每個請求 / 背景工作）目前持有的連線
+_current_connection: contextvars.ContextVar = contextvars.ContextVar(
+    'case_study_v2_sqlite_connection', default=None
+)
+
+
+def resolve_db_path(db_url: Optional[str] = None) -> str:
+    """
+    解析資料庫位置
+
+    Args:
+        db_url: sqlite:///path、file:path 或一般檔案路徑；
+                未指定時依序讀取 CASE_STUDY_DB_URL、DATABASE_URL 環境變數
+
+    Returns:
+        str: SQLite 檔案路徑
+    """
+    db_url = db_url or os.getenv('CASE_STUDY_DB_URL') or os.getenv('DATABASE_URL')
+    if not db_url:
+        return DEFAULT_DB_PATH
+
+    for prefix in ('sqlite:///', 'sqlite://', 'file:'):
+        if db_url.startswith(prefix):
+            return db_url[len(prefix):]
+
+    if '://' in db_url:
+        # 非 SQLite 的 URL（例如 Prisma 的 postgresql://）不適用於此 repository
+        logger.warning(f"Ignoring non-SQLite database URL, falling back to {DEFAULT_DB_PATH}")
+        return DEFAULT_DB_PATH
+
+    return db_url
+
+
+class QueryResult:
+    """查詢結果：在 worker 執行緒中一次取回，回到事件迴圈後可直接讀取"""
+
+    def __init__(self, rows: List[tuple], rowcount: int, lastrowid: Optional[int], description):
+        self.rows = rows
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self.description = description
+
+    @property
+    def columns(self) -> List[str]:
+        return [d[0] for d in self.description] if self.description else []
+
+    def fetchall(self) -> List[tuple]:
+        return self.rows
+
+    def fetchone(self) -> Optional[tuple]:
+        return self.rows[0] if self.rows else None
+
+
+class AsyncSQLiteConnection:
+    """
+    單一池化連線的 async 包裝
+
+    所有操作都在 repository 的執行緒池中執行；同一條連線上的操作以 lock 串行化，
+    因此同一請求內共用連線的子 task 也是安全的。
+    """
+
+    def __init__(self, raw_conn: sqlite3.Connection, executor: ThreadPoolExecutor):
+        self._conn = raw_conn
+        self._executor = executor
+        self._lock = asyncio.Lock()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.in_transaction
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """在 worker 執行緒中以原生 sqlite3.Connection 執行 fn(conn, *args)"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            return await loop.run_in_executor(self._executor, fn, self._conn, *args)
+
+    @staticmethod
+    def _execute_sync(conn: sqlite3.Connection, sql: str, params: Sequence) -> QueryResult:
+        cursor = conn.execute(sql, params)
+        try:
+            rows = cursor.fetchall() if cursor.description else []
+            return QueryResult(rows, cursor.rowcount, cursor.lastrowid, cursor.description)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _executemany_sync(conn: sqlite3.Connection, sql: str, seq_of_params: Iterable[Sequence]) -> QueryResult:
+        cursor = conn.executemany(sql, seq_of_params)
+        try:
+            return QueryResult([], cursor.rowcount, cursor.lastrowid, None)
+        finally:
+            cursor.close()
+
+    async def execute(self, sql: str, params: Sequence = ()) -> QueryResult:
+        return await self.run(self._execute_sync, sql, params)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Sequence]) -> QueryResult:
+        return await self.run(self._executemany_sync, sql, list(seq_of_params))
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return (await self.execute(sql, params)).rows
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        return (await self.execute(sql, params)).fetchone()
+
+    async def fetchval(self, sql: str, params: Sequence = (), default: Any = None) -> Any:
+        row = await self.fetchone(sql, params)
+        return row[0] if row else default
+
+    async def commit(self):
+        await self.run(lambda conn: conn.commit())
+
+    async def rollback(self):
+        await self.run(lambda conn: conn.rollback())
+
+
+class SQLiteRepository:
+    """
+    Case Study v2 共用的 async SQLite repository
+
+    - 連線池：最多 pool_size 條連線，各自擁有 prepared statement cache
+    - 每個請求（asyncio task context）重用同一條連線，離開時自動歸還
+    - WAL 模式讓讀取不會被訓練工作中的寫入擋住
+    """
+
+    def __init__(self, db_url: Optional[str] = None, pool_size: Optional[int] = None,
+                 statement_cache_size: int = 256, busy_timeout: float = 30.0):
+        self.db_path = resolve_db_path(db_url)
+        self.pool_size = pool_size or int(os.getenv('CASE_STUDY_DB_POOL_SIZE', '4'))
+        self.statement_cache_size = statement_cache_size
+        self.busy_timeout = busy_timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.pool_size, thread_name_prefix='case-study-sqlite'
+        )
+        self._idle: List[AsyncSQLiteConnection] = []
+        self._created = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+    def _connect_sync(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    async def _acquire(self) -> AsyncSQLiteConnection:
+        if self._closed:
+            raise RuntimeError("SQLiteRepository is closed")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+
+        await self._semaphore.acquire()
+        try:
+            if self._idle:
+                return self._idle.pop()
+            loop = asyncio.get_running_loop()
+            raw_conn = await loop.run_in_executor(self._executor, self._connect_sync)
+            self._created += 1
+            logger.debug(f"Opened pooled SQLite connection #{self._created} to {self.db_path}")
+            return AsyncSQLiteConnection(raw_conn, self._executor)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _release(self, conn: AsyncSQLiteConnection):
+        try:
+            # 與原本 conn.close() 行為一致：未 commit 的變更一律捨棄
+            if conn.in_transaction:
+                await conn.rollback()
+            if self._closed:
+                await conn.run(lambda raw: raw.close())
+            else:
+                self._idle.append(conn)
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncSQLiteConnection]:
+        """
+        取得目前請求使用的連線
+
+        巢狀呼叫會重用外層已取得的連線，因此 handler 與它呼叫的 helper
+        共用同一條連線及同一個交易。
+        """
+        current = _current_connection.get()
+        if current is not None:
+            yield current
+            return
+
+        conn = await self._acquire()
+        token = _current_connection.set(conn)
+        try:
+            yield conn
+        finally:
+            _current_connection.reset(token)
+            await self._release(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncSQLiteConnection]:
+        """成功時 commit、發生例外時 rollback 的連線"""
+        async with self.connection() as conn:
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        async with self.connection() as conn:
+            return await conn.fetchall(sql, params)
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        async with self.connection() as conn:
+            return await conn.fetchone(sql, params)
+
+    # ========== analysis_ready_data ==========
+
+    async def load_positive_samples(self, dataset_id: str) -> List[tuple]:
+        """
+        載入資料集中已標記為正樣本的資料
+
+        Returns:
+            List[tuple]: (timestamp, wattage_total, wattage_110v, wattage_220v, raw_l1, raw_l2)，依時間排序
+        """
+        return await self.fetchall(f'''
+            SELECT {", ".join(SAMPLE_COLUMNS)}
+            FROM analysis_ready_data
+            WHERE dataset_id = ? AND is_positive_label = 1
+            ORDER BY timestamp
+        ''', (dataset_id,))
+
+    async def load_unlabeled_samples(self, dataset_id: str, limit: int) -> List[tuple]:
+        """
+        載入資料集中未標記的資料（最多 limit 筆）
+
+        Returns:
+            List[tuple]: (timestamp, wattage_total, wattage_110v, wattage_220v, raw_l1, raw_l2)，依時間排序
+        """
+        return await self.fetchall(f'''
+            SELECT {", ".join(SAMPLE_COLUMNS)}
+            FROM analysis_ready_data
+            WHERE dataset_id = ? AND (is_positive_label = 0 OR is_positive_label IS NULL)
+            ORDER BY timestamp
+            LIMIT ?
+        ''', (dataset_id, limit))
+
+    async def load_labeled_samples(self, dataset_id: Optional[str] = None,
+                                   limit: Optional[int] = None, newest_first: bool = False) -> List[tuple]:
+        """
+        載入資料及其標籤（未標記視為 0）
+
+        Args:
+            dataset_id: 指定資料集；None 表示全部資料
+            limit: 最多筆數
+            newest_first: 依時間由新到舊排序（搭配 limit 取最近資料）
+
+        Returns:
+            List[tuple]: (timestamp, wattage_total, wattage_110v, wattage_220v, raw_l1, raw_l2, label)
+        """
+        conditions = ['timestamp IS NOT NULL'] if dataset_id is None else ['dataset_id = ?']
+        params: List[Any] = [] if dataset_id is None else [dataset_id]
+        sql = f'''
+            SELECT {", ".join(SAMPLE_COLUMNS)}, COALESCE(is_positive_label, 0) as label
+            FROM analysis_ready_data
+            WHERE {" AND ".join(conditions)}
+            ORDER BY timestamp {"DESC" if newest_first else ""}
+        '''
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return await self.fetchall(sql, tuple(params))
+
+    async def dataset_fingerprint(self, dataset_id: str) -> List[Any]:
+        """
+        計算資料集內容指紋（供特徵快取使用）
+
+        只做一次彙總查詢，不傳輸資料列；新增 / 刪除資料或任何標籤變動都會改變指紋。
+
+        Returns:
+            List: [筆數, 正標籤數, 最早時間, 最晚時間, 正標籤 rowid checksum]
+        """
+        row = await self.fetchone('''
+            SELECT COUNT(*),
+                   SUM(CASE WHEN is_positive_label = 1 THEN 1 ELSE 0 END),
+                   MIN(timestamp),
+                   MAX(timestamp),
+                   SUM(CASE WHEN is_positive_label = 1 THEN rowid ELSE 0 END)
+            FROM analysis_ready_data
+            WHERE dataset_id = ?
+        ''', (dataset_id,))
+        return [value if value is not None else 0 for value in row] if row else [0, 0, 0, 0, 0]
+
+    # ========== anomaly_event 批次審核 ==========
+
+    async def bulk_review_events(
+        self,
+        status: str,
+        reviewer_id: str,
+        justification_notes: str,
+        review_timestamp: str,
+        event_ids: Optional[Sequence[str]] = None,
+        experiment_run_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        以集合操作批次審核 UNREVIEWED 的異常事件（單一交易、單次執行緒切換）
+
+        事件 ID 先寫入暫存表，狀態更新、正標籤傳播（完全相同時間，否則 ±5 分鐘內最近的一筆）
+        都是與暫存表 join 的少數幾個 UPDATE；受影響資料集的 positive_labels
+        與實驗的統計只在最後各重算一次。
+
+        Args:
+            status: CONFIRMED_POSITIVE 或 REJECTED_NORMAL
+            reviewer_id: 審核者
+            justification_notes: 審核說明
+            review_timestamp: 審核時間（SQLite 格式字串）
+            event_ids: 要審核的事件 ID（依此順序處理，重複者只取第一次）
+            experiment_run_id: 未指定 event_ids 時，審核此實驗所有 UNREVIEWED 事件
+
+        Returns:
+            Dict: updated_events（依請求順序）, dataset_positive_labels, experiment_stats
+        """
+        async with self.transaction() as conn:
+            return await conn.run(
+                _bulk_review_sync, status, reviewer_id, justification_notes, review_timestamp,
+                list(event_ids) if event_ids is not None else None, experiment_run_id
+            )
+
+    # ========== analysis_datasets / anomaly_event / trained_models ==========
+
+    async def get_dataset(self, dataset_id: str) -> Optional[tuple]:
+        return await self.fetchone('SELECT * FROM analysis_datasets WHERE id = ?', (dataset_id,))
+
+    async def list_datasets(self) -> List[tuple]:
+        return await self.fetchall('SELECT * FROM analysis_datasets ORDER BY created_at DESC')
+
+    async def list_anomaly_events(self, dataset_id: str) -> List[tuple]:
+        return await self.fetchall(
+            'SELECT * FROM anomaly_event WHERE dataset_id = ? ORDER BY event_timestamp', (dataset_id,)
+        )
+
+    async def get_trained_model(self, model_id: str) -> Optional[tuple]:
+        return await self.fetchone('SELECT * FROM trained_models WHERE id = ?', (model_id,))
+
+    async def close(self):
+        """關閉所有閒置連線並停止執行緒池"""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.run(lambda raw: raw.close())
+        self._executor.shutdown(wait=False)
+
+
+# 正標籤傳播的模糊比對範圍：事件時間前後各 5 分鐘
+LABEL_MATCH_WINDOW_MINUTES = 5
+
+
+def _bulk_review_sync(
+    conn: sqlite3.Connection,
+    status: str,
+    reviewer_id: str,
+    justification_notes: str,
+    review_timestamp: str,
+    event_ids: Optional[List[str]],
+    experiment_run_id: Optional[str]
+) -> Dict[str, Any]:
+    """bulk_review_events 的同步實作（在 worker 執行緒中執行，呼叫端負責 commit / rollback）"""
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS bulk_review_ids (id TEXT PRIMARY KEY, ord INTEGER NOT NULL)')
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS bulk_review_matches (ard_id TEXT NOT NULL, event_id TEXT NOT NULL, ord INTEGER NOT NULL)')
+    conn.execute('CREATE INDEX IF NOT EXISTS temp.bulk_review_matches_ard ON bulk_review_matches (ard_id, ord)')
+    conn.execute(
+        'CREATE TEMP TABLE IF NOT EXISTS bulk_review_fallback '
+        '(event_id TEXT, dataset_id TEXT, event_timestamp TEXT, ord INTEGER, start_window TEXT, end_window TEXT)'
+    )
+    _clear_bulk_review_tables(conn)
+
+    try:
+        # 1. 暫存要審核的事件，只保留存在且尚未審核者
+        if event_ids is not None:
+            conn.executemany(
+                'INSERT OR IGNORE INTO temp.bulk_review_ids (id, ord) VALUES (?, ?)',
+                ((event_id, ord_) for ord_, event_id in enumerate(event_ids))
+            )
+            conn.execute("""
+                DELETE FROM temp.bulk_review_ids
+                WHERE id NOT IN (SELECT id FROM anomaly_event WHERE status = 'UNREVIEWED')
+            """)
+        else:
+            conn.execute("""
+                INSERT INTO temp.bulk_review_ids (id, ord)
+                SELECT id, ROW_NUMBER() OVER (ORDER BY rowid)
+                FROM anomaly_event
+                WHERE experiment_run_id = ? AND status = 'UNREVIEWED'
+            """, (experiment_run_id,))
+
+        events = conn.execute("""
+            SELECT ae.id, ae.dataset_id, ae.event_timestamp, ae.experiment_run_id, t.ord
+            FROM temp.bulk_review_ids t
+            JOIN anomaly_event ae ON ae.id = t.id
+            ORDER BY t.ord
+        """).fetchall()
+
+        if event_ids is not None and len(events) < len(set(event_ids)):
+            logger.warning(f"Bulk review: skipped {len(set(event_ids)) - len(events)} events that were not found or already reviewed")
+
+        if not events:
+            return {'updated_events': [], 'dataset_positive_labels': {}, 'experiment_stats': {}}
+
+        # 2. 更新事件狀態
+        conn.execute("""
+            UPDATE anomaly_event
+            SET status = ?, reviewer_id = ?, justification_notes = ?,
+                review_timestamp = ?, updated_at = ?
+            WHERE id IN (SELECT id FROM temp.bulk_review_ids)
+        """, (status, reviewer_id, justification_notes, review_timestamp, review_timestamp))
+
+        # 3. 確認為異常時，把正標籤傳播到 analysis_ready_data
+        if status == 'CONFIRMED_POSITIVE':
+            conn.execute("""
+                INSERT INTO temp.bulk_review_matches (ard_id, event_id, ord)
+                SELECT ard.id, ae.id, t.ord
+                FROM temp.bulk_review_ids t
+                JOIN anomaly_event ae ON ae.id = t.id
+                JOIN analysis_ready_data ard
+                  ON ard.dataset_id = ae.dataset_id AND ard.timestamp = ae.event_timestamp
+            """)
+
+            # 沒有完全相同時間的資料點時，改用 ±5 分鐘內最接近的一筆
+            exact_matched = {row[0] for row in conn.execute('SELECT DISTINCT event_id FROM temp.bulk_review_matches')}
+            fallback = []
+            for event_id, dataset_id, event_timestamp, _, ord_ in events:
+                if event_id in exact_matched:
+                    continue
+                try:
+                    event_dt = datetime.fromisoformat(str(event_timestamp).replace('Z', '+00:00'))
+                except ValueError as dt_error:
+                    logger.error(f"Error processing timestamp for event {event_id}: {dt_error}")
+                    continue
+                window = timedelta(minutes=LABEL_MATCH_WINDOW_MINUTES)
+                fallback.append((
+                    event_id, dataset_id, event_timestamp, ord_,
+                    (event_dt - window).strftime('%Y-%m-%d %H:%M:%S'),
+                    (event_dt + window).strftime('%Y-%m-%d %H:%M:%S')
+                ))
+
+            if fallback:
+                conn.executemany(
+                    'INSERT INTO temp.bulk_review_fallback VALUES (?, ?, ?, ?, ?, ?)', fallback
+                )
+                conn.execute("""
+                    INSERT INTO temp.bulk_review_matches (ard_id, event_id, ord)
+                    SELECT ard_id, event_id, ord FROM (
+                        SELECT ard.id AS ard_id, f.event_id, f.ord,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY f.event_id
+                                   ORDER BY ABS(julianday(ard.timestamp) - julianday(f.event_timestamp)), ard.rowid
+                               ) AS rank
+                        FROM temp.bulk_review_fallback f
+                        JOIN analysis_ready_data ard
+                          ON ard.dataset_id = f.dataset_id
+                         AND ard.timestamp BETWEEN f.start_window AND f.end_window
+                    )
+                    WHERE rank = 1
+                """)
+
+            # 同一資料點被多個事件對應時，以請求中較後面的事件為準（與逐筆處理結果相同）
+            conn.execute("""
+                UPDATE analysis_ready_data
+                SET is_positive_label = 1,
+                    source_anomaly_event_id = (
+                        SELECT m.event_id FROM temp.bulk_review_matches m
+                        WHERE m.ard_id = analysis_ready_data.id
+                        ORDER BY m.ord DESC
+                        LIMIT 1
+                    )
+                WHERE id IN (SELECT ard_id FROM temp.bulk_review_matches)
+            """)
+
+        # 4. 每個受影響資料集重算一次 positive_labels（取確認事件數與正標籤資料數的最大值）
+        conn.execute("""
+            UPDATE analysis_datasets
+            SET positive_labels = MAX(
+                (SELECT COUNT(*) FROM anomaly_event ae
+                 WHERE ae.dataset_id = analysis_datasets.id AND ae.status = 'CONFIRMED_POSITIVE'),
+                (SELECT COUNT(*) FROM analysis_ready_data ard
+                 WHERE ard.dataset_id = analysis_datasets.id AND ard.is_positive_label = 1)
+            )
+            WHERE id IN (
+                SELECT DISTINCT ae.dataset_id
+                FROM temp.bulk_review_ids t JOIN anomaly_event ae ON ae.id = t.id
+            )
+        """)
+        dataset_positive_labels = dict(conn.execute("""
+            SELECT id, positive_labels FROM analysis_datasets
+            WHERE id IN (
+                SELECT DISTINCT ae.dataset_id
+                FROM temp.bulk_review_ids t JOIN anomaly_event ae ON ae.id = t.id
+            )
+        """).fetchall())
+
+        # 5. 每個受影響實驗重算一次統計
+        experiment_stats = {}
+        for run_id in {event[3] for event in events if event[3] is not None}:
+            experiment_stats[run_id] = _refresh_experiment_run_stats_sync(conn, run_id, review_timestamp)
+
+        return {
+            'updated_events': [event[0] for event in events],
+            'dataset_positive_labels': dataset_positive_labels,
+            'experiment_stats': experiment_stats
+        }
+
+    finally:
+        _clear_bulk_review_tables(conn)
+
+
+def _clear_bulk_review_tables(conn: sqlite3.Connection):
+    for table in ('bulk_review_ids', 'bulk_review_matches', 'bulk_review_fallback'):
+        conn.execute(f'DELETE FROM temp.{table}')
+
+
+def _refresh_experiment_run_stats_sync(conn: sqlite3.Connection, experiment_run_id: str, updated_at: str) -> Dict[str, int]:
+    """重算實驗的候選數與數據池正 / 負標籤數並寫回 experiment_run"""
+    total_candidates = conn.execute(
+        'SELECT COUNT(*) FROM anomaly_event WHERE experiment_run_id = ?', (experiment_run_id,)
+    ).fetchone()[0]
+
+    total_data_pool_size, total_positive_in_pool = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(CASE WHEN is_positive_label = 1 THEN 1 ELSE 0 END), 0)
+        FROM analysis_ready_data
+        WHERE dataset_id IN (
+            SELECT DISTINCT dataset_id FROM anomaly_event WHERE experiment_run_id = ?
+        )
+    """, (experiment_run_id,)).fetchone()
+    total_negative_in_pool = total_data_pool_size - total_positive_in_pool
+
+    conn.execute("""
+        UPDATE experiment_run
+        SET candidate_count = ?,
+            positive_label_count = ?,
+            negative_label_count = ?,
+            total_data_pool_size = ?,
+            updated_at = ?
+        WHERE id = ?
+    """, (total_candidates, total_positive_in_pool, total_negative_in_pool, total_data_pool_size, updated_at, experiment_run_id))
+
+    return {
+        'candidate_count': total_candidates,
+        'total_data_pool_size': total_data_pool_size,
+        'positive_label_count': total_positive_in_pool,
+        'negative_label_count': total_negative_in_pool
+    }
+
+
+_repository: Optional[SQLiteRepository] = None
+
+
+def get_sqlite_repository() -> SQLiteRepository:
+    """取得共用的 SQLiteRepository（第一次呼叫時建立）"""
+    global _repository
+    if _repository is None:
+        _repository = SQLiteRepository()
+        logger.info(f"SQLite repository using {_repository.db_path} (pool size {_repository.pool_size})")
+    return _repository
+
+
+async def close_sqlite_repository():
+    """關閉共用的 SQLiteRepository（應用程式關閉時呼叫）"""
+    global _repository
+    if _repository is not None:
+        await _repository.close()
+        _repository = None
@@ -0,0 +1,381 @@
+"""
+Hyperparameter Sweep Runner for Case Study v2
+以共享資料、平行 trial 與 successive halving 執行 nnPU 超參數搜尋
+
+- P/U 資料只從資料庫載入一次；每組 (windowSize, inputMode) 只做一次特徵工程與
+  StandardScaler，結果放進 shared memory，worker 以零複製的 numpy view 讀取
+- trial 在 spawn 的 ProcessPoolExecutor 中執行，每個 worker 以 torch.set_num_threads
+  限制執行緒數，避免多個 trial 互搶 CPU
+- 每一輪（rung）所有存活 trial 訓練到相同 epoch 預算，依最佳驗證 F1 只保留前 1/eta
+  繼續訓練；trial 以 NNPUTrainingEngine.checkpoint() 在輪與輪之間接續
+- 完成（訓練到 epochs 或提早停止）的 trial 立即寫入 trained_models 與資料庫
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .models import ModelConfig, StartTrainingJobRequest
+from .database import DatabaseManager
+from .model_trainer import (
+    build_nnpu_model,
+    build_training_features,
+    get_taiwan_time,
+    load_pu_training_rows,
+    save_model_artifact
+)
+from .shared_models import get_feature_names, get_input_mode, to_model_input
+from .sqlite_repository import get_sqlite_repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ETA = 3
+DEFAULT_MIN_EPOCHS = 5
+
+# worker 端已 attach 的 shared memory（name -> (SharedMemory, ndarray)）
+_ATTACHED_ARRAYS: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def expand_search_space(base_config: Dict[str, Any], search_space: Dict[str, List[Any]],
+                        max_trials: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    將搜尋空間展開成完整的 ModelConfig 設定
+
+    Args:
+        base_config: 基礎 ModelConfig（dict），未在搜尋空間中的欄位沿用
+        search_space: 欄位名稱 -> 候選值列表，取笛卡兒積
+        max_trials: 組合數超過時隨機抽樣的 trial 數
+        seed: 抽樣種子
+
+    Returns:
+        List[Dict]: 每個 trial 的 ModelConfig dict（已經過 pydantic 驗證）
+    """
+    unknown = set(search_space) - set(ModelConfig.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters in search space: {sorted(unknown)}")
+
+    names = list(search_space)
+    combinations = list(itertools.product(*(search_space[name] for name in names)))
+    if max_trials is not None and len(combinations) > max_trials:
+        combinations = random.Random(seed).sample(combinations, max_trials)
+
+    return [ModelConfig(**{**base_config, **dict(zip(names, values))}).dict() for values in combinations]
+
+
+def _share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """複製陣列到新的 shared memory，回傳 (segment, worker 可 attach 的描述)"""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return segment, {'name': segment.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def _attach_array(descriptor: Dict[str, Any]) -> np.ndarray:
+    """worker 端 attach shared memory（同一 worker 只 attach 一次）"""
+    attached = _ATTACHED_ARRAYS.get(descriptor['name'])
+    if attached is None:
+        segment = shared_memory.SharedMemory(name=descriptor['name'])
+        array = np.ndarray(descriptor['shape'], dtype=np.dtype(descriptor['dtype']), buffer=segment.buf)
+        attached = _ATTACHED_ARRAYS[descriptor['name']] = (segment, array)
+    return attached[1]
+
+
+def _init_sweep_worker(threads_per_trial: int):
+    """worker 初始化：限制每個 trial 的 torch 執行緒數"""
+    import torch
+    torch.set_num_threads(threads_per_trial)
+    torch.set_num_interop_threads(1)
+
+
+def run_sweep_trial(trial: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在 worker process 中把一個 trial 訓練到本輪的 epoch 預算
+
+    Args:
+        trial: trial_id / config / data（shared memory 描述）/ budget /
+               checkpoint_path / seed / model_id / scaler
+
+    Returns:
+        Dict: 本輪結果（best_val_f1、epochs_trained、finished 等）；
+              trial 完成時另含 model_path 與 training_metrics
+    """
+    import torch
+    from .nnpu_engine import NNPUTrainingEngine
+
+    config = ModelConfig(**trial['config'])
+    data = {key: _attach_array(descriptor) for key, descriptor in trial['data'].items()}
+    window_size, input_mode = config.windowSize, get_input_mode(trial['config'])
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    torch.manual_seed(trial['seed'])
+    model, optimizer = build_nnpu_model(config, data['X_train'].shape[1], device)
+    engine = NNPUTrainingEngine(
+        model, optimizer, config.classPrior, device,
+        batch_size=config.batchSize,
+        shuffle=config.shuffle,
+        num_workers=0,
+        seed=trial['seed']
+    )
+    checkpoint_path = trial['checkpoint_path']
+    if os.path.exists(checkpoint_path):
+        engine.restore(torch.load(checkpoint_path, map_location=device, weights_only=False))
+
+    train_loader = engine.make_loader(to_model_input(data['X_train'], window_size, input_mode), data['y_train'])
+    X_val = to_model_input(data['X_val'], window_size, input_mode, device=device)
+    y_val = torch.as_tensor(data['y_val'], device=device).reshape(-1, 1)
+
+    history = engine.fit(
+        train_loader, X_val, y_val, min(trial['budget'], config.epochs),
+        eval_every=config.evalEvery,
+        early_stopping=config.earlyStopping,
+        patience=config.patience
+    )
+    finished = history['early_stopped'] or history['epochs_trained'] >= config.epochs
+
+    result = {
+        'trial_id': trial['trial_id'],
+        'best_val_f1': engine.best_val_f1,
+        'best_epoch': history['best_epoch'],
+        'epochs_trained': history['epochs_trained'],
+        'early_stopped': history['early_stopped'],
+        'epochs_per_second': engine.epochs_per_second,
+        'finished': finished
+    }
+    if not finished:
+        torch.save(engine.checkpoint(), checkpoint_path)
+        return result
+
+    # 完成：載入最佳權重，在測試集上評估並保存 artifact（格式與 fit_nnpu_model 相同）
+    engine.load_best()
+    X_test = to_model_input(data['X_test'], window_size, input_mode, device=device)
+    y_test = torch.as_tensor(data['y_test'], device=device).reshape(-1, 1)
+    test_metrics = engine.evaluate(X_test, y_test)
+    total_negative_risks = sum(history['negative_risks'])
+
+    model_artifact = {
+        'model_state_dict': model.state_dict(),
+        'scaler': trial['scaler'],
+        'model_config': config.dict(),
+        'best_f1_score': engine.best_val_f1,
+        'nnpu_class_prior': config.classPrior,
+        'nnpu_method': 'non-negative PU Learning',
+        'feature_names': get_feature_names(),
+        'training_stats': {
+            'negative_risk_events': total_negative_risks,
+            'epochs_trained': history['epochs_trained'],
+            'early_stopped': history['early_stopped']
+        }
+    }
+    result['model_path'] = save_model_artifact(trial['model_id'], model_artifact)
+    result['training_metrics'] = {
+        'training_history': history,
+        'epochs_per_second': engine.epochs_per_second,
+        'best_val_f1': engine.best_val_f1,
+        'final_test_metrics': {
+            'test_f1': test_metrics['f1'],
+            'test_precision': test_metrics['precision'],
+            'test_recall': test_metrics['recall'],
+            'test_nnpu_risk': test_metrics['loss'],
+            'true_positive_recall_test': test_metrics['true_positive_recall']
+        },
+        'nnpu_stats': {
+            'class_prior_used': config.classPrior,
+            'total_negative_risks': total_negative_risks,
+            'nnpu_method': 'non-negative PU Learning (Kiryo et al., 2017)'
+        },
+        'sweep': {'sweep_id': trial['sweep_id'], 'trial_id': trial['trial_id']}
+    }
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return result
+
+
+class SweepRunner:
+    """
+    nnPU 超參數搜尋（successive halving）
+
+    Args:
+        db_manager: 用於建立 / 更新 trained_model 記錄
+        request: 基礎訓練請求（名稱、情境、資料來源與預設 ModelConfig）
+        search_space: ModelConfig 欄位 -> 候選值列表
+        max_parallel: 同時執行的 trial 數（預設 CPU 數 / threads_per_trial）
+        threads_per_trial: 每個 trial 的 torch 執行緒數
+        eta: 每輪保留前 1/eta 的 trial，預算乘以 eta
+        min_epochs: 第一輪的 epoch 預算
+        max_trials: 組合數超過時隨機抽樣的 trial 數
+        seed: 抽樣與模型初始化的種子
+    """
+
+    def __init__(self, db_manager: DatabaseManager, request: StartTrainingJobRequest,
+                 search_space: Dict[str, List[Any]], max_parallel: Optional[int] = None,
+                 threads_per_trial: int = 1, eta: int = DEFAULT_ETA,
+                 min_epochs: int = DEFAULT_MIN_EPOCHS, max_trials: Optional[int] = None, seed: int = 0):
+        self.db_manager = db_manager
+        self.request = request
+        self.threads_per_trial = max(1, threads_per_trial)
+        self.max_parallel = max_parallel or max(1, (os.cpu_count() or 1) // self.threads_per_trial)
+        self.eta = max(2, eta)
+        self.min_epochs = max(1, min_epochs)
+        self.seed = seed
+        self.configs = expand_search_space(request.training_config.dict(), search_space, max_trials, seed)
+        self.sweep_id = f"sweep_{get_taiwan_time().strftime('%Y%m%d_%H%M%S')}"
+        self.results: List[Dict[str, Any]] = []
+
+    def _rung_budget(self, rung: int) -> int:
+        return self.min_epochs * self.eta ** rung
+
+    async def run(self, training_data_info: dict = None) -> List[Dict[str, Any]]:
+        """
+        執行搜尋
+
+        Args:
+            training_data_info: 與 ModelTrainer.train_model 相同的資料來源設定
+
+        Returns:
+            List[Dict]: 每個 trial 的結果（依最佳驗證 F1 由高到低）；
+                        完成的 trial 含 trained_model_id 與 model_path，被淘汰的 pruned 為 True
+        """
+        from sklearn.preprocessing import StandardScaler
+
+        training_data_info = training_data_info or {}
+        positive_dataset_ids = training_data_info.get('p_data_sources', {}).get('dataset_ids', [])
+        unlabeled_dataset_ids = training_data_info.get('u_data_sources', {}).get('dataset_ids', [])
+        split_ratios = training_data_info.get('split_ratios', {'train': 0.7, 'validation': 0.2, 'test': 0.1})
+        sample_limit = int(10000 * training_data_info.get('u_sample_ratio', 0.1))
+
+        logger.info(f"🔎 Starting hyperparameter sweep {self.sweep_id}: {len(self.configs)} trials, "
+                    f"{self.max_parallel} parallel × {self.threads_per_trial} thread(s), eta={self.eta}")
+
+        # 1. 資料只載入一次
+        positive_data, unlabeled_data = await load_pu_training_rows(
+            get_sqlite_repository(), positive_dataset_ids, unlabeled_dataset_ids, sample_limit
+        )
+
+        loop = asyncio.get_running_loop()
+        segments: List[shared_memory.SharedMemory] = []
+        checkpoint_dir = tempfile.mkdtemp(prefix=f"{self.sweep_id}_")
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_parallel,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_sweep_worker,
+            initargs=(self.threads_per_trial,)
+        )
+
+        try:
+            # 2. 每組 (windowSize, inputMode) 只做一次特徵工程與標準化
+            groups: Dict[Tuple[int, str], Dict[str, Any]] = {}
+            for config in self.configs:
+                group_key = (config['windowSize'], get_input_mode(config))
+                if group_key in groups:
+                    continue
+                arrays, _ = await loop.run_in_executor(
+                    None, build_training_features, positive_data, unlabeled_data,
+                    split_ratios, group_key[0], group_key[1]
+                )
+                scaler = StandardScaler().fit(arrays['X_train'])
+                descriptors = {}
+                for name in ('X_train', 'X_val', 'X_test'):
+                    segment, descriptors[name] = _share_array(scaler.transform(arrays[name]))
+                    segments.append(segment)
+                for name in ('y_train', 'y_val', 'y_test'):
+                    segment, descriptors[name] = _share_array(np.asarray(arrays[name]))
+                    segments.append(segment)
+                groups[group_key] = {'data': descriptors, 'scaler': scaler}
+                logger.info(f"  📦 Shared features for window={group_key[0]}, input={group_key[1]}: "
+                            f"{len(arrays['y_train'])}/{len(arrays['y_val'])}/{len(arrays['y_test'])} samples")
+
+            trials = []
+            for index, config in enumerate(self.configs):
+                group = groups[(config['windowSize'], get_input_mode(config))]
+                trials.append({
+                    'trial_id': index,
+                    'sweep_id': self.sweep_id,
+                    'config': config,
+                    'data': group['data'],
+                    'scaler': group['scaler'],
+                    'seed': self.seed + index,
+                    'model_id': f"{self.sweep_id}_trial{index}",
+                    'checkpoint_path': os.path.join(checkpoint_dir, f"trial_{index}.pt")
+                })
+
+            # 3. successive halving：每輪全部存活 trial 訓練到相同預算，保留前 1/eta
+            active, rung = trials, 0
+            while active:
+                budget = self._rung_budget(rung)
+                if len(active) == 1:
+                    budget = active[0]['config']['epochs']
+                logger.info(f"  🪜 Rung {rung}: {len(active)} trial(s), budget {budget} epochs")
+
+                futures = []
+                for trial in active:
+                    trial['budget'] = budget
+                    futures.append(asyncio.wrap_future(pool.submit(run_sweep_trial, trial)))
+
+                rung_results = []
+                for future in asyncio.as_completed(futures):
+                    result = await future
+                    rung_results.append(result)
+                    if result['finished']:
+                        await self._persist_trial(trials[result['trial_id']], result)
+
+                rung_results.sort(key=lambda r: r['best_val_f1'], reverse=True)
+                keep = max(1, math.ceil(len(rung_results) / self.eta))
+                promoted = {r['trial_id'] for r in rung_results[:keep] if not r['finished']}
+                for result in rung_results:
+                    if not result['finished'] and result['trial_id'] not in promoted:
+                        result.update({'config': trials[result['trial_id']]['config'], 'pruned': True})
+                        self.results.append(result)
+                        logger.info(f"    ✂️ Pruned trial {result['trial_id']} at epoch {result['epochs_trained']} "
+                                    f"(best val F1 {result['best_val_f1']:.4f})")
+
+                active = [trials[trial_id] for trial_id in sorted(promoted)]
+                rung += 1
+
+        finally:
+            pool.shutdown(wait=True)
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+        # 同分時完成的 trial 排在被淘汰者之前
+        self.results.sort(key=lambda r: (r['best_val_f1'], not r['pruned']), reverse=True)
+        if self.results:
+            best = self.results[0]
+            logger.info(f"🏆 Sweep {self.sweep_id} finished: best trial {best['trial_id']} "
+                        f"(val F1 {best['best_val_f1']:.4f}, config {best['config']})")
+        return self.results
+
+    async def _persist_trial(self, trial: Dict[str, Any], result: Dict[str, Any]):
+        """完成的 trial 立即寫入資料庫（artifact 已由 worker 寫入 trained_models）"""
+        request = self.request
+        record = await self.db_manager.create_trained_model(
+            name=f"{request.model_name} [sweep trial {trial['trial_id']}]",
+            scenario_type=request.scenario_type.value,
+            experiment_run_id=request.experiment_run_id,
+            model_config=trial['config'],
+            data_source_config=request.data_source_config.dict()
+        )
+        await self.db_manager.update_trained_model(
+            record.id,
+            'COMPLETED',
+            model_path=result['model_path'],
+            training_metrics=result['training_metrics'],
+            completed_at=get_taiwan_time()
+        )
+        result.update({'config': trial['config'], 'pruned': False, 'trained_model_id': record.id})
+        del result['training_metrics']
+        self.results.append(result)
+        logger.info(f"    ✅ Trial {trial['trial_id']} completed: val F1 {result['best_val_f1']:.4f} "
+                    f"after {result['epochs_trained']} epochs → {result['model_path']}")
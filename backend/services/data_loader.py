@@ -5,7 +5,7 @@
 
 import pandas as pd
 import numpy as np
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from datetime import datetime, timedelta, date
 import asyncio
 import logging
@@ -14,6 +14,12 @@ from core.database import db_manager
 
 logger = logging.getLogger(__name__)
 
+# 電表數據載入所需的欄位（不包含 requestData/responseData 等大型文字欄位）
+METER_LOG_COLUMNS = [
+    'deviceNumber', 'createdAt', 'power', 'voltage',
+    'currents', 'battery', 'switchState', 'networkState'
+]
+
 class DataLoaderService:
     """數據載入服務 - 專門負責載入真實數據"""
 
@@ -282,6 +288,112 @@ class DataLoaderService:
         """
         return self._device_room_mapping.copy()
 
+    def _resolve_device_filter(
+        self,
+        selected_floors_by_building: Optional[Dict[str, List[str]]],
+        meter_id: Optional[str]
+    ) -> Optional[List[str]]:
+        """
+        解析設備過濾條件
+
+        Args:
+            selected_floors_by_building: 按建築物分組的樓層選擇
+            meter_id: 可選的電表號碼，提供時忽略樓層篩選
+
+        Returns:
+            Optional[List[str]]: 允許的設備列表；None 表示不過濾（載入所有設備）
+        """
+        # 如果指定了電表號碼，直接使用該電表，忽略樓層篩選
+        if meter_id:
+            logger.info(f"[DATA_LOADER] 使用指定電表號碼: {meter_id}")
+            return [meter_id]
+
+        # 如果有樓層/建築過濾條件，獲取符合條件的設備列表
+        if selected_floors_by_building:
+            logger.info(f"[DATA_LOADER] 使用按建築分組的樓層過濾: {selected_floors_by_building}")
+
+            allowed_devices = []
+            for device_id, room_info in self._device_room_mapping.items():
+                # 檢查該設備的建築物與樓層是否在選擇列表中
+                if room_info["floor"] in selected_floors_by_building.get(room_info["building"], []):
+                    allowed_devices.append(device_id)
+                    logger.debug(f"[DATA_LOADER] 匹配設備: {device_id} - {room_info['building']} {room_info['floor']}F {room_info['room']}")
+
+            logger.info(f"[DATA_LOADER] 過濾後匹配的設備數量: {len(allowed_devices)}")
+            return allowed_devices
+
+        logger.info("[DATA_LOADER] 沒有指定電表號碼或樓層篩選條件，載入所有設備資料")
+        return None
+
+    def _build_meter_log_query(
+        self,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        allowed_devices: Optional[List[str]]
+    ):
+        """
+        建立只投影所需 8 個欄位的 Core 查詢（不載入 requestData/responseData 等欄位）
+        """
+        from sqlalchemy import and_
+        from core.database import AmmeterLog
+
+        # 建立基本查詢條件
+        base_conditions = [
+            AmmeterLog.createdAt >= start_datetime,
+            AmmeterLog.createdAt <= end_datetime,
+            AmmeterLog.action == "ammeterDetail",
+            AmmeterLog.success == True,
+            AmmeterLog.power.is_not(None),
+            AmmeterLog.power > 0
+        ]
+
+        # 如果有設備過濾條件，加入查詢
+        if allowed_devices is not None:
+            base_conditions.append(AmmeterLog.deviceNumber.in_(allowed_devices))
+
+        return (
+            select(*[getattr(AmmeterLog, column) for column in METER_LOG_COLUMNS])
+            .where(and_(*base_conditions))
+            .order_by(AmmeterLog.deviceNumber, AmmeterLog.createdAt)
+        )
+
+    @staticmethod
+    def _rows_to_dataframe(rows: List[tuple]) -> pd.DataFrame:
+        """
+        將查詢結果列直接轉為欄位陣列並組成 DataFrame
+
+        缺值與 0 值的預設處理與原本逐筆轉換相同
+        （voltage→220.0, currents→0.0, battery→85.0, switchState/networkState→1）
+        """
+        if not rows:
+            return pd.DataFrame()
+
+        device_numbers, created_at, power, voltage, currents, battery, switch_state, network_state = zip(*rows)
+
+        def with_default(values, default: float) -> np.ndarray:
+            array = np.asarray(values, dtype=np.float64)  # None → NaN
+            return np.where(np.isnan(array) | (array == 0), default, array)
+
+        power = np.asarray(power, dtype=np.float64)
+        currents = with_default(currents, 0.0)
+
+        df = pd.DataFrame({
+            'deviceNumber': np.asarray(device_numbers, dtype=object),
+            'timestamp': pd.to_datetime(np.asarray(created_at)),
+            'power': power,
+            'kWh': power,  # 為了相容性，同時設定 power 和 kWh
+            'voltage': with_default(voltage, 220.0),
+            'current': currents,
+            'currents': currents,
+            'battery': with_default(battery, 85.0),
+            'switchState': with_default(switch_state, 1).astype(np.int64),
+            'networkState': with_default(network_state, 1).astype(np.int64),
+        })
+        df = df.sort_values(['deviceNumber', 'timestamp'])
+
+        # 移除重複記錄
+        return df.drop_duplicates(subset=['deviceNumber', 'timestamp'], keep='last')
+
     async def load_meter_data_by_time_range(
         self,
         start_time: str,
@@ -308,115 +420,102 @@ class DataLoaderService:
         logger.info(f"  - selected_floors_by_building: {selected_floors_by_building}")
 
         try:
-            from sqlalchemy import func, and_
-            from core.database import AmmeterLog
-            import pandas as pd
-
             # 解析時間
             start_datetime = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
             end_datetime = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
 
             logger.info(f"[DATA_LOADER] 解析後的時間範圍: {start_datetime} 到 {end_datetime}")
 
-            # 初始化設備過濾條件
-            device_filter_condition = None
-            allowed_devices = []
+            allowed_devices = self._resolve_device_filter(selected_floors_by_building, meter_id)
+            if allowed_devices is not None and not allowed_devices:
+                # 如果沒有符合條件的設備，返回空DataFrame
+                logger.info("[DATA_LOADER] 沒有設備符合過濾條件，返回空DataFrame")
+                return pd.DataFrame()
 
-            # 如果指定了電表號碼，直接使用該電表，忽略樓層篩選
-            if meter_id:
-                logger.info(f"[DATA_LOADER] 使用指定電表號碼: {meter_id}")
-                device_filter_condition = AmmeterLog.deviceNumber == meter_id
-                allowed_devices = [meter_id]
-            # 如果有樓層/建築過濾條件，獲取符合條件的設備列表
-            elif selected_floors_by_building:
-                logger.info(f"[DATA_LOADER] 使用按建築分組的樓層過濾: {selected_floors_by_building}")
-
-                for device_id, room_info in self._device_room_mapping.items():
-                    device_building = room_info["building"]
-                    device_floor = room_info["floor"]
-
-                    # 檢查該設備的建築物是否在選擇列表中
-                    if device_building in selected_floors_by_building:
-                        selected_floors_for_building = selected_floors_by_building[device_building]
-                        # 檢查該設備的樓層是否在該建築物的選擇樓層中
-                        if device_floor in selected_floors_for_building:
-                            allowed_devices.append(device_id)
-                            logger.debug(f"[DATA_LOADER] 匹配設備: {device_id} - {room_info['building']} {room_info['floor']}F {room_info['room']}")
-
-                logger.info(f"[DATA_LOADER] 過濾後匹配的設備數量: {len(allowed_devices)}")
-
-                # 建立設備過濾條件
-                if allowed_devices:
-                    device_filter_condition = AmmeterLog.deviceNumber.in_(allowed_devices)
-                else:
-                    # 如果沒有符合條件的設備，返回空DataFrame
-                    logger.info("[DATA_LOADER] 沒有設備符合過濾條件，返回空DataFrame")
-                    return pd.DataFrame()
-            else:
-                logger.info("[DATA_LOADER] 沒有指定電表號碼或樓層篩選條件，載入所有設備資料")
-
-            # 從 AmmeterLog 表中查詢數據
+            query = self._build_meter_log_query(start_datetime, end_datetime, allowed_devices)
+
+            # 從 AmmeterLog 表中查詢數據（欄位投影，不建立 ORM 物件）
             async with db_manager.get_async_session() as session:
-                # 建立基本查詢條件
-                base_conditions = [
-                    AmmeterLog.createdAt >= start_datetime,
-                    AmmeterLog.createdAt <= end_datetime,
-                    AmmeterLog.action == "ammeterDetail",
-                    AmmeterLog.success == True,
-                    AmmeterLog.power.is_not(None),
-                    AmmeterLog.power > 0
-                ]
-
-                # 如果有設備過濾條件，加入查詢
-                if device_filter_condition is not None:
-                    base_conditions.append(device_filter_condition)
-
-                combined_condition = and_(*base_conditions)
-
-                # 查詢數據
-                query = select(AmmeterLog).where(combined_condition).order_by(AmmeterLog.deviceNumber, AmmeterLog.createdAt)
                 result = await session.execute(query)
-                logs = result.scalars().all()
-
-                logger.info(f"[DATA_LOADER] 從資料庫查詢到 {len(logs)} 筆記錄")
-
-                if not logs:
-                    logger.warning("[DATA_LOADER] 沒有找到符合條件的電表數據")
-                    return pd.DataFrame()
-
-                # 轉換為 DataFrame
-                data_rows = []
-                for log in logs:
-                    data_rows.append({
-                        'deviceNumber': log.deviceNumber,
-                        'timestamp': log.createdAt,
-                        'power': float(log.power),
-                        'kWh': float(log.power),  # 為了相容性，同時設定 power 和 kWh
-                        'voltage': float(log.voltage) if log.voltage else 220.0,
-                        'current': float(log.currents) if log.currents else 0.0,
-                        'currents': float(log.currents) if log.currents else 0.0,
-                        'battery': float(log.battery) if log.battery else 85.0,
-                        'switchState': int(log.switchState) if log.switchState else 1,
-                        'networkState': int(log.networkState) if log.networkState else 1
-                    })
-
-                df = pd.DataFrame(data_rows)
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df = df.sort_values(['deviceNumber', 'timestamp'])
-
-                # 移除重複記錄
-                df = df.drop_duplicates(subset=['deviceNumber', 'timestamp'], keep='last')
-
-                logger.info(f"[DATA_LOADER] 載入完成，共 {len(df)} 筆數據")
-                logger.info(f"[DATA_LOADER] 設備數量: {df['deviceNumber'].nunique()}")
-                logger.info(f"[DATA_LOADER] 時間範圍: {df['timestamp'].min()} 到 {df['timestamp'].max()}")
-                logger.info(f"[DATA_LOADER] 欄位: {list(df.columns)}")
-
-                return df
+                rows = result.all()
+
+            logger.info(f"[DATA_LOADER] 從資料庫查詢到 {len(rows)} 筆記錄")
+
+            if not rows:
+                logger.warning("[DATA_LOADER] 沒有找到符合條件的電表數據")
+                return pd.DataFrame()
+
+            df = self._rows_to_dataframe(rows)
+
+            logger.info(f"[DATA_LOADER] 載入完成，共 {len(df)} 筆數據")
+            logger.info(f"[DATA_LOADER] 設備數量: {df['deviceNumber'].nunique()}")
+            logger.info(f"[DATA_LOADER] 時間範圍: {df['timestamp'].min()} 到 {df['timestamp'].max()}")
+            logger.info(f"[DATA_LOADER] 欄位: {list(df.columns)}")
+
+            return df
 
         except Exception as e:
             logger.error(f"[DATA_LOADER] load_meter_data_by_time_range 失敗: {e}")
             raise
 
+    async def iter_meter_data_by_time_range(
+        self,
+        start_time: str,
+        end_time: str,
+        selected_floors_by_building: Optional[Dict[str, List[str]]] = None,
+        meter_id: Optional[str] = None,
+        chunk_size: int = 100000
+    ) -> AsyncIterator[pd.DataFrame]:
+        """
+        以伺服器端游標分批串流電表數據，適用於無法一次載入記憶體的時間範圍
+
+        每批的欄位與 load_meter_data_by_time_range 相同；同一 (deviceNumber, timestamp)
+        的記錄不會被拆到兩個批次，因此去重結果與一次載入相同。
+
+        Args:
+            start_time: 開始時間 (ISO格式字符串)
+            end_time: 結束時間 (ISO格式字符串)
+            selected_floors_by_building: 按建築物分組的樓層選擇
+            meter_id: 可選的電表號碼
+            chunk_size: 每批從資料庫讀取的筆數
+
+        Yields:
+            DataFrame: 依 (deviceNumber, timestamp) 排序的一批電表數據
+        """
+        start_datetime = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+        end_datetime = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+
+        allowed_devices = self._resolve_device_filter(selected_floors_by_building, meter_id)
+        if allowed_devices is not None and not allowed_devices:
+            return
+
+        query = self._build_meter_log_query(start_datetime, end_datetime, allowed_devices)
+
+        carry_rows: List[tuple] = []
+        total_rows = 0
+        async with db_manager.get_async_session() as session:
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            async for partition in result.partitions(chunk_size):
+                rows = carry_rows + [tuple(row) for row in partition]
+
+                # 保留最後一個 (deviceNumber, timestamp) 的記錄到下一批，避免跨批次重複
+                last_key = rows[-1][:2]
+                split_at = len(rows)
+                while split_at > 0 and rows[split_at - 1][:2] == last_key:
+                    split_at -= 1
+                carry_rows = rows[split_at:]
+
+                if split_at > 0:
+                    chunk_df = self._rows_to_dataframe(rows[:split_at])
+                    total_rows += len(chunk_df)
+                    yield chunk_df
+
+        if carry_rows:
+            chunk_df = self._rows_to_dataframe(carry_rows)
+            total_rows += len(chunk_df)
+            yield chunk_df
+
+        logger.info(f"[DATA_LOADER] 串流載入完成，共 {total_rows} 筆數據")
+
 # 創建服務實例
 data_loader = DataLoaderService()
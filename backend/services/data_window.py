@@ -0,0 +1,221 @@
+"""
+dataWindow 批次擷取服務 - U 樣本、預測樣本與候選事件共用
+原始數據只依 (電表, 時間) 排序一次，每個樣本的 ±15 分鐘窗口
+以排序陣列上的 searchsorted 邊界取得，不再逐樣本重新篩選與排序整個 DataFrame
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_WINDOW_HALF_WIDTH_MINUTES = 15
+DEVICE_COLUMNS = ('meterId', 'deviceNumber', 'device_id')
+TIME_COLUMNS = ('timestamp', 'lastUpdated')
+
+_NAT_NS = np.iinfo(np.int64).min
+
+
+def _to_utc_naive_ns(timestamps) -> np.ndarray:
+    """時間戳 -> UTC（無時區）的 int64 奈秒，讓有無時區的時間可互相比較；NaT 為 int64 最小值"""
+    timestamps = pd.to_datetime(pd.Series(timestamps).reset_index(drop=True), utc=True)
+    return timestamps.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+@dataclass
+class WindowSlices:
+    """
+    批次窗口查詢結果（欄式陣列，索引皆指向 DataWindowExtractor 的排序後資料）
+
+    start / end: 每個樣本窗口的資料區間 [start, end)
+    nearest: 該電表最接近中心時間的資料點，電表無資料時為 -1
+    """
+    centers: pd.Series
+    start: np.ndarray
+    end: np.ndarray
+    nearest: np.ndarray
+    window_start: List[pd.Timestamp]
+    window_end: List[pd.Timestamp]
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self.end - self.start
+
+    @property
+    def has_meter_data(self) -> np.ndarray:
+        return self.nearest >= 0
+
+    def take(self, indices: np.ndarray) -> "WindowSlices":
+        """取出部分樣本（例如只保留窗口內有數據者）"""
+        return WindowSlices(
+            centers=self.centers.iloc[indices].reset_index(drop=True),
+            start=self.start[indices],
+            end=self.end[indices],
+            nearest=self.nearest[indices],
+            window_start=[self.window_start[i] for i in indices],
+            window_end=[self.window_end[i] for i in indices]
+        )
+
+
+class DataWindowExtractor:
+    """
+    依電表分組、時間排序的 dataWindow 擷取器
+
+    建立時排序一次，之後任意數量的 (電表, 中心時間) 查詢都以
+    每台電表一次的向量化 searchsorted 完成；timeSeries 的時間字串
+    只在第一次被用到時格式化並快取，重疊的窗口共用。
+    """
+
+    def __init__(self, df: pd.DataFrame, value_column: str = 'power', device_column: Optional[str] = None):
+        device_column = device_column or next((col for col in DEVICE_COLUMNS if col in df.columns), None)
+        time_column = next((col for col in TIME_COLUMNS if col in df.columns), None)
+        if device_column is None:
+            raise ValueError("No device ID column found in DataFrame")
+        if time_column is None:
+            raise ValueError("No timestamp column found in DataFrame")
+
+        timestamps = pd.to_datetime(df[time_column]).reset_index(drop=True)
+        times_ns = _to_utc_naive_ns(timestamps)
+        device_codes, device_names = pd.factorize(df[device_column].reset_index(drop=True), sort=True)
+
+        keep = np.flatnonzero((device_codes >= 0) & (times_ns != _NAT_NS))
+        order = keep[np.lexsort((times_ns[keep], device_codes[keep]))]
+
+        self.device_names = device_names
+        self.device_index = {name: code for code, name in enumerate(device_names)}
+        self.timestamps = timestamps.iloc[order].reset_index(drop=True)
+        self.times_ns = times_ns[order]
+        self.values = (
+            pd.to_numeric(df[value_column], errors='coerce').to_numpy(dtype=float)[order]
+            if value_column in df.columns else np.zeros(len(order))
+        )
+        self.device_bounds = np.searchsorted(device_codes[order], np.arange(len(device_names) + 1))
+        self._iso = np.empty(len(order), dtype=object)
+        self._iso_ready = np.zeros(len(order), dtype=bool)
+
+    def locate(
+        self,
+        devices: Sequence[Any],
+        centers: Sequence[Any],
+        half_width_minutes: float = DATA_WINDOW_HALF_WIDTH_MINUTES
+    ) -> WindowSlices:
+        """
+        批次定位窗口
+
+        Args:
+            devices: 每個樣本的電表編號
+            centers: 每個樣本的中心時間（datetime / Timestamp / ISO 字串）
+            half_width_minutes: 窗口半寬（分鐘），窗口為 [center - w, center + w]
+
+        Returns:
+            WindowSlices
+        """
+        centers = pd.Series(pd.to_datetime(pd.Series(list(centers), dtype=object)))
+        half_width = timedelta(minutes=half_width_minutes)
+        half_width_ns = int(half_width.total_seconds() * 1_000_000_000)
+        n = len(centers)
+
+        codes = np.array([self.device_index.get(device, -1) for device in devices], dtype=np.int64)
+        center_ns = _to_utc_naive_ns(centers) if n else np.empty(0, dtype=np.int64)
+        start = np.zeros(n, dtype=np.int64)
+        end = np.zeros(n, dtype=np.int64)
+        nearest = np.full(n, -1, dtype=np.int64)
+
+        valid = (codes >= 0) & (center_ns != _NAT_NS)
+        for code in np.unique(codes[valid]):
+            samples = np.flatnonzero(valid & (codes == code))
+            lo, hi = self.device_bounds[code], self.device_bounds[code + 1]
+            times = self.times_ns[lo:hi]
+            sample_ns = center_ns[samples]
+
+            start[samples] = lo + np.searchsorted(times, sample_ns - half_width_ns, side='left')
+            end[samples] = lo + np.searchsorted(times, sample_ns + half_width_ns, side='right')
+
+            # 最接近中心時間的資料點（距離相同時取較早者，重複時間取第一筆）
+            right = np.searchsorted(times, sample_ns, side='left')
+            left = np.maximum(right - 1, 0)
+            right = np.minimum(right, len(times) - 1)
+            use_left = (sample_ns - times[left]) <= np.abs(times[right] - sample_ns)
+            closest = np.where(use_left, left, right)
+            nearest[samples] = lo + np.searchsorted(times, times[closest], side='left')
+
+        return WindowSlices(
+            centers=centers,
+            start=start,
+            end=end,
+            nearest=nearest,
+            window_start=[center - half_width for center in centers],
+            window_end=[center + half_width for center in centers]
+        )
+
+    @staticmethod
+    def _window_rows(slices: WindowSlices) -> np.ndarray:
+        """所有窗口的資料列索引依樣本順序串接（第 i 個窗口佔 offsets[i]:offsets[i+1]）"""
+        lengths = slices.counts
+        return np.repeat(slices.start - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def _isoformat_rows(self, slices: WindowSlices, rows: np.ndarray) -> np.ndarray:
+        """格式化（並快取）窗口內資料點的時間字串"""
+        if len(rows):
+            missing = np.unique(rows[~self._iso_ready[rows]])
+            self._iso[missing] = [ts.isoformat() for ts in self.timestamps.iloc[missing]]
+            self._iso_ready[missing] = True
+        return self._iso
+
+    def build_data_windows(
+        self,
+        slices: WindowSlices,
+        detection_rule: Any = "",
+        anomaly_score: Any = 0.0,
+        event_timestamps: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        由窗口定位結果建立 dataWindow 字典（格式與逐筆生成時一致）
+
+        Args:
+            slices: locate() 的結果
+            detection_rule: 單一值或每個樣本一個值
+            anomaly_score: 單一值或每個樣本一個值
+            event_timestamps: 原樣寫入 eventTimestamp 的字串，預設為中心時間的 isoformat
+
+        Returns:
+            List[Dict]: 每個樣本的 dataWindow；電表無資料的樣本 timeSeries 為空
+        """
+        n = len(slices.start)
+        rules = detection_rule if isinstance(detection_rule, (list, tuple, np.ndarray)) else [detection_rule] * n
+        scores = anomaly_score if isinstance(anomaly_score, (list, tuple, np.ndarray)) else [anomaly_score] * n
+        rows = self._window_rows(slices)
+        iso = self._isoformat_rows(slices, rows)
+
+        # 只轉換實際輸出的資料點（而非整個 extractor 的數值陣列）
+        offsets = np.concatenate([[0], np.cumsum(slices.counts)])
+        window_values = np.nan_to_num(self.values[rows], nan=0.0).tolist()
+        has_nearest = slices.nearest >= 0
+        nearest_values = np.zeros(n)
+        nearest_values[has_nearest] = np.nan_to_num(self.values[slices.nearest[has_nearest]], nan=0.0)
+        nearest_values = nearest_values.tolist()
+
+        data_windows = []
+        for i in range(n):
+            start, end = slices.start[i], slices.end[i]
+            time_series = [
+                {"timestamp": timestamp, "power": power}
+                for timestamp, power in zip(iso[start:end], window_values[offsets[i]:offsets[i + 1]])
+            ]
+            data_windows.append({
+                "eventTimestamp": event_timestamps[i] if event_timestamps is not None else slices.centers.iloc[i].isoformat(),
+                "eventPowerValue": nearest_values[i],
+                "windowStart": slices.window_start[i].isoformat(),
+                "windowEnd": slices.window_end[i].isoformat(),
+                "timeSeries": time_series,
+                "totalDataPoints": len(time_series),
+                "detectionRule": rules[i],
+                "anomalyScore": scores[i]
+            })
+
+        return data_windows
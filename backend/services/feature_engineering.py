@@ -19,6 +19,14 @@ warnings.filterwarnings('ignore', category=FutureWarning)
 
 logger = logging.getLogger(__name__)
 
+# generate_feature_vector 輸出的特徵數
+FEATURE_VECTOR_SIZE = 17
+
+# 檢測規則的數值編碼
+DETECTION_RULE_MAPPING = {
+    'spike': 1, 'threshold': 2, 'pattern': 3, 'peer': 4, 'unknown': 0
+}
+
 class FeatureEngineering:
     """特徵工程服務類"""
 
@@ -49,7 +57,7 @@ class FeatureEngineering:
             time_series = data_window.get('timeSeries', [])
             if not time_series:
                 logger.warning(f"Event {event.get('eventId', 'unknown')} has no time series data")
-                return np.zeros(20)  # 返回零向量作為後備
+                return np.zeros(FEATURE_VECTOR_SIZE)  # 返回零向量作為後備
 
             # 提取功率數值序列
             power_values = [point.get('power', 0) for point in time_series]
@@ -106,11 +114,7 @@ class FeatureEngineering:
 
             # 5. 檢測規則特徵 (簡化版本 - 用數值編碼)
             detection_rule = event.get('detectionRule', 'unknown')
-            # 簡單的規則映射
-            rule_mapping = {
-                'spike': 1, 'threshold': 2, 'pattern': 3, 'peer': 4, 'unknown': 0
-            }
-            features['detection_rule_encoded'] = rule_mapping.get(detection_rule.lower(), 0)
+            features['detection_rule_encoded'] = DETECTION_RULE_MAPPING.get(detection_rule.lower(), 0)
 
             # 6. 數據窗口統計特徵
             features['window_data_points'] = len(time_series)
@@ -130,12 +134,16 @@ class FeatureEngineering:
 
         except Exception as e:
             logger.error(f"Failed to generate feature vector for event {event.get('eventId', 'unknown')}: {e}")
-            return np.zeros(17)  # 返回零向量作為後備
+            return np.zeros(FEATURE_VECTOR_SIZE)  # 返回零向量作為後備
 
     def generate_feature_matrix(self, events: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[str]]:
         """
         從事件列表生成特徵矩陣
 
+        以批次方式計算（與逐筆呼叫 generate_feature_vector 的結果一致）：
+        所有事件的功率序列攤平成一個陣列加上各事件的 offsets，統計量以
+        segment reduce（np.ufunc.reduceat）一次算出；批次計算失敗時退回逐筆計算。
+
         Args:
             events: 異常事件列表
 
@@ -143,18 +151,16 @@ class FeatureEngineering:
             Tuple[np.ndarray, List[str]]: (特徵矩陣, 事件ID列表)
         """
         try:
-            feature_vectors = []
-            event_ids = []
-
-            for event in events:
-                feature_vector = self.generate_feature_vector(event)
-                feature_vectors.append(feature_vector)
-                event_ids.append(event.get('eventId', f"event_{len(event_ids)}"))
-
-            if not feature_vectors:
+            event_ids = [event.get('eventId', f"event_{i}") for i, event in enumerate(events)]
+            if not events:
                 return np.array([]), []
 
-            feature_matrix = np.vstack(feature_vectors)
+            try:
+                feature_matrix = self._batch_feature_matrix(events)
+            except Exception as e:
+                logger.warning(f"Batch feature extraction failed ({e}), falling back to per-event extraction")
+                feature_matrix = np.vstack([self.generate_feature_vector(event) for event in events])
+
             logger.info(f"Generated feature matrix: {feature_matrix.shape}")
 
             return feature_matrix, event_ids
@@ -163,6 +169,102 @@ class FeatureEngineering:
             logger.error(f"Failed to generate feature matrix: {e}")
             return np.array([]), []
 
+    def _batch_feature_matrix(self, events: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        generate_feature_vector 的批次版本
+
+        逐筆版本會拋出例外（回傳零向量）的事件，在此同樣得到零向量列。
+
+        Args:
+            events: 異常事件列表
+
+        Returns:
+            np.ndarray: (n_events, FEATURE_VECTOR_SIZE) 特徵矩陣
+        """
+        n_events = len(events)
+        feature_matrix = np.zeros((n_events, FEATURE_VECTOR_SIZE))
+
+        # 1. 解析 dataWindow，把所有功率序列攤平成 values + lengths
+        rows, segments, event_powers, rule_codes, scores, timestamps = [], [], [], [], [], []
+        for i, event in enumerate(events):
+            try:
+                data_window = event.get('dataWindow', {})
+                if isinstance(data_window, str):
+                    data_window = json.loads(data_window)
+
+                time_series = data_window.get('timeSeries', [])
+                if not time_series:
+                    logger.warning(f"Event {event.get('eventId', 'unknown')} has no time series data")
+                    continue
+
+                powers = [point.get('power', 0) for point in time_series]
+                event_power = data_window.get('eventPowerValue', 0)
+                rule_code = DETECTION_RULE_MAPPING.get(event.get('detectionRule', 'unknown').lower(), 0)
+                if not _is_real_number(event_power):
+                    raise TypeError(f"invalid eventPowerValue: {event_power!r}")
+            except Exception as e:
+                logger.error(f"Failed to generate feature vector for event {event.get('eventId', 'unknown')}: {e}")
+                continue
+
+            rows.append(i)
+            segments.append(powers)
+            event_powers.append(event_power)
+            rule_codes.append(rule_code)
+            scores.append(event.get('score', 0))
+            timestamps.append(event.get('eventTimestamp', ''))
+
+        # 逐筆版本中會失敗、得到零向量的功率序列：
+        # 含非數值（None、字串）時 np.mean 失敗；全為 bool 時 max - min 失敗（numpy 不支援 bool 相減）
+        # 與數值混合的 bool 會被轉為 0 / 1，不影響計算
+        values = np.array([power for segment in segments for power in segment])
+        if values.dtype.kind not in 'iuf':
+            numeric = [np.array(segment).dtype.kind in 'iuf' for segment in segments]
+        else:
+            numeric = [
+                not isinstance(segment[0], (bool, np.bool_)) or np.array(segment).dtype.kind != 'b'
+                for segment in segments
+            ]
+        if not all(numeric):
+            for row, ok in zip(rows, numeric):
+                if not ok:
+                    logger.error(f"Failed to generate feature vector for event "
+                                 f"{events[row].get('eventId', 'unknown')}: non-numeric power values")
+            keep = np.flatnonzero(numeric)
+            rows, segments = [rows[k] for k in keep], [segments[k] for k in keep]
+            event_powers, rule_codes = [event_powers[k] for k in keep], [rule_codes[k] for k in keep]
+            scores, timestamps = [scores[k] for k in keep], [timestamps[k] for k in keep]
+            values = np.array([power for segment in segments for power in segment])
+
+        if not rows:
+            return feature_matrix
+
+        values = values.astype(float)
+        lengths = np.array([len(segment) for segment in segments])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+        # 2. 統計特徵（segment reduce）
+        stats = _segment_statistics(values, starts, lengths)
+        event_powers = np.array(event_powers, dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            max_to_mean_ratio = np.where(stats['mean'] != 0, stats['max'] / stats['mean'], 0)
+
+        # 3. 時間特徵
+        hour_of_day, day_of_week = _timestamp_features(timestamps)
+
+        # 4. 構建特徵矩陣（欄位順序與 generate_feature_vector 相同）
+        feature_matrix[rows] = np.column_stack([
+            stats['mean'], stats['std'], stats['median'],
+            stats['max'], stats['min'], stats['max'] - stats['min'],
+            stats['skewness'], stats['kurtosis'], max_to_mean_ratio,
+            event_powers - stats['mean'], event_powers,
+            hour_of_day, day_of_week, (day_of_week >= 5).astype(float),
+            _to_float_array(scores), np.array(rule_codes, dtype=float),
+            lengths
+        ])
+
+        return feature_matrix
+
     def fit_scaler(self, feature_matrix: np.ndarray) -> None:
         """
         擬合標準化器
@@ -274,5 +376,115 @@ class FeatureEngineering:
             logger.error(f"PCA dimensionality reduction failed: {e}")
             return np.array([])
 
+def _is_real_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating))
+
+
+def _to_float_array(values: List[Any]) -> np.ndarray:
+    """轉為 float 陣列；無法轉換的值為 NaN"""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        converted = []
+        for value in values:
+            try:
+                converted.append(float(value))
+            except (TypeError, ValueError):
+                converted.append(np.nan)
+        return np.array(converted)
+
+
+def _segment_statistics(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    對攤平的序列（values 以 starts / lengths 切成各事件的片段）計算每個片段的統計量
+
+    與逐筆版本相同的定義：np.std（ddof=0）、np.median、scipy.stats.skew / kurtosis
+    （bias=True，變異數相對於平均值為 0 時為 NaN；長度不足 3 / 4 時為 0）。
+
+    Args:
+        values: 所有片段串接的值 (N,)
+        starts: 各片段起點 (n_segments,)
+        lengths: 各片段長度 (n_segments,)，皆 >= 1
+
+    Returns:
+        Dict[str, np.ndarray]: mean、std、median、max、min、skewness、kurtosis
+    """
+    segment_ids = np.repeat(np.arange(len(lengths)), lengths)
+
+    mean = np.add.reduceat(values, starts) / lengths
+    deviation = values - mean[segment_ids]
+    squared = deviation ** 2
+    m2 = np.add.reduceat(squared, starts) / lengths
+    m3 = np.add.reduceat(squared * deviation, starts) / lengths
+    m4 = np.add.reduceat(squared ** 2, starts) / lengths
+
+    # 中位數：片段內排序後取中間一個或兩個的平均（含 NaN 的片段為 NaN）
+    # 片段長度相近時補成 (n_segments, max_length) 的矩陣逐列排序，否則對 (片段, 值) 做 lexsort
+    max_length = lengths.max()
+    if len(lengths) * max_length <= 4 * len(values):
+        padded = np.full((len(lengths), max_length), np.inf)
+        padded[segment_ids, np.arange(len(values)) - starts[segment_ids]] = values
+        padded.sort(axis=1)
+        segments = np.arange(len(lengths))
+        median = (padded[segments, (lengths - 1) // 2] + padded[segments, lengths // 2]) / 2
+    else:
+        sorted_values = values[np.lexsort((values, segment_ids))]
+        median = (sorted_values[starts + (lengths - 1) // 2] + sorted_values[starts + lengths // 2]) / 2
+    median[np.add.reduceat(np.isnan(values), starts) > 0] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zero_variance = m2 <= (np.finfo(float).eps * mean) ** 2
+        skewness = np.where(zero_variance, np.nan, m3 / m2 ** 1.5)
+        kurtosis = np.where(zero_variance, np.nan, m4 / m2 ** 2.0) - 3
+
+    return {
+        'mean': mean,
+        'std': np.sqrt(m2),
+        'median': median,
+        'max': np.maximum.reduceat(values, starts),
+        'min': np.minimum.reduceat(values, starts),
+        'skewness': np.where(lengths > 2, skewness, 0),
+        'kurtosis': np.where(lengths > 3, kurtosis, 0)
+    }
+
+
+def _timestamp_features(timestamps: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    eventTimestamp 的 (hour_of_day, day_of_week)；空值或無法解析時為 0
+
+    先整批 pd.to_datetime，批次解析失敗（例如混合時區）或個別值無法以推斷的格式
+    解析時，再對這些值逐一解析，結果與逐筆版本一致。
+    """
+    n = len(timestamps)
+    hour_of_day = np.zeros(n)
+    day_of_week = np.zeros(n)
+
+    present = [i for i, timestamp in enumerate(timestamps) if timestamp]
+    if not present:
+        return hour_of_day, day_of_week
+
+    retry = present
+    try:
+        parsed = pd.to_datetime(pd.Series([timestamps[i] for i in present], dtype=object), errors='coerce')
+        if pd.api.types.is_datetime64_any_dtype(parsed):
+            valid = parsed.notna().to_numpy()
+            index = np.array(present)[valid]
+            hour_of_day[index] = parsed.dt.hour.to_numpy()[valid]
+            day_of_week[index] = parsed.dt.dayofweek.to_numpy()[valid]
+            retry = [i for i, ok in zip(present, valid) if not ok]
+    except Exception:
+        pass
+
+    for i in retry:
+        try:
+            dt = pd.to_datetime(timestamps[i])
+            hour_of_day[i] = dt.hour
+            day_of_week[i] = dt.dayofweek
+        except Exception:
+            pass
+
+    return hour_of_day, day_of_week
+
+
 # 全域實例
 feature_engineering = FeatureEngineering()
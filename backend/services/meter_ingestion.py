@@ -0,0 +1,373 @@
+"""
+Meter Ingestion Service - 電表資料擷取管線
+抓取階段以 semaphore 限制同時連線數，寫入階段批次 upsert ammeter 並以
+多列 INSERT 寫入 ammeter_log；同一時間只允許一個週期執行，並記錄每個週期
+的延遲與吞吐量指標
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FETCH_CONCURRENCY = 16
+DEFAULT_WRITE_BATCH_SIZE = 100
+DEFAULT_CYCLE_TIMEOUT_SECONDS = 55.0
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 10.0
+METRICS_HISTORY_SIZE = 60
+
+READING_FLOAT_FIELDS = ['voltage', 'currents', 'power', 'battery']
+READING_INT_FIELDS = ['switchState', 'networkState']
+
+_QUEUE_SENTINEL = None
+
+
+class MeterApiClient:
+    """
+    電表 API 客戶端
+
+    METER_API_URL 為含 {deviceNumber} 佔位符的 URL 樣板，例如
+    https://meter.example.com/api/ammeterDetail?deviceNumber={deviceNumber}；
+    METER_API_TOKEN（選用）會以 Bearer token 送出。
+    測試時可傳入 httpx.MockTransport 作為本地 stub。
+    """
+
+    def __init__(
+        self,
+        url_template: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: int = DEFAULT_FETCH_CONCURRENCY,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.url_template = url_template or os.getenv('METER_API_URL')
+        self.timeout = timeout or float(os.getenv('METER_API_TIMEOUT', DEFAULT_REQUEST_TIMEOUT_SECONDS))
+        self.max_connections = max_connections
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.url_template)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {}
+            token = os.getenv('METER_API_TOKEN')
+            if token:
+                headers['Authorization'] = f"Bearer {token}"
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers=headers,
+                limits=httpx.Limits(max_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def fetch_detail(self, device_number: str) -> Tuple[int, str]:
+        """
+        取得單一電表詳情
+
+        Returns:
+            (HTTP 狀態碼, 回應內容)
+        """
+        url = self.url_template.format(deviceNumber=device_number)
+        response = await self._get_client().get(url)
+        return response.status_code, response.text
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _parse_reading(body: str) -> Dict[str, Any]:
+    """解析電表 API 回應；支援資料直接在最外層或包在 "data" 之下"""
+    payload = json.loads(body)
+    if isinstance(payload, dict) and isinstance(payload.get('data'), dict):
+        payload = payload['data']
+    if not isinstance(payload, dict):
+        raise ValueError("電表 API 回應格式錯誤")
+
+    reading = {
+        'factory': payload.get('factory'),
+        'device': payload.get('device'),
+    }
+    for field in READING_FLOAT_FIELDS:
+        value = payload.get(field)
+        reading[field] = float(value) if value is not None else None
+    for field in READING_INT_FIELDS:
+        value = payload.get(field)
+        reading[field] = int(value) if value is not None else None
+    return reading
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return float(ordered[index])
+
+
+class MeterIngestionPipeline:
+    """
+    電表資料擷取管線
+
+    - fetch：每個電表一個 task，以 semaphore 限制同時請求數（METER_FETCH_CONCURRENCY）
+    - write：單一 writer 從佇列取結果，每 METER_WRITE_BATCH_SIZE 筆以一個交易寫入
+    - 週期超過 METER_CYCLE_TIMEOUT 秒時取消尚未完成的 HTTP 抓取（meters_timed_out）；
+      已取得的資料一律放入佇列寫入，不受逾時影響
+    - 上一個週期尚未結束時，新的週期直接略過（不會重疊）
+    """
+
+    def __init__(
+        self,
+        api_client: Optional[MeterApiClient] = None,
+        database=None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        cycle_timeout: Optional[float] = None
+    ):
+        self.concurrency = concurrency or int(os.getenv('METER_FETCH_CONCURRENCY', DEFAULT_FETCH_CONCURRENCY))
+        self.batch_size = batch_size or int(os.getenv('METER_WRITE_BATCH_SIZE', DEFAULT_WRITE_BATCH_SIZE))
+        self.cycle_timeout = cycle_timeout or float(os.getenv('METER_CYCLE_TIMEOUT', DEFAULT_CYCLE_TIMEOUT_SECONDS))
+        self.api_client = api_client or MeterApiClient(max_connections=self.concurrency)
+        self.database = database or db_manager
+
+        self._cycle_lock = asyncio.Lock()
+        self.metrics_history: deque = deque(maxlen=METRICS_HISTORY_SIZE)
+
+    @property
+    def is_running(self) -> bool:
+        return self._cycle_lock.locked()
+
+    def get_recent_metrics(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近幾個週期的指標（新到舊）"""
+        return list(self.metrics_history)[-limit:][::-1]
+
+    async def run_cycle(self, meters: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        執行一個擷取週期
+
+        Args:
+            meters: load_meter_data() 的電表清單
+
+        Returns:
+            本週期的指標；上一個週期仍在執行時回傳 skipped=True
+        """
+        if self._cycle_lock.locked():
+            logger.warning("上一個電表擷取週期尚未完成，略過本次週期")
+            return {
+                'started_at': datetime.utcnow().isoformat(),
+                'skipped': True,
+                'meters_total': len(meters),
+            }
+
+        async with self._cycle_lock:
+            metrics = await self._run_cycle(meters)
+
+        self.metrics_history.append(metrics)
+        logger.info(
+            f"電表擷取週期完成: {metrics['meters_succeeded']}/{metrics['meters_total']} 成功, "
+            f"{metrics['duration_seconds']:.1f}s, {metrics['throughput_meters_per_second']:.1f} meters/s, "
+            f"fetch p95 {metrics['fetch_latency_ms']['p95']:.0f}ms"
+        )
+        return metrics
+
+    async def _run_cycle(self, meters: List[Dict[str, str]]) -> Dict[str, Any]:
+        if not self.api_client.is_configured:
+            raise RuntimeError("METER_API_URL 未設定，無法抓取電表資料")
+
+        started_at = datetime.utcnow()
+        cycle_start = time.perf_counter()
+        stats = {
+            'fetch_latencies_ms': [],
+            'succeeded': 0,
+            'failed': 0,
+            'errors': [],
+            'ammeter_rows': 0,
+            'log_rows': 0,
+            'write_batches': 0,
+            'write_seconds': 0.0,
+            'write_errors': 0,
+        }
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        writer = asyncio.create_task(self._write_stage(queue, stats))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.cycle_timeout
+        timed_out = []
+
+        async def fetch_one(meter: Dict[str, str]):
+            # 逾時只作用在 HTTP 抓取；取得結果後等待佇列空位（writer 持續消化）不會被取消
+            try:
+                async with semaphore:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    result = await asyncio.wait_for(self._fetch_meter(meter), remaining)
+            except asyncio.TimeoutError:
+                timed_out.append(meter['deviceNumber'])
+                return
+            await queue.put(result)
+
+        if meters:
+            await asyncio.gather(*(fetch_one(meter) for meter in meters))
+            if timed_out:
+                logger.warning(f"電表擷取週期超過 {self.cycle_timeout:.0f} 秒，取消 {len(timed_out)} 個未完成的抓取")
+
+        await queue.put(_QUEUE_SENTINEL)
+        await writer
+
+        duration = time.perf_counter() - cycle_start
+        latencies = stats['fetch_latencies_ms']
+        return {
+            'started_at': started_at.isoformat(),
+            'skipped': False,
+            'duration_seconds': round(duration, 3),
+            'meters_total': len(meters),
+            'meters_succeeded': stats['succeeded'],
+            'meters_failed': stats['failed'],
+            'meters_timed_out': len(timed_out),
+            'throughput_meters_per_second': round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+            'fetch_latency_ms': {
+                'p50': round(_percentile(latencies, 0.5), 1),
+                'p95': round(_percentile(latencies, 0.95), 1),
+                'max': round(max(latencies), 1) if latencies else 0.0,
+            },
+            'ammeter_rows_upserted': stats['ammeter_rows'],
+            'log_rows_inserted': stats['log_rows'],
+            'write_batches': stats['write_batches'],
+            'write_seconds': round(stats['write_seconds'], 3),
+            'write_errors': stats['write_errors'],
+            'errors': stats['errors'][:20],
+        }
+
+    async def _fetch_meter(self, meter: Dict[str, str]) -> Dict[str, Any]:
+        """抓取單一電表；不拋出例外，失敗時回傳 success=False 的結果"""
+        device_number = meter["deviceNumber"]
+        request_start = time.perf_counter()
+        status_code = None
+        body = None
+        reading = None
+        error = None
+
+        try:
+            status_code, body = await self.api_client.fetch_detail(device_number)
+            if 200 <= status_code < 300:
+                reading = _parse_reading(body)
+            else:
+                error = f"HTTP {status_code}"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        return {
+            'meter': meter,
+            'reading': reading,
+            'status_code': status_code,
+            'body': body,
+            'error': error,
+            'response_time_ms': (time.perf_counter() - request_start) * 1000,
+            'fetched_at': datetime.utcnow(),
+        }
+
+    async def _write_stage(self, queue: asyncio.Queue, stats: Dict[str, Any]):
+        """writer：累積到 batch_size 筆就寫入一次"""
+        batch = []
+        while True:
+            result = await queue.get()
+            if result is _QUEUE_SENTINEL:
+                break
+            self._record_fetch(result, stats)
+            batch.append(result)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, stats)
+                batch = []
+        if batch:
+            await self._flush(batch, stats)
+
+    @staticmethod
+    def _record_fetch(result: Dict[str, Any], stats: Dict[str, Any]):
+        stats['fetch_latencies_ms'].append(result['response_time_ms'])
+        if result['reading'] is not None:
+            stats['succeeded'] += 1
+        else:
+            stats['failed'] += 1
+            meter = result['meter']
+            stats['errors'].append({
+                'device': meter.get('deviceNumber', 'unknown'),
+                'name': meter.get('electricMeterName', 'unknown'),
+                'error': result['error'],
+            })
+
+    async def _flush(self, batch: List[Dict[str, Any]], stats: Dict[str, Any]):
+        ammeters = []
+        logs = []
+        for result in batch:
+            meter = result['meter']
+            reading = result['reading']
+            fetched_at = result['fetched_at']
+
+            if reading is not None:
+                ammeters.append({
+                    'deviceNumber': meter['deviceNumber'],
+                    'electricMeterNumber': meter['electricMeterNumber'],
+                    'electricMeterName': meter['electricMeterName'],
+                    'lastUpdated': fetched_at,
+                    **reading,
+                })
+
+            logs.append({
+                'id': str(uuid.uuid4()),
+                'deviceNumber': meter['deviceNumber'],
+                'action': 'ammeterDetail',
+                'lastUpdated': fetched_at,
+                'requestData': json.dumps({'deviceNumber': meter['deviceNumber']}),
+                'responseData': result['body'],
+                'statusCode': result['status_code'],
+                'success': reading is not None,
+                'errorMessage': result['error'],
+                'responseTime': int(result['response_time_ms']),
+                'createdAt': fetched_at,
+                **(reading or {}),
+            })
+
+        write_start = time.perf_counter()
+        try:
+            ammeter_rows, log_rows = await self.database.save_ammeter_batch(ammeters, logs)
+            stats['ammeter_rows'] += ammeter_rows
+            stats['log_rows'] += log_rows
+        except Exception as e:
+            stats['write_errors'] += 1
+            logger.error(f"電表資料批次寫入失敗 ({len(batch)} 筆): {e}")
+        finally:
+            stats['write_batches'] += 1
+            stats['write_seconds'] += time.perf_counter() - write_start
+
+    async def close(self):
+        await self.api_client.close()
+
+
+_ingestion_pipeline: Optional[MeterIngestionPipeline] = None
+
+
+def get_ingestion_pipeline() -> MeterIngestionPipeline:
+    """取得共用的 MeterIngestionPipeline（第一次呼叫時建立）"""
+    global _ingestion_pipeline
+    if _ingestion_pipeline is None:
+        _ingestion_pipeline = MeterIngestionPipeline()
+    return _ingestion_pipeline
@@ -0,0 +1,243 @@
+"""
+同儕基準服務 - 預先計算樓層 / 建築物的時間對齊用電基準
+依 DataLoaderService 的設備房間映射分組，每個聚合時間桶計算一次
+同樓層（不足時退回同建築物）設備的中位數，
+讓 Peer 規則以真正的鄰近設備比較，而不需逐對比較設備
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AGG_WINDOW_MINUTES = 5
+DEFAULT_MIN_PEERS = 3  # 同一時間桶至少需有幾台設備回報，基準才有效
+MAX_CACHED_BASELINES = 8
+
+
+def _bucket_ids(timestamps, agg_window_minutes: int) -> np.ndarray:
+    """時間戳 -> 聚合時間桶編號（epoch 分鐘 // 窗口，時區統一換算為 UTC）"""
+    timestamps = pd.to_datetime(pd.Series(timestamps).reset_index(drop=True))
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    minutes = timestamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[m]').astype(np.int64)
+    return minutes // agg_window_minutes
+
+
+def _group_keys(group_codes: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """(群組代碼, 時間桶) -> 單一 int64 key"""
+    return (group_codes.astype(np.int64) << 32) | buckets
+
+
+class PeerBaseline:
+    """
+    某段時間範圍的同儕基準表
+
+    floor_table / building_table 以 (群組代碼 << 32 | 時間桶) 的 int64 key 排序，
+    欄位為 median, peers（該時間桶回報的設備數）；
+    已排除 peers < min_peers 的時間桶。
+    """
+
+    def __init__(
+        self,
+        floor_table: pd.DataFrame,
+        building_table: pd.DataFrame,
+        floor_groups: Dict[str, int],
+        building_groups: Dict[str, int],
+        agg_window_minutes: int
+    ):
+        self.floor_table = floor_table
+        self.building_table = building_table
+        self.floor_groups = floor_groups
+        self.building_groups = building_groups
+        self.agg_window_minutes = agg_window_minutes
+
+    def lookup(self, devices, timestamps) -> np.ndarray:
+        """
+        取得每筆資料對應的同儕基準（同儕中位數）
+
+        先查同樓層基準，該時間桶同樓層設備不足時改用同建築物基準；
+        不在映射表中的設備或兩者皆不足時為 NaN，由呼叫端決定退回方式。
+
+        Args:
+            devices: 每筆資料的設備編號
+            timestamps: 每筆資料的時間戳
+
+        Returns:
+            np.ndarray: 與輸入等長的基準值
+        """
+        device_codes, device_names = pd.factorize(np.asarray(devices, dtype=object))
+        buckets = _bucket_ids(timestamps, self.agg_window_minutes)
+        baseline = np.full(len(device_codes), np.nan)
+
+        for device_groups, table in ((self.floor_groups, self.floor_table), (self.building_groups, self.building_table)):
+            missing = np.flatnonzero(np.isnan(baseline) & (device_codes >= 0))
+            if len(missing) == 0 or table.empty:
+                continue
+
+            group_of_device = np.array([device_groups.get(name, -1) for name in device_names], dtype=np.int64)
+            groups = group_of_device[device_codes[missing]]
+            keys = _group_keys(groups, buckets[missing])
+
+            table_keys = table.index.to_numpy()
+            positions = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+            found = (groups >= 0) & (table_keys[positions] == keys)
+            baseline[missing[found]] = table['median'].to_numpy(dtype=float)[positions[found]]
+
+        return baseline
+
+
+def build_peer_baseline(
+    df: pd.DataFrame,
+    value_column: str,
+    device_room_mapping: Dict[str, Dict[str, str]],
+    agg_window_minutes: int = DEFAULT_AGG_WINDOW_MINUTES,
+    min_peers: int = DEFAULT_MIN_PEERS
+) -> PeerBaseline:
+    """
+    由電表數據建立同儕基準
+
+    每台設備在每個時間桶先取平均（避免回報頻率高的設備主導中位數），
+    再對同群組所有設備取中位數；基準包含設備本身，
+    min_peers 確保單一設備無法主導基準。
+
+    Args:
+        df: 包含 deviceNumber, timestamp 與 value_column 的數據
+        value_column: 數值欄位名稱
+        device_room_mapping: 設備編號 -> {"building", "floor", ...}
+        agg_window_minutes: 時間對齊的聚合窗口（分鐘）
+        min_peers: 時間桶最少回報設備數
+
+    Returns:
+        PeerBaseline
+    """
+    def group_codes(label_of) -> Dict[str, int]:
+        labels = {}
+        return {
+            device: labels.setdefault(label_of(info), len(labels))
+            for device, info in device_room_mapping.items()
+        }
+
+    floor_groups = group_codes(lambda info: (info.get('building'), info.get('floor')))
+    building_groups = group_codes(lambda info: info.get('building'))
+
+    device_codes, device_names = pd.factorize(df['deviceNumber'])
+    buckets = _bucket_ids(df['timestamp'], agg_window_minutes)
+    values = pd.to_numeric(df[value_column], errors='coerce').to_numpy(dtype=float)
+    valid = ~np.isnan(values) & (device_codes >= 0)
+
+    per_device = pd.Series(values[valid]).groupby(_group_keys(device_codes[valid], buckets[valid])).mean()
+    per_device_keys = per_device.index.to_numpy()
+    per_device_codes = per_device_keys >> 32
+    per_device_buckets = per_device_keys & 0xFFFFFFFF
+    per_device_values = per_device.to_numpy()
+
+    def aggregate(device_groups: Dict[str, int]) -> pd.DataFrame:
+        group_of_device = np.array([device_groups.get(name, -1) for name in device_names], dtype=np.int64)
+        groups = group_of_device[per_device_codes]
+        mapped = groups >= 0
+        grouped = pd.Series(per_device_values[mapped]).groupby(
+            _group_keys(groups[mapped], per_device_buckets[mapped])
+        )
+        table = pd.DataFrame({
+            'median': grouped.median(),
+            'peers': grouped.size(),
+        })
+        return table[table['peers'] >= min_peers]
+
+    floor_table = aggregate(floor_groups)
+    building_table = aggregate(building_groups)
+
+    logger.info(
+        f"[PEER_BASELINE] 建立同儕基準: {len(device_names)} 台設備, "
+        f"樓層基準 {len(floor_table)} 筆, 建築物基準 {len(building_table)} 筆"
+    )
+    return PeerBaseline(floor_table, building_table, floor_groups, building_groups, agg_window_minutes)
+
+
+class PeerBaselineService:
+    """同儕基準服務 - 依時間範圍快取 PeerBaseline"""
+
+    def __init__(self, max_entries: int = MAX_CACHED_BASELINES):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, PeerBaseline]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_device_room_mapping() -> Dict[str, Dict[str, str]]:
+        from services.data_loader import data_loader
+        return data_loader.get_device_room_mapping()
+
+    @staticmethod
+    def _cache_key(df: pd.DataFrame, value_column: str, mapping: Dict[str, Dict[str, str]], *options: Any) -> Tuple:
+        """時間範圍 + 資料量與數值總和（偵測同範圍資料變動）+ 分組與參數"""
+        timestamps = pd.to_datetime(df['timestamp'])
+        values = pd.to_numeric(df[value_column], errors='coerce').to_numpy(dtype=float)
+        groups = frozenset(
+            (device, info.get('building'), info.get('floor'))
+            for device, info in mapping.items()
+        )
+        return (
+            str(timestamps.min()), str(timestamps.max()), len(df),
+            float(np.nansum(values)), value_column, hash(groups), *options
+        )
+
+    def get_baseline(
+        self,
+        df: pd.DataFrame,
+        value_column: str,
+        agg_window_minutes: int = DEFAULT_AGG_WINDOW_MINUTES,
+        min_peers: int = DEFAULT_MIN_PEERS,
+        device_room_mapping: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> PeerBaseline:
+        """
+        取得（必要時建立）此數據時間範圍的同儕基準
+
+        Args:
+            df: 包含 deviceNumber, timestamp 與 value_column 的數據
+            value_column: 數值欄位名稱
+            agg_window_minutes: 時間對齊的聚合窗口（分鐘）
+            min_peers: 時間桶最少回報設備數
+            device_room_mapping: 預設使用 data_loader.get_device_room_mapping()
+
+        Returns:
+            PeerBaseline
+        """
+        mapping = device_room_mapping if device_room_mapping is not None else self._load_device_room_mapping()
+        agg_window_minutes = max(1, int(agg_window_minutes or DEFAULT_AGG_WINDOW_MINUTES))
+        key = self._cache_key(df, value_column, mapping, agg_window_minutes, min_peers)
+
+        with self._lock:
+            baseline = self._cache.get(key)
+            if baseline is not None:
+                self._cache.move_to_end(key)
+                logger.info(f"[PEER_BASELINE] 使用快取的同儕基準: {key[0]} ~ {key[1]}")
+                return baseline
+
+        baseline = build_peer_baseline(
+            df, value_column, mapping,
+            agg_window_minutes=agg_window_minutes,
+            min_peers=min_peers
+        )
+
+        with self._lock:
+            self._cache[key] = baseline
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+        return baseline
+
+    def clear(self):
+        """清除所有快取的基準"""
+        with self._lock:
+            self._cache.clear()
+
+
+# 全域實例
+peer_baseline_service = PeerBaselineService()
@@ -5,14 +5,17 @@ PU Learning 預測階段數據準備函數
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, AsyncIterator, Tuple
 from datetime import datetime, timedelta
 import logging
 from services.data_loader import DataLoaderService
 from services.feature_engineering import feature_engineering
+from services.data_window import DataWindowExtractor, DATA_WINDOW_HALF_WIDTH_MINUTES
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PREDICTION_CHUNK_MINUTES = 360  # 串流預測每個區塊涵蓋的時間長度
+
 class PULearningPredictor:
     """PU Learning 預測器 - 處理預測階段的數據準備"""
 
@@ -45,14 +48,7 @@ class PULearningPredictor:
             logger.info("🔮" + "="*50)
 
             # 1. 解析時間範圍
-            start_datetime = datetime.strptime(
-                f"{time_range['start_date']} {time_range['start_time']}",
-                "%Y-%m-%d %H:%M"
-            )
-            end_datetime = datetime.strptime(
-                f"{time_range['end_date']} {time_range['end_time']}",
-                "%Y-%m-%d %H:%M"
-            )
+            start_datetime, end_datetime = self._parse_time_range(time_range)
 
             # 2. 載入原始數據
             start_time_str = start_datetime.isoformat()
@@ -88,6 +84,121 @@ class PULearningPredictor:
             logger.error(f"📍 Traceback: {traceback.format_exc()}")
             return []
 
+    @staticmethod
+    def _parse_time_range(time_range: Dict[str, str]) -> Tuple[datetime, datetime]:
+        """{"start_date", "end_date", "start_time", "end_time"} -> (開始時間, 結束時間)"""
+        start_datetime = datetime.strptime(
+            f"{time_range['start_date']} {time_range['start_time']}",
+            "%Y-%m-%d %H:%M"
+        )
+        end_datetime = datetime.strptime(
+            f"{time_range['end_date']} {time_range['end_time']}",
+            "%Y-%m-%d %H:%M"
+        )
+        return start_datetime, end_datetime
+
+    async def stream_predictions(
+        self,
+        model,
+        time_range: Dict[str, str],
+        building_floors: Dict[str, List[str]],
+        sliding_window_minutes: int = 5,
+        chunk_minutes: int = DEFAULT_PREDICTION_CHUNK_MINUTES
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        串流預測 - 依時間區塊逐段載入原始數據、生成樣本、特徵工程與推論
+
+        每個區塊只載入該段時間（加上 dataWindow 半寬，但不超出預測範圍）的原始數據，
+        記憶體用量與區塊長度成正比而非整個預測範圍；區塊依時間順序產出，
+        結果與 prepare_prediction_data + predict_with_model 一致（樣本編號跨區塊延續）。
+
+        使用方式:
+            async for results in pu_predictor.stream_predictions(model, time_range, floors):
+                await save(results)
+
+        Args:
+            model: 訓練好的模型
+            time_range: 預測時間範圍（格式同 prepare_prediction_data）
+            building_floors: 建築樓層選擇
+            sliding_window_minutes: 滑動窗口間隔（分鐘）
+            chunk_minutes: 每個區塊涵蓋的時間長度（分鐘）
+
+        Yields:
+            List[Dict]: 該區塊的預測結果（格式同 predict_with_model）
+        """
+        start_datetime, end_datetime = self._parse_time_range(time_range)
+        centers = pd.date_range(start_datetime, end_datetime, freq=timedelta(minutes=sliding_window_minutes))
+        steps_per_chunk = max(1, chunk_minutes // sliding_window_minutes)
+        margin = timedelta(minutes=DATA_WINDOW_HALF_WIDTH_MINUTES)
+        sample_counters: Dict[str, int] = {}
+        total_chunks = (len(centers) + steps_per_chunk - 1) // steps_per_chunk
+
+        logger.info(f"🔮 Streaming prediction: {len(centers)} time points in {total_chunks} chunks of {chunk_minutes} minutes")
+
+        for chunk_index, offset in enumerate(range(0, len(centers), steps_per_chunk)):
+            chunk_centers = centers[offset:offset + steps_per_chunk]
+            raw_df = await self.data_loader.load_meter_data_by_time_range(
+                start_time=max(chunk_centers[0] - margin, start_datetime).isoformat(),
+                end_time=min(chunk_centers[-1] + margin, end_datetime).isoformat(),
+                selected_floors_by_building=building_floors
+            )
+            if raw_df.empty:
+                continue
+
+            prediction_samples = self._build_sliding_window_samples(raw_df, chunk_centers, sample_counters)
+            del raw_df
+            if not prediction_samples:
+                continue
+
+            results = await self.predict_with_model(model, prediction_samples)
+            logger.info(
+                f"📦 Prediction chunk {chunk_index + 1}/{total_chunks} "
+                f"({chunk_centers[0]} ~ {chunk_centers[-1]}): {len(results)} results"
+            )
+            yield results
+
+    def _build_sliding_window_samples(
+        self,
+        raw_df: pd.DataFrame,
+        centers: pd.DatetimeIndex,
+        sample_counters: Dict[str, int]
+    ) -> List[Dict[str, Any]]:
+        """
+        為指定時間點建立所有設備的預測樣本（窗口內無數據的時間點略過）
+
+        樣本依設備、時間排序；sample_counters 記錄每個設備已使用的樣本編號，
+        讓分段生成時 eventId 與一次生成完全相同。
+        """
+        # 確保時間戳格式正確
+        if 'timestamp' not in raw_df.columns and 'lastUpdated' in raw_df.columns:
+            raw_df = raw_df.rename(columns={'lastUpdated': 'timestamp'})
+
+        extractor = DataWindowExtractor(raw_df, device_column='deviceNumber')
+
+        # 每個設備 × 每個時間點一個候選，只保留窗口內有數據的時間點
+        devices = np.repeat(np.asarray(extractor.device_names, dtype=object), len(centers))
+        slices = extractor.locate(devices, np.tile(centers.to_pydatetime(), len(extractor.device_names)))
+        keep = np.flatnonzero(slices.counts > 0)
+        data_windows = extractor.build_data_windows(
+            slices.take(keep), detection_rule="prediction_sample", anomaly_score=0.0
+        )
+
+        prediction_samples = []
+        for device_id, data_window in zip(devices[keep], data_windows):
+            sample_id = sample_counters.get(device_id, 0)
+            sample_counters[device_id] = sample_id + 1
+            prediction_samples.append({
+                "eventId": f"pred_{device_id}_{sample_id}",
+                "meterId": device_id,
+                "eventTimestamp": data_window["eventTimestamp"],
+                "detectionRule": "prediction_sample",
+                "score": 0.0,
+                "dataWindow": data_window,
+                "status": "PREDICTION_SAMPLE"
+            })
+
+        return prediction_samples
+
     async def _generate_sliding_window_samples(
         self,
         raw_df: pd.DataFrame,
@@ -95,128 +206,20 @@ class PULearningPredictor:
         end_datetime: datetime,
         window_minutes: int
     ) -> List[Dict[str, Any]]:
-        """使用滑動窗口生成預測樣本"""
+        """使用滑動窗口生成預測樣本（所有設備與時間點的 dataWindow 一次批次擷取）"""
         try:
-            # 確保時間戳格式正確
-            if 'timestamp' not in raw_df.columns and 'lastUpdated' in raw_df.columns:
-                raw_df = raw_df.rename(columns={'lastUpdated': 'timestamp'})
-
-            raw_df['timestamp'] = pd.to_datetime(raw_df['timestamp'])
-            raw_df = raw_df.sort_values(['deviceNumber', 'timestamp'])
-
-            prediction_samples = []
-            devices = raw_df['deviceNumber'].unique()
-
-            # 為每個設備生成滑動窗口預測點
-            for device_id in devices:
-                device_df = raw_df[raw_df['deviceNumber'] == device_id].copy()
-
-                # 生成時間點（每 window_minutes 分鐘一個）
-                current_time = start_datetime
-                sample_id = 0
-
-                while current_time <= end_datetime:
-                    # 檢查該時間點附近是否有數據
-                    nearby_data = device_df[
-                        (device_df['timestamp'] >= current_time - timedelta(minutes=30)) &
-                        (device_df['timestamp'] <= current_time + timedelta(minutes=30))
-                    ]
-
-                    if not nearby_data.empty:
-                        # 生成該時間點的 dataWindow
-                        data_window = await self._generate_prediction_data_window(
-                            device_id, current_time, raw_df
-                        )
-
-                        if data_window and data_window.get('timeSeries'):
-                            prediction_sample = {
-                                "eventId": f"pred_{device_id}_{sample_id}",
-                                "meterId": device_id,
-                                "eventTimestamp": current_time.isoformat(),
-                                "detectionRule": "prediction_sample",
-                                "score": 0.0,
-                                "dataWindow": data_window,
-                                "status": "PREDICTION_SAMPLE"
-                            }
-                            prediction_samples.append(prediction_sample)
-                            sample_id += 1
-
-                    # 移動到下一個時間點
-                    current_time += timedelta(minutes=window_minutes)
-
-                logger.info(f"📊 Generated {sample_id} prediction samples for device {device_id}")
+            # 生成時間點（每 window_minutes 分鐘一個）
+            centers = pd.date_range(start_datetime, end_datetime, freq=timedelta(minutes=window_minutes))
+            sample_counters: Dict[str, int] = {}
+            prediction_samples = self._build_sliding_window_samples(raw_df, centers, sample_counters)
 
+            logger.info(f"📊 Generated {len(prediction_samples)} prediction samples for {len(sample_counters)} devices")
             return prediction_samples
 
         except Exception as e:
             logger.error(f"Failed to generate sliding window samples: {e}")
             return []
 
-    async def _generate_prediction_data_window(
-        self,
-        device_id: str,
-        center_time: datetime,
-        raw_df: pd.DataFrame
-    ) -> Optional[Dict[str, Any]]:
-        """為預測點生成 dataWindow - 與訓練時的邏輯完全一致"""
-        try:
-            # 篩選該設備的數據
-            device_df = raw_df[raw_df['deviceNumber'] == device_id].copy()
-            if device_df.empty:
-                return None
-
-            # 確保時間戳格式
-            time_col = 'timestamp'
-            device_df[time_col] = pd.to_datetime(device_df[time_col])
-            device_df = device_df.sort_values(time_col)
-
-            # 定義時間窗口：中心時間前後各 15 分鐘
-            window_start = center_time - timedelta(minutes=15)
-            window_end = center_time + timedelta(minutes=15)
-
-            # 篩選時間窗口內的數據
-            window_df = device_df[
-                (device_df[time_col] >= window_start) &
-                (device_df[time_col] <= window_end)
-            ]
-
-            if window_df.empty:
-                return None
-
-            # 找到最接近中心時間的數據點
-            time_diffs = abs(device_df[time_col] - center_time)
-            if len(time_diffs) == 0:
-                center_power_value = 0
-            else:
-                closest_idx = time_diffs.idxmin()
-                center_power_value = device_df.loc[closest_idx, 'power'] if not device_df.empty else 0
-
-            # 構建時序數據列表
-            time_series = []
-            for _, row in window_df.iterrows():
-                time_series.append({
-                    "timestamp": row[time_col].isoformat(),
-                    "power": float(row['power']) if pd.notna(row['power']) else 0.0
-                })
-
-            # 構建 dataWindow 對象（與訓練時格式完全一致）
-            data_window = {
-                "eventTimestamp": center_time.isoformat(),
-                "eventPowerValue": float(center_power_value) if pd.notna(center_power_value) else 0.0,
-                "windowStart": window_start.isoformat(),
-                "windowEnd": window_end.isoformat(),
-                "timeSeries": time_series,
-                "totalDataPoints": len(time_series),
-                "detectionRule": "prediction_sample",
-                "anomalyScore": 0.0  # 預測時不知道分數
-            }
-
-            return data_window
-
-        except Exception as e:
-            logger.error(f"Failed to generate prediction dataWindow: {e}")
-            return None
-
     async def predict_with_model(
         self,
         model,
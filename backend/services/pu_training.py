@@ -20,14 +20,40 @@ import os
 
 # WebSocket 相關
 from fastapi import WebSocket
-from typing import Set
+
+from services.broadcast_channel import BroadcastChannel
+from services.data_window import _to_utc_naive_ns
 
 logger = logging.getLogger(__name__)
 
 # 全域變量用於追蹤訓練任務和 WebSocket 連接
 training_jobs: Dict[str, Dict[str, Any]] = {}
-websocket_connections: Set[WebSocket] = set()
-websocket_lock = asyncio.Lock()  # 添加異步鎖保護 WebSocket 操作
+# 訓練進度廣播頻道（依 job_id 合併進度，晚連線者會收到各任務最新進度）
+progress_channel = BroadcastChannel('pu_training')
+
+# U 樣本錨點與已知 P 樣本的最小時間距離（秒）
+U_ANCHOR_P_TOLERANCE_SECONDS = 60
+
+
+def _stratified_sample(strata: np.ndarray, limit: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    依分層按比例抽樣（最大餘數法分配名額），回傳選中元素的位置（原順序）
+
+    每個元素給一個隨機鍵，分層內取鍵最小的前 k 個，
+    不需為每個分層建立候選清單，結果只取決於 rng 的種子。
+    """
+    codes, counts = np.unique(strata, return_inverse=True, return_counts=True)[1:]
+    quota_exact = counts * (limit / len(strata))
+    quota = np.floor(quota_exact).astype(np.int64)
+    remainder = limit - quota.sum()
+    if remainder > 0:
+        quota[np.argsort(-(quota_exact - quota), kind='stable')[:remainder]] += 1
+
+    order = np.lexsort((rng.random(len(strata)), codes))
+    sorted_codes = codes[order]
+    group_start = np.searchsorted(sorted_codes, sorted_codes, side='left')
+    rank = np.arange(len(order)) - group_start
+    return np.sort(order[rank < quota[sorted_codes]])
 
 class TrainingProgress(BaseModel):
     """訓練進度模型"""
@@ -216,7 +242,8 @@ class PULearningTrainer:
                     request.experiment_run_id,
                     request.u_sample_time_range,
                     request.u_sample_building_floors,
-                    request.u_sample_limit
+                    request.u_sample_limit,
+                    seed=request.model_params.seed
                 )
             else:
                 # 使用舊的方法（從 anomaly_event 表）
@@ -459,7 +486,8 @@ class PULearningTrainer:
         experiment_run_id: str,
         u_sample_time_range: Dict[str, str],
         u_sample_building_floors: Dict[str, List[str]],
-        u_sample_limit: int
+        u_sample_limit: int,
+        seed: Optional[int] = None
     ) -> Tuple[List[Dict], List[Dict]]:
         """載入 P 樣本並動態生成 U 樣本"""
         try:
@@ -504,7 +532,8 @@ class PULearningTrainer:
                 experiment_run_id,
                 u_sample_time_range,
                 u_sample_building_floors,
-                u_sample_limit
+                u_sample_limit,
+                seed=seed
             )
 
             logger.info(f"📊 Generated {len(u_samples)} U samples from raw data")
@@ -522,7 +551,8 @@ class PULearningTrainer:
         experiment_run_id: str,
         time_range: Dict[str, str],
         building_floors: Dict[str, List[str]],
-        limit: int = 5000
+        limit: int = 5000,
+        seed: Optional[int] = None
     ) -> List[Dict]:
         """
         從原始電表數據動態生成 U 樣本
@@ -533,12 +563,14 @@ class PULearningTrainer:
             time_range: 時間範圍配置 {"start_date": "2025-08-13", "end_date": "2025-08-14", "start_time": "00:00", "end_time": "23:59"}
             building_floors: 建築樓層配置 {"Building A": ["2"], "Building B": ["1", "2"]}
             limit: U 樣本數量限制
+            seed: 錨點抽樣的隨機種子
 
         Returns:
             List[Dict]: U 樣本列表，每個樣本包含 dataWindow
         """
         try:
             from services.data_loader import DataLoaderService
+            from services.data_window import DataWindowExtractor
             from datetime import datetime, timedelta
             import pandas as pd
 
@@ -591,7 +623,7 @@ class PULearningTrainer:
             # 4. 隨機選取錨點（排除已知的 P 樣本位置）
             await self._broadcast_progress(job_id, 8.9, f"Selecting {limit} anchor points for U sample generation...")
             anchor_points = await self._select_anchor_points(
-                raw_df, p_sample_positions, limit
+                raw_df, p_sample_positions, limit, seed=seed
             )
 
             if not anchor_points:
@@ -602,44 +634,30 @@ class PULearningTrainer:
             logger.info(f"🎯 Selected {len(anchor_points)} anchor points")
             await self._broadcast_progress(job_id, 8.95, f"Selected {len(anchor_points)} anchor points, generating data windows...")
 
-            # 5. 為每個錨點生成 dataWindow
+            # 5. 一次批次擷取所有錨點的 dataWindow
+            extractor = DataWindowExtractor(raw_df, device_column='deviceNumber')
+            slices = extractor.locate(
+                [anchor["deviceNumber"] for anchor in anchor_points],
+                [anchor["timestamp"] for anchor in anchor_points]
+            )
+            data_windows = extractor.build_data_windows(slices, detection_rule="dynamic_u_sample", anomaly_score=0.0)
+
             u_samples = []
-            total_anchors = len(anchor_points)
-
-            for i, anchor in enumerate(anchor_points):
-                try:
-                    data_window = await self._generate_data_window_for_anchor(anchor, raw_df)
-
-                    # 構建 U 樣本對象
-                    u_sample = {
-                        "eventId": f"u_sample_{experiment_run_id}_{i}",
-                        "meterId": anchor["deviceNumber"],
-                        "eventTimestamp": anchor["timestamp"].isoformat(),
-                        "detectionRule": "dynamic_u_sample",
-                        "score": 0.0,  # U 樣本沒有異常分數
-                        "dataWindow": data_window,
-                        "status": "DYNAMIC_U_SAMPLE"
-                    }
-                    u_samples.append(u_sample)
-
-                    # 發送進度更新 - 每500個樣本更新一次
-                    if (i + 1) % 500 == 0 or i == total_anchors - 1:  # 改為每500個樣本更新一次
-                        progress_pct = 8.95 + (i + 1) / total_anchors * 0.05  # 從 8.95% 到 9%
-                        u_sample_progress = ((i + 1) / total_anchors) * 100
-                        await self._broadcast_progress(
-                            job_id,
-                            progress_pct,
-                            f"Generated {i + 1}/{total_anchors} U samples with data windows",
-                            {
-                                "u_sample_count": len(u_samples),
-                                "u_sample_progress": u_sample_progress
-                            }
-                        )
-                        logger.info(f"✅ Generated {i + 1}/{total_anchors} U samples")
-
-                except Exception as e:
-                    logger.warning(f"⚠️ Failed to generate dataWindow for anchor {i}: {e}")
-                    continue
+            for i, (anchor, data_window, has_data) in enumerate(zip(anchor_points, data_windows, slices.has_meter_data)):
+                if not has_data:
+                    logger.warning(f"No data found for meter {anchor['deviceNumber']}")
+                    data_window = self._create_empty_data_window(anchor)
+
+                # 構建 U 樣本對象
+                u_samples.append({
+                    "eventId": f"u_sample_{experiment_run_id}_{i}",
+                    "meterId": anchor["deviceNumber"],
+                    "eventTimestamp": anchor["timestamp"].isoformat(),
+                    "detectionRule": "dynamic_u_sample",
+                    "score": 0.0,  # U 樣本沒有異常分數
+                    "dataWindow": data_window,
+                    "status": "DYNAMIC_U_SAMPLE"
+                })
 
             logger.info("✅" + "="*50)
             logger.info(f"🎊 U SAMPLE GENERATION COMPLETED")
@@ -688,13 +706,26 @@ class PULearningTrainer:
         self,
         raw_df: pd.DataFrame,
         p_sample_positions: List[Tuple[str, datetime]],
-        limit: int
+        limit: int,
+        seed: Optional[int] = None
     ) -> List[Dict]:
-        """從原始數據中選取錨點，排除已知的 P 樣本位置"""
-        try:
-            import pandas as pd
-            import numpy as np
+        """
+        從原始數據中選取錨點，排除已知的 P 樣本位置
+
+        只對有 P 樣本的電表的資料點，以 pd.merge_asof（by 電表、direction='nearest'）
+        找出同一電表最近的 P 樣本，距離小於 U_ANCHOR_P_TOLERANCE_SECONDS 的資料點不作為錨點；
+        之後依 (電表, 小時) 分層按比例抽樣，只為選中的資料點建立錨點。
+
+        Args:
+            raw_df: 原始電表數據（deviceNumber, timestamp 或 lastUpdated, power）
+            p_sample_positions: 已知 P 樣本位置 [(meterId, eventTimestamp)]
+            limit: 錨點數量上限
+            seed: 隨機種子，相同種子與數據產生相同的 U 分佈
 
+        Returns:
+            List[Dict]: 錨點列表 {"deviceNumber", "timestamp", "power"}
+        """
+        try:
             # 確保時間戳是 datetime 類型
             if 'timestamp' in raw_df.columns:
                 raw_df['timestamp'] = pd.to_datetime(raw_df['timestamp'])
@@ -705,41 +736,54 @@ class PULearningTrainer:
                 logger.error("No timestamp column found in raw data")
                 return []
 
-            # 建立 P 樣本位置的快速查找集合
-            p_positions_set = set()
-            for meter_id, timestamp in p_sample_positions:
-                # 建立一個容錯的時間窗口（前後1分鐘）
-                p_positions_set.add((meter_id, timestamp))
-
-            # 過濾出非 P 樣本的數據點
-            valid_anchors = []
-            for _, row in raw_df.iterrows():
-                meter_id = row['deviceNumber']
-                timestamp = row['timestamp']
-
-                # 檢查是否與任何 P 樣本位置衝突（使用時間窗口）
-                is_p_sample = False
-                for p_meter, p_time in p_sample_positions:
-                    if (meter_id == p_meter and
-                        abs((timestamp - p_time).total_seconds()) < 60):  # 1分鐘容錯
-                        is_p_sample = True
-                        break
-
-                if not is_p_sample:
-                    valid_anchors.append({
-                        "deviceNumber": meter_id,
-                        "timestamp": timestamp,
-                        "power": row.get('power', 0)
-                    })
+            if raw_df.empty or limit <= 0:
+                return []
 
-            logger.info(f"📊 Valid anchor candidates: {len(valid_anchors)} (after excluding P samples)")
+            device_codes, device_names = pd.factorize(raw_df['deviceNumber'])
+            row_times = _to_utc_naive_ns(raw_df['timestamp'])
+            valid = (device_codes >= 0) & (row_times != np.iinfo(np.int64).min)
+
+            # 1. 排除 P 樣本位置：每台電表的 P 時間戳排序後，以最近鄰 asof join 找出衝突資料點
+            if p_sample_positions:
+                p_df = pd.DataFrame(p_sample_positions, columns=['meterId', 'eventTimestamp'])
+                p_codes = device_names.get_indexer(p_df['meterId'])
+                p_times = _to_utc_naive_ns(p_df['eventTimestamp'])
+                p_keep = (p_codes >= 0) & (p_times != np.iinfo(np.int64).min)
+                rows = np.flatnonzero(valid & np.isin(device_codes, p_codes[p_keep]))
+
+                if len(rows):
+                    rows_df = pd.DataFrame({'code': device_codes[rows], 'time': row_times[rows], 'row': rows})
+                    p_frame = pd.DataFrame({'code': p_codes[p_keep], 'p_time': p_times[p_keep]})
+                    nearest = pd.merge_asof(
+                        rows_df.sort_values('time', kind='mergesort'),
+                        p_frame.sort_values('p_time', kind='mergesort'),
+                        left_on='time', right_on='p_time', by='code', direction='nearest'
+                    )
+                    distance = (nearest['time'] - nearest['p_time']).abs()
+                    tolerance_ns = U_ANCHOR_P_TOLERANCE_SECONDS * 1_000_000_000
+                    conflict = nearest['p_time'].notna() & (distance < tolerance_ns)
+                    valid[nearest.loc[conflict, 'row'].to_numpy()] = False
+
+            candidate_rows = np.flatnonzero(valid)
+            logger.info(f"📊 Valid anchor candidates: {len(candidate_rows)} (after excluding P samples)")
+            if len(candidate_rows) == 0:
+                return []
 
-            # 隨機選取指定數量的錨點
-            if len(valid_anchors) > limit:
-                selected_indices = np.random.choice(len(valid_anchors), limit, replace=False)
-                selected_anchors = [valid_anchors[i] for i in selected_indices]
-            else:
-                selected_anchors = valid_anchors
+            # 2. 依 (電表, 小時) 分層抽樣
+            if len(candidate_rows) > limit:
+                hours = (row_times[candidate_rows] // 3_600_000_000_000) % 24
+                strata = device_codes[candidate_rows].astype(np.int64) * 24 + hours
+                candidate_rows = candidate_rows[_stratified_sample(strata, limit, np.random.default_rng(seed))]
+
+            timestamps = raw_df['timestamp'].iloc[candidate_rows]
+            powers = (
+                raw_df['power'].iloc[candidate_rows].tolist()
+                if 'power' in raw_df.columns else [0] * len(candidate_rows)
+            )
+            selected_anchors = [
+                {"deviceNumber": device_names[code], "timestamp": timestamp, "power": power}
+                for code, timestamp, power in zip(device_codes[candidate_rows], timestamps, powers)
+            ]
 
             logger.info(f"🎯 Selected {len(selected_anchors)} anchor points")
             return selected_anchors
@@ -748,71 +792,6 @@ class PULearningTrainer:
             logger.error(f"Failed to select anchor points: {e}")
             return []
 
-    async def _generate_data_window_for_anchor(
-        self,
-        anchor: Dict,
-        raw_df: pd.DataFrame
-    ) -> Dict[str, Any]:
-        """為錨點生成 dataWindow，邏輯與現有的事件 dataWindow 生成完全一致"""
-        try:
-            from datetime import timedelta
-            import pandas as pd
-
-            anchor_time = anchor["timestamp"]
-            meter_id = anchor["deviceNumber"]
-
-            # 篩選該電表的數據
-            meter_df = raw_df[raw_df['deviceNumber'] == meter_id].copy()
-            if meter_df.empty:
-                logger.warning(f"No data found for meter {meter_id}")
-                return self._create_empty_data_window(anchor)
-
-            # 確保時間戳列正確
-            time_col = 'timestamp' if 'timestamp' in meter_df.columns else 'lastUpdated'
-            meter_df[time_col] = pd.to_datetime(meter_df[time_col])
-            meter_df = meter_df.sort_values(time_col)
-
-            # 定義時間窗口：錨點前後各 15 分鐘
-            window_start = anchor_time - timedelta(minutes=15)
-            window_end = anchor_time + timedelta(minutes=15)
-
-            # 篩選時間窗口內的數據
-            window_df = meter_df[
-                (meter_df[time_col] >= window_start) &
-                (meter_df[time_col] <= window_end)
-            ]
-
-            # 找到最接近錨點時間的數據點
-            time_diffs = abs(meter_df[time_col] - anchor_time)
-            closest_idx = time_diffs.idxmin()
-            anchor_power_value = meter_df.loc[closest_idx, 'power'] if not meter_df.empty else 0
-
-            # 構建時序數據列表
-            time_series = []
-            for _, row in window_df.iterrows():
-                time_series.append({
-                    "timestamp": row[time_col].isoformat(),
-                    "power": float(row['power']) if pd.notna(row['power']) else 0.0
-                })
-
-            # 構建 dataWindow 對象（與現有格式完全一致）
-            data_window = {
-                "eventTimestamp": anchor_time.isoformat(),
-                "eventPowerValue": float(anchor_power_value) if pd.notna(anchor_power_value) else 0.0,
-                "windowStart": window_start.isoformat(),
-                "windowEnd": window_end.isoformat(),
-                "timeSeries": time_series,
-                "totalDataPoints": len(time_series),
-                "detectionRule": "dynamic_u_sample",
-                "anomalyScore": 0.0
-            }
-
-            return data_window
-
-        except Exception as e:
-            logger.error(f"Failed to generate dataWindow for anchor: {e}")
-            return self._create_empty_data_window(anchor)
-
     def _create_empty_data_window(self, anchor: Dict) -> Dict[str, Any]:
         """創建空的 dataWindow 作為後備"""
         return {
@@ -1242,7 +1221,12 @@ class PULearningTrainer:
 
     async def _broadcast_progress(self, job_id: str, progress: float, message: str,
                                  additional_data: Optional[Dict] = None):
-        """廣播訓練進度到所有連接的 WebSocket 客戶端"""
+        """
+        廣播訓練進度到所有連接的 WebSocket 客戶端
+
+        只做非阻塞 enqueue：同一 job 的進度在推送間隔內合併為最新一則，
+        結束（100% / 失敗）時立即送出；實際發送由每個連線的 sender task 負責。
+        """
         progress_data = {
             "job_id": job_id,
             "progress": progress,
@@ -1253,46 +1237,11 @@ class PULearningTrainer:
         if additional_data:
             progress_data.update(additional_data)
 
-        logger.info("📡" + "="*40)
-        logger.info("📡 BROADCASTING PROGRESS")
-        logger.info(f"🆔 Job ID: {job_id}")
-        logger.info(f"📊 Progress: {progress}%")
-        logger.info(f"💬 Message: {message}")
-        logger.info(f"🔌 WebSocket Connections: {len(websocket_connections)}")
-        logger.info(f"📋 Progress Data: {progress_data}")
-        logger.info("📡" + "="*40)
-
-        # 廣播到所有連接的 WebSocket
-        disconnected = set()
-        success_count = 0
-        error_count = 0
-
-        # 使用異步鎖保護 WebSocket 連接列表操作
-        async with websocket_lock:
-            # 創建連接列表的副本以避免迭代時集合大小改變
-            connections_copy = list(websocket_connections)
-
-        for websocket in connections_copy:
-            try:
-                await websocket.send_text(json.dumps(progress_data))
-                success_count += 1
-                logger.debug(f"✅ Progress sent to WebSocket connection successfully")
-                # 強制立即發送，避免緩衝
-                await asyncio.sleep(0.001)  # 1ms 延遲確保訊息立即發送
-            except Exception as e:
-                error_count += 1
-                logger.warning(f"❌ Failed to send progress to WebSocket: {e}")
-                disconnected.add(websocket)
-
-        # 清理斷開的連接 - 也需要鎖保護
-        if disconnected:
-            async with websocket_lock:
-                for ws in disconnected:
-                    websocket_connections.discard(ws)
-
-        logger.info(f"📊 Broadcast Results: {success_count} successful, {error_count} failed")
-        if disconnected:
-            logger.info(f"🗑️  Removed {len(disconnected)} disconnected WebSocket connections")
+        logger.info(f"📡 [{job_id}] {progress}% {message} ({progress_channel.subscriber_count} connections)")
+
+        progress_channel.publish_progress(json.dumps(progress_data), key=job_id)
+        if progress >= 100 or progress < 0:
+            progress_channel.flush()
 
     def get_job_status(self, job_id: str) -> Optional[Dict]:
         """獲取訓練任務狀態"""
@@ -1307,21 +1256,11 @@ trainer = PULearningTrainer()
 
 # WebSocket 連接管理
 async def add_websocket_connection(websocket: WebSocket):
-    """添加 WebSocket 連接"""
-    async with websocket_lock:
-        websocket_connections.add(websocket)
-    logger.info("🔗" + "="*40)
-    logger.info("🔗 WEBSOCKET CONNECTION ADDED")
-    logger.info(f"📊 Total connections: {len(websocket_connections)}")
-    logger.info(f"🆔 WebSocket ID: {id(websocket)}")
-    logger.info("🔗" + "="*40)
+    """添加 WebSocket 連接（會先收到每個訓練任務的最新進度）"""
+    progress_channel.subscribe(websocket)
+    logger.info(f"🔗 WebSocket connection added ({id(websocket)}), total: {progress_channel.subscriber_count}")
 
 async def remove_websocket_connection(websocket: WebSocket):
     """移除 WebSocket 連接"""
-    async with websocket_lock:
-        websocket_connections.discard(websocket)
-    logger.info("🔌" + "="*40)
-    logger.info("🔌 WEBSOCKET CONNECTION REMOVED")
-    logger.info(f"📊 Remaining connections: {len(websocket_connections)}")
-    logger.info(f"🆔 WebSocket ID: {id(websocket)}")
-    logger.info("🔌" + "="*40)
+    progress_channel.unsubscribe(websocket)
+    logger.info(f"🔌 WebSocket connection removed ({id(websocket)}), remaining: {progress_channel.subscriber_count}")
@@ -0,0 +1,121 @@
+"""
+FeatureEngineering.generate_feature_matrix 測試
+批次特徵矩陣必須與逐筆 generate_feature_vector 堆疊的結果一致
+（含空窗口、非數值 / bool 功率、常數 / 過短窗口、混合時區等邊界情況）
+
+Usage:
+    python -m pytest tests/test_feature_engineering.py
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.feature_engineering import FEATURE_VECTOR_SIZE, FeatureEngineering  # noqa: E402
+
+
+def make_event(event_id, powers=(1.0, 2.0, 4.0, 8.0), **overrides):
+    data_window = {'eventPowerValue': 3.0, 'timeSeries': [{'power': p} for p in powers]}
+    data_window.update(overrides.pop('data_window', {}))
+    event = {'eventId': event_id, 'eventTimestamp': '2025-08-02T13:00:00+08:00',
+             'detectionRule': 'spike', 'score': 0.5, 'dataWindow': data_window}
+    event.update(overrides)
+    return event
+
+
+# 逐筆版本中會走到各種後備分支的事件
+EDGE_CASES = [
+    make_event('empty_window', powers=()),
+    make_event('no_data_window', dataWindow=None),
+    make_event('invalid_json', dataWindow='{not json'),
+    make_event('none_power', powers=(1.0, None, 3.0)),
+    make_event('string_power', powers=('1.0', '2.0')),
+    make_event('missing_power', data_window={'timeSeries': [{'power': 5.0}, {}, {'timestamp': 'x'}]}),
+    make_event('none_event_power', data_window={'eventPowerValue': None}),
+    make_event('none_rule', detectionRule=None),
+    make_event('constant', powers=(0.1, 0.1, 0.1, 0.1, 0.1)),
+    make_event('one_point', powers=(7.0,)),
+    make_event('two_points', powers=(7.0, 9.0)),
+    make_event('three_points', powers=(7.0, 9.0, 13.0)),
+    make_event('int_powers', powers=(1, 5, 2, 8, 3)),
+    make_event('nan_power', powers=(1.0, float('nan'), 3.0, 4.0)),
+    make_event('zero_mean', powers=(-1.0, 1.0, -2.0, 2.0)),
+    make_event('no_timestamp', eventTimestamp=''),
+    make_event('naive_timestamp', eventTimestamp='2025-08-03 23:30:00'),
+    make_event('utc_timestamp', eventTimestamp='2025-08-03T23:30:00Z'),
+    make_event('bad_timestamp', eventTimestamp='not a timestamp'),
+    make_event('datetime_timestamp', eventTimestamp=pd.Timestamp('2025-08-09 06:15:00')),
+    make_event('missing_event_power', data_window={'eventPowerValue': 0}),
+    make_event('bool_powers', powers=(True, False, True)),
+    make_event('numpy_bool_powers', powers=(np.True_, np.False_)),
+    make_event('bool_then_float_powers', powers=(True, 2.0, 5.0)),
+    make_event('float_then_bool_powers', powers=(2.0, False, 5.0)),
+    make_event('bool_event_power', data_window={'eventPowerValue': True}),
+]
+
+
+@pytest.fixture(scope='module')
+def featurizer():
+    return FeatureEngineering()
+
+
+def per_event_matrix(featurizer, events):
+    return np.vstack([featurizer.generate_feature_vector(event) for event in events])
+
+
+def assert_matches_per_event(featurizer, events):
+    expected = per_event_matrix(featurizer, events)
+
+    # 直接呼叫批次實作，避免例外時退回逐筆計算而掩蓋差異
+    batched = featurizer._batch_feature_matrix(events)
+    matrix, event_ids = featurizer.generate_feature_matrix(events)
+
+    assert batched.shape == (len(events), FEATURE_VECTOR_SIZE)
+    np.testing.assert_allclose(batched, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert event_ids == [event['eventId'] for event in events]
+
+
+@pytest.mark.parametrize('event', EDGE_CASES, ids=[event['eventId'] for event in EDGE_CASES])
+def test_edge_case_matches_per_event(featurizer, event):
+    # 單獨一筆，以及夾在正常事件之間（確認 offsets 不會錯位）
+    assert_matches_per_event(featurizer, [event])
+    assert_matches_per_event(featurizer, [make_event('before'), event, make_event('after', powers=(3.0, 1.0))])
+
+
+def test_all_edge_cases_together(featurizer):
+    assert_matches_per_event(featurizer, EDGE_CASES)
+
+
+@pytest.mark.parametrize('as_json', [False, True])
+def test_random_events_match_per_event(featurizer, as_json):
+    rng = np.random.default_rng(0)
+    base = pd.Timestamp('2025-08-01T00:00:00+08:00')
+    rules = ['spike', 'threshold', 'pattern', 'peer', 'dynamic_u_sample', 'Spike']
+    events = []
+    for i in range(200):
+        length = int(rng.integers(1, 61))
+        center = base + pd.Timedelta(minutes=int(rng.integers(0, 30 * 1440)))
+        powers = (400 + 150 * rng.standard_normal(length)).round(3).tolist()
+        data_window = {'eventPowerValue': powers[length // 2], 'timeSeries': [{'power': p} for p in powers]}
+        events.append({
+            'eventId': f"event_{i}",
+            'eventTimestamp': center.isoformat(),
+            'detectionRule': rules[i % len(rules)],
+            'score': float(rng.random()),
+            'dataWindow': json.dumps(data_window) if as_json else data_window,
+        })
+
+    assert_matches_per_event(featurizer, events)
+
+
+def test_empty_window_has_feature_vector_size(featurizer):
+    vector = featurizer.generate_feature_vector(make_event('empty_window', powers=()))
+    assert vector.shape == (FEATURE_VECTOR_SIZE,)
+    assert not vector.any()
@@ -0,0 +1,83 @@
+"""
+nnpu_engine.nnpu_risk 測試
+與逐遮罩 BCELoss 版本比較風險與梯度，並確認 sigmoid 飽和時梯度仍為有限值
+
+Usage:
+    python -m pytest tests/test_nnpu_engine.py
+"""
+
+import os
+import sys
+
+import pytest
+import torch
+import torch.nn as nn
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.case_study_v2.nnpu_engine import nnpu_risk  # noqa: E402
+
+
+def reference_nnpu_risk(outputs, labels, class_prior, beta=0.0):
+    """原本以 nn.BCELoss 逐遮罩計算的 nnPU risk"""
+    criterion = nn.BCELoss()
+    outputs, labels = outputs.reshape(-1), labels.reshape(-1)
+    positive, unlabeled = outputs[labels == 1], outputs[labels == 0]
+    zero = outputs.sum() * 0
+
+    positive_risk = criterion(positive, torch.ones_like(positive)) if len(positive) else zero
+    negative_risk_unlabeled = criterion(unlabeled, torch.zeros_like(unlabeled)) if len(unlabeled) else zero
+    positive_risk_unlabeled = criterion(unlabeled, torch.ones_like(unlabeled)) if len(unlabeled) else zero
+
+    pu_risk = class_prior * positive_risk + negative_risk_unlabeled - class_prior * positive_risk_unlabeled
+    if pu_risk < -beta:
+        return class_prior * positive_risk + beta
+    return pu_risk
+
+
+def risk_and_logit_grad(risk_fn, logits, labels, class_prior=0.3):
+    logits = torch.tensor(logits, dtype=torch.float32, requires_grad=True)
+    labels = torch.tensor(labels, dtype=torch.float32).reshape(-1, 1)
+    risk = risk_fn(torch.sigmoid(logits).reshape(-1, 1), labels, class_prior)
+    if isinstance(risk, tuple):
+        risk = risk[0]
+    risk.backward()
+    return risk.detach(), logits.grad
+
+
+@pytest.mark.parametrize('logits, labels', [
+    ([20.0, -1.0, 0.5, 30.0], [1, 0, 0, 1]),
+    ([20.0, -1.0, 0.5, 30.0], [1, 0, 1, 0]),
+    ([-40.0, 3.0, 0.5, -30.0], [0, 1, 0, 1]),
+    ([-40.0, 40.0, 0.0, -1.0], [1, 1, 0, 0]),
+])
+def test_saturated_outputs_have_finite_gradients(logits, labels):
+    risk, grad = risk_and_logit_grad(nnpu_risk, logits, labels)
+    expected_risk, expected_grad = risk_and_logit_grad(reference_nnpu_risk, logits, labels)
+
+    assert torch.isfinite(grad).all()
+    torch.testing.assert_close(risk, expected_risk)
+    torch.testing.assert_close(grad, expected_grad)
+
+
+@pytest.mark.parametrize('labels', [[1, 1, 1, 1], [0, 0, 0, 0], [1, 0, 0, 0]])
+def test_matches_bce_reference_on_random_outputs(labels):
+    generator = torch.Generator().manual_seed(0)
+    logits = (3 * torch.randn(len(labels), generator=generator)).tolist()
+
+    risk, grad = risk_and_logit_grad(nnpu_risk, logits, labels)
+    expected_risk, expected_grad = risk_and_logit_grad(reference_nnpu_risk, logits, labels)
+
+    torch.testing.assert_close(risk, expected_risk)
+    torch.testing.assert_close(grad, expected_grad)
+
+
+def test_non_negative_correction():
+    # 未標記樣本幾乎都被判為負類時 PU risk 為負，應改用 π·R_p + β
+    outputs = torch.tensor([[0.9], [0.01], [0.001], [0.001]])
+    labels = torch.tensor([[1.0], [0.0], [0.0], [0.0]])
+
+    risk, is_negative = nnpu_risk(outputs, labels, class_prior=0.9, beta=0.0)
+
+    assert bool(is_negative)
+    torch.testing.assert_close(risk, reference_nnpu_risk(outputs, labels, 0.9))